@@ -19,16 +19,25 @@ import time
 import ctypes
 import uuid
 import random
-import http.server
-import socketserver
 import socket  # 用于单实例锁和端口安全
 import string  # 用于磁盘盘符遍历
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from collections import deque
 from http import HTTPStatus
-import queue                       # [PyArchitect Fix] 提升为全局导入以解决作用域问题
 from typing import Callable, Any   # [PyArchitect Fix] 补充类型提示所需依赖
+from cinetico_core import HardwareProbe  # GUI 无关的核心服务
+from cinetico_core import (RemoteNodePool, JobJournal, clean_orphan_temp_files,
+                           OutputManifest, suspend_process, resume_process, graceful_stop,
+                           read_memory_status, read_cpu_temperature,
+                           ResourceGovernor, GOVERNOR_INTERVAL_SEC, StallSupervisor,
+                           ProcessOrchestrator, export_job_metrics,
+                           ControlAPIServer, EventHub, job_id_for, api_port_from_env, HEADLESS_VIDEO_EXTS,
+                           EncoderMetrics, JOB_STATE_NAMES, Tracer, GLOBAL_RAM_STORAGE,
+                           ProfileSession, profile_mode_from_env, UIUpdateBus, UI_FRAME_MS,
+                           EncodeEngine, EncodeJob, EngineListener,
+                           STATE_PENDING, STATE_QUEUED_IO, STATE_CACHING, STATE_READY, STATE_ENCODING,
+                           STATE_DONE, STATE_ERROR)
 
 # =========================================================================
 # [Module 1] Environment Initialization & Dependency Management
@@ -152,6 +161,28 @@ def check_and_install_dependencies(status_cb: Optional[Callable[[str], None]] =
         _report_status(f"ERR: FFmpeg DL Failed - {e}")
 
 
+# --- Headless 模式分发 ---
+# 必须位于 GUI 库导入之前：远程编码节点与命令行批处理运行在无显示环境中，不依赖 customtkinter，也不触发依赖自动安装
+if __name__ == "__main__" and "--agent" in sys.argv[1:]:
+    from cinetico_core import agent_main
+    sys.exit(agent_main(sys.argv[1:]))
+if __name__ == "__main__" and "--headless" in sys.argv[1:]:
+    from cinetico_core import headless_main
+    sys.exit(headless_main(sys.argv[1:]))
+if __name__ == "__main__" and "--benchmark" in sys.argv[1:]:
+    from cinetico_core import bench_main
+    sys.exit(bench_main(sys.argv[1:]))
+if __name__ == "__main__" and "--export-trace" in sys.argv[1:]:
+    from cinetico_core import trace_export_main
+    sys.exit(trace_export_main(sys.argv[1:]))
+if __name__ == "__main__" and "--simulate" in sys.argv[1:]:
+    from cinetico_core import simulate_main
+    sys.exit(simulate_main(sys.argv[1:]))
+if __name__ == "__main__" and "--verify-corpus" in sys.argv[1:]:
+    from cinetico_core import verify_corpus_main
+    sys.exit(verify_corpus_main(sys.argv[1:]))
+
+
 # =========================================================================
 # [Module 2] Core Application Logic & UI
 # 功能：主程序逻辑，包含 GUI 构建、任务调度、硬件监控与 FFmpeg 封装
@@ -191,35 +222,8 @@ COLOR_READING     = ("#8E44AD", "#9B59B6")    # IO 读取 (紫)
 COLOR_PAUSED      = ("#7F8C8D", "#7f8c8d")    # 暂停/停止 (灰)
 COLOR_WAITING     = ("#95A5A6", "#555555")    # 等待中 (灰)
 
-# 任务状态常量 (用于状态机控制)
-STATUS_WAIT = 0      
-STATUS_CACHING = 1   
-STATUS_READY = 2     
-STATUS_RUN = 3       
-STATUS_DONE = 5      
-STATUS_ERR = -1      
-
-STATE_PENDING = 0        
-STATE_QUEUED_IO = 1      
-STATE_CACHING = 2        
-STATE_READY = 3          
-STATE_ENCODING = 4       
-STATE_DONE = 5           
-STATE_ERROR = -1         
-
 # --- 系统工具函数 ---
 
-def get_subprocess_args():
-    """
-    获取跨平台的 subprocess 启动参数。
-    主要用于 Windows 下隐藏弹出的 CMD 窗口。
-    """
-    if platform.system() == "Windows":
-        si = subprocess.STARTUPINFO()
-        si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        return {"startupinfo": si, "creationflags": subprocess.CREATE_NO_WINDOW}
-    return {}
-
 def get_free_ram_gb():
     """
     获取当前系统可用内存 (GB)。
@@ -244,8 +248,9 @@ def get_free_ram_gb():
         return 4.0
 
 # 内存缓存策略配置
-MAX_RAM_LOAD_GB = 48.0  # 最大内存占用限制
+MAX_RAM_LOAD_GB = 48.0  # 最大内存占用限制 (调整前可用 --simulate 离线评估)
 SAFE_RAM_RESERVE = 6.0  # 保留给系统的最小安全内存
+COALESCED_UI_METHODS = ("set_progress", "update_data")  # 只需显示最新值的高频更新，在 UI 总线上按控件合并
 
 # --- 拖拽功能兼容处理 ---
 try:
@@ -416,130 +421,115 @@ class DiskManager:
         candidates.sort(key=lambda x: x[0], reverse=True)
         return candidates[0][1]
     
-# --- 全局内存文件服务器 ---
-# 用于将内存中的视频数据 (Bytes) 通过 HTTP 协议喂给 FFmpeg，避免写盘。
-GLOBAL_RAM_STORAGE = {} 
-PATH_TO_TOKEN_MAP = {}
-
-class GlobalRamHandler(http.server.SimpleHTTPRequestHandler):
-    """自定义 HTTP 处理器，支持高并发分块链表传输，彻底解决超大内存对象的分配崩溃"""
-    def log_message(self, format, *args): pass  
-    
-    def do_GET(self):
-        try:
-            token = self.path.lstrip('/')
-            video_data_chunks = GLOBAL_RAM_STORAGE.get(token) # 现在获取到的是一个 list[bytes]
-            if not video_data_chunks:
-                self.send_error(404)
-                return
-                
-            # 计算总长度
-            total_length = sum(len(chunk) for chunk in video_data_chunks)
-            
-            self.send_response(200)
-            self.send_header("Content-Type", "video/mp4") 
-            self.send_header("Content-Length", str(total_length))
-            self.end_headers()
-            
-            # [PyArchitect Fix] 流式向 Socket 吐出数据块，内存零拷贝
-            try: 
-                for chunk in video_data_chunks:
-                    self.wfile.write(chunk)
-            except (ConnectionResetError, BrokenPipeError): 
-                pass
-        except Exception: 
-            pass
-
-def start_global_server():
-    """启动本地回环 HTTP 服务器（安全加固版）"""
-    # 强制绑定 loopback，拒绝局域网访问
-    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), GlobalRamHandler)
-    server.daemon_threads = True
-    port = server.server_address[1]
-    threading.Thread(target=server.serve_forever, daemon=True).start()
-    return server, port
+# 全局内存文件服务器 (GLOBAL_RAM_STORAGE / start_global_server) 位于 cinetico_core，基准测试套件复用同一实现
 
 # =========================================================================
 # [Module 3] UI Components
 # 功能：自定义的 UI 控件，支持 Light/Dark 主题切换
 # =========================================================================
 
+SCOPE_POINTS = 100      # 示波器环形缓冲区容量 (数据点)
+SCOPE_FRAME_MS = 33     # 量程缓动的帧间隔；无新数据且缓动结束后动画循环休眠
+
 class InfinityScope(ctk.CTkCanvas):
     """
     动态示波器控件。
     用于显示编码时的 FPS 或数据流波动。
-    特点：在绘制循环中实时检测系统主题，动态调整背景和线条颜色。
+    特点：数据点存于定长环形缓冲区，画布图元只创建一次、之后经 coords() 更新；
+    仅在新数据、量程缓动、尺寸或主题变化时重绘，空闲时动画循环完全休眠。
     """
     def __init__(self, master, **kwargs):
         super().__init__(master, highlightthickness=0, **kwargs)
-        self.points = []
+        self.points = deque(maxlen=SCOPE_POINTS)
         self.display_max = 10.0  
         self.target_max = 10.0   
-        self.running = True
+        self._size = (0, 0)
+        self._dirty = False
+        self._after_id = None
+        
+        # 常驻图元：中心基准线与波形线
+        line_color = "#00B894"                            # 波形线 (保持绿色)
+        self._grid_item = self.create_line(0, 0, 0, 0, dash=(4, 4))
+        self._wave_item = self.create_line(0, 0, 0, 0, fill=line_color, width=2, smooth=True, state="hidden")
+        self._on_appearance_mode(ctk.get_appearance_mode())
+        ctk.AppearanceModeTracker.add(self._on_appearance_mode, self)
+        
         # 监听窗口尺寸变化以重绘
-        self.bind("<Configure>", lambda e: self.draw()) 
-        self.animate_loop()
+        self.bind("<Configure>", self._on_resize) 
 
     def add_point(self, val):
         """添加新数据点"""
         self.points.append(val)
-        if len(self.points) > 100: self.points.pop(0)
         # 动态调整 Y 轴量程
-        current_data_max = max(self.points) if self.points else 10
-        self.target_max = max(current_data_max, 10) * 1.2
+        self.target_max = max(max(self.points), 10) * 1.2
+        self._invalidate()
 
     def clear(self):
-        self.points = []
-        self.draw()
+        self.points.clear()
+        self._invalidate()
 
-    def animate_loop(self):
-        """动画主循环 (约 30 FPS)"""
-        if self.winfo_exists() and self.running:
-            # 平滑过渡 Y 轴最大值
-            diff = self.target_max - self.display_max
-            if abs(diff) > 0.01: self.display_max += diff * 0.1
-            self.draw()
-            self.after(33, self.animate_loop) 
+    def destroy(self):
+        ctk.AppearanceModeTracker.remove(self._on_appearance_mode)
+        super().destroy()
 
-    def draw(self):
-        """绘制逻辑"""
-        if not self.winfo_exists(): return
-        
-        # [关键] 实时获取当前外观模式 (Light/Dark)
-        mode = ctk.get_appearance_mode()
+    def _on_appearance_mode(self, mode):
+        """主题切换回调 (由 customtkinter 在 Light/Dark 变化时调用)：只改颜色，不动坐标"""
         is_light = (mode == "Light")
         
         # 根据模式设定绘图颜色
         bg_color = "#F0F0F0" if is_light else "#0f0f0f"   # 浅灰 vs 深黑
         grid_color = "#D0D0D0" if is_light else "#2a2a2a" # 网格线
-        line_color = "#00B894"                            # 波形线 (保持绿色)
-        
         self.configure(bg=bg_color)
-        self.delete("all")
-        
-        w = self.winfo_width()
-        h = self.winfo_height()
+        self.itemconfigure(self._grid_item, fill=grid_color)
+
+    def _on_resize(self, event):
+        self._size = (event.width, event.height)
+        self._invalidate()
+
+    def _invalidate(self):
+        """标记需要重绘并唤醒动画循环 (已在运行时不重复调度)"""
+        self._dirty = True
+        if self._after_id is None:
+            self._after_id = self.after(SCOPE_FRAME_MS, self.animate_loop)
+
+    def animate_loop(self):
+        """动画帧 (约 30 FPS)：仅在有待绘内容或量程仍在缓动时继续调度"""
+        self._after_id = None
+        if not self.winfo_exists(): return
+        # 平滑过渡 Y 轴最大值
+        diff = self.target_max - self.display_max
+        easing = abs(diff) > 0.01
+        if easing: 
+            self.display_max += diff * 0.1
+            self._dirty = True
+        if self._dirty:
+            self.draw()
+        if easing:
+            self._after_id = self.after(SCOPE_FRAME_MS, self.animate_loop)
+
+    def draw(self):
+        """绘制逻辑：更新常驻图元的坐标"""
+        self._dirty = False
+        w, h = self._size
         if w < 10 or h < 10: return
         
-        # 绘制中心基准线
-        self.create_line(0, h/2, w, h/2, fill=grid_color, dash=(4, 4))
+        # 中心基准线
+        self.coords(self._grid_item, 0, h/2, w, h/2)
         
-        if not self.points: return
+        n = len(self.points)
+        if n < 2:
+            self.itemconfigure(self._wave_item, state="hidden")
+            return
         
         # 计算波形坐标
         scale_y = (h - 20) / self.display_max
-        n = len(self.points)
-        if n < 2: return
-        step_x = w / (n - 1) if n > 1 else w
+        step_x = w / (n - 1)
         coords = []
         for i, val in enumerate(self.points):
-            x = i * step_x
-            y = h - (val * scale_y) - 10
-            coords.extend([x, y])
-            
-        # 绘制平滑曲线
-        if len(coords) >= 4:
-            self.create_line(coords, fill=line_color, width=2, smooth=True)
+            coords.append(i * step_x)
+            coords.append(h - (val * scale_y) - 10)
+        self.coords(self._wave_item, coords)
+        self.itemconfigure(self._wave_item, state="normal")
 
 class MonitorChannel(ctk.CTkFrame):
     """
@@ -593,10 +583,19 @@ class MonitorChannel(ctk.CTkFrame):
 
         self.is_active = False
         self.last_update_time = time.time()
-        self.after(500, self._heartbeat)
+        self._heartbeat_id = None
+        self._label_state = {}   # 标签 -> 最近一次写入的属性，未变化时跳过 configure (避免无谓重绘)
+
+    def _set_label(self, label, **kwargs) -> None:
+        state = self._label_state.setdefault(label, {})
+        changed = {k: v for k, v in kwargs.items() if k not in state or state[k] != v}
+        if changed:
+            state.update(changed)
+            label.configure(**changed)
 
     def _heartbeat(self):
-        """心跳检测"""
+        """心跳检测 (仅在通道活跃时调度，空闲后自然停止)"""
+        self._heartbeat_id = None
         if not self.winfo_exists(): return
         
         # [PyArchitect Fix] 空闲时彻底停止向示波器推数据，防止出现“幽灵图表”
@@ -605,24 +604,22 @@ class MonitorChannel(ctk.CTkFrame):
             # 如果运行中超过 3 秒没收到数据，说明卡住了，补 0
             if now - self.last_update_time > 3.0: 
                 self.scope.add_point(0)
-                self.lbl_fps.configure(text="0.0", text_color=COLOR_TEXT_HINT)
-        else:
-            # 空闲状态下，不添加任何点，让 scope 保持静止或清空
-            pass
-            
-        self.after(500, self._heartbeat)
+                self._set_label(self.lbl_fps, text="0.0", text_color=COLOR_TEXT_HINT)
+            self._heartbeat_id = self.after(500, self._heartbeat)
 
     def activate(self, filename, tag, task_uuid): # [修改] 新增 task_uuid 参数
         if not self.winfo_exists(): return
         self.current_task_uuid = task_uuid # [关键] 绑定当前任务令牌
         self.is_active = True
         self.scope.clear()
-        self.lbl_title.configure(text=f"运行中: {filename[:10]}...", text_color=COLOR_ACCENT)
-        self.lbl_info.configure(text=tag, text_color=COLOR_TEXT_HINT)
-        self.lbl_fps.configure(text_color=COLOR_TEXT_MAIN)
-        self.lbl_prog.configure(text_color=COLOR_ACCENT)
-        self.lbl_eta.configure(text_color=COLOR_SUCCESS)
+        self._set_label(self.lbl_title, text=f"运行中: {filename[:10]}...", text_color=COLOR_ACCENT)
+        self._set_label(self.lbl_info, text=tag, text_color=COLOR_TEXT_HINT)
+        self._set_label(self.lbl_fps, text_color=COLOR_TEXT_MAIN)
+        self._set_label(self.lbl_prog, text_color=COLOR_ACCENT)
+        self._set_label(self.lbl_eta, text_color=COLOR_SUCCESS)
         self.last_update_time = time.time()
+        if self._heartbeat_id is None:
+            self._heartbeat_id = self.after(500, self._heartbeat)
 
     def update_data(self, fps: float, prog: float, eta: str, task_uuid: str, est_size: str = "") -> None:
         """
@@ -640,27 +637,27 @@ class MonitorChannel(ctk.CTkFrame):
             
         self.last_update_time = time.time() 
         self.scope.add_point(fps)
-        self.lbl_fps.configure(text=f"{float(fps):.1f}", text_color=COLOR_TEXT_MAIN) 
-        self.lbl_prog.configure(text=f"{int(prog*100)}%")
+        self._set_label(self.lbl_fps, text=f"{float(fps):.1f}", text_color=COLOR_TEXT_MAIN) 
+        self._set_label(self.lbl_prog, text=f"{int(prog*100)}%")
         
         # [优化] 拼装 ETA 与 预期体积
         display_text = eta if "ETA" in eta or "Final" in eta else f"ETA: {eta}"
         if est_size and "Final" not in display_text:
             display_text += f" | {est_size}"
             
-        self.lbl_eta.configure(text=display_text)
+        self._set_label(self.lbl_eta, text=display_text)
 
     def reset(self) -> None:
         """重置通道为等待状态"""
         if not self.winfo_exists(): return
         self.current_task_uuid = None
         self.is_active = False
-        self.lbl_title.configure(text="通道 · 空闲", text_color=COLOR_TEXT_SUB)
-        self.lbl_info.configure(text="等待任务...", text_color=COLOR_TEXT_HINT)
+        self._set_label(self.lbl_title, text="通道 · 空闲", text_color=COLOR_TEXT_SUB)
+        self._set_label(self.lbl_info, text="等待任务...", text_color=COLOR_TEXT_HINT)
         
-        self.lbl_fps.configure(text="--", text_color=COLOR_TEXT_HINT)
-        self.lbl_prog.configure(text="0%", text_color=COLOR_TEXT_HINT)
-        self.lbl_eta.configure(text="ETA: --:--", text_color=COLOR_TEXT_HINT)
+        self._set_label(self.lbl_fps, text="--", text_color=COLOR_TEXT_HINT)
+        self._set_label(self.lbl_prog, text="0%", text_color=COLOR_TEXT_HINT)
+        self._set_label(self.lbl_eta, text="ETA: --:--", text_color=COLOR_TEXT_HINT)
         self.scope.clear()
 
     def set_placeholder(self) -> None:
@@ -668,13 +665,13 @@ class MonitorChannel(ctk.CTkFrame):
         if not self.winfo_exists(): return
         self.is_active = False
         self.configure(border_color=COLOR_BORDER)
-        self.lbl_title.configure(text="通道 · 未启用", text_color=COLOR_TEXT_HINT)
-        self.lbl_info.configure(text="Channel Disabled", text_color=COLOR_TEXT_HINT)
+        self._set_label(self.lbl_title, text="通道 · 未启用", text_color=COLOR_TEXT_HINT)
+        self._set_label(self.lbl_info, text="Channel Disabled", text_color=COLOR_TEXT_HINT)
         self.scope.clear()
         
-        self.lbl_fps.configure(text="--", text_color=COLOR_TEXT_HINT)
-        self.lbl_prog.configure(text="--", text_color=COLOR_TEXT_HINT)
-        self.lbl_eta.configure(text="", text_color=COLOR_TEXT_HINT)
+        self._set_label(self.lbl_fps, text="--", text_color=COLOR_TEXT_HINT)
+        self._set_label(self.lbl_prog, text="--", text_color=COLOR_TEXT_HINT)
+        self._set_label(self.lbl_eta, text="", text_color=COLOR_TEXT_HINT)
 
 class ToastNotification(ctk.CTkFrame):
     """自定义 Toast 消息提示框，自下而上浮出"""
@@ -706,112 +703,47 @@ import os
 import platform
 import subprocess
 
-class TaskCard(ctk.CTkFrame):
+TASK_ROW_HEIGHT = 78    # 任务行的固定高度 (含行间距)，虚拟列表据此直接换算可见区间
+TASK_ROW_GAP = 8
+
+class TaskCard(EncodeJob):
     """
-    任务列表项卡片。
-    显示文件名、状态、进度条，支持查看独立日志。
+    任务记录 (不含控件)。
+    调度字段继承自 EncodeJob 并由 EncodeEngine 维护；这里只保存显示状态与进度，
+    界面由 VirtualTaskList 中循环复用的 TaskRow 渲染，仅当记录恰好处于可见区间时 (view 非空) 才触达控件。
     """
-    def __init__(self, master, index, filepath, **kwargs):
-        super().__init__(master, fg_color=COLOR_CARD, corner_radius=10, border_width=0, **kwargs)
-        
-        self.grid_columnconfigure(1, weight=1)
-        self.filepath = filepath
-        self.status_code = STATE_PENDING 
-        self.ram_data = None 
-        self.ssd_cache_path = None
-        self.source_mode = "PENDING"
-        self.ui_max_progress = 0.0
-        
-        # [新增] 为每个任务维护独立的日志缓冲区（保留最后2000行，防内存溢出）
-        self.log_data = deque(maxlen=2000)
-        
-        try: self.file_size_gb = os.path.getsize(filepath) / (1024**3)
-        except: self.file_size_gb = 0.0
-        
-        # 序号
-        self.lbl_index = ctk.CTkLabel(self, text=f"{index:02d}", font=("Impact", 22), 
-                                      text_color=COLOR_TEXT_HINT, width=50, anchor="center")
-        self.lbl_index.grid(row=0, column=0, rowspan=2, padx=(5, 5), pady=0) 
-        
-        # 文件名
-        name_frame = ctk.CTkFrame(self, fg_color="transparent")
-        name_frame.grid(row=0, column=1, sticky="sw", padx=0, pady=(8, 0)) 
-        ctk.CTkLabel(name_frame, text=os.path.basename(filepath), font=("微软雅黑", 12, "bold"), 
-                     text_color=COLOR_TEXT_MAIN, anchor="w").pack(side="left")
-        
-        # 按钮区容器
-        btn_frame = ctk.CTkFrame(self, fg_color="transparent")
-        btn_frame.grid(row=0, column=2, padx=10, pady=(8,0), sticky="e")
-        
-        btn_bg = ("#E0E0E0", "#444444")
-        btn_hover = ("#D0D0D0", "#555555")
-        
-        # [新增] 查看日志按钮
-        self.btn_log = ctk.CTkButton(btn_frame, text="📄", width=28, height=22, fg_color=btn_bg, hover_color=btn_hover, 
-                                     text_color=COLOR_TEXT_MAIN, font=("Segoe UI Emoji", 11), command=self.show_log)
-        self.btn_log.pack(side="left", padx=(0, 5))
-
-        # 打开文件夹按钮
-        self.btn_open = ctk.CTkButton(btn_frame, text="📂", width=28, height=22, fg_color=btn_bg, hover_color=btn_hover, 
-                                      text_color=COLOR_TEXT_MAIN, font=("Segoe UI Emoji", 11), command=self.open_location)
-        self.btn_open.pack(side="left")
-        
-        # 状态文本
-        self.lbl_status = ctk.CTkLabel(self, text="等待处理", font=("Arial", 10), text_color=COLOR_TEXT_HINT, anchor="nw")
-        self.lbl_status.grid(row=1, column=1, sticky="nw", padx=0, pady=(0, 0)) 
-        
-        # 进度条
-        self.progress = ctk.CTkProgressBar(self, height=6, corner_radius=3, progress_color=COLOR_ACCENT)
-        self.progress.configure(fg_color=("#E0E0E0", "#444444")) 
-        self.progress.set(0)
-        self.progress.grid(row=2, column=0, columnspan=3, sticky="new", padx=12, pady=(0, 10))
-        self.final_output_path = None
-    def set_status(self, text: str, text_color: tuple | str, code: int) -> None:
+    def __init__(self, filepath, size_bytes=0):
+        super().__init__(filepath, size_bytes)
+        self.settings_override = {}    # 经控制接口提交时携带的单任务编码设置 (覆盖全局设置)
+        self.status_text = "等待处理"   # 最近一次状态文本、颜色与进度，行控件重新绑定时据此渲染
+        self.status_color = COLOR_TEXT_HINT
+        self.progress_value = 0.0
+        self.progress_color = COLOR_ACCENT
+        self.on_event = None           # 状态/进度事件回调 (card, kind)，用于推送控制接口事件
+        self.view = None               # 当前绑定的 TaskRow (不在可见区间时为 None)
+
+    def set_status(self, text: str, text_color: tuple | str) -> None:
         """
-        线程安全的卡片状态更新器。
+        更新状态文本 (在主线程调用)；可见时同步刷新所绑定的行控件。status_code 由引擎迁移，这里只负责显示。
         """
-        if self.winfo_exists():
-            self.lbl_status.configure(text=text, text_color=text_color)
-            self.status_code = code
+        self.status_text = text
+        self.status_color = text_color
+        if self.view is not None:
+            self.view.render_status()
+        if self.on_event:
+            self.on_event(self, "status")
 
     def set_progress(self, val: float, color: tuple | str) -> None:
         """
-        线程安全的卡片进度条更新器。
+        更新任务进度 (在主线程调用)；可见时同步刷新所绑定的行控件。
         """
-        if self.winfo_exists():
-            # 限制数值范围以防底层 Tkinter 渲染崩溃
-            safe_val = max(0.0, min(1.0, float(val)))
-            self.progress.set(safe_val)
-            self.progress.configure(progress_color=color)
-
-    def clean_memory(self) -> None:
-        """
-        清理当前卡片绑定的物理内存与全局引用，防止 OOM (Out Of Memory) 内存泄漏。
-        [PyArchitect Fix] 引入深度清空与强制系统级内存回收。
-        """
-        self.ram_data = None
-        
-        # 安全移除全局字典中的巨型二进制对象，切断强引用
-        token = PATH_TO_TOKEN_MAP.get(self.filepath)
-        if token:
-            data_list = GLOBAL_RAM_STORAGE.pop(token, None)
-            if isinstance(data_list, list):
-                data_list.clear() # 释放内部 chunk 引用
-            PATH_TO_TOKEN_MAP.pop(self.filepath, None)
-            
-        # 如果释放了大量内存，立即踢醒垃圾回收器，交还 OS 物理内存
-        import gc
-        gc.collect()
-
-    def update_index(self, new_index: int) -> None:
-        """
-        更新 UI 列表中的任务序号。
-        
-        Args:
-            new_index (int): 重新排序后的任务队列序号。
-        """
-        if self.winfo_exists():
-            self.lbl_index.configure(text=f"{new_index:02d}")
+        # 限制数值范围以防底层 Tkinter 渲染崩溃
+        self.progress_value = max(0.0, min(1.0, float(val)))
+        self.progress_color = color
+        if self.view is not None:
+            self.view.render_progress()
+        if self.on_event:
+            self.on_event(self, "progress")
 
     def open_location(self) -> None:
         """
@@ -845,12 +777,12 @@ class TaskCard(ctk.CTkFrame):
             # 捕获操作系统拒绝访问、进程树挂载失败等底层异常，保留堆栈信息但不阻断主程序
             print(f"[OS Subprocess Error] 唤起系统文件管理器失败: {e}")
 
-    def show_log(self) -> None:
+    def show_log(self, master) -> None:
         """弹出当前任务的详细日志窗口"""
-        log_win = ctk.CTkToplevel(self)
+        log_win = ctk.CTkToplevel(master)
         log_win.title(f"日志诊断 - {os.path.basename(self.filepath)}")
         log_win.geometry("700x500")
-        log_win.transient(self.winfo_toplevel())
+        log_win.transient(master.winfo_toplevel())
         
         txt = ctk.CTkTextbox(log_win, font=("Consolas", 12), wrap="none", fg_color=("#FFFFFF", "#1E1E1E"))
         txt.pack(fill="both", expand=True, padx=10, pady=10)
@@ -860,6 +792,202 @@ class TaskCard(ctk.CTkFrame):
         txt.insert("1.0", full_log)
         txt.configure(state="disabled") # 只读模式
 
+class TaskRow(ctk.CTkFrame):
+    """
+    任务列表的可复用行控件。
+    显示文件名、状态、进度条，支持查看独立日志；滚动或重排时经 bind_card() 换绑到另一条任务记录，不重建控件。
+    """
+    def __init__(self, master, on_control, **kwargs):
+        super().__init__(master, fg_color=COLOR_CARD, corner_radius=10, border_width=0, **kwargs)
+        
+        self.grid_columnconfigure(1, weight=1)
+        self.card = None
+        self.index = None
+        self.on_control = on_control   # 单任务控制回调 (path, "pause" / "cancel")
+        self._shown = {}               # 已渲染到控件上的值，未变化时跳过 configure
+        
+        # 序号
+        self.lbl_index = ctk.CTkLabel(self, text="", font=("Impact", 22), 
+                                      text_color=COLOR_TEXT_HINT, width=50, anchor="center")
+        self.lbl_index.grid(row=0, column=0, rowspan=2, padx=(5, 5), pady=0) 
+        
+        # 文件名
+        name_frame = ctk.CTkFrame(self, fg_color="transparent")
+        name_frame.grid(row=0, column=1, sticky="sw", padx=0, pady=(8, 0)) 
+        self.lbl_name = ctk.CTkLabel(name_frame, text="", font=("微软雅黑", 12, "bold"), 
+                                     text_color=COLOR_TEXT_MAIN, anchor="w")
+        self.lbl_name.pack(side="left")
+        
+        # 按钮区容器
+        btn_frame = ctk.CTkFrame(self, fg_color="transparent")
+        btn_frame.grid(row=0, column=2, padx=10, pady=(8,0), sticky="e")
+        
+        btn_bg = ("#E0E0E0", "#444444")
+        btn_hover = ("#D0D0D0", "#555555")
+        
+        # 暂停/恢复与取消按钮 (仅作用于本任务的进程组)
+        self.btn_pause = ctk.CTkButton(btn_frame, text="⏸", width=28, height=22, fg_color=btn_bg, hover_color=btn_hover, 
+                                       text_color=COLOR_TEXT_MAIN, font=("Segoe UI Emoji", 11), 
+                                       command=lambda: self._control("pause"))
+        self.btn_pause.pack(side="left", padx=(0, 5))
+        self.btn_cancel = ctk.CTkButton(btn_frame, text="✕", width=28, height=22, fg_color=btn_bg, hover_color=btn_hover, 
+                                        text_color=COLOR_TEXT_MAIN, font=("Segoe UI Emoji", 11), 
+                                        command=lambda: self._control("cancel"))
+        self.btn_cancel.pack(side="left", padx=(0, 5))
+
+        # [新增] 查看日志按钮
+        self.btn_log = ctk.CTkButton(btn_frame, text="📄", width=28, height=22, fg_color=btn_bg, hover_color=btn_hover, 
+                                     text_color=COLOR_TEXT_MAIN, font=("Segoe UI Emoji", 11), 
+                                     command=lambda: self.card and self.card.show_log(self))
+        self.btn_log.pack(side="left", padx=(0, 5))
+
+        # 打开文件夹按钮
+        self.btn_open = ctk.CTkButton(btn_frame, text="📂", width=28, height=22, fg_color=btn_bg, hover_color=btn_hover, 
+                                      text_color=COLOR_TEXT_MAIN, font=("Segoe UI Emoji", 11), 
+                                      command=lambda: self.card and self.card.open_location())
+        self.btn_open.pack(side="left")
+        
+        # 状态文本
+        self.lbl_status = ctk.CTkLabel(self, text="", font=("Arial", 10), text_color=COLOR_TEXT_HINT, anchor="nw")
+        self.lbl_status.grid(row=1, column=1, sticky="nw", padx=0, pady=(0, 0)) 
+        
+        # 进度条
+        self.progress = ctk.CTkProgressBar(self, height=6, corner_radius=3, progress_color=COLOR_ACCENT)
+        self.progress.configure(fg_color=("#E0E0E0", "#444444")) 
+        self.progress.set(0)
+        self.progress.grid(row=2, column=0, columnspan=3, sticky="new", padx=12, pady=(0, 10))
+
+    def _control(self, action: str) -> None:
+        if self.card is not None and self.on_control:
+            self.on_control(self.card.filepath, action)
+
+    def _put(self, key, value, apply) -> None:
+        """仅在值变化时调用 apply (CTk 的 configure 会触发重绘，复用行时逐项比对可省去大部分开销)"""
+        if key not in self._shown or self._shown[key] != value:
+            self._shown[key] = value
+            apply(value)
+
+    def bind_card(self, card: TaskCard, index: int) -> None:
+        """将本行绑定到任务记录 card (队列中第 index 个，从 1 计数) 并渲染"""
+        if card is not self.card:
+            self.unbind_card()
+            self.card = card
+            card.view = self
+            self._put("name", os.path.basename(card.filepath), lambda v: self.lbl_name.configure(text=v))
+            self.render_status()
+            self.render_progress()
+        if index != self.index:
+            self.index = index
+            self._put("index", index, lambda v: self.lbl_index.configure(text=f"{v:02d}"))
+
+    def unbind_card(self) -> None:
+        if self.card is not None and self.card.view is self:
+            self.card.view = None
+        self.card = None
+        self.index = None
+
+    def render_status(self) -> None:
+        card = self.card
+        self._put("status", (card.status_text, card.status_color), 
+                  lambda v: self.lbl_status.configure(text=v[0], text_color=v[1]))
+        self._put("pause", "▶" if card.paused else "⏸", lambda v: self.btn_pause.configure(text=v))
+
+    def render_progress(self) -> None:
+        card = self.card
+        self._put("progress", card.progress_value, self.progress.set)
+        self._put("progress_color", card.progress_color, lambda v: self.progress.configure(progress_color=v))
+
+class VirtualTaskList(ctk.CTkFrame):
+    """
+    虚拟化任务列表。
+    行高固定，按滚动偏移直接算出可见区间，只为其创建少量 TaskRow 并循环复用；
+    增删、排序与滚动都只重新绑定可见行，与队列长度无关。
+    items() 返回当前队列 (路径列表)，records 为路径 -> TaskCard。
+    """
+    def __init__(self, master, items: Callable[[], list], records: dict, on_control, **kwargs):
+        super().__init__(master, fg_color="transparent", **kwargs)
+        self.items = items
+        self.records = records
+        self.on_control = on_control
+        self.offset = 0.0              # 滚动偏移 (像素)
+        self.rows = []                 # 行控件池 (按需扩容，不回收)
+        self._layout_pending = False
+        
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent", corner_radius=0)
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        
+        self.viewport.bind("<Configure>", lambda e: self.refresh())
+        # 滚轮事件全局绑定 (add="+" 不覆盖其他滚动区域)，回调中按指针所在控件过滤
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind_all(seq, self._on_wheel, add="+")
+
+    def refresh(self) -> None:
+        """队列内容或顺序变化后调用；同一轮事件循环内的多次调用合并为一次布局"""
+        if not self._layout_pending:
+            self._layout_pending = True
+            self.after_idle(self._layout)
+
+    def scroll_to(self, index: int) -> None:
+        """滚动使第 index 项 (从 0 计数) 位于可视区域中部"""
+        height = max(1, self.viewport.winfo_height())
+        self.offset = index * TASK_ROW_HEIGHT - (height - TASK_ROW_HEIGHT) / 2
+        self._layout()
+
+    def _layout(self) -> None:
+        self._layout_pending = False
+        if not self.winfo_exists(): return
+        items = self.items()
+        height = max(1, self.viewport.winfo_height())
+        total = len(items) * TASK_ROW_HEIGHT
+        self.offset = max(0.0, min(self.offset, total - height))
+        first = int(self.offset // TASK_ROW_HEIGHT)
+        visible = min(len(items) - first, height // TASK_ROW_HEIGHT + 2)
+        
+        while len(self.rows) < visible:
+            self.rows.append(TaskRow(self.viewport, self.on_control))
+        for slot, row in enumerate(self.rows):
+            i = first + slot
+            card = self.records.get(items[i]) if slot < visible else None
+            if card is None:
+                if row.card is not None:
+                    row.unbind_card()
+                    row.place_forget()
+                continue
+            row.bind_card(card, i + 1)
+            row.place(x=0, y=i * TASK_ROW_HEIGHT - self.offset, relwidth=1.0, height=TASK_ROW_HEIGHT - TASK_ROW_GAP)
+        
+        if total > height:
+            self.scrollbar.set(self.offset / total, (self.offset + height) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _scroll_by(self, pixels: float) -> None:
+        self.offset += pixels
+        self._layout()
+
+    def _on_scrollbar(self, *args) -> None:
+        total = len(self.items()) * TASK_ROW_HEIGHT
+        if args[0] == "moveto":
+            self.offset = float(args[1]) * total
+            self._layout()
+        elif args[0] == "scroll":
+            page = self.viewport.winfo_height() if args[2] == "pages" else TASK_ROW_HEIGHT
+            self._scroll_by(int(args[1]) * page)
+
+    def _on_wheel(self, event) -> None:
+        try:
+            widget = self.winfo_containing(event.x_root, event.y_root)
+        except (KeyError, tk.TclError):
+            return
+        if widget is None or not str(widget).startswith(str(self)): return
+        if event.num == 4: units = -1.0
+        elif event.num == 5: units = 1.0
+        elif platform.system() == "Darwin": units = -float(event.delta)
+        else: units = -event.delta / 120.0
+        self._scroll_by(units * TASK_ROW_HEIGHT / 2)
+
 # =========================================================================
 # [Module 3.5] Help Window (Ported from v0.9.6 & Optimized)
 # [修复版] 已适配 Light/Dark 双色模式，并找回了丢失的技术细节文档
@@ -1220,6 +1348,166 @@ class SplashScreen(ctk.CTkToplevel):
             print(f"Boot Error: {e}")
             self.after(0, self._finish_boot)
 
+class EngineUIBridge(EngineListener):
+    """
+    EncodeEngine 回调 -> 界面。
+    引擎在调度线程、工作线程或编排器线程上回调；这里只把状态文本、进度与监控通道的更新经 safe_update 投递到主线程，
+    并负责监控通道槽位的申请与归还 (远程任务不占用本地通道)。
+    """
+
+    # 方案用尽时按失败类别显示的最终状态
+    FAILURE_STATUS = {
+        "no_space": "Disk Full / 磁盘空间不足",
+        "nvenc_encode": "NVENC Unavailable / 硬件编码器不可用",
+        "nvenc_pix_fmt": "Unsupported by NVENC / 硬件编码不支持该格式",
+        "decode_surfaces": "GPU Decode Failure / 硬件解码资源不足",
+        "http_eof": "Source Stream Lost / 输入流中断",
+        "resources": "Out of Resources / 系统资源不足",
+        "corrupt_input": "Corrupt Input / 源文件损坏",
+        "stalled": "Stalled / 进程卡死，已放弃",
+        "cache_failed": "Cache Allocation Failed / 缓存分配失败",
+        "concat_failed": "Concat Exception / 拼接异常",
+        "remote_failed": "Remote Encoding Exception / 远程编码异常",
+        "move_failed": "Relocation Failed / 迁移输出失败",
+        "internal": "System Fault / 系统故障",
+    }
+
+    def __init__(self, app: "UltraEncoderApp") -> None:
+        self.app = app
+
+    def _status(self, job: TaskCard, text: str, color: tuple) -> None:
+        self.app.safe_update(job.set_status, text, color)
+
+    def _progress(self, job: TaskCard, value: float, color: tuple) -> None:
+        self.app.safe_update(job.set_progress, value, color)
+
+    def job_state(self, job: TaskCard, code: int) -> None:
+        """状态迁移：写入任务日志，并为进入终态的任务计数"""
+        app = self.app
+        app.journal.set_state(job.filepath, code)
+        if code == STATE_DONE:
+            app.metrics.jobs_finished.inc(1, "done")
+            app.finished_tasks_count += 1
+            app.safe_update(app.update_run_status)
+        elif code == STATE_ERROR:
+            app.metrics.jobs_finished.inc(1, "cancelled" if job.cancelled else "failed")
+
+    def caching(self, job: TaskCard) -> None:
+        if job.source_mode == "RAM":
+            self._status(job, "Buffering to RAM / 缓冲至物理内存", COLOR_RAM)
+            self._progress(job, 0.0, COLOR_RAM)
+        else:
+            self._status(job, "Writing Storage Cache / 写入存储缓存", COLOR_SSD_CACHE)
+            self._progress(job, 0.0, COLOR_SSD_CACHE)
+
+    def cache_progress(self, job: TaskCard, fraction: float) -> None:
+        self._progress(job, fraction, COLOR_READING if job.source_mode == "RAM" else COLOR_SSD_CACHE)
+
+    def ready(self, job: TaskCard) -> None:
+        if job.source_mode == "DIRECT":
+            self._status(job, "就绪 (SSD直读)", COLOR_DIRECT)
+            self._progress(job, 1.0, COLOR_DIRECT)
+            return
+        color = COLOR_READY_RAM if job.source_mode == "RAM" else COLOR_SSD_CACHE
+        self._status(job, "Standby for Encoding / 编码待命", color)
+        self._progress(job, 1.0, color)
+
+    def dispatched(self, job: TaskCard) -> None:
+        self.app.safe_update(self.app.scroll_to_card, job)
+
+    def encoding_started(self, jobs: list, info: dict) -> dict:
+        """申请监控通道并激活 (以任务令牌防止旧任务的迟到更新覆盖新任务)，返回句柄"""
+        app, first = self.app, jobs[0]
+        if info.get("node"):
+            self._status(first, f"Remote Encoding / 远程编码 @ {info['node']}", COLOR_ACCENT)
+            return {"slot": -1, "ui": None, "token": None}
+        slot_t0 = time.time()
+        slot_idx, ch_ui = app._acquire_monitor_slot()
+        app.tracer.complete("slot_wait", slot_t0, time.time(), first.filepath, slot=slot_idx)
+        token = uuid.uuid4().hex
+        tag_info = f"Enc: {'GPU' if info.get('hw_encode') else 'CPU'}"
+        if info.get("segments"):
+            tag_info += f" | Split: {info['segments']} seg / {info['lanes']} lanes"
+            text = f"Segmented Encoding x{info['lanes']} / 分段并行编码"
+        elif info.get("batch"):
+            tag_info += f" | Batch x{info['batch']}"
+            text = f"Batch Encoding x{info['batch']} / 合批编码"
+        else:
+            tag_info += f" | Dec: {'GPU' if info.get('hw_decode') else 'CPU'}"
+            if first.source_mode == "RAM": tag_info += " | RAM"
+            text = "Encoding in Progress / 编码进行中"
+        for job in jobs:
+            self._status(job, text, COLOR_ACCENT)
+        app.safe_update(ch_ui.activate, os.path.basename(first.filepath), tag_info, token)
+        return {"slot": slot_idx, "ui": ch_ui, "token": token}
+
+    def progress(self, handle: dict, jobs: list, fraction, fps, eta_sec, out_time_sec, speed=0.0, size=0, members=None) -> None:
+        prog = min(0.99, fraction or 0.0)
+        if members:
+            for job, value in zip(jobs, members):
+                self._progress(job, min(0.99, value), COLOR_ACCENT)
+        else:
+            self._progress(jobs[0], prog, COLOR_ACCENT)
+        ch_ui = handle["ui"]
+        if ch_ui is None: return
+        if prog >= 0.98:
+            self.app.safe_update(ch_ui.update_data, fps, 0.99, "Finalizing...", handle["token"], "")
+            self._status(jobs[0], "📦 封装中...", COLOR_ACCENT)
+            return
+        eta = "--:--"
+        if eta_sec is not None:
+            eta = f"{int(eta_sec//60):02d}:{int(eta_sec%60):02d}"
+        # 动态预测最终体积 (进度大于 5% 后预测才趋于准确)
+        est_size_str = ""
+        if prog > 0.05 and size > 0:
+            est_size_str = f"Est: {(size / prog) / (1024 * 1024):.1f}MB"
+        self.app.safe_update(ch_ui.update_data, fps, prog, eta, handle["token"], est_size_str)
+
+    def encoding_ended(self, handle: dict) -> None:
+        """[关键] 归还显示槽位，确保下个任务有窗口可用"""
+        if handle["ui"] is None: return
+        self.app.safe_update(handle["ui"].reset)
+        self.app._release_monitor_slot(handle["slot"])
+
+    def retry(self, job: TaskCard, cause: str, plan: str, detail: str | None = None) -> None:
+        if cause == "stall":
+            print(f"[Stall] {os.path.basename(job.filepath)}: {detail} -> {plan}")
+            text = f"Stalled, Retrying ({plan}) / 卡死，降级重试"
+        elif cause == "batch":
+            text = "Batch Failed, Retrying Solo / 合批失败，单独重试"
+        elif cause == "node_lost":
+            text = "Node Lost, Requeued / 节点失联，已重新排队"
+        else:
+            text = f"Retrying ({plan}) / 自动降级重试: {cause}"
+        self._status(job, text, COLOR_WAITING)
+        self._progress(job, 0.0, COLOR_ACCENT)
+
+    def done(self, job: TaskCard, output: str | None, input_size: int, output_size: int, record: dict) -> None:
+        app = self.app
+        app.job_metrics.append(record)
+        if output is None:
+            app.test_stats["orig"] += input_size
+            app.test_stats["new"] += output_size
+            self._status(job, "Benchmark Complete / 基准测试完成", COLOR_SUCCESS)
+        else:
+            app.journal.set_output(job.filepath, output)
+            ratio_str = ""
+            if input_size > 0:
+                saved_percent = (1.0 - (output_size / input_size)) * 100
+                ratio_str = f"(-{saved_percent:.1f}%)" if saved_percent >= 0 else f"(+{abs(saved_percent):.1f}%)"
+            self._status(job, f"Task Resolved / 任务已终结 {ratio_str}", COLOR_SUCCESS)
+        self._progress(job, 1.0, COLOR_SUCCESS)
+
+    def failed(self, job: TaskCard, reason: str, **detail) -> None:
+        if reason == "internal": print(f"System Error: {detail.get('detail')}")
+        self._status(job, self.FAILURE_STATUS.get(reason, "Encoding Exception / 编码异常"), COLOR_ERROR)
+
+    def cancelled(self, job: TaskCard, partial: str | None) -> None:
+        self._status(job, "Cancelled, Partial Kept / 已取消 (保留已编码部分)" if partial else "Cancelled / 已取消", COLOR_PAUSED)
+
+    def interrupted(self, job: TaskCard) -> None:
+        self._status(job, "Process Terminated / 进程已终止", COLOR_PAUSED)
+
 # =========================================================================
 # [Module 4] Main Application
 # 功能：核心业务逻辑控制器
@@ -1231,63 +1519,43 @@ class UltraEncoderApp(DnDWindow):
     def safe_update(self, func: Callable, *args: Any, **kwargs: Any) -> None:
         """
         高并发安全的 UI 更新网关。
-        采用无锁队列 (Queue) 替代直接的跨线程 after 调用，防止事件循环阻塞与渲染丢包。
+        经合并式更新总线 (UIUpdateBus) 投递到主线程，替代直接的跨线程 after 调用。
+        进度类方法 (COALESCED_UI_METHODS) 按 (控件, 方法) 只保留最新值；状态迁移等其余调用按序全部送达，从不丢弃。
         
         Args:
             func (Callable): 需要在 UI 主线程安全执行的函数句柄。
             *args (Any): 透传给目标函数的位置参数。
             **kwargs (Any): 透传给目标函数的关键字参数。
         """
-        if not hasattr(self, "_ui_event_queue"):
-            # 初始化最大容量为 10000 的线程安全队列，并应用类型声明
-            self._ui_event_queue: queue.Queue = queue.Queue(maxsize=10000)
-            self._process_ui_events() # 惰性启动主线程消费者循环
-            
-        try:
-            self._ui_event_queue.put_nowait((func, args, kwargs))
-        except queue.Full:
-            pass # 极高频拥塞情况下的防御性丢包策略，确保系统核心不会挂起
+        owner = getattr(func, "__self__", None)
+        key = (id(owner), func.__name__) if owner is not None and func.__name__ in COALESCED_UI_METHODS else None
+        self.ui_bus.post(func, args, kwargs, key)
 
     def _process_ui_events(self) -> None:
         """
-        运行于主线程的微秒级渲染帧消费者引擎。
-        分摊总线队列积压压力，并执行聚合态的批量 UI 渲染帧刷新。
+        运行于主线程的渲染帧消费者：每帧在时间预算内批量应用一次总线上的全部更新。
         """
         if not self.winfo_exists(): 
             return
             
         try:
-            # 批量清空当前队列中累积的时序状态，阻断事件循环饥饿现象
-            for _ in range(50): 
-                func, args, kwargs = self._ui_event_queue.get_nowait()
-                try:
-                    if self.winfo_exists(): 
-                        func(*args, **kwargs)
-                except Exception as e: 
-                    # 捕获并打印具体异常，保留现场可观测性，严禁盲目吞噬错误
-                    print(f"[UI Event Error] 调度 {func.__name__} 时发生异常: {e}")
-        except queue.Empty:
-            pass
+            self.ui_bus.drain(self._apply_ui_event)
         finally:
             # 重新将消费者循环锚定至事件队尾，维持约 30 FPS 的人眼舒适刷新率
-            self.after(33, self._process_ui_events)
+            self.after(UI_FRAME_MS, self._process_ui_events)
 
-    def scroll_to_card(self, widget):
-        """滚动列表以显示当前处理的卡片"""
+    def _apply_ui_event(self, func: Callable, args: tuple, kwargs: dict) -> None:
         try:
-            target_file = None
-            for f, card in self.task_widgets.items():
-                if card == widget: target_file = f; break
-            if not target_file: return
-            if target_file in self.file_queue:
-                index = self.file_queue.index(target_file) - 1 
-                total = len(self.file_queue)               
-                if total > 1:
-                    target_pos = index / total
-                    if index > 0: target_pos = max(0.0, target_pos - (1 / total) * 0.5)
-                    self.scroll._parent_canvas.yview_moveto(target_pos)
-                    self.after(100, lambda: self.scroll._parent_canvas.yview_moveto(target_pos))
-        except: pass
+            func(*args, **kwargs)
+        except Exception as e: 
+            # 捕获并打印具体异常，保留现场可观测性，严禁盲目吞噬错误
+            print(f"[UI Event Error] 调度 {getattr(func, '__name__', func)} 时发生异常: {e}")
+
+    def scroll_to_card(self, card):
+        """滚动列表以显示当前处理的任务"""
+        try:
+            self.scroll.scroll_to(self.file_queue.index(card.filepath))
+        except ValueError: pass
     
     # [新增] 标题点击计数
     def on_title_click(self, event):
@@ -1316,6 +1584,7 @@ class UltraEncoderApp(DnDWindow):
             self.lbl_main_title.configure(text_color="#E67E22")
             self.btn_action.configure(text="EXECUTE BENCHMARK / 执行基准测试")
             self.test_stats = {"orig": 0, "new": 0}
+            self.job_metrics = []
         else:
             self.show_toast("Benchmark Mode Deactivated / 基准测试模式已解除", "⚙️")
             self.lbl_main_title.configure(text_color=COLOR_TEXT_MAIN)
@@ -1325,56 +1594,31 @@ class UltraEncoderApp(DnDWindow):
         """
         [优化] 启动时检测硬件，返回推荐并发数。
         优化逻辑：准确识别 GPU 厂商，防止非 NVIDIA 环境默认开启 CUDA 导致崩溃。
+        [新增] CPU 数取自亲和性与 cgroup 配额，容器内不再按宿主机核数推荐并发。
         """
-        recomm_workers = 2
-        cpu_msg = ""
-        gpu_msg = ""
-        self.has_nvidia_gpu = False  # [新增] 明确的硬件标志位
-
-        # --- CPU 检测 ---
-        try:
-            cpu_count = os.cpu_count() or 4
-        except:
-            cpu_count = 4
-
-        if cpu_count >= 16:
-            cpu_workers = 4 
-            cpu_msg = f"High-End CPU ({cpu_count} threads)."
-        elif cpu_count >= 8:
-            cpu_workers = 3
-            cpu_msg = f"Modern CPU ({cpu_count} threads)."
-        else:
-            cpu_workers = 2
-            cpu_msg = f"Standard CPU ({cpu_count} threads)."
-
-        # --- GPU 检测 ---
-        gpu_workers = 2
-        sys_plat = platform.system()
-        
-        if sys_plat == "Windows":
-            try:
-                # 尝试运行 nvidia-smi 只要成功返回即视为有 N 卡
-                subprocess.run("nvidia-smi", stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-                self.has_nvidia_gpu = True
-                gpu_workers = 3 
-                gpu_msg = "NVIDIA GPU Detected (NVENC)."
-            except:
-                self.has_nvidia_gpu = False
-                gpu_msg = "No NVIDIA GPU detected."
-        elif sys_plat == "Darwin":
-            # Mac 通常都支持 VideoToolbox
-            self.has_nvidia_gpu = True # 这里复用标志位，意为“有可用硬解”
-            gpu_msg = "Apple Silicon / Metal."
-            gpu_workers = 3
-
-        # 决策：如果有可用 GPU，则推荐 GPU 并发数
-        if self.has_nvidia_gpu:
-            recomm_workers = gpu_workers
-        else:
-            recomm_workers = cpu_workers
-
+        facts = HardwareProbe.snapshot(FFMPEG_PATH)
+        cpu_count = facts["cpu_count"]
+
+        # --- CPU 描述 ---
+        if cpu_count >= 16: cpu_msg = f"High-End CPU ({cpu_count} threads)."
+        elif cpu_count >= 8: cpu_msg = f"Modern CPU ({cpu_count} threads)."
+        else: cpu_msg = f"Standard CPU ({cpu_count} threads)."
+        if cpu_count < facts["host_cpus"]:
+            cpu_msg += f" Limited by quota/affinity (host: {facts['host_cpus']})."
+
+        # --- GPU 描述 ---
+        # has_nvidia_gpu 复用为“有可用硬件编码路线”的标志位 (Mac 下意为 VideoToolbox)
+        self.has_nvidia_gpu = facts["hw_encode"] is not None
+        self.engine.hw_route = facts["hw_encode"]
+        if facts["hw_encode"] == "nvenc": gpu_msg = "NVIDIA GPU Detected (NVENC)."
+        elif facts["hw_encode"] == "videotoolbox": gpu_msg = "Apple Silicon / Metal."
+        elif facts["hwaccels"]: gpu_msg = f"No NVENC route. HW accels: {', '.join(sorted(facts['hwaccels']))}."
+        else: gpu_msg = "No NVIDIA GPU detected."
+
+        recomm_workers = facts["rec_slots"]
         self.hardware_info = {
             "rec_worker": str(recomm_workers),
+            "cpu_count": cpu_count,
             "cpu_desc_en": cpu_msg,
             "cpu_desc_cn": cpu_msg, 
             "gpu_desc_en": gpu_msg,
@@ -1398,30 +1642,59 @@ class UltraEncoderApp(DnDWindow):
         self.minsize(1200, 850) 
         self.protocol("WM_DELETE_WINDOW", self.on_closing) 
         
-        # 数据结构初始化
-        self.file_queue = []       # 任务队列
-        self.task_widgets = {}     # 文件路径 -> Widget 映射
-        self.active_procs = []     # 活跃的 FFmpeg 进程
+        # 数据结构初始化 (任务队列与任务记录归调度引擎所有，见下方 self.engine)
+        self.queued_paths = set()  # 已入队及正在统计大小的路径，用于去重
+        self.queue_generation = 0  # 清空队列时递增，丢弃清空前发起的入队
         self.running = False       
-        self.stop_flag = False     
+        self.ui_bus = UIUpdateBus() # 工作线程 -> 主线程的合并式更新总线
+        self.after(UI_FRAME_MS, self._process_ui_events)
         
         # 线程同步锁
-        self.queue_lock = threading.Lock() 
         self.slot_lock = threading.Lock()
         
         self.monitor_slots = []    
         self.available_indices = [] 
         self.current_workers = 2   
-        self.executor = ThreadPoolExecutor(max_workers=16) # 计算任务线程池
+        self.stat_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="stat") # 新文件大小统计 (网络共享上并行可掩盖单次 stat 延迟)
+        self.orchestrator = ProcessOrchestrator() # 所有 FFmpeg/ffprobe 子进程共用的单一事件循环
         self.temp_dir = os.path.join(os.path.expanduser("~"), "Downloads")
         self.manual_cache_path = None
-        self.temp_files = set() 
         self.finished_tasks_count = 0
+        self.remote_pool = RemoteNodePool.from_env() # 远程编码节点 (CINETICO_AGENTS)
+        
+        # 崩溃安全的任务日志：先同步读取上次未完成的任务并清理遗留临时文件，再启动后台批量写入
+        self.journal = JobJournal()
+        self.journal_cache_dirs = [d for d in (self.journal.get_meta("cache_dirs") or "").split("\n") if d]
+        self.journal_pending = self._load_journal()
+        self.journal.start()
+        self.manifest = OutputManifest() # 成品清单：相同源文件 + 相同设置时跳过重复编码
+        self.governor = ResourceGovernor() # 内存/温度告急时挂起最低优先级的编码任务
+        self.throttled_jobs = []           # 被调度器挂起的任务 (后进先出恢复)
+        self.stall_supervisor = StallSupervisor() # out_time 停滞监督，卡死进程自动结束并降级重试
 
         # [新增] 测试模式相关变量
         self.title_click_count = 0     # 标题点击计数
         self.test_mode = False         # 测试模式开关
         self.test_stats = {"orig": 0, "new": 0} # 统计数据：原大小、新大小
+        self.job_metrics = []  # 本次会话中各任务的资源效率记录 (基准报告导出为 CSV)
+        self.api_hub = EventHub()  # 控制接口事件订阅 (无订阅者时发布为空操作)
+        self.api_server = None
+        self.metrics = EncoderMetrics()  # Prometheus 指标 (控制接口的 /metrics)
+        self.metrics.collectors.append(self._collect_metrics)
+        self.tracer = Tracer()  # 阶段 span (CINETICO_TRACE=1 启用，--export-trace 导出为 Chrome trace)
+        # 调度引擎 (与 Headless 共用)：调度循环、缓存层级与编码工作线程，界面更新经 EngineUIBridge 回调
+        self.engine = EncodeEngine(EngineUIBridge(self), FFMPEG_PATH, FFPROBE_PATH, work_dir=self.temp_dir,
+                                   workers=self.current_workers, orchestrator=self.orchestrator,
+                                   stall_supervisor=self.stall_supervisor, metrics=self.metrics, tracer=self.tracer,
+                                   manifest=self.manifest, remote_pool=self.remote_pool, is_ssd=DiskManager.is_ssd,
+                                   ram_limit_gb=MAX_RAM_LOAD_GB, free_ram_gb=lambda: get_free_ram_gb() - SAFE_RAM_RESERVE)
+        self.file_queue = self.engine.queue          # 任务队列 (引擎的别名)
+        self.task_widgets = self.engine.jobs         # 文件路径 -> TaskCard 任务记录 (界面由 VirtualTaskList 按可见区间渲染)
+        self.queue_lock = self.engine.queue_lock
+        self.profiler = None        # 剖析会话 (CINETICO_PROFILE=1|mem 或 Ctrl+Shift+P 开关)
+        self._profile_lock = threading.Lock()
+        profile_mode = profile_mode_from_env()
+        if profile_mode: self._start_profiling(profile_mode == "mem")
         
         # [修改] 启动 UI 构建前，先计算推荐并发数
         rec_worker = self.detect_hardware_limit()
@@ -1430,9 +1703,6 @@ class UltraEncoderApp(DnDWindow):
         self.setup_ui(default_worker=rec_worker) # 传递参数
         self.finished_tasks_count = 0
 
-        # 启动本地内存文件流服务器
-        self.global_server, self.global_port = start_global_server()
-        
         # 阻止系统休眠
         set_execution_state(True)  
         
@@ -1446,6 +1716,58 @@ class UltraEncoderApp(DnDWindow):
 
         # 启动时在后台静默加载帮助窗口
         self.after(200, self.preload_help_window)
+        self.bind("<Control-Shift-P>", lambda e: self.toggle_profiling())
+        
+        # 恢复上次崩溃/强退前未完成的任务
+        self.after(300, self._restore_journal)
+
+        # 本地控制接口 (仅回环地址；CINETICO_API_PORT=off 可禁用)
+        api_port = api_port_from_env()
+        if api_port is not None:
+            self.api_server = ControlAPIServer(self, self.api_hub, api_port, extra_routes={"/metrics": self.metrics.route})
+            if not self.api_server.start(): self.api_server = None
+
+    @property
+    def stop_flag(self) -> bool:
+        """停止请求 (由引擎持有：置位后不再派发，工作线程据此把被结束的任务结算为中断)"""
+        return self.engine.stopping
+
+    @stop_flag.setter
+    def stop_flag(self, value: bool) -> None:
+        self.engine.stopping = value
+
+    @property
+    def engine_stats(self) -> dict:
+        """调度循环自身的开销统计 (每轮 run 重置)"""
+        return self.engine.stats
+
+    # --- 任务日志 (崩溃恢复) ---
+    def _load_journal(self) -> list[str]:
+        """
+        读取上次未完成且源文件仍存在的任务，并清理历史缓存目录中的孤儿临时文件。
+        必须在任何编码开始之前调用 (单实例锁保证不会误删其他实例的产物)。
+        """
+        removed = sum(clean_orphan_temp_files(d) for d in self.journal_cache_dirs)
+        if removed: print(f"[Journal] cleaned {removed} orphan temp files")
+        pending = []
+        for path, state, _ in self.journal.load():
+            if state != STATE_DONE and os.path.exists(path): pending.append(path)
+            else: self.journal.forget(path) # 只清除已完成与源文件已丢失的记录
+        # 未完成的记录原样保留，直到 add_list 重新入队时 (enqueue 为 upsert) 覆盖；恢复窗口内崩溃或关闭不会丢失队列
+        return pending
+
+    def _restore_journal(self) -> None:
+        """将上次未完成的任务重新加入队列 (已完成的任务自动跳过)"""
+        pending, self.journal_pending = self.journal_pending, []
+        if not pending: return
+        self.add_list(pending)
+        self.show_toast(f"已恢复 {len(pending)} 个未完成任务", "♻️")
+
+    def _journal_cache_dir(self, cache_dir: str) -> None:
+        """记录使用过的缓存目录，供下次启动时清理孤儿文件"""
+        if cache_dir in self.journal_cache_dirs: return
+        self.journal_cache_dirs = (self.journal_cache_dirs + [cache_dir])[-8:]
+        self.journal.set_meta("cache_dirs", "\n".join(self.journal_cache_dirs))
 
     # --- 帮助窗口逻辑 (移植自 v0.9.6) ---
     def preload_help_window(self):
@@ -1508,60 +1830,97 @@ class UltraEncoderApp(DnDWindow):
             # 将 padx 修改为 20，使滚动条的外边缘与下方区域的边缘处于同一垂线上
             self.scroll.pack(fill="both", expand=True, padx=15, pady=0)
 
-    def add_list(self, files):
-        """将文件添加到任务队列，并执行智能排序"""
+    def add_list(self, files, settings_override: dict | None = None, on_added: Callable | None = None) -> list[str]:
+        """
+        将文件添加到任务队列，并执行智能排序；返回被接受的新路径。
+        文件大小在后台线程中并行统计，完成后回到主线程按体积插入队列，随后调用 on_added(已入队路径)。
+        """
         # [PyArchitect Fix] 拖入新文件时，如果当前是"完成"状态，重置为"压制"状态
         if not self.running:
             self.reset_ui_state()
 
-        with self.queue_lock: 
-            existing_paths = set(os.path.normpath(os.path.abspath(f)) for f in self.file_queue)
-            new_added = False
-            
-            # 过滤非视频文件与重复文件
-            for f in files:
-                f_norm = os.path.normpath(os.path.abspath(f))
-                if f_norm in existing_paths: continue 
-                if f_norm.lower().endswith(('.mp4', '.mkv', '.mov', '.avi', '.ts', '.flv', '.wmv')):
-                    self.file_queue.append(f_norm) 
-                    existing_paths.add(f_norm) 
-                    if f_norm not in self.task_widgets:
-                        card = TaskCard(self.scroll, 0, f_norm) 
-                        self.task_widgets[f_norm] = card
-                    new_added = True
-            
-            if not new_added: return
-            
-            # 队列排序逻辑：
-            # 锁定已开始/已完成的任务位置，对等待中的任务按文件大小从小到大排序
-            # 这有助于短任务优先完成，提升用户心理满足感
-            LOCKED_STATES = [STATE_DONE, STATE_ERROR, STATE_ENCODING, STATE_QUEUED_IO, STATE_READY, STATE_CACHING]
-            immutable_queue = []
-            mutable_queue = [] 
-            for f in self.file_queue:
-                widget = self.task_widgets[f]
-                if widget.status_code in LOCKED_STATES or widget.source_mode in ["RAM", "SSD_CACHE", "DIRECT"]:
-                    immutable_queue.append(f)
-                else:
-                    mutable_queue.append(f)
-            mutable_queue.sort(key=lambda x: os.path.getsize(x))
-            self.file_queue = immutable_queue + mutable_queue
-            
-            # UI 重绘
-            for widget in self.task_widgets.values():
-                widget.pack_forget()
-
-            for i, f in enumerate(self.file_queue):
-                if f in self.task_widgets:
-                    card = self.task_widgets[f]
-                    card.pack(fill="x", pady=4)
-                    card.update_index(i + 1)
-            
-            if self.running: 
-                self.update_run_status()
-                self.show_toast(f"已添加 {len(files)} 个任务 (智能排序完成)", "📥")
-            else:
-                self.check_placeholder()
+        added_paths = []
+        # 过滤非视频文件与重复文件 (queued_paths 含已入队与正在统计大小的路径)
+        for f in files:
+            f_norm = os.path.normpath(os.path.abspath(f))
+            if f_norm in self.queued_paths: continue 
+            if f_norm.lower().endswith(('.mp4', '.mkv', '.mov', '.avi', '.ts', '.flv', '.wmv')):
+                self.queued_paths.add(f_norm) 
+                added_paths.append(f_norm)
+        
+        if not added_paths:
+            if on_added: on_added([])
+            return []
+        threading.Thread(target=self._worker_stat_files, args=(added_paths, dict(settings_override or {}), self.queue_generation, on_added), 
+                         daemon=True).start()
+        return added_paths
+
+    def _worker_stat_files(self, paths: list[str], settings_override: dict, generation: int, on_added: Callable | None) -> None:
+        """线程任务：并行统计新文件的大小 (网络共享上 stat 可能很慢，不占用主线程与队列锁)"""
+        def size_of(path: str) -> int:
+            try: return os.path.getsize(path)
+            except OSError: return 0
+        sizes = list(self.stat_executor.map(size_of, paths))
+        self.safe_update(self._enqueue_files, paths, sizes, settings_override, generation, on_added)
+
+    def _enqueue_files(self, paths: list[str], sizes: list[int], settings_override: dict, generation: int, 
+                       on_added: Callable | None) -> None:
+        """主线程：为已统计大小的新文件建立任务记录，并按缓存的体积二分插入队列 (O(k log n)，不再访问文件系统)"""
+        if generation != self.queue_generation: return # 统计期间队列已被清空
+        settings = dict(self._encode_settings(), **settings_override)
+        cards = []
+        for f, size in zip(paths, sizes):
+            card = TaskCard(f, size) 
+            card.on_event = self._publish_card_event
+            card.settings_override = dict(settings_override)
+            card.settings = dict(settings) # 入队时的设置快照；run() 启动时按当时的全局设置刷新
+            cards.append(card)
+            self.tracer.instant("queue.add", f, size_gb=round(card.file_size_gb, 4))
+            self.journal.enqueue(f)
+
+        # 队列排序逻辑：
+        # 锁定已开始/已完成的任务位置，等待中的任务按文件大小从小到大排列
+        # 这有助于短任务优先完成，提升用户心理满足感
+        self.engine.add(cards)
+        self.scroll.refresh()
+
+        if self.running: 
+            self.update_run_status()
+            self.show_toast(f"已添加 {len(paths)} 个任务 (智能排序完成)", "📥")
+        else:
+            self.check_placeholder()
+
+        # 后台比对成品清单，已按相同设置编码过的文件直接标记完成
+        threading.Thread(target=self._worker_manifest_check, args=(paths, settings), daemon=True).start()
+        if on_added: on_added(paths)
+
+    def _encode_settings(self) -> dict:
+        """当前影响产物的编码设置 (用于成品清单与远程节点下发)"""
+        return {"codec": self.codec_var.get(), "gpu": self.gpu_var.get(), "crf": self.crf_var.get(),
+                "10bit": self.depth_10bit_var.get(), "keep_meta": self.keep_meta_var.get()}
+
+    def _job_settings(self, card: "TaskCard") -> dict:
+        """单任务实际生效的编码设置：全局设置叠加控制接口提交时的覆盖项"""
+        return dict(self._encode_settings(), **card.settings_override)
+
+    def _worker_manifest_check(self, paths: list[str], settings: dict) -> None:
+        """线程任务：查询成品清单 (大小/mtime 未命中时不读取文件内容)"""
+        hits = 0
+        for f in paths:
+            output = self.manifest.lookup(f, settings)
+            if not output: continue
+            card = self.task_widgets.get(f)
+            if not card: continue
+            with self.queue_lock:
+                if card.status_code != STATE_PENDING: continue # 已被调度或移除，不再干预
+                self.engine.set_state(card, STATE_DONE)
+            hits += 1
+            self.metrics.manifest_skips.inc()
+            card.log_data.append(f"[Manifest] already encoded -> {output}")
+            self.safe_update(card.set_status, "Already Encoded / 已有相同设置的输出", COLOR_SUCCESS)
+            self.safe_update(card.set_progress, 1.0, COLOR_SUCCESS)
+        if hits:
+            self.safe_update(self.show_toast, f"跳过 {hits} 个已编码文件", "⏭️")
 
     def update_run_status(self):
         if not self.running: return
@@ -1579,8 +1938,13 @@ class UltraEncoderApp(DnDWindow):
 
         self.stop_flag = True
         self.running = False
-        self.executor.shutdown(wait=False) 
         self.kill_all_procs() 
+        self.orchestrator.shutdown()
+        if self.api_server: self.api_server.stop()
+        self.tracer.close()
+        if self.profiler: self.profile("stop")
+        self.engine.shutdown(wait=False) 
+        self.journal.close() # 提交尚未落盘的任务日志，未完成的任务下次启动时恢复
         self.destroy()
         set_execution_state(False)
         os._exit(0)
@@ -1590,35 +1954,221 @@ class UltraEncoderApp(DnDWindow):
         终止所有挂起的子进程。
         [PyArchitect Fix] 摒弃裸 except，精准捕获操作系统层级的进程调度异常。
         """
-        for p in list(self.active_procs): 
-            try:
-                p.terminate()
-                if platform.system() != "Windows":
-                    p.kill() 
-            except OSError:
-                pass # 进程句柄已失效或无权限
-            except subprocess.SubprocessError:
-                pass 
-            
-        self.active_procs.clear()
-        
-        try: 
-            if platform.system() == "Windows":
-                subprocess.run(["taskkill", "/F", "/IM", "ffmpeg.exe"], 
-                             creationflags=subprocess.CREATE_NO_WINDOW, 
-                             stderr=subprocess.DEVNULL,
-                             check=False)
+        # 只结束本程序创建的进程组，不再按进程名全局查杀 (共享主机上会误伤其他 FFmpeg)；探测/拼接等一次性命令一并结束
+        self.engine.kill_all()
+        self.throttled_jobs.clear()
+
+    # --- 单任务进程控制 ---
+    def control_job(self, task_file: str, action: str) -> None:
+        """任务卡片按钮回调：pause (暂停/恢复切换) 或 cancel"""
+        card = self.task_widgets.get(task_file)
+        if not card: return
+        if action == "pause":
+            if card.status_code != STATE_ENCODING or card.cancelled: return
+            card.paused = not card.paused
+            if card.paused:
+                for proc in list(card.procs): suspend_process(proc)
+                card.set_status("Paused / 已暂停", COLOR_PAUSED)
             else:
-                subprocess.run(["pkill", "-9", "-f", "ffmpeg"], 
-                               stderr=subprocess.DEVNULL,
-                               check=False)
-        except OSError:
-            pass
+                if not card.throttled:
+                    for proc in list(card.procs): resume_process(proc)
+                card.set_status("Encoding in Progress / 编码进行中", COLOR_ACCENT)
+        elif action == "cancel":
+            if card.status_code in [STATE_DONE, STATE_ERROR]: return
+            started = self.engine.cancel(card) # 未开始的任务由引擎同步置为终态，编码中的由工作线程结算
+            card.paused = card.throttled = False
+            if card in self.throttled_jobs: self.throttled_jobs.remove(card)
+            card.set_status("Cancelling / 正在取消" if started else "Cancelled / 已取消", COLOR_PAUSED)
+            # 优雅停止会阻塞等待 FFmpeg 收尾，放到后台线程执行
+            for proc in list(card.procs):
+                threading.Thread(target=graceful_stop, args=(proc,), daemon=True).start()
+
+    # --- 本地控制接口 (由 HTTP 线程调用：只读快照，界面与队列变更经 safe_update 投递到主线程) ---
+    def _job_snapshot(self, path: str, position: int) -> dict:
+        card = self.task_widgets[path]
+        return {"id": job_id_for(path), "path": path, "position": position, "state": card.status_code,
+                "status": card.status_text, "progress": round(card.progress_value, 4),
+                "source_mode": card.source_mode, "paused": card.paused, "cancelled": card.cancelled,
+                "duration_sec": card.duration_sec, "size_gb": round(card.file_size_gb, 3),
+                "settings_override": card.settings_override, "output": card.final_output_path}
+
+    def _publish_card_event(self, card: "TaskCard", kind: str) -> None:
+        """卡片状态/进度变化时推送事件 (在主线程调用，仅入队，不做 I/O)"""
+        if not self.api_hub.active: return
+        self.api_hub.publish({"event": kind, "id": job_id_for(card.filepath), "path": card.filepath,
+                              "state": card.status_code, "status": card.status_text,
+                              "progress": round(card.progress_value, 4), "ts": round(time.time(), 3)})
+
+    def _api_find(self, job_id: str) -> str | None:
+        with self.queue_lock:
+            return next((f for f in self.file_queue if job_id_for(f) == job_id), None)
+
+    def list_jobs(self) -> list[dict]:
+        with self.queue_lock:
+            return [self._job_snapshot(f, i) for i, f in enumerate(self.file_queue)]
+
+    def submit(self, files: list[str], settings: dict, position: int | None, start: bool) -> list[str]:
+        paths = [os.path.normpath(os.path.abspath(f)) for f in files]
+        paths = [f for f in paths if f.lower().endswith(HEADLESS_VIDEO_EXTS)]
+
+        def placed(added: list[str]) -> None:
+            if position is not None:
+                for offset, f in enumerate(added): self._move_job(f, position + offset)
+            if start and not self.running: self.run()
+
+        self.safe_update(self.add_list, paths, settings_override=settings, on_added=placed)
+        return [job_id_for(f) for f in paths]
+
+    def control(self, job_id: str, action: str) -> bool:
+        path = self._api_find(job_id)
+        if path is None: return False
+        card = self.task_widgets[path]
+
+        def apply() -> None:
+            if action == "cancel": self.control_job(path, "cancel")
+            elif (action == "pause") != card.paused: self.control_job(path, "pause") # 幂等：映射到卡片的切换按钮
+
+        self.safe_update(apply)
+        return True
+
+    def reprioritise(self, job_id: str, position: int) -> bool:
+        path = self._api_find(job_id)
+        if path is None: return False
+        self.safe_update(self._move_job, path, position)
+        return True
+
+    def _move_job(self, path: str, position: int) -> None:
+        """将任务移动到队列中的指定位置；引擎按 file_queue 顺序调度，因此即刻生效"""
+        with self.queue_lock:
+            if path not in self.file_queue: return
+            old = self.file_queue.index(path)
+            self.file_queue.pop(old)
+            new = max(0, min(position, len(self.file_queue)))
+            self.file_queue.insert(new, path)
+            self.task_widgets[path].pinned = True
+            # 固定位置的任务之前的区段不再视为有序，新任务只插入其后
+            floor = self.engine.queue_floor
+            if old < floor: floor -= 1
+            if new < floor: floor += 1
+            self.engine.queue_floor = max(floor, new + 1)
+        self.scroll.refresh()
+
+    def state(self) -> dict:
+        with self.queue_lock:
+            cards = [self.task_widgets[f] for f in self.file_queue]
+        counts: dict[str, int] = {}
+        for card in cards: counts[str(card.status_code)] = counts.get(str(card.status_code), 0) + 1
+        ram_cards = [c for c in cards if c.source_mode == "RAM" and c.status_code not in (STATE_DONE, STATE_ERROR)]
+        busy = self._busy_slots()
+        return {"running": self.running, "jobs": counts,
+                "cache": {"ram_gb": round(sum(c.file_size_gb for c in ram_cards), 3), "ram_limit_gb": MAX_RAM_LOAD_GB,
+                          "ram_jobs": len(ram_cards),
+                          "ssd_jobs": sum(1 for c in cards if c.source_mode == "SSD_CACHE" and c.status_code not in (STATE_DONE, STATE_ERROR)),
+                          "temp_dir": self.temp_dir},
+                "slots": {"workers": self.current_workers, "busy": busy,
+                          "lanes": sum(c.lanes for c in cards if c.status_code == STATE_ENCODING),
+                          "remote_free": self.remote_pool.free_slots()},
+                "throughput": {"encode_speed": round(self.engine.encode_speed, 3),
+                               "startup_overhead_sec": round(self.engine.startup_overhead_sec, 3),
+                               "finished": self.finished_tasks_count}}
+
+    def _busy_slots(self) -> int:
+        with self.slot_lock:
+            return self.current_workers - len(self.available_indices) if self.running else 0
+
+    def _collect_metrics(self) -> list:
+        """/metrics 抓取时调用：队列状态、内存缓存与槽位均为现场快照，不在编码路径上维护"""
+        with self.queue_lock:
+            cards = [self.task_widgets[f] for f in self.file_queue]
+        by_state = {name: 0 for name in JOB_STATE_NAMES.values()}
+        for card in cards: by_state[JOB_STATE_NAMES.get(card.status_code, "error")] += 1
+        reserved = sum(c.file_size_gb for c in cards if c.source_mode == "RAM" and c.status_code not in (STATE_DONE, STATE_ERROR))
+        resident = sum(len(chunk) for chunks in list(GLOBAL_RAM_STORAGE.values()) for chunk in list(chunks))
+        busy = self._busy_slots()
+        return [("cinetico_jobs", "gauge", "Jobs in the queue by state.", [({"state": k}, v) for k, v in by_state.items()]),
+                ("cinetico_ram_cache_resident_bytes", "gauge", "Bytes held in the in-memory source cache.", [({}, resident)]),
+                ("cinetico_ram_cache_reserved_bytes", "gauge", "Source bytes assigned to the RAM tier and not yet released.",
+                 [({}, int(reserved * 1024**3))]),
+                ("cinetico_ram_cache_limit_bytes", "gauge", "Upper bound for the RAM tier.", [({}, int(MAX_RAM_LOAD_GB * 1024**3))]),
+                ("cinetico_slots", "gauge", "Encode slots by use.",
+                 [({"use": "total"}, self.current_workers), ({"use": "busy"}, busy)]),
+                ("cinetico_slot_utilisation", "gauge", "Busy encode slots divided by total slots.",
+                 [({}, busy / self.current_workers if self.current_workers else 0.0)]),
+                ("cinetico_encode_speed", "gauge", "Smoothed encode speed in media seconds per wall second.", [({}, self.engine.encode_speed)]),
+                ("cinetico_api_events_dropped", "gauge", "Control API events dropped for slow subscribers.", [({}, self.api_hub.dropped)]),
+                ("cinetico_ui_bus_pending", "gauge", "UI updates waiting for the next frame.", [({}, self.ui_bus.pending)]),
+                ("cinetico_ui_bus_lag_seconds", "gauge", "Age of the stalest UI update applied in the last frame.", [({}, self.ui_bus.lag_sec)]),
+                ("cinetico_ui_bus_updates_total", "counter", "UI updates by outcome.",
+                 [({"outcome": "applied"}, self.ui_bus.applied), ({"outcome": "coalesced"}, self.ui_bus.coalesced)])]
+
+    # --- 运行时剖析 ---
+    def _start_profiling(self, memory: bool) -> None:
+        """开始剖析会话：采样全部线程，并记录 UI 更新总线的积压与延迟 (调用方需持有 _profile_lock 或处于初始化阶段)"""
+        gauges = {"ui_bus_pending": lambda: self.ui_bus.pending, "ui_bus_lag_ms": lambda: self.ui_bus.lag_sec * 1000}
+        self.profiler = self.engine.profiler = ProfileSession(memory=memory, gauges=gauges).start()
+
+    def profile(self, action: str, memory: bool = False) -> dict:
+        """控制接口 / 快捷键：status | start | stop 剖析会话，stop 时返回报告目录"""
+        with self._profile_lock:
+            if action == "start" and not self.profiler:
+                self._start_profiling(memory)
+            elif action == "stop" and self.profiler:
+                session, self.profiler = self.profiler, None
+                self.engine.profiler = None
+                out_dir = session.stop({"ui_bus": self.ui_bus.stats(), "engine": dict(self.engine_stats)})
+                return {"active": False, "dir": out_dir}
+            return self.profiler.status() if self.profiler else {"active": False}
+
+    def toggle_profiling(self) -> None:
+        """Ctrl+Shift+P：开始 / 结束剖析 (结束时在后台写出报告，避免阻塞界面)"""
+        if not self.profiler:
+            self.profile("start")
+            self.show_toast("Profiling started / 剖析已开始 (Ctrl+Shift+P 结束)", "📊")
+            return
+        def worker() -> None:
+            result = self.profile("stop")
+            if result.get("dir"): self.safe_update(self.show_toast, f"剖析报告: {result['dir']}", "📊")
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _governor_loop(self) -> None:
+        """
+        资源调度线程：内存或温度告急时挂起队列中优先级最低 (排序最靠后) 的编码任务，
+        资源回落后按后进先出顺序恢复。挂起不会丢失进度，也不会触碰本程序以外的进程。
+        """
+        while self.running and not self.stop_flag:
+            time.sleep(GOVERNOR_INTERVAL_SEC)
+            with self.queue_lock:
+                encoding = [self.task_widgets[f] for f in self.file_queue
+                            if self.task_widgets[f].status_code == STATE_ENCODING]
+            running = [c for c in encoding if c.procs and not c.paused and not c.throttled and not c.cancelled]
+            action = self.governor.decide(read_memory_status(), read_cpu_temperature(),
+                                          len(running), len(self.throttled_jobs), time.time())
+            if action == "suspend" and running:
+                card = running[-1]
+                card.throttled = True
+                self.throttled_jobs.append(card)
+                for proc in list(card.procs): suspend_process(proc)
+                card.log_data.append(f"[Governor] suspended ({self.governor.reason})")
+                self.safe_update(card.set_status, f"Throttled / 资源紧张，已挂起 ({self.governor.reason})", COLOR_PAUSED)
+            elif action == "resume" and self.throttled_jobs:
+                card = self.throttled_jobs.pop()
+                card.throttled = False
+                if not card.paused:
+                    for proc in list(card.procs): resume_process(proc)
+                    self.safe_update(card.set_status, "Encoding in Progress / 编码进行中", COLOR_ACCENT)
+                card.log_data.append("[Governor] resumed")
+        # 队列结束或停止时恢复所有被挂起的任务，避免遗留停止态进程
+        while self.throttled_jobs:
+            card = self.throttled_jobs.pop()
+            card.throttled = False
+            for proc in list(card.procs): resume_process(proc)
 
     def sys_check(self):
         """启动时系统环境检查"""
         # check_ffmpeg() # 可以注释掉这行，前面已经查过了
         threading.Thread(target=self.scan_disk, daemon=True).start()
+        if self.remote_pool.nodes:
+            threading.Thread(target=self.remote_pool.start, daemon=True).start()
         self.update_monitor_layout()
 
     def scan_disk(self):
@@ -1633,6 +2183,7 @@ class UltraEncoderApp(DnDWindow):
         cache_dir = os.path.join(path, "_Ultra_Smart_Cache_")
         os.makedirs(cache_dir, exist_ok=True)
         self.temp_dir = cache_dir
+        self._journal_cache_dir(cache_dir)
 
         # 更新 UI
         self.safe_update(self.btn_cache.configure, text=f"缓存池: {path[:3]} (智能托管)")
@@ -1925,7 +2476,7 @@ class UltraEncoderApp(DnDWindow):
         self.btn_action.pack(fill="x", padx=UNIFIED_PAD_X, pady=20)
         
         # --- 右侧内容区 ---
-        self.scroll = ctk.CTkScrollableFrame(left, fg_color="transparent")
+        self.scroll = VirtualTaskList(left, items=lambda: self.file_queue, records=self.task_widgets, on_control=self.control_job)
         self.lbl_placeholder = ctk.CTkLabel(left, text="📂\n\nDrag & Drop Video Files Here\n拖入视频文件开启任务", 
                                             font=("微软雅黑", 16, "bold"), text_color=COLOR_TEXT_HINT, justify="center")
         self.check_placeholder()
@@ -1954,34 +2505,21 @@ class UltraEncoderApp(DnDWindow):
         # 2. [关键] 立即杀死所有外部进程
         self.kill_all_procs()
         
-        # 3. [关键] 暴力重置线程池和锁 (解决卡顿的根源)
-        # 如果旧线程池还在跑，直接抛弃它，创建新的
-        try: 
-            self.executor.shutdown(wait=False)
-        except Exception: 
-            pass
-        self.executor = ThreadPoolExecutor(max_workers=16)
-        
-        # 补充对 I/O 预读线程池的同步绞杀
-        try:
-            if hasattr(self, 'io_executor'):
-                self.io_executor.shutdown(wait=False)
-        except Exception:
-            pass
-            
+        # 3. 线程池常驻复用：子进程已被杀死，阻塞在编排器 Future 上的工作线程会随之返回
         # 重置锁对象 (防止死锁)
-        self.queue_lock = threading.Lock()
+        self.queue_lock = self.engine.queue_lock = threading.Lock()
         self.slot_lock = threading.Lock()
         
         # 4. 清除 UI 数据
-        for k, v in self.task_widgets.items(): v.destroy()
         self.task_widgets.clear()
         self.file_queue.clear()
+        self.queued_paths.clear()
+        self.engine.queue_floor = 0
+        self.queue_generation += 1
+        self.journal.clear()
         
         # 5. 重置内部计数器和缓存
         self.finished_tasks_count = 0
-        self.temp_files.clear()
-        self.active_procs.clear()
         
         # [PyArchitect Fix] 暴力解构链表并强制触发底层 GC 垃圾回收，逼迫 Python 释放物理内存给 OS
         for token in list(GLOBAL_RAM_STORAGE.keys()):
@@ -1989,15 +2527,13 @@ class UltraEncoderApp(DnDWindow):
             if isinstance(data_list, list):
                 data_list.clear() # 深度击碎 64MB 内存块的连续指针
         GLOBAL_RAM_STORAGE.clear()
-        PATH_TO_TOKEN_MAP.clear()
         
         import gc
         gc.collect() # 强制执行全量垃圾回收 (Full Collection)
         
         # 6. 重置 UI 视觉
         self.check_placeholder()
-        try: self.scroll._parent_canvas.yview_moveto(0.0)
-        except: pass
+        self.scroll.scroll_to(0)
         
         self.reset_ui_state()
         
@@ -2086,109 +2622,6 @@ class UltraEncoderApp(DnDWindow):
             else:
                 ch.grid(row=i, column=0, columnspan=2, sticky="nsew", padx=5, pady=5)
 
-    def process_caching(self, src_path, widget, lock_obj=None, no_wait=False):
-        """
-        IO 预读取逻辑。
-        将文件加载到 RAM 或 SSD 缓存中，以加速编码。
-        """
-        file_size = os.path.getsize(src_path)
-        file_size_gb = file_size / (1024**3)
-        
-        # 1. 尝试内存加载
-        if file_size_gb < MAX_RAM_LOAD_GB:
-             wait_count = 0
-             limit = 0 if no_wait else 60 
-             # 等待可用内存释放
-             while wait_count < limit: 
-                 free_ram = get_free_ram_gb()
-                 available = free_ram - SAFE_RAM_RESERVE
-                 if available > file_size_gb: break 
-                 if wait_count == 0: self.safe_update(widget.set_status, "Awaiting Memory Allocation / 等待内存分配", COLOR_WAITING, STATUS_WAIT)
-                 if self.stop_flag: return False
-                 time.sleep(0.5)
-                 wait_count += 1
-                 
-        if lock_obj: lock_obj.acquire()
-        try:
-            free_ram = get_free_ram_gb()
-            available_for_cache = free_ram - SAFE_RAM_RESERVE
-            
-            # 策略：RAM 充足时优先载入 RAM
-            if available_for_cache > file_size_gb and file_size_gb < MAX_RAM_LOAD_GB:
-                self.safe_update(widget.set_status, "Buffering to RAM / 缓冲至物理内存", COLOR_RAM, STATUS_CACHING)
-                self.safe_update(widget.set_progress, 0, COLOR_RAM)
-                try:
-                    chunk_size = 64 * 1024 * 1024  # 64MB 切片
-                    data_buffer = []               # [PyArchitect Fix] 改用 List 存储，彻底消除连续内存碎片化引发的 MemoryError
-                    read_len = 0
-                    
-                    with open(src_path, 'rb') as f:
-                        while True:
-                            if self.stop_flag: return False
-                            chunk = f.read(chunk_size)
-                            if not chunk: break
-                            data_buffer.append(chunk) # 以独立的内存页追加，而非扩展连续指针
-                            read_len += len(chunk)
-                            if file_size > 0:
-                                prog = read_len / file_size
-                                self.safe_update(widget.set_progress, prog, COLOR_READING)
-                                
-                    token = str(uuid.uuid4().hex) 
-                    GLOBAL_RAM_STORAGE[token] = data_buffer
-                    PATH_TO_TOKEN_MAP[src_path] = token
-                    self.safe_update(widget.set_status, "Ready (RAM Cached) / 就绪 (内存缓存)", COLOR_READY_RAM, STATUS_READY)                    
-                    self.safe_update(widget.set_progress, 1, COLOR_READY_RAM)
-                    widget.source_mode = "RAM"
-                    return True
-                except Exception as e: 
-                    print(f"[RAM Allocation Error] {e}")
-                    widget.clean_memory() # 内存分配失败回退
-            
-            # 策略：RAM 不足时尝试写入 SSD 缓存
-            self.safe_update(widget.set_status, "Writing Storage Cache / 写入存储缓存", COLOR_SSD_CACHE, STATUS_CACHING)
-            self.safe_update(widget.set_progress, 0, COLOR_SSD_CACHE)
-            try:
-                fname = os.path.basename(src_path)
-                cache_path = os.path.join(self.temp_dir, f"CACHE_{int(time.time())}_{fname}")
-                copied = 0
-                aborted_by_user = False
-                
-                # [PyArchitect Fix] 严格遵守 Context Manager 生命周期，绝不在持有句柄时进行跨级删除
-                with open(src_path, 'rb') as fsrc, open(cache_path, 'wb') as fdst:
-                    while True:
-                        if self.stop_flag: 
-                            aborted_by_user = True
-                            break # 安全跳出循环，交由 with 块自动释放 OS 文件锁
-                            
-                        chunk = fsrc.read(32 * 1024 * 1024) 
-                        if not chunk: break
-                        fdst.write(chunk)
-                        copied += len(chunk)
-                        if file_size > 0:
-                            self.safe_update(widget.set_progress, copied / file_size, COLOR_SSD_CACHE)
-                            
-                # 句柄已安全释放，此时可以放心执行系统级 I/O 销毁
-                if aborted_by_user:
-                    try: 
-                        os.remove(cache_path)
-                    except OSError: 
-                        pass # 忽略无权限或文件不存在的系统异常
-                    return False
-
-                self.temp_files.add(cache_path)
-                widget.ssd_cache_path = cache_path
-                widget.source_mode = "SSD_CACHE"
-                self.safe_update(widget.set_status, "Ready (Storage Cached) / 就绪 (存储缓存)", COLOR_SSD_CACHE, STATUS_READY)
-                self.safe_update(widget.set_progress, 1, COLOR_SSD_CACHE)
-                return True
-                
-            except OSError:
-                # [PyArchitect Fix] 捕获具体的 OSError 而非裸奔的 Exception
-                self.safe_update(widget.set_status, "Cache Allocation Failed / 缓存分配失败", COLOR_ERROR, STATUS_ERR)
-                return False
-        finally:
-            if lock_obj: lock_obj.release()
-        
     def run(self):
         """开始执行任务队列"""
         if not self.file_queue: return
@@ -2204,35 +2637,49 @@ class UltraEncoderApp(DnDWindow):
         self.btn_action.configure(text="STOP / 停止", fg_color=("#C0392B", "#852222"), hover_color=("#E74C3C", "#A32B2B"), state="normal")
         self.btn_clear.configure(state="disabled")
 
-        # 线程池重置
-        self.executor.shutdown(wait=False)
-        self.executor = ThreadPoolExecutor(max_workers=16)
-        
         with self.slot_lock: self.available_indices = list(range(self.current_workers))
         self.update_monitor_layout()
         
-        # 重置未完成任务状态
+        # 重置未完成任务状态，并按当前的全局设置刷新各任务的设置快照
+        engine = self.engine
+        engine.ffmpeg_path, engine.ffprobe_path = FFMPEG_PATH, FFPROBE_PATH
+        engine.work_dir = self.temp_dir
+        engine.workers = self.current_workers
+        engine.benchmark = self.test_mode
         with self.queue_lock:
             self.finished_tasks_count = 0 # [关键] 计数器归零
             for f in self.file_queue:
                 card = self.task_widgets[f]
-                # [关键] 只有真正完成的任务才跳过，其他的全部重置为等待
+                # [关键] 只有真正完成的任务才跳过，其他的全部重置为等待 (引擎释放其缓存并清除降级标记)
                 if card.status_code == STATE_DONE: 
                     self.finished_tasks_count += 1
                 else:
-                    card.set_status("Pending / 等待处理", COLOR_TEXT_HINT, STATUS_WAIT)
+                    engine.reset_job(card)
+                    card.settings = self._job_settings(card)
+                    card.set_status("Pending / 等待处理", COLOR_TEXT_HINT)
                     # [PyArchitect Fix] 补齐缺失的 color 参数，使用系统强调色作为重置后的默认色彩
                     card.set_progress(0.0, COLOR_ACCENT)
-                    card.clean_memory() 
-                    if card.ssd_cache_path and os.path.exists(card.ssd_cache_path):
-                        try: 
-                            os.remove(card.ssd_cache_path)
-                        except OSError: 
-                            pass # 忽略底层文件系统级别的删除异常
-                    card.ssd_cache_path = None
-                    card.source_mode = "PENDING"
         
-        threading.Thread(target=self.engine, daemon=True).start()
+        threading.Thread(target=self._run_engine, name="engine", daemon=True).start()
+        if not (getattr(self, "governor_thread", None) and self.governor_thread.is_alive()):
+            self.governor_thread = threading.Thread(target=self._governor_loop, daemon=True)
+            self.governor_thread.start()
+
+    def _run_engine(self) -> None:
+        """调度线程：驱动引擎直到队列全部进入终态或被停止，随后切换界面状态"""
+        self.engine.run()
+        self.running = False
+        
+        if not self.stop_flag:
+            # 正常完成逻辑：播放动画 + 切换绿色完成状态
+            self.safe_update(self.launch_fireworks)
+            if self.test_mode:
+                self.safe_update(self._show_test_report)
+            self.safe_update(self.set_completion_state)
+        else:
+            # 用户强制停止逻辑：提示 + 重置回初始状态
+            self.safe_update(self.show_toast, "任务已手动停止", "🛑")
+            self.safe_update(self.reset_ui_state)
 
     def stop(self):
         """停止所有任务"""
@@ -2275,38 +2722,6 @@ class UltraEncoderApp(DnDWindow):
         self.btn_clear.configure(state="normal")
         self.lbl_run_status.configure(text="Queue Execution Concluded / 队列执行完毕")
 
-    def get_dur(self, path: str) -> float:
-        """
-        安全获取视频流的物理时长 (秒)。
-        引入超时与输出重定向机制，防止子进程管道死锁。
-        
-        Args:
-            path (str): 目标视频文件的绝对路径。
-            
-        Returns:
-            float: 视频时长秒数。若解析失败则返回 0.0。
-        """
-        try:
-            cmd =[
-                FFPROBE_PATH, "-v", "error", 
-                "-show_entries", "format=duration", 
-                "-of", "default=noprint_wrappers=1:nokey=1", path
-            ]
-            kwargs = get_subprocess_args()
-            
-            # stderr=subprocess.DEVNULL 避免错误日志填满系统管道导致主线程挂起
-            # timeout=5.0 避免损坏的视频文件导致进程无限期阻塞
-            out = subprocess.check_output(
-                cmd, 
-                stderr=subprocess.DEVNULL, 
-                timeout=5.0, 
-                **kwargs
-            ).strip()
-            return float(out)
-        except (subprocess.SubprocessError, OSError, ValueError):
-            # 精准捕获子进程异常与类型转换异常，严禁使用裸 except
-            return 0.0
-
     def add_file(self):
         """添加文件对话框"""
         files = filedialog.askopenfilenames(title="选择视频文件", filetypes=[("Video Files", "*.mp4 *.mkv *.mov *.avi *.ts *.flv *.wmv")])
@@ -2416,96 +2831,6 @@ class UltraEncoderApp(DnDWindow):
             if 'top' in locals() and top.winfo_exists(): top.destroy()
             self.show_toast("✨ 所有任务已完成 / All Tasks Finished! ✨", "🏆")
 
-    def engine(self):
-        """
-        [Fixed] 核心调度引擎。
-        修复了任务自然完成后 UI 不重置、不播放动画的问题。
-        """
-        total_ram_limit = MAX_RAM_LOAD_GB 
-        current_ram_usage = 0.0            
-        is_cache_ssd = DiskManager.is_ssd(self.temp_dir) or (self.manual_cache_path and DiskManager.is_ssd(self.manual_cache_path))
-        io_concurrency = self.current_workers if is_cache_ssd else 1
-        self.io_executor = ThreadPoolExecutor(max_workers=io_concurrency)
-        
-        while not self.stop_flag:
-            active_io_count = 0
-            active_compute_count = 0
-            current_ram_usage = 0.0
-            
-            # 1. 统计资源
-            with self.queue_lock:
-                for f in self.file_queue:
-                    card = self.task_widgets[f]
-                    if card.source_mode == "RAM" and card.status_code not in [STATE_DONE, STATE_ERROR]:
-                        current_ram_usage += card.file_size_gb
-                    if card.status_code in [STATE_QUEUED_IO, STATE_CACHING]: active_io_count += 1
-                    elif card.status_code == STATE_ENCODING: active_compute_count += 1
-            
-            # 2. 调度 IO
-            with self.queue_lock:
-                for f in self.file_queue:
-                    card = self.task_widgets[f]
-                    if card.status_code == STATE_PENDING:
-                        source_is_ssd = DiskManager.is_ssd(f)
-                        if source_is_ssd:
-                            card.source_mode = "DIRECT"
-                            card.status_code = STATE_READY 
-                            self.safe_update(card.set_status, "就绪 (SSD直读)", COLOR_DIRECT, STATE_READY)
-                            self.safe_update(card.set_progress, 1.0, COLOR_DIRECT)
-                            continue 
-                        else:
-                            if active_io_count >= 1: break 
-                            predicted_usage = current_ram_usage + card.file_size_gb
-                            if predicted_usage < total_ram_limit:
-                                should_use_ram = True
-                                current_ram_usage += card.file_size_gb 
-                            else: should_use_ram = False 
-                            card.source_mode = "RAM" if should_use_ram else "SSD_CACHE"
-                            card.status_code = STATE_QUEUED_IO
-                            active_io_count += 1
-                            self.io_executor.submit(self._worker_io_task, f)
-                            break
-            
-            # 3. 调度计算
-            if active_compute_count < self.current_workers:
-                with self.queue_lock:
-                    for f in self.file_queue:
-                        card = self.task_widgets[f]
-                        if card.status_code == STATE_READY:
-                            card.status_code = STATE_ENCODING
-                            active_compute_count += 1
-                            self.executor.submit(self._worker_compute_task, f)
-                            self.safe_update(self.scroll_to_card, card)
-                            if active_compute_count >= self.current_workers: break
-            
-            # 4. 检查完成状态
-            all_done = True
-            with self.queue_lock:
-                for f in self.file_queue:
-                    if self.task_widgets[f].status_code not in [STATE_DONE, STATE_ERROR]: all_done = False; break
-            
-            # 如果全部完成且没有活动的线程，退出循环
-            if all_done and active_io_count == 0 and active_compute_count == 0: break
-            time.sleep(0.1) 
-            
-        # --- 循环结束后的收尾工作 ---
-        self.running = False
-        
-        # [PyArchitect Fix] 强制释放 I/O 线程池，阻断 Zombie Threads 内存泄漏链条
-        if hasattr(self, 'io_executor'):
-            self.io_executor.shutdown(wait=False)
-        
-        if not self.stop_flag:
-            # 正常完成逻辑：播放动画 + 切换绿色完成状态
-            self.safe_update(self.launch_fireworks)
-            if self.test_mode:
-                self.safe_update(self._show_test_report)
-            self.safe_update(self.set_completion_state)
-        else:
-            # 用户强制停止逻辑：提示 + 重置回初始状态
-            self.safe_update(self.show_toast, "任务已手动停止", "🛑")
-            self.safe_update(self.reset_ui_state)
-
     def _show_test_report(self):
         """显示测试报告的辅助函数"""
         orig_total = self.test_stats["orig"]
@@ -2519,38 +2844,28 @@ class UltraEncoderApp(DnDWindow):
             msg += f"\n压缩比: {ratio:.2f}% (节省 {save_rate:.2f}% 空间)"
         else:
             msg += "\n数据异常：原视频大小为0"
+        records = [r for r in self.job_metrics if r.get("benchmark")]
+        if records:
+            cpu_total = sum(r["cpu_user_sec"] + r["cpu_sys_sec"] for r in records)
+            io_bound = sum(1 for r in records if r["bound"] == "io")
+            msg += f"\n\nCPU 总耗时: {cpu_total:.1f} s | I/O 受限任务: {io_bound}/{len(records)}"
+            try:
+                path = export_job_metrics(records, os.path.join(os.path.expanduser("~"), ".cinetico",
+                                                                 f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.csv"))
+                msg += f"\n明细已导出: {path}"
+            except OSError as e:
+                msg += f"\n明细导出失败: {e}"
         ModernAlert(self, "基准测试报告", msg, type="info")
 
-    def _worker_io_task(self, task_file):
-        """线程任务：IO 预读取"""
-        card = self.task_widgets[task_file]
-        try:
-            self.safe_update(card.set_status, "Allocating I/O / 正在分配 I/O", COLOR_READING, STATE_CACHING)
-            success = self.process_caching(task_file, card, lock_obj=None, no_wait=True)
-            if success:
-                self.safe_update(card.set_status, "Standby for Encoding / 编码待命", COLOR_READY_RAM if card.source_mode == "RAM" else COLOR_SSD_CACHE, STATE_READY)
-            else: self.safe_update(card.set_status, "I/O Failure / I/O 失败", COLOR_ERROR, STATE_ERROR)
-        except Exception as e:
-            self.safe_update(card.set_status, "I/O Exception / I/O 异常", COLOR_ERROR, STATE_ERROR)
-
-    def _worker_compute_task(self, task_file):
-        """线程任务：视频编码计算 (PyArchitect Fixed: UUID Guard & Atomic State)"""
-        card = self.task_widgets[task_file]
-        fname = os.path.basename(task_file)
+    def _acquire_monitor_slot(self) -> tuple[int, Any]:
+        """
+        申请一个监控通道槽位。
+        
+        Returns:
+            tuple: (槽位索引, 通道 UI 对象)。无可用槽位时返回 (-1, 空实现的兜底对象)。
+        """
         slot_idx = -1
         ch_ui = None
-        proc = None
-        working_output_file = None 
-        temp_audio_wav = os.path.join(self.temp_dir, f"TEMP_AUDIO_{uuid.uuid4().hex}.wav")
-        input_size = 0
-        duration = 1.0
-        
-        # [关键] 生成本次任务的唯一令牌
-        task_token = uuid.uuid4().hex 
-        
-        # 用于崩溃时回溯日志
-        log_buffer = deque(maxlen=30)
-        
         # [PyArchitect Fix] 引入自旋等待机制，解决多线程任务交接时的槽位抢占竞态条件 (Race Condition)
         # 确保当前一个任务刚更新完 DONE 状态但尚未归还槽位时，新任务会短暂等待，防止退化为静默后台执行
         retry_count = 50 
@@ -2572,313 +2887,14 @@ class UltraEncoderApp(DnDWindow):
                 def update_data(self, *a): pass
                 def reset(self): pass
             ch_ui = DummyUI()
-            
-        try:
-            # 激活通道，传入 Token
-            self.safe_update(ch_ui.activate, fname, "Initializing Pipeline / 初始化处理管线", task_token)
-            
-            if os.path.exists(task_file):
-                input_size = os.path.getsize(task_file)
-                duration = self.get_dur(task_file)
-                if duration <= 0: duration = 1.0
-
-            # --- 像素格式与编码预检 (防卫性编程：防止硬件解码器崩溃) ---
-            force_cpu_decode = False
-            try:
-                # [PyArchitect Fix] 同时探测 codec_name 和 pix_fmt
-                probe_cmd: list[str] = [
-                    FFPROBE_PATH, "-v", "error", "-select_streams", "v:0", 
-                    "-show_entries", "stream=codec_name,pix_fmt", "-of", "csv=p=0", task_file
-                ]
-                
-                # 获取流信息，预期输出格式如 "h264,yuv420p10le"
-                probe_info: str = subprocess.check_output(probe_cmd, **get_subprocess_args()).decode().strip().lower()
-                
-                # 触发软解回退 (CPU Decode) 的边界条件：
-                # 1. 包含 422 或 444 色度采样的视频
-                # 2. 编码格式为 h264 且位深为 10-bit 的视频 (如 High 10 Profile)
-                if "422" in probe_info or "444" in probe_info or ("h264" in probe_info and "10" in probe_info): 
-                    force_cpu_decode = True
-                    
-            except subprocess.SubprocessError as e:
-                # 捕获具体的子进程异常，避免裸 except 掩盖其他核心系统级错误
-                print(f"[FFprobe 预检异常] 无法探测视频信息: {e}")
-
-            # 1. 提取音频
-            self.safe_update(ch_ui.activate, fname, "Demuxing Audio Stream / 解复用音频流", task_token)
-            self.safe_update(card.set_status, "Demuxing Audio / 音频解复用", COLOR_READING, STATE_ENCODING)
-            has_audio = False
-            
-            extract_cmd = [FFMPEG_PATH, "-y", "-i", task_file, "-vn", "-acodec", "pcm_s16le", "-ar", "44100", "-ac", "2", "-f", "wav", temp_audio_wav]
-            audio_proc = subprocess.run(extract_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **get_subprocess_args())
-            
-            if audio_proc.returncode == 0 and os.path.exists(temp_audio_wav) and os.path.getsize(temp_audio_wav) > 1024: 
-                has_audio = True
+        return slot_idx, ch_ui
 
-            self.safe_update(card.set_status, "Encoding in Progress / 编码进行中", COLOR_ACCENT, STATE_ENCODING)
-            
-            # 2. 构建编码命令 (逻辑保持不变，为节省篇幅省略中间构建 cmd 的代码，请保留原有的构建逻辑)
-            # ... [此处保留原代码中构建 cmd 列表的逻辑] ...
-            # 为了确保完整性，这里假设你保留了 cmd = [FFMPEG_PATH, ...] 的构建代码
-            
-            # --- 以下是 cmd 构建逻辑的简化占位，请务必保留原有逻辑 ---
-            codec_sel = self.codec_var.get()
-            using_gpu = self.gpu_var.get()
-            allow_hw_decode_input = using_gpu
-            if force_cpu_decode and platform.system() == "Windows": allow_hw_decode_input = False
-            final_hw_encode = using_gpu
-            
-            # --- 构建物理与虚拟输入源 ---
-            input_video_source = task_file
-            is_network_stream = False
-
-            if not using_gpu and card.source_mode == "RAM":
-                token = PATH_TO_TOKEN_MAP.get(task_file)
-                if token: 
-                    input_video_source = f"http://127.0.0.1:{self.global_port}/{token}"
-                    is_network_stream = True
-            elif card.source_mode == "SSD_CACHE" and card.ssd_cache_path:
-                input_video_source = os.path.abspath(card.ssd_cache_path)
-
-            output_dir = os.path.dirname(task_file)
-            f_name_no_ext = os.path.splitext(fname)[0]
-            final_output_path = os.path.join(output_dir, f"{f_name_no_ext}_Compressed_{time.strftime('%Y%m%d')}.mp4")
-            working_output_file = os.path.join(self.temp_dir, f"TEMP_ENC_{uuid.uuid4().hex}.mp4")
-
-            cmd = [FFMPEG_PATH, "-y"]
-            
-            if allow_hw_decode_input:
-                if platform.system() == "Darwin": 
-                    cmd.extend(["-hwaccel", "videotoolbox"])
-                else: 
-                    # [PyArchitect Fix] 限制硬件解码器的 CPU 喂送线程数。
-                    # 防止由于高核心 CPU 在处理高帧率视频时，向 NVDEC 申请超过 32 个 Decode Surfaces 而导致显存池溢出崩溃。
-                    cmd.extend(["-hwaccel", "cuda", "-hwaccel_output_format", "cuda", "-threads", "4"])
-                
-            # 为 HTTP 内存流增加充足的探测缓冲，防止由于丢包或握手延迟引发的提前 EOF
-            if is_network_stream: 
-                cmd.extend(["-probesize", "100M", "-analyzeduration", "100M"])
-                
-            # 添加主输入 (通常是高带宽的内存 HTTP 流 或 高速 SSD 缓存)
-            cmd.extend(["-i", input_video_source])
-
-            # [PyArchitect Fix] 异构双输入分离架构 (Dual-Input Stream Separation)
-            if has_audio and is_network_stream:
-                # 核心策略：当主视频流为不支持随机访问的 HTTP 内存流时，强行在同一流中解复用音视频会导致 FFmpeg 缓冲死锁
-                # 解决方案：将原物理文件作为 Input 1 单独引入，利用极低的硬盘 I/O 专职提取音频
-                cmd.extend(["-i", task_file])
-                cmd.extend(["-map", "0:v:0"])  # 从内存流读取画面
-                cmd.extend(["-map", "1:a:0"])  # 从物理硬盘读取声音
-            else:
-                # 若为纯本地文件直读 (DIRECT) 或 SSD 缓存，文件系统本身支持高速随机访问 (Seek)，直接正常映射双轨
-                cmd.extend(["-map", "0:v:0"])
-                if has_audio: 
-                    cmd.extend(["-map", "0:a:0"])
-            
-            # 编码器选择部分 (保留原逻辑)
-            if final_hw_encode:
-                if platform.system() == "Darwin":
-                    if "H.264" in codec_sel: v_codec = "h264_videotoolbox"
-                    elif "H.265" in codec_sel: v_codec = "hevc_videotoolbox"
-                    else: v_codec = "libsvtav1"; final_hw_encode = False
-                else:
-                    if "H.264" in codec_sel: v_codec = "h264_nvenc"
-                    elif "H.265" in codec_sel: v_codec = "hevc_nvenc"
-                    else: v_codec = "av1_nvenc"
-                cmd.extend(["-c:v", v_codec])
-            else:
-                cmd.extend(["-c:v", "libx264"])
-
-            # 码率控制与像素格式
-            use_10bit = self.depth_10bit_var.get()
-            if final_hw_encode and "H.264" in codec_sel and use_10bit: use_10bit = False 
-
-            # [PyArchitect Fix] 贯彻 WYSIWYG 原则，直接透传前端已处理好的物理映射值
-            target_crf = self.crf_var.get()
-
-            if final_hw_encode:
-                if platform.system() == "Darwin":
-                    # Mac VideoToolbox 质量映射
-                    mac_quality = int(100 - (target_crf * 2.2))
-                    if mac_quality < 20: mac_quality = 20
-                    cmd.extend(["-q:v", str(mac_quality)])
-                    if use_10bit: cmd.extend(["-pix_fmt", "p010le"])
-                    else: cmd.extend(["-pix_fmt", "yuv420p"])
-                else:
-                    # Windows NVENC 质量映射
-                    if use_10bit:
-                         if allow_hw_decode_input: cmd.extend(["-vf", "scale_cuda=format=p010le"])
-                         else: cmd.extend(["-pix_fmt", "p010le"])
-                    else:
-                         if allow_hw_decode_input: cmd.extend(["-vf", "scale_cuda=format=yuv420p"])
-                         else: cmd.extend(["-pix_fmt", "yuv420p"])
-                    cmd.extend(["-rc", "vbr", "-cq", str(target_crf), "-b:v", "0"])
-                    if "AV1" not in codec_sel: cmd.extend(["-preset", "p4"])
-            else:
-                # CPU 软解质量映射
-                if use_10bit: cmd.extend(["-pix_fmt", "yuv420p10le"])
-                else: cmd.extend(["-pix_fmt", "yuv420p"])
-                cmd.extend(["-crf", str(target_crf), "-preset", "medium"])
-
-            if has_audio: cmd.extend(["-c:a", "aac", "-b:a", "320k"])
-            if self.keep_meta_var.get(): cmd.extend(["-map_metadata", "0"])
-            cmd.extend(["-progress", "pipe:1", "-nostats", working_output_file])
-            # --- cmd 构建结束 ---
-
-            # 3. 启动 FFmpeg 子进程 (应用企业级安全加固，防止 OS 管道死锁)
-            kwargs = get_subprocess_args()
-            if platform.system() == "Windows":
-                 proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                       text=True, encoding="utf-8", errors="replace", bufsize=1,
-                                       startupinfo=kwargs['startupinfo'], creationflags=kwargs['creationflags'])
-            else:
-                 proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                       text=True, encoding="utf-8", errors="replace", bufsize=1)
-            self.active_procs.append(proc)
-            
-            decode_mode = "GPU" if allow_hw_decode_input else "CPU"
-            if force_cpu_decode: decode_mode = "CPU(4:2:2)"
-            tag_info = f"Enc: {'GPU' if final_hw_encode else 'CPU'} | Dec: {decode_mode}"
-            if card.source_mode == "RAM": tag_info += " | RAM"
-            
-            # [关键] 更新时传入 task_token
-            self.safe_update(ch_ui.activate, fname, tag_info, task_token)
-            
-            # 4. 进度监听循环
-            progress_stats = {}
-            start_t = time.time()
-            last_ui_update_time = 0 
-            max_prog_reached = 0.0   
-            is_finished_locally = False 
-            
-            # [关键] 清空上次的日志缓存
-            card.log_data.clear()
-
-            for line in proc.stdout:
-                if self.stop_flag or is_finished_locally: break
-                try: 
-                    line_str = line.strip() 
-                    if not line_str: continue
-                    
-                    # [新增] 实时写入卡片专有日志
-                    card.log_data.append(line_str)
-                    
-                    if "=" in line_str:
-                        parts = line_str.split("=", 1)
-                        if len(parts) == 2:
-                            key, value = parts
-                            progress_stats[key.strip()] = value.strip()
-                            
-                            if key.strip() == "out_time_us":
-                                now = time.time()
-                                if now - last_ui_update_time > 0.1:
-                                    fps = float(progress_stats.get("fps", "0")) if "fps" in progress_stats else 0.0
-                                    try: current_us = int(value.strip())
-                                    except: current_us = 0
-                                    
-                                    raw_prog = (current_us / 1000000.0) / duration
-                                    if raw_prog > max_prog_reached: max_prog_reached = raw_prog
-                                    final_prog = min(0.99, max_prog_reached) 
-                                    
-                                    eta = "--:--"
-                                    elapsed = now - start_t
-                                    if final_prog > 0.005:
-                                        eta_sec = (elapsed / final_prog) - elapsed
-                                        if eta_sec < 0: eta_sec = 0
-                                        eta = f"{int(eta_sec//60):02d}:{int(eta_sec%60):02d}"
-                                    
-                                    # [新增] 核心数学逻辑：动态预测最终体积
-                                    est_size_str = ""
-                                    if final_prog > 0.05: # 进度大于 5% 后预测才趋于准确
-                                        raw_size = progress_stats.get("total_size", "0").replace("N/A", "0")
-                                        try:
-                                            current_size_bytes = int(raw_size)
-                                            if current_size_bytes > 0:
-                                                est_mb = (current_size_bytes / final_prog) / (1024 * 1024)
-                                                est_size_str = f"Est: {est_mb:.1f}MB"
-                                        except ValueError:
-                                            pass
-                                    
-                                    if not is_finished_locally:
-                                        if final_prog >= 0.98:
-                                            self.safe_update(ch_ui.update_data, fps, 0.99, "Finalizing...", task_token, "")
-                                            self.safe_update(card.set_status, "📦 封装中...", COLOR_ACCENT, STATE_ENCODING)
-                                            self.safe_update(card.set_progress, 0.99, COLOR_ACCENT)
-                                        else:
-                                            # [修改] 将预测体积传给监控通道
-                                            self.safe_update(ch_ui.update_data, fps, final_prog, eta, task_token, est_size_str)
-                                            self.safe_update(card.set_progress, final_prog, COLOR_ACCENT)
-                                    
-                                    last_ui_update_time = now
-                except: pass
-            
-            proc.wait()
-            is_finished_locally = True # [关键] 进程结束，立即上锁，禁止后续的进度条回滚
-            
-            # 立即释放通道
-            self.safe_update(ch_ui.reset)
-            
-            if proc in self.active_procs: self.active_procs.remove(proc)
-            if os.path.exists(temp_audio_wav):
-                try: os.remove(temp_audio_wav)
-                except: pass
-            
-            if self.stop_flag:
-                self.safe_update(card.set_status, "Process Terminated / 进程已终止", COLOR_PAUSED, STATE_PENDING)
-            elif proc.returncode == 0:
-                # 成功分支
-                self.safe_update(card.set_status, "Relocating Output / 迁移输出文件", COLOR_MOVING, STATE_DONE)
-                
-                if self.test_mode:
-                     # (测试模式代码简略)
-                     new_s = os.path.getsize(working_output_file)
-                     self.test_stats["orig"] += input_size
-                     self.test_stats["new"] += new_s
-                     try: os.remove(working_output_file)
-                     except: pass
-                     self.safe_update(card.set_status, "Benchmark Complete / 基准测试完成", COLOR_SUCCESS, STATE_DONE)
-                     self.safe_update(card.set_progress, 1.0, COLOR_SUCCESS)
-                else:
-                    if os.path.exists(working_output_file): 
-                        shutil.move(working_output_file, final_output_path)
-                    if self.keep_meta_var.get() and os.path.exists(final_output_path): 
-                        try: shutil.copystat(task_file, final_output_path)
-                        except: pass
-                    
-                    final_size_mb = 0
-                    ratio_str = ""
-                    try:
-                        final_size_mb = os.path.getsize(final_output_path)
-                        saved_percent = (1.0 - (final_size_mb / input_size)) * 100
-                        ratio_str = f"(-{saved_percent:.1f}%)" if saved_percent >= 0 else f"(+{abs(saved_percent):.1f}%)"
-                    except: pass
-                    
-                    # [关键] 最终状态更新，覆盖之前的 "Finalizing"
-                    self.safe_update(card.set_status, f"Task Resolved / 任务已终结 {ratio_str}", COLOR_SUCCESS, STATE_DONE)
-                    self.safe_update(card.set_progress, 1.0, COLOR_SUCCESS)
-            else:
-                err_summary = "\n".join(list(log_buffer))
-                self.safe_update(card.set_status, "Encoding Exception / 编码异常", COLOR_ERROR, STATE_ERROR)
-                
-        except Exception as e:
-            print(f"System Error: {e}")
-            self.safe_update(card.set_status, "System Fault / 系统故障", COLOR_ERROR, STATE_ERROR)
-        finally:
-            # 清理全局缓存映射
-            token = PATH_TO_TOKEN_MAP.get(task_file)
-            if token and token in GLOBAL_RAM_STORAGE:
-                 del GLOBAL_RAM_STORAGE[token]
-                 del PATH_TO_TOKEN_MAP[task_file]
-            if working_output_file and os.path.exists(working_output_file):
-                try: os.remove(working_output_file)
-                except: pass
-            
-            self.safe_update(ch_ui.reset)
-            # [关键] 归还显示槽位，确保下个任务有窗口可用 (附带防重复归还校验)
-            with self.slot_lock:
-                if slot_idx != -1 and slot_idx not in self.available_indices:
-                    self.available_indices.append(slot_idx)
-                    self.available_indices.sort()
+    def _release_monitor_slot(self, slot_idx: int) -> None:
+        """[关键] 归还显示槽位，确保下个任务有窗口可用 (附带防重复归还校验)"""
+        with self.slot_lock:
+            if slot_idx != -1 and slot_idx not in self.available_indices:
+                self.available_indices.append(slot_idx)
+                self.available_indices.sort()
 
 if __name__ == "__main__":
     # --- [PyArchitect Fix] 控制台隐身术 ---
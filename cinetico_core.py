@@ -0,0 +1,6045 @@
+"""
+Project: Cinético Encoder
+Description: GUI-free core services shared by the desktop app and future headless entry points.
+             本模块禁止导入任何 GUI 库 (customtkinter / tkinter)，确保可在无显示环境中复用。
+"""
+
+import argparse
+import asyncio
+import bisect
+import collections
+import concurrent.futures
+import csv
+import ctypes
+import ctypes.util
+import glob
+import hashlib
+import heapq
+import hmac
+import http.server
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import queue
+import random
+import re
+import select
+import shutil
+import signal
+import socket
+import socketserver
+import sqlite3
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as futures_wait
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+def get_subprocess_args() -> Dict[str, Any]:
+    """
+    获取跨平台的 subprocess 启动参数。
+    主要用于 Windows 下隐藏弹出的 CMD 窗口。
+    """
+    if platform.system() == "Windows":
+        si = subprocess.STARTUPINFO()
+        si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        return {"startupinfo": si, "creationflags": subprocess.CREATE_NO_WINDOW}
+    return {}
+
+
+# =========================================================================
+# [Core 1] Hardware Capability Probe
+# 功能：识别容器内真实可用的 CPU 配额、CPU 亲和性与 FFmpeg 编码能力
+# =========================================================================
+
+class HardwareProbe:
+    """
+    硬件能力探针。
+    - CPU：取 sched_getaffinity 与 cgroup 配额 (v1/v2) 中的较小值，避免容器内误判为宿主机核数。
+    - FFmpeg：解析 `-encoders` / `-hwaccels` 输出，按 (二进制路径, mtime) 缓存，二进制更新后自动失效。
+    """
+    _ffmpeg_cache: Dict[Tuple[str, float], Dict[str, Set[str]]] = {}
+    _cache_lock = threading.Lock()
+
+    @staticmethod
+    def _read_first_line(path: str) -> Optional[str]:
+        try:
+            with open(path, "r") as f:
+                return f.readline().strip()
+        except OSError:
+            return None
+
+    @staticmethod
+    def _cgroup_chain(base: str, rel: str) -> List[str]:
+        """由叶子 cgroup 逐级向上直到挂载点的目录列表 (叶子在前)"""
+        chain: List[str] = []
+        rel = rel.strip("/")
+        while True:
+            chain.append(os.path.join(base, rel) if rel else base)
+            if not rel:
+                return chain
+            rel = os.path.dirname(rel)
+
+    @classmethod
+    def _cgroup_dirs(cls) -> Tuple[List[str], List[str]]:
+        """
+        解析 /proc/self/cgroup，返回 (v2 目录链, v1 cpu 控制器目录链)。
+        v2 形如 0::/system.slice/xxx.service，v1 形如 4:cpu,cpuacct:/docker/xxxx；无对应层级时为空列表。
+        """
+        v2: List[str] = []
+        v1: List[str] = []
+        try:
+            with open("/proc/self/cgroup", "r") as f:
+                for line in f:
+                    parts = line.strip().split(":", 2)
+                    if len(parts) != 3:
+                        continue
+                    if parts[0] == "0" and not parts[1]:
+                        v2 = cls._cgroup_chain("/sys/fs/cgroup", parts[2])
+                    elif "cpu" in parts[1].split(","):
+                        v1 = cls._cgroup_chain("/sys/fs/cgroup/cpu", parts[2])
+        except OSError:
+            pass
+        return v2, v1
+
+    @staticmethod
+    def _quota_cores(quota_s: Optional[str], period_s: Optional[str]) -> Optional[float]:
+        try:
+            quota, period = int(quota_s or ""), int(period_s or "")
+        except ValueError:
+            return None  # "max" / 缺失
+        return quota / period if quota > 0 and period > 0 else None
+
+    @classmethod
+    def cgroup_cpu_quota(cls) -> Optional[float]:
+        """
+        读取 cgroup CPU 配额，单位为“核”。
+        配额可能设在任一祖先层级 (systemd slice、嵌套容器)，因此从叶子逐级走到根，取各级配额的最小值。
+        Returns:
+            float: 配额折算的核数 (例如 8.0)；无配额或非 Linux 时返回 None。
+        """
+        if platform.system() != "Linux":
+            return None
+
+        v2, v1 = cls._cgroup_dirs()
+        quotas: List[float] = []
+        # cgroup v2: "max 100000" 或 "800000 100000" (根 cgroup 没有 cpu.max)
+        for directory in v2:
+            line = cls._read_first_line(os.path.join(directory, "cpu.max"))
+            parts = line.split() if line else []
+            cores = cls._quota_cores(parts[0], parts[1]) if len(parts) >= 2 else None
+            if cores:
+                quotas.append(cores)
+        # cgroup v1: cfs_quota_us = -1 表示不限制
+        for directory in v1:
+            cores = cls._quota_cores(cls._read_first_line(os.path.join(directory, "cpu.cfs_quota_us")),
+                                     cls._read_first_line(os.path.join(directory, "cpu.cfs_period_us")))
+            if cores:
+                quotas.append(cores)
+        return min(quotas) if quotas else None
+
+    @classmethod
+    def effective_cpu_count(cls) -> int:
+        """获取进程实际可调度的 CPU 数 (亲和性 ∩ 配额)"""
+        try:
+            count = len(os.sched_getaffinity(0))
+        except (AttributeError, OSError):
+            count = os.cpu_count() or 4
+
+        quota = cls.cgroup_cpu_quota()
+        if quota:
+            count = min(count, max(1, math.ceil(quota)))
+        return max(1, count)
+
+    @staticmethod
+    def _parse_encoders(text: str) -> Set[str]:
+        """解析 `ffmpeg -encoders`，仅保留视频/音频编码器名称"""
+        encoders: Set[str] = set()
+        in_table = False
+        for line in text.splitlines():
+            stripped = line.strip()
+            if stripped.startswith("------"):
+                in_table = True
+                continue
+            if not in_table or not stripped:
+                continue
+            parts = stripped.split(None, 2)
+            if len(parts) >= 2 and len(parts[0]) == 6:
+                encoders.add(parts[1])
+        return encoders
+
+    @staticmethod
+    def _parse_hwaccels(text: str) -> Set[str]:
+        """解析 `ffmpeg -hwaccels`，首行为标题"""
+        accels: Set[str] = set()
+        for line in text.splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.endswith(":"):
+                continue
+            accels.add(stripped)
+        return accels
+
+    @classmethod
+    def ffmpeg_capabilities(cls, ffmpeg_path: str) -> Dict[str, Set[str]]:
+        """
+        探测 FFmpeg 二进制支持的编码器与硬件加速方式。
+        同一二进制 (路径 + mtime 不变) 只会真正执行一次。
+
+        Args:
+            ffmpeg_path (str): ffmpeg 可执行文件路径或 PATH 中的命令名。
+
+        Returns:
+            dict: {"encoders": set[str], "hwaccels": set[str]}，探测失败时为空集合。
+        """
+        resolved = shutil.which(ffmpeg_path) or ffmpeg_path
+        try:
+            mtime = os.path.getmtime(resolved)
+        except OSError:
+            return {"encoders": set(), "hwaccels": set()}
+
+        key = (os.path.realpath(resolved), mtime)
+        with cls._cache_lock:
+            cached = cls._ffmpeg_cache.get(key)
+        if cached is not None:
+            return cached
+
+        caps: Dict[str, Set[str]] = {"encoders": set(), "hwaccels": set()}
+        kwargs = get_subprocess_args()
+        for flag, parser, field in (("-encoders", cls._parse_encoders, "encoders"),
+                                    ("-hwaccels", cls._parse_hwaccels, "hwaccels")):
+            try:
+                out = subprocess.run([resolved, "-hide_banner", flag], stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, timeout=10.0, **kwargs).stdout
+                caps[field] = parser(out.decode("utf-8", errors="replace"))
+            except (subprocess.SubprocessError, OSError):
+                pass
+
+        with cls._cache_lock:
+            cls._ffmpeg_cache[key] = caps
+        return caps
+
+    @staticmethod
+    def has_nvidia_device() -> bool:
+        """确认机器上确实存在 NVIDIA 设备 (仅编译了 NVENC 的 FFmpeg 不代表有显卡)"""
+        if platform.system() == "Linux" and os.path.exists("/dev/nvidiactl"):
+            return True
+        try:
+            subprocess.run(["nvidia-smi"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           check=True, timeout=10.0, **get_subprocess_args())
+            return True
+        except (subprocess.SubprocessError, OSError):
+            return False
+
+    @staticmethod
+    def recommend_cpu_slots(cpu_count: int) -> int:
+        """按有效 CPU 数推导 CPU 编码并发数 (UI 支持 1~4)"""
+        if cpu_count >= 16: return 4
+        if cpu_count >= 8: return 3
+        if cpu_count >= 4: return 2
+        return 1
+
+    @classmethod
+    def snapshot(cls, ffmpeg_path: str) -> Dict[str, Any]:
+        """
+        汇总一次完整的硬件事实，并据此推导默认并发槽位。
+
+        Returns:
+            dict: cpu_count / host_cpus / cpu_quota / encoders / hwaccels /
+                  hw_encode (可用硬件编码路线: "nvenc" | "videotoolbox" | None) /
+                  cpu_slots / gpu_slots / rec_slots
+        """
+        sys_plat = platform.system()
+        cpu_count = cls.effective_cpu_count()
+        caps = cls.ffmpeg_capabilities(ffmpeg_path)
+        encoders, hwaccels = caps["encoders"], caps["hwaccels"]
+
+        hw_encode: Optional[str] = None
+        if sys_plat == "Darwin":
+            # Mac 通常都支持 VideoToolbox；FFmpeg 尚未部署时 encoders 为空，按默认可用处理
+            if not encoders or "h264_videotoolbox" in encoders:
+                hw_encode = "videotoolbox"
+        elif sys_plat == "Windows":
+            # Windows 沿用 nvidia-smi 判定 (首次启动时 FFmpeg 可能尚未下载)
+            if (not encoders or "h264_nvenc" in encoders) and cls.has_nvidia_device():
+                hw_encode = "nvenc"
+        else:
+            # Linux：编码器与 cuda 硬解必须同时编译进 FFmpeg，且存在真实设备
+            if "h264_nvenc" in encoders and "cuda" in hwaccels and cls.has_nvidia_device():
+                hw_encode = "nvenc"
+
+        cpu_slots = cls.recommend_cpu_slots(cpu_count)
+        gpu_slots = min(3, max(cpu_slots, 2)) if hw_encode else 0
+        return {
+            "cpu_count": cpu_count,
+            "host_cpus": os.cpu_count() or cpu_count,
+            "cpu_quota": cls.cgroup_cpu_quota(),
+            "encoders": encoders,
+            "hwaccels": hwaccels,
+            "hw_encode": hw_encode,
+            "cpu_slots": cpu_slots,
+            "gpu_slots": gpu_slots,
+            "rec_slots": gpu_slots if hw_encode else cpu_slots,
+        }
+
+
+# =========================================================================
+# [Core 1.5] FFmpeg Command Builder
+# 功能：GUI 与各类 Headless 入口共用的编码参数构建
+# =========================================================================
+
+def build_hwaccel_args(allow_hw_decode_input: bool) -> List[str]:
+    """构建硬件解码输入参数 (位于 -i 之前)"""
+    if not allow_hw_decode_input: return []
+    if platform.system() == "Darwin": 
+        return ["-hwaccel", "videotoolbox"]
+    # [PyArchitect Fix] 限制硬件解码器的 CPU 喂送线程数。
+    # 防止由于高核心 CPU 在处理高帧率视频时，向 NVDEC 申请超过 32 个 Decode Surfaces 而导致显存池溢出崩溃。
+    return ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda", "-threads", "4"]
+
+
+def build_video_codec_args(codec_sel: str, final_hw_encode: bool, allow_hw_decode_input: bool,
+                           use_10bit: bool, target_crf: int) -> Tuple[List[str], bool]:
+    """
+    构建视频编码器、像素格式与码率控制参数 (单次编码与分段编码共用)。
+    
+    Returns:
+        tuple: (参数列表, 实际是否使用硬件编码)。Mac 下 AV1 会回退到 CPU 编码。
+    """
+    args: List[str] = []
+    # 编码器选择部分
+    if final_hw_encode:
+        if platform.system() == "Darwin":
+            if "H.264" in codec_sel: v_codec = "h264_videotoolbox"
+            elif "H.265" in codec_sel: v_codec = "hevc_videotoolbox"
+            else: v_codec = "libsvtav1"; final_hw_encode = False
+        else:
+            if "H.264" in codec_sel: v_codec = "h264_nvenc"
+            elif "H.265" in codec_sel: v_codec = "hevc_nvenc"
+            else: v_codec = "av1_nvenc"
+        args.extend(["-c:v", v_codec])
+    else:
+        args.extend(["-c:v", "libx264"])
+
+    # 码率控制与像素格式
+    # [PyArchitect Fix] 贯彻 WYSIWYG 原则，直接透传前端已处理好的物理映射值
+    if final_hw_encode and "H.264" in codec_sel and use_10bit: use_10bit = False 
+
+    if final_hw_encode:
+        if platform.system() == "Darwin":
+            # Mac VideoToolbox 质量映射
+            mac_quality = int(100 - (target_crf * 2.2))
+            if mac_quality < 20: mac_quality = 20
+            args.extend(["-q:v", str(mac_quality)])
+            if use_10bit: args.extend(["-pix_fmt", "p010le"])
+            else: args.extend(["-pix_fmt", "yuv420p"])
+        else:
+            # Windows NVENC 质量映射
+            if use_10bit:
+                 if allow_hw_decode_input: args.extend(["-vf", "scale_cuda=format=p010le"])
+                 else: args.extend(["-pix_fmt", "p010le"])
+            else:
+                 if allow_hw_decode_input: args.extend(["-vf", "scale_cuda=format=yuv420p"])
+                 else: args.extend(["-pix_fmt", "yuv420p"])
+            args.extend(["-rc", "vbr", "-cq", str(target_crf), "-b:v", "0"])
+            if "AV1" not in codec_sel: args.extend(["-preset", "p4"])
+    else:
+        # CPU 软解质量映射
+        if use_10bit: args.extend(["-pix_fmt", "yuv420p10le"])
+        else: args.extend(["-pix_fmt", "yuv420p"])
+        args.extend(["-crf", str(target_crf), "-preset", "medium"])
+    return args, final_hw_encode
+
+
+# =========================================================================
+# [Core 2] Segment-Parallel Encoding
+# 功能：关键帧索引 (带磁盘缓存)、分段规划、长任务拆分策略与无损拼接
+# =========================================================================
+
+SEGMENT_MIN_DURATION_SEC = 600.0   # 短于 10 分钟的素材拆分收益不抵开销
+SEGMENT_MIN_LENGTH_SEC = 60.0      # 单段最短时长，避免产生大量碎片
+SEGMENTS_PER_LANE = 2              # 每条通道分配的段数，用于尾部负载均衡
+
+
+class KeyframeIndex:
+    """
+    关键帧时间戳索引。
+    仅解复用 (不解码) 读取视频包的 K 标志，结果按 (真实路径, 大小, mtime) 缓存于内存与磁盘 JSON。
+    """
+    _mem_cache: Dict[Tuple[str, int, int], List[float]] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _fingerprint(src_path: str) -> Tuple[str, int, int]:
+        st = os.stat(src_path)
+        return (os.path.realpath(src_path), st.st_size, st.st_mtime_ns)
+
+    @staticmethod
+    def _cache_file(cache_dir: str, key: Tuple[str, int, int]) -> str:
+        digest = hashlib.sha1(f"{key[0]}|{key[1]}|{key[2]}".encode("utf-8")).hexdigest()
+        return os.path.join(cache_dir, "_kfindex", f"{digest}.json")
+
+    @staticmethod
+    def parse_packets(text: str) -> List[float]:
+        """解析 `packet=pts_time,flags` 的 csv 输出，返回升序去重的关键帧时间"""
+        times: List[float] = []
+        for line in text.splitlines():
+            parts = line.strip().split(",")
+            if len(parts) < 2 or "K" not in parts[1]:
+                continue
+            try:
+                times.append(float(parts[0]))
+            except ValueError:
+                continue  # pts_time 为 N/A
+        return sorted(set(times))
+
+    @classmethod
+    def get(cls, ffprobe_path: str, src_path: str, cache_dir: Optional[str] = None,
+            runner: Optional[Any] = None) -> List[float]:
+        """
+        获取源文件的关键帧列表。
+
+        Args:
+            ffprobe_path (str): ffprobe 可执行文件。
+            src_path (str): 源视频路径。
+            cache_dir (str, optional): 磁盘缓存目录，None 时仅使用内存缓存。
+            runner (ProcessOrchestrator, optional): 提供时经由其事件循环运行 ffprobe。
+
+        Returns:
+            list[float]: 关键帧时间 (秒)；探测失败返回空列表。
+        """
+        try:
+            key = cls._fingerprint(src_path)
+        except OSError:
+            return []
+
+        with cls._lock:
+            if key in cls._mem_cache:
+                return cls._mem_cache[key]
+
+        cache_file = cls._cache_file(cache_dir, key) if cache_dir else None
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    times = [float(t) for t in json.load(f)]
+                with cls._lock:
+                    cls._mem_cache[key] = times
+                return times
+            except (OSError, ValueError, TypeError):
+                pass
+
+        cmd = [ffprobe_path, "-v", "error", "-select_streams", "v:0",
+               "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", src_path]
+        try:
+            if runner is not None:
+                out = runner.run(cmd, timeout=600.0).result()[1]
+            else:
+                out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     timeout=600.0, **get_subprocess_args()).stdout
+        except (subprocess.SubprocessError, OSError):
+            return []
+        times = cls.parse_packets(out.decode("utf-8", errors="replace"))
+
+        with cls._lock:
+            cls._mem_cache[key] = times
+        if cache_file and times:
+            try:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                tmp = cache_file + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(times, f)
+                os.replace(tmp, cache_file)
+            except OSError:
+                pass
+        return times
+
+
+def plan_segments(keyframes: List[float], duration: float, lanes: int) -> List[Tuple[float, float]]:
+    """
+    在关键帧上切分时间轴。
+    目标段数 = lanes * SEGMENTS_PER_LANE (受最短段长约束)，每个切点取最接近理想位置的关键帧。
+
+    Returns:
+        list[(start, end)]: 首段从 0 开始，末段 end 为 duration；无法切分时返回单段。
+    """
+    if duration <= 0 or lanes < 2 or len(keyframes) < 2:
+        return [(0.0, duration)]
+
+    count = min(lanes * SEGMENTS_PER_LANE, int(duration // SEGMENT_MIN_LENGTH_SEC))
+    if count < 2:
+        return [(0.0, duration)]
+
+    cuts: List[float] = []
+    for i in range(1, count):
+        ideal = duration * i / count
+        pos = bisect.bisect_left(keyframes, ideal)
+        nearest = [keyframes[j] for j in (pos - 1, pos) if 0 <= j < len(keyframes)]
+        cut = min(nearest, key=lambda t: abs(t - ideal))
+        prev = cuts[-1] if cuts else 0.0
+        # 丢弃与前一切点过近或越界的关键帧 (GOP 很长的素材常见)
+        if cut - prev >= SEGMENT_MIN_LENGTH_SEC / 2 and duration - cut >= SEGMENT_MIN_LENGTH_SEC / 2:
+            cuts.append(cut)
+
+    bounds = [0.0] + cuts + [duration]
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+
+def should_segment(job_duration: float, remaining_durations: List[float], free_lanes: int) -> bool:
+    """
+    长任务拆分策略：当任务预计时长超过队列中其余所有任务之和 (即它决定了整批的完成时间)，
+    且至少有两条空闲通道时，启用分段并行。
+    """
+    if free_lanes < 2 or job_duration < SEGMENT_MIN_DURATION_SEC:
+        return False
+    return job_duration > sum(remaining_durations)
+
+
+def build_concat_cmd(ffmpeg_path: str, list_file: str, output_file: str,
+                     audio_file: Optional[str] = None, metadata_src: Optional[str] = None) -> List[str]:
+    """
+    构建无损拼接命令：concat demuxer 流复制视频段，并混入单独编码一次的音轨。
+    """
+    cmd = [ffmpeg_path, "-y", "-f", "concat", "-safe", "0", "-i", list_file]
+    if audio_file:
+        cmd.extend(["-i", audio_file])
+    if metadata_src:
+        cmd.extend(["-i", metadata_src])
+    cmd.extend(["-map", "0:v:0"])
+    if audio_file:
+        cmd.extend(["-map", "1:a:0"])
+    if metadata_src:
+        cmd.extend(["-map_metadata", "2" if audio_file else "1"])
+    cmd.extend(["-c", "copy", "-movflags", "+faststart", output_file])
+    return cmd
+
+
+def write_concat_list(list_file: str, segment_files: List[str]) -> None:
+    """写出 concat demuxer 的列表文件 (单引号需按 ffconcat 规则转义)"""
+    with open(list_file, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for path in segment_files:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+
+# =========================================================================
+# [Core 2.5] Tiny-Clip Batching
+# 功能：将大量短片段合并进同一个 FFmpeg 进程 (多输入/多输出)，摊薄进程启动与编码器初始化开销
+# =========================================================================
+
+BATCH_MAX_FILES = 8                # 单个批处理进程的最大文件数
+BATCH_MAX_TOTAL_SEC = 240.0        # 单批总时长上限，保证各成员进度大致同步
+BATCH_STARTUP_SHARE = 0.10         # 启动开销占单任务耗时超过该比例时值得合批
+BATCH_CLIP_SEC_RANGE = (5.0, 60.0) # 阈值的上下限
+BATCH_PROBE_MAX_GB = 1.0           # 仅对该体积以下的文件做时长探测 (候选短片段)
+
+
+def batch_clip_threshold(startup_sec: float, speed: float) -> float:
+    """
+    由实测的启动开销与编码速度推导合批阈值 (素材秒)。
+    素材时长 d 的单任务墙钟耗时 ≈ startup + d / speed，当 startup 占比 ≥ BATCH_STARTUP_SHARE 时合批。
+    """
+    speed = max(speed, 0.1)
+    raw = startup_sec * speed * (1.0 - BATCH_STARTUP_SHARE) / BATCH_STARTUP_SHARE
+    return max(BATCH_CLIP_SEC_RANGE[0], min(BATCH_CLIP_SEC_RANGE[1], raw))
+
+
+def plan_batch(candidates: List[Tuple[Any, float]], threshold: float) -> List[Any]:
+    """
+    从就绪候选 [(key, 探测时长)] 中按顺序挑选一批短片段。
+    时长未知 (<= 0) 或超过阈值的任务不参与；不足 2 个时返回空列表。
+    """
+    picked: List[Any] = []
+    total = 0.0
+    for key, duration in candidates:
+        if duration <= 0 or duration > threshold:
+            continue
+        if total + duration > BATCH_MAX_TOTAL_SEC and picked:
+            break
+        picked.append(key)
+        total += duration
+        if len(picked) >= BATCH_MAX_FILES:
+            break
+    return picked if len(picked) >= 2 else []
+
+
+def build_batch_cmd(ffmpeg_path: str, inputs: List[str], outputs: List[str], hwaccel_args: List[str],
+                    codec_args: List[str], keep_meta: bool) -> List[str]:
+    """
+    构建多输入/多输出的批处理命令：第 i 个输入独立映射到第 i 个输出，音轨可选 (0:a:0?)。
+    -progress 为全局选项，汇报的 out_time 对所有并行输出近似一致。
+    """
+    cmd = [ffmpeg_path, "-y", "-benchmark", "-progress", "pipe:1", "-nostats"]
+    for src in inputs:
+        cmd.extend(hwaccel_args)
+        cmd.extend(["-i", src])
+    for i, dst in enumerate(outputs):
+        cmd.extend(["-map", f"{i}:v:0", "-map", f"{i}:a:0?"])
+        cmd.extend(codec_args)
+        cmd.extend(["-c:a", "aac", "-b:a", "320k"])
+        if keep_meta:
+            cmd.extend(["-map_metadata", str(i)])
+        cmd.append(dst)
+    return cmd
+
+
+def attribute_batch_errors(log_lines: List[str], inputs: List[str], outputs: List[str]) -> Set[int]:
+    """
+    将批处理进程的错误日志归因到具体成员 (返回成员下标)。
+    识别 FFmpeg 6+ 的 `[in#N/...]` / `[out#N/...]` 前缀、`Input #N` 以及日志中出现的文件路径。
+    """
+    pattern = re.compile(r"\b(?:in|out)#(\d+)|Input #(\d+)|Output #(\d+)")
+    error_words = ("error", "invalid", "failed", "could not", "no such file", "corrupt")
+    blamed: Set[int] = set()
+    for line in log_lines:
+        lower = line.lower()
+        if not any(w in lower for w in error_words):
+            continue
+        for m in pattern.finditer(line):
+            idx = int(next(g for g in m.groups() if g is not None))
+            if 0 <= idx < len(inputs):
+                blamed.add(idx)
+        for i, (src, dst) in enumerate(zip(inputs, outputs)):
+            if src in line or dst in line:
+                blamed.add(i)
+    return blamed
+
+# =========================================================================
+# [Core 3] Distributed Encode Agents
+# 功能：基于 TCP 的远程编码节点 (Agent) 与协调端连接池
+# 帧格式：!IQ (头部长度, 负载长度) + JSON 头部 + 二进制负载
+# =========================================================================
+
+PROTOCOL_VERSION = 1
+AGENT_DEFAULT_PORT = 53340
+HEARTBEAT_INTERVAL_SEC = 2.0       # Agent 在任务期间的心跳周期
+HEARTBEAT_TIMEOUT_SEC = 15.0       # 协调端超过该时长未收到任何帧即判定节点失联
+NODE_RETRY_SEC = 30.0              # 失联节点的重新探测间隔
+TRANSFER_CHUNK = 4 * 1024 * 1024   # 源/成品传输分块大小
+MAX_FRAME_HEADER = 64 * 1024       # 单帧 JSON 头部上限 (超出即视为协议错误，防止对端迫使本端分配巨量内存)
+AGENT_SETTING_FLAGS = ("force_cpu_decode", "audio")  # 成品清单键之外，节点接受的布尔开关
+AGENT_TOKEN_ENV = "CINETICO_AGENT_TOKEN"
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+class RemoteNodeLost(Exception):
+    """远程节点心跳超时或连接中断"""
+
+
+def send_frame(sock: Any, header: Dict[str, Any], payload: bytes = b"", token: Optional[str] = None) -> None:
+    """发送一帧 (调用方负责并发写锁)；token 非空时附带在头部，供节点逐帧校验"""
+    if token:
+        header = dict(header, token=token)
+    hdr = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    sock.sendall(struct.pack("!IQ", len(hdr), len(payload)) + hdr + payload)
+
+
+def _recv_exact(sock: Any, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(min(size - len(buf), TRANSFER_CHUNK))
+        if not chunk:
+            raise ConnectionError("peer closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def recv_frame(sock: Any) -> Tuple[Dict[str, Any], bytes]:
+    """接收一帧，返回 (头部, 负载)"""
+    hdr_len, payload_len = struct.unpack("!IQ", _recv_exact(sock, 12))
+    if hdr_len > MAX_FRAME_HEADER or payload_len > TRANSFER_CHUNK:
+        raise ValueError(f"oversized frame ({hdr_len}, {payload_len})")
+    header = json.loads(_recv_exact(sock, hdr_len).decode("utf-8"))
+    payload = _recv_exact(sock, payload_len) if payload_len else b""
+    return header, payload
+
+
+def resolve_ffmpeg_binaries(base_dir: Optional[str] = None) -> Tuple[str, str]:
+    """
+    定位 ffmpeg / ffprobe (不触发下载)：优先使用脚本旁的 bin 目录，其次使用 PATH。
+    """
+    base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+    exe = ".exe" if platform.system() == "Windows" else ""
+    local_ffmpeg = os.path.join(base_dir, "bin", f"ffmpeg{exe}")
+    if os.path.exists(local_ffmpeg):
+        return local_ffmpeg, os.path.join(base_dir, "bin", f"ffprobe{exe}")
+    return "ffmpeg", "ffprobe"
+
+
+def validate_agent_settings(settings: Any) -> Dict[str, Any]:
+    """
+    远程任务设置：成品清单键 (校验规则同 validate_job_settings) 加 AGENT_SETTING_FLAGS 中的布尔开关。
+    其余键一律拒绝 —— 节点从不把对端提供的原始参数放进 FFmpeg 命令行。
+    """
+    if settings is None:
+        return {}
+    if not isinstance(settings, dict):
+        raise ValueError("settings must be an object")
+    flags = {k: settings[k] for k in AGENT_SETTING_FLAGS if k in settings}
+    for key, value in flags.items():
+        if not isinstance(value, bool):
+            raise ValueError(f"{key} must be a boolean")
+    clean = validate_job_settings({k: v for k, v in settings.items() if k not in AGENT_SETTING_FLAGS})
+    clean.update(flags)
+    return clean
+
+
+def cpu_fallback_crf(gpu_cq: int) -> int:
+    """GPU 任务回退 CPU 编码时按 UI 约定 (GPU CQ = CPU CRF + 5) 换算画质值，保持画质一致"""
+    return max(16, int(gpu_cq) - 5)
+
+
+def settings_encode_args(settings: Dict[str, Any], hw_route: Optional[str]) -> Tuple[List[str], List[str]]:
+    """
+    把任务设置映射为 (硬件解码参数, 视频编码参数)。
+    本机不具备硬件编码能力 (或失败降级为 cpu_encode) 时回退 CPU，并换算画质值 (cpu_fallback_crf)。
+    """
+    use_gpu = bool(settings.get("gpu")) and hw_route is not None and not settings.get("force_cpu_encode", False)
+    crf = int(settings.get("crf", 23))
+    if settings.get("gpu") and not use_gpu:
+        crf = cpu_fallback_crf(crf)
+    allow_hw_decode = use_gpu and not settings.get("force_cpu_decode", False)
+    codec_args, _ = build_video_codec_args(settings.get("codec", "H.264"), use_gpu, allow_hw_decode,
+                                           bool(settings.get("10bit")), crf)
+    return build_hwaccel_args(allow_hw_decode), codec_args
+
+
+def build_agent_cmd(ffmpeg_path: str, input_path: str, output_path: str,
+                    settings: Dict[str, Any], hw_route: Optional[str],
+                    extra_output_args: Optional[List[str]] = None, audio_path: Optional[str] = None) -> List[str]:
+    """
+    按已校验的设置 (validate_agent_settings) 构建完整编码命令。
+    extra_output_args / audio_path 仅供本机调用方 (Headless)，远程节点从不传入：
+    前者追加 -benchmark / -threads；后者表示 input_path 是内存 HTTP 流，音轨改由该文件作为第二输入提供
+    (与 GUI 相同，在不可随机访问的流上同时解复用音视频易缓冲死锁)。
+    """
+    hwaccel_args, codec_args = settings_encode_args(settings, hw_route)
+    cmd = [ffmpeg_path, "-y"] + hwaccel_args
+    if audio_path:
+        cmd.extend(["-probesize", "100M", "-analyzeduration", "100M"])
+    cmd.extend(["-i", input_path])
+    if audio_path:
+        cmd.extend(["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0?"])
+    else:
+        cmd.extend(["-map", "0:v:0", "-map", "0:a:0?"])
+    cmd.extend(codec_args)
+    cmd.extend(extra_output_args or [])
+    if settings.get("audio", True):
+        cmd.extend(["-c:a", "aac", "-b:a", "320k"])
+    if settings.get("keep_meta"):
+        cmd.extend(["-map_metadata", "0"])
+    cmd.extend(["-progress", "pipe:1", "-nostats", output_path])
+    return cmd
+
+
+class EncodeAgent:
+    """
+    远程编码节点。
+    每条 TCP 连接承载一次握手或一个任务，协调端按节点槽位数建立多条连接实现并发。
+    源文件位于 shared_roots 之内 (且大小一致) 时直接读取，否则要求协调端推送字节流；成品始终以字节流回传。
+    默认只监听回环地址；监听其他地址时必须配置共享密钥，每一帧都会校验。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = AGENT_DEFAULT_PORT,
+                 work_dir: Optional[str] = None, slots: Optional[int] = None,
+                 ffmpeg_path: Optional[str] = None, token: Optional[str] = None,
+                 shared_roots: Optional[List[str]] = None) -> None:
+        self.token = token if token is not None else os.environ.get(AGENT_TOKEN_ENV) or None
+        if not self.token and host not in LOOPBACK_HOSTS:
+            raise ValueError(f"listening on {host} requires a shared token ({AGENT_TOKEN_ENV} or --token)")
+        self.shared_roots = [os.path.realpath(r) for r in (shared_roots or [])]
+        self.host, self.port = host, port
+        self.ffmpeg_path = ffmpeg_path or resolve_ffmpeg_binaries()[0]
+        facts = HardwareProbe.snapshot(self.ffmpeg_path)
+        self.hw_route = facts["hw_encode"]
+        self.slots = slots or facts["rec_slots"]
+        self.cpu_count = facts["cpu_count"]
+        self.work_dir = work_dir or os.path.join(tempfile.gettempdir(), "cinetico_agent")
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.server = None
+
+    def serve_forever(self) -> None:
+        agent = self
+
+        class _Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                agent._handle_connection(self.request)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((self.host, self.port), _Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        print(f"[Agent] listening on {self.host}:{self.port} | slots={self.slots} | hw={self.hw_route or 'cpu'}", flush=True)
+        self.server.serve_forever()
+
+    def _recv(self, sock: Any) -> Tuple[Dict[str, Any], bytes]:
+        """接收一帧并校验共享密钥 (未配置密钥时仅允许回环监听，见 __init__)"""
+        header, payload = recv_frame(sock)
+        if self.token:
+            if not hmac.compare_digest(str(header.get("token", "")), self.token):
+                raise PermissionError("bad agent token")
+        return header, payload
+
+    def _shared_source(self, spec: Dict[str, Any]) -> Optional[str]:
+        """协调端声明的共享路径：仅当其真实路径位于 shared_roots 之内且大小一致时原地读取"""
+        src = spec.get("path")
+        if not isinstance(src, str) or not src or not self.shared_roots:
+            return None
+        try:
+            real = os.path.realpath(src)
+            if not any(os.path.commonpath([real, root]) == root for root in self.shared_roots):
+                return None  # commonpath 在不同盘符间抛出 ValueError，同样视为越界
+            return real if os.path.isfile(real) and os.path.getsize(real) == spec.get("size") else None
+        except (OSError, ValueError):
+            return None
+
+    def _handle_connection(self, sock: Any) -> None:
+        try:
+            while True:
+                header, _ = self._recv(sock)
+                kind = header.get("type")
+                if kind == "hello":
+                    send_frame(sock, {"type": "hello", "version": PROTOCOL_VERSION, "node": platform.node(),
+                                      "slots": self.slots, "cpu_count": self.cpu_count, "hw_encode": self.hw_route})
+                elif kind == "ping":
+                    send_frame(sock, {"type": "pong"})
+                elif kind == "job":
+                    self._run_job(sock, header)
+                    return  # 任务期间已有取消监听线程在读该连接，不可复用
+                else:
+                    send_frame(sock, {"type": "error", "message": f"unknown frame {kind}"})
+        except PermissionError:
+            try: send_frame(sock, {"type": "error", "message": "unauthorised"})
+            except OSError: pass
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            try: sock.close()
+            except OSError: pass
+
+    def _receive_source(self, sock: Any, dst: str) -> None:
+        with open(dst, "wb") as f:
+            while True:
+                header, payload = self._recv(sock)
+                if header.get("type") == "chunk":
+                    f.write(payload)
+                elif header.get("type") == "eof":
+                    return
+                else:
+                    raise ConnectionError(f"unexpected frame during upload: {header.get('type')}")
+
+    def _run_job(self, sock: Any, job: Dict[str, Any]) -> None:
+        job_id = str(job.get("job_id") or uuid.uuid4().hex)
+        try:
+            settings = validate_agent_settings(job.get("settings"))
+        except ValueError as e:
+            send_frame(sock, {"type": "error", "job_id": job_id, "message": str(e)})
+            return
+        spec = job.get("input") if isinstance(job.get("input"), dict) else {}
+        src = self._shared_source(spec)
+        tmp_src = None
+        if src is None:
+            ext = spec.get("ext", "")
+            ext = ext if isinstance(ext, str) and re.fullmatch(r"\.[A-Za-z0-9]{1,8}", ext) else ""  # 只进入临时文件名，不允许路径字符
+            tmp_src = os.path.join(self.work_dir, f"SRC_{uuid.uuid4().hex}{ext}")
+            send_frame(sock, {"type": "need_bytes", "job_id": job_id})
+            try:
+                self._receive_source(sock, tmp_src)
+            except BaseException:
+                if os.path.exists(tmp_src): os.remove(tmp_src)
+                raise
+            src = tmp_src
+        else:
+            send_frame(sock, {"type": "accepted", "job_id": job_id})
+
+        out_file = os.path.join(self.work_dir, f"OUT_{uuid.uuid4().hex}.mp4")
+        cmd = build_agent_cmd(self.ffmpeg_path, src, out_file, settings, self.hw_route)
+        send_lock = threading.Lock()
+        done = threading.Event()
+        log_tail: List[str] = []
+        proc = None
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                    encoding="utf-8", errors="replace", bufsize=1, **get_subprocess_args())
+
+            def heartbeat() -> None:
+                while not done.wait(HEARTBEAT_INTERVAL_SEC):
+                    try:
+                        with send_lock: send_frame(sock, {"type": "heartbeat", "job_id": job_id})
+                    except OSError:
+                        done.set()
+                        break
+
+            def watch_cancel() -> None:
+                # 任务期间协调端只会发送 cancel；连接断开同样视为取消
+                try:
+                    while not done.is_set():
+                        header, _ = self._recv(sock)
+                        if header.get("type") == "cancel": break
+                except (ConnectionError, OSError, ValueError):  # 含 PermissionError：未授权帧同样视为取消
+                    pass
+                if not done.is_set() and proc.poll() is None:
+                    proc.kill()
+
+            threading.Thread(target=heartbeat, daemon=True).start()
+            threading.Thread(target=watch_cancel, daemon=True).start()
+
+            progress: Dict[str, str] = {}
+            last_sent = 0.0
+            for line in proc.stdout:
+                line = line.strip()
+                if not line: continue
+                key, sep, value = line.partition("=")
+                if not sep or " " in key:
+                    log_tail.append(line)
+                    del log_tail[:-30]
+                    continue
+                progress[key] = value
+                if key == "progress" and time.time() - last_sent > 0.5:
+                    last_sent = time.time()
+                    with send_lock:
+                        send_frame(sock, {"type": "progress", "job_id": job_id,
+                                          "out_time_us": progress.get("out_time_us", "0"),
+                                          "fps": progress.get("fps", "0"),
+                                          "total_size": progress.get("total_size", "0")})
+            proc.wait()
+        finally:
+            done.set()
+            if proc is not None and proc.poll() is None:
+                proc.kill()
+
+        try:
+            rc = proc.returncode if proc is not None else -1
+            size = os.path.getsize(out_file) if rc == 0 and os.path.exists(out_file) else 0
+            with send_lock:
+                send_frame(sock, {"type": "result", "job_id": job_id, "returncode": rc,
+                                  "size": size, "log_tail": log_tail})
+                if rc == 0:
+                    with open(out_file, "rb") as f:
+                        while True:
+                            chunk = f.read(TRANSFER_CHUNK)
+                            if not chunk: break
+                            send_frame(sock, {"type": "chunk"}, chunk)
+                    send_frame(sock, {"type": "eof"})
+        finally:
+            for path in (out_file, tmp_src):
+                if path and os.path.exists(path):
+                    try: os.remove(path)
+                    except OSError: pass
+
+
+class RemoteNode:
+    """协调端视角下的一个远程节点 (含槽位占用与吞吐量权重)"""
+
+    def __init__(self, host: str, port: int, token: Optional[str] = None) -> None:
+        self.host, self.port = host, port
+        self.token = token       # 节点共享密钥，随每一帧发送
+        self.name = f"{host}:{port}"
+        self.slots = 0
+        self.busy = 0
+        self.alive = False
+        self.retry_at = 0.0
+        self.throughput = 1.0   # 媒体秒 / 墙钟秒 的指数滑动平均，初始按实时速度估计
+        self.hw_encode: Optional[str] = None
+
+    def probe(self) -> bool:
+        """握手并读取节点能力；失败时标记失联并安排重试"""
+        try:
+            with socket.create_connection((self.host, self.port), timeout=5.0) as sock:
+                send_frame(sock, {"type": "hello", "version": PROTOCOL_VERSION}, token=self.token)
+                header, _ = recv_frame(sock)
+            if header.get("type") != "hello":
+                raise ConnectionError(header.get("message", "handshake rejected"))
+            self.slots = int(header.get("slots", 1))
+            self.hw_encode = header.get("hw_encode")
+            self.name = f"{header.get('node', self.host)}@{self.host}:{self.port}"
+            self.alive = True
+        except (OSError, ValueError, ConnectionError):
+            self.alive = False
+            self.retry_at = time.time() + NODE_RETRY_SEC
+        return self.alive
+
+    def record_throughput(self, media_sec: float, wall_sec: float) -> None:
+        if media_sec > 0 and wall_sec > 0:
+            self.throughput = 0.7 * self.throughput + 0.3 * (media_sec / wall_sec)
+
+
+class RemoteNodePool:
+    """
+    远程节点池。
+    配置来源：环境变量 CINETICO_AGENTS="host:port,host:port"，共享密钥取自 CINETICO_AGENT_TOKEN。
+    分配时在有空闲槽位的存活节点中选择吞吐量权重最高者；失联节点由后台线程定期重新探测。
+    """
+
+    def __init__(self, nodes: Optional[List[RemoteNode]] = None) -> None:
+        self.nodes: List[RemoteNode] = nodes or []
+        self.lock = threading.Lock()
+        self._retry_thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, value: Optional[str] = None) -> "RemoteNodePool":
+        value = os.environ.get("CINETICO_AGENTS", "") if value is None else value
+        token = os.environ.get(AGENT_TOKEN_ENV) or None
+        nodes = []
+        for item in value.replace(";", ",").split(","):
+            item = item.strip()
+            if not item: continue
+            host, _, port = item.rpartition(":")
+            if not host:
+                host, port = item, str(AGENT_DEFAULT_PORT)
+            try:
+                nodes.append(RemoteNode(host, int(port), token))
+            except ValueError:
+                print(f"[Agents] 忽略无效节点配置: {item}")
+        return cls(nodes)
+
+    def start(self) -> None:
+        """首轮探测全部节点，并启动失联节点的重试线程"""
+        for node in self.nodes:
+            node.probe()
+        if self.nodes and self._retry_thread is None:
+            self._retry_thread = threading.Thread(target=self._retry_loop, daemon=True)
+            self._retry_thread.start()
+
+    def _retry_loop(self) -> None:
+        while True:
+            time.sleep(5.0)
+            for node in self.nodes:
+                if not node.alive and time.time() >= node.retry_at:
+                    node.probe()
+
+    def free_slots(self) -> int:
+        with self.lock:
+            return sum(max(0, n.slots - n.busy) for n in self.nodes if n.alive)
+
+    def acquire(self) -> Optional[RemoteNode]:
+        with self.lock:
+            candidates = [n for n in self.nodes if n.alive and n.busy < n.slots]
+            if not candidates: return None
+            node = max(candidates, key=lambda n: n.throughput)
+            node.busy += 1
+            return node
+
+    def release(self, node: RemoteNode, lost: bool = False) -> None:
+        with self.lock:
+            node.busy = max(0, node.busy - 1)
+            if lost:
+                node.alive = False
+                node.retry_at = time.time() + NODE_RETRY_SEC
+
+
+def run_remote_job(node: RemoteNode, src_path: str, out_path: str, settings: Dict[str, Any],
+                   duration: float, on_progress: Optional[Any] = None,
+                   should_stop: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    在远程节点上执行一次完整编码，并把成品写回 out_path。
+
+    Args:
+        on_progress: 回调 (out_time_sec, fps, total_size_bytes)。
+        should_stop: 返回 True 时向节点发送 cancel。
+
+    Returns:
+        dict: {"returncode", "log_tail", "wall_sec"}
+
+    Raises:
+        RemoteNodeLost: 超过 HEARTBEAT_TIMEOUT_SEC 未收到任何帧或连接中断。
+    """
+    start_t = time.time()
+    job_id = uuid.uuid4().hex
+    try:
+        sock = socket.create_connection((node.host, node.port), timeout=HEARTBEAT_TIMEOUT_SEC)
+    except OSError as e:
+        raise RemoteNodeLost(str(e))
+    try:
+        sock.settimeout(HEARTBEAT_TIMEOUT_SEC)
+        send_frame(sock, {"type": "job", "job_id": job_id, "settings": settings, "duration": duration,
+                          "input": {"path": os.path.abspath(src_path), "size": os.path.getsize(src_path),
+                                    "ext": os.path.splitext(src_path)[1]}}, token=node.token)
+        header, _ = recv_frame(sock)
+        if header.get("type") == "error":  # 节点拒绝了任务 (设置无效或密钥不符)：按编码失败处理，不判为失联
+            return {"returncode": -1, "log_tail": [f"[Agent] {header.get('message', 'rejected')}"], "wall_sec": time.time() - start_t}
+        if header.get("type") == "need_bytes":
+            with open(src_path, "rb") as f:
+                while True:
+                    if should_stop and should_stop():
+                        raise InterruptedError("cancelled during upload")
+                    chunk = f.read(TRANSFER_CHUNK)
+                    if not chunk: break
+                    send_frame(sock, {"type": "chunk"}, chunk, token=node.token)
+            send_frame(sock, {"type": "eof"}, token=node.token)
+        elif header.get("type") != "accepted":
+            raise RemoteNodeLost(f"unexpected reply {header.get('type')}")
+
+        cancelled = False
+        while True:
+            if should_stop and should_stop() and not cancelled:
+                send_frame(sock, {"type": "cancel"}, token=node.token)
+                cancelled = True
+            header, payload = recv_frame(sock)
+            kind = header.get("type")
+            if kind == "progress" and on_progress:
+                try:
+                    on_progress(int(header.get("out_time_us", 0)) / 1000000.0,
+                                float(header.get("fps", 0) or 0),
+                                int(str(header.get("total_size", "0")).replace("N/A", "0") or 0))
+                except ValueError:
+                    pass
+            elif kind == "result":
+                rc = int(header.get("returncode", -1))
+                if rc == 0:
+                    tmp = out_path + ".part"
+                    with open(tmp, "wb") as f:
+                        while True:
+                            chunk_hdr, chunk = recv_frame(sock)
+                            if chunk_hdr.get("type") == "eof": break
+                            f.write(chunk)
+                    os.replace(tmp, out_path)
+                    node.record_throughput(duration, time.time() - start_t)
+                return {"returncode": rc, "log_tail": header.get("log_tail", []), "wall_sec": time.time() - start_t}
+    except InterruptedError:
+        return {"returncode": -1, "log_tail": ["cancelled"], "wall_sec": time.time() - start_t}
+    except (socket.timeout, ConnectionError, OSError, ValueError) as e:
+        raise RemoteNodeLost(f"{node.name}: {e}")
+    finally:
+        try: sock.close()
+        except OSError: pass
+
+
+def agent_main(argv: Optional[List[str]] = None) -> int:
+    """Agent 模式入口：python Cinetico_Encoder.py --agent [--host H --token T] [--port N] [--slots N] [--work-dir DIR] [--shared-root DIR]"""
+    parser = argparse.ArgumentParser(prog="Cinetico_Encoder.py --agent", description="Cinético remote encode agent")
+    parser.add_argument("--agent", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址；非回环地址必须同时提供共享密钥")
+    parser.add_argument("--token", default=None, help=f"共享密钥 (默认读取 {AGENT_TOKEN_ENV})")
+    parser.add_argument("--shared-root", action="append", default=[],
+                        help="允许原地读取共享路径源文件的根目录 (可重复)；未配置时源文件一律经 TCP 推送")
+    parser.add_argument("--port", type=int, default=AGENT_DEFAULT_PORT)
+    parser.add_argument("--slots", type=int, default=None, help="并发槽位 (默认按硬件推导)")
+    parser.add_argument("--work-dir", default=None)
+    parser.add_argument("--ffmpeg", default=None)
+    args = parser.parse_args(argv)
+    try:
+        agent = EncodeAgent(args.host, args.port, args.work_dir, args.slots, args.ffmpeg, args.token, args.shared_root)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        agent.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+# =========================================================================
+# [Core 4] Crash-Safe Job Journal
+# 功能：SQLite (WAL) 预写式任务日志，记录入队、状态迁移与产出，崩溃/强退后恢复队列
+# 写入由后台线程批量提交，调用方只做入队操作，不阻塞调度与 UI
+# =========================================================================
+
+JOURNAL_FLUSH_SEC = 0.5            # 批量提交周期
+JOURNAL_BATCH_MAX = 500            # 单次事务最多合并的写操作数
+ORPHAN_PREFIXES = ("TEMP_ENC_", "TEMP_AUDIO_", "TEMP_SEG_", "CACHE_")
+
+
+def default_journal_path() -> str:
+    """任务日志默认位置：~/.cinetico/journal.db"""
+    return os.path.join(os.path.expanduser("~"), ".cinetico", "journal.db")
+
+
+def clean_orphan_temp_files(cache_dir: str) -> int:
+    """
+    清理上次异常退出遗留的临时产物 (TEMP_ENC_* / TEMP_AUDIO_* / TEMP_SEG_* / CACHE_*)。
+    必须在本进程开始编码之前调用；返回清理的条目数。
+    """
+    removed = 0
+    try:
+        entries = list(os.scandir(cache_dir))
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.name.startswith(ORPHAN_PREFIXES):
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+class JobJournal:
+    """
+    预写式任务日志。
+    jobs 表以源路径为主键保存 (入队序号, 状态码, 输出路径)；meta 表保存缓存目录等运行期信息。
+    所有写操作先进入内存队列，由后台线程每 JOURNAL_FLUSH_SEC 合并为一个事务提交。
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or default_journal_path()
+        self._ops: "queue.Queue[Optional[Tuple[str, tuple]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._seq = 0
+        self.available = True
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = self._connect()
+            conn.execute("CREATE TABLE IF NOT EXISTS jobs (path TEXT PRIMARY KEY, seq INTEGER, "
+                         "state INTEGER, output TEXT, updated REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.commit()
+            row = conn.execute("SELECT MAX(seq) FROM jobs").fetchone()
+            self._seq = (row[0] or 0) if row else 0
+            conn.close()
+        except Exception as e:
+            # 日志不可用 (只读目录/损坏) 时降级为空操作，不影响编码主流程
+            print(f"[Journal] disabled: {e}")
+            self.available = False
+
+    def _connect(self) -> Any:
+        conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # --- 读取 (启动阶段同步调用) ---
+
+    def load(self) -> List[Tuple[str, int, Optional[str]]]:
+        """按入队顺序返回 [(源路径, 状态码, 输出路径)]"""
+        if not self.available:
+            return []
+        try:
+            conn = self._connect()
+            rows = conn.execute("SELECT path, state, output FROM jobs ORDER BY seq").fetchall()
+            conn.close()
+            return [(r[0], int(r[1]), r[2]) for r in rows]
+        except Exception as e:
+            print(f"[Journal] load failed: {e}")
+            return []
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        if not self.available:
+            return default
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+            conn.close()
+            return row[0] if row else default
+        except Exception:
+            return default
+
+    # --- 写入 (任意线程，非阻塞) ---
+
+    def start(self) -> None:
+        if not self.available or self._thread:
+            return
+        self._thread = threading.Thread(target=self._writer_loop, name="JobJournal", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, path: str) -> None:
+        self._seq += 1
+        self._ops.put(("enqueue", (path, self._seq)))
+
+    def set_state(self, path: str, state: int) -> None:
+        self._ops.put(("state", (path, state)))
+
+    def set_output(self, path: str, output: str) -> None:
+        self._ops.put(("output", (path, output)))
+
+    def forget(self, path: str) -> None:
+        self._ops.put(("forget", (path,)))
+
+    def clear(self) -> None:
+        self._ops.put(("clear", ()))
+
+    def set_meta(self, key: str, value: str) -> None:
+        self._ops.put(("meta", (key, value)))
+
+    def close(self, timeout: float = 2.0) -> None:
+        """提交剩余写操作并停止后台线程 (退出前调用)"""
+        if self._thread and self._thread.is_alive():
+            self._ops.put(None)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _writer_loop(self) -> None:
+        conn = self._connect()
+        running = True
+        while running:
+            try:
+                first = self._ops.get(timeout=JOURNAL_FLUSH_SEC)
+            except queue.Empty:
+                continue
+            batch = [first]
+            time.sleep(0.05)  # 短暂聚合同一时刻的状态风暴 (如整批入队)
+            while len(batch) < JOURNAL_BATCH_MAX:
+                try:
+                    batch.append(self._ops.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [op for op in batch if op is not None]
+            try:
+                self._apply(conn, batch)
+            except Exception as e:
+                print(f"[Journal] write failed: {e}")
+        conn.close()
+
+    @staticmethod
+    def _apply(conn: Any, batch: List[Tuple[str, tuple]]) -> None:
+        now = time.time()
+        with conn:
+            for kind, args in batch:
+                if kind == "enqueue":
+                    conn.execute("INSERT INTO jobs (path, seq, state, output, updated) VALUES (?, ?, 0, NULL, ?) "
+                                 "ON CONFLICT(path) DO UPDATE SET seq=excluded.seq, state=0, output=NULL, updated=excluded.updated",
+                                 (args[0], args[1], now))
+                elif kind == "state":
+                    conn.execute("UPDATE jobs SET state=?, updated=? WHERE path=?", (args[1], now, args[0]))
+                elif kind == "output":
+                    conn.execute("UPDATE jobs SET output=?, updated=? WHERE path=?", (args[1], now, args[0]))
+                elif kind == "forget":
+                    conn.execute("DELETE FROM jobs WHERE path=?", args)
+                elif kind == "clear":
+                    conn.execute("DELETE FROM jobs")
+                elif kind == "meta":
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", args)
+
+# =========================================================================
+# [Core 5] Output Manifest
+# 功能：按 (源文件指纹, 编码设置哈希) 记录已产出的成品，重复拖入时直接判定完成
+# 指纹 = 大小 + mtime + 抽样哈希；查询先按大小/mtime 命中候选，仅对候选读取抽样内容
+# =========================================================================
+
+FINGERPRINT_SAMPLE_BYTES = 64 * 1024   # 每个采样点读取的字节数
+FINGERPRINT_SAMPLES = 3                # 采样点数量 (头/中/尾)
+MANIFEST_SETTING_KEYS = ("codec", "crf", "10bit", "gpu", "keep_meta")
+
+
+def sampled_hash(path: str) -> str:
+    """对文件头/中/尾抽样计算 BLAKE2b 摘要 (大文件只读取约 192KB)"""
+    h = hashlib.blake2b(digest_size=16)
+    size = os.path.getsize(path)
+    h.update(str(size).encode())
+    with open(path, "rb") as f:
+        if size <= FINGERPRINT_SAMPLE_BYTES * FINGERPRINT_SAMPLES:
+            h.update(f.read())
+        else:
+            step = (size - FINGERPRINT_SAMPLE_BYTES) // (FINGERPRINT_SAMPLES - 1)
+            for i in range(FINGERPRINT_SAMPLES):
+                f.seek(i * step)
+                h.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+    return h.hexdigest()
+
+
+def settings_hash(settings: Dict[str, Any]) -> str:
+    """归一化编码设置 (仅影响产物的字段) 后取摘要"""
+    norm = {k: settings.get(k) for k in MANIFEST_SETTING_KEYS}
+    norm["crf"] = int(norm["crf"]) if norm["crf"] is not None else None
+    norm["10bit"] = bool(norm["10bit"])
+    norm["gpu"] = bool(norm["gpu"])
+    norm["keep_meta"] = bool(norm["keep_meta"])
+    return hashlib.sha1(json.dumps(norm, sort_keys=True).encode()).hexdigest()
+
+
+def default_manifest_path() -> str:
+    """输出清单默认位置：~/.cinetico/manifest.db (与任务日志分离，清空队列不影响清单)"""
+    return os.path.join(os.path.expanduser("~"), ".cinetico", "manifest.db")
+
+
+class OutputManifest:
+    """
+    成品清单。记录源文件指纹 + 设置哈希 → 输出路径及其校验值。
+    读写均为短事务，可在任意工作线程调用；清单不可用时所有查询返回未命中。
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or default_manifest_path()
+        self._lock = threading.Lock()
+        self.available = True
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            with self._lock:
+                conn = self._connect()
+                conn.execute("CREATE TABLE IF NOT EXISTS outputs (size INTEGER, mtime_ns INTEGER, src_hash TEXT, "
+                             "settings TEXT, output TEXT, out_size INTEGER, out_hash TEXT, created REAL, "
+                             "PRIMARY KEY (src_hash, settings))")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_outputs_stat ON outputs (size, mtime_ns, settings)")
+                conn.commit()
+                conn.close()
+        except Exception as e:
+            print(f"[Manifest] disabled: {e}", file=sys.stderr)
+            self.available = False
+
+    def _connect(self) -> Any:
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def lookup(self, src_path: str, settings: Dict[str, Any]) -> Optional[str]:
+        """
+        返回与源文件指纹及设置一致、且成品仍完好的输出路径；未命中返回 None。
+        大小/mtime 不匹配时无需读取源文件内容。
+        """
+        if not self.available:
+            return None
+        try:
+            st = os.stat(src_path)
+            with self._lock:
+                conn = self._connect()
+                rows = conn.execute("SELECT src_hash, output, out_size, out_hash FROM outputs "
+                                    "WHERE size=? AND mtime_ns=? AND settings=?",
+                                    (st.st_size, st.st_mtime_ns, settings_hash(settings))).fetchall()
+                conn.close()
+            if not rows:
+                return None
+            src_hash = sampled_hash(src_path)
+            for row_hash, output, out_size, out_hash in rows:
+                if row_hash != src_hash or not os.path.isfile(output):
+                    continue
+                if os.path.getsize(output) == out_size and sampled_hash(output) == out_hash:
+                    return output
+        except Exception as e:
+            print(f"[Manifest] lookup failed: {e}", file=sys.stderr)
+        return None
+
+    def record(self, src_path: str, settings: Dict[str, Any], output_path: str) -> None:
+        """登记一次成功产出 (同一源与设置的旧记录被覆盖)"""
+        if not self.available:
+            return
+        try:
+            st = os.stat(src_path)
+            row = (st.st_size, st.st_mtime_ns, sampled_hash(src_path), settings_hash(settings), output_path,
+                   os.path.getsize(output_path), sampled_hash(output_path), time.time())
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+                conn.close()
+        except Exception as e:
+            print(f"[Manifest] record failed: {e}", file=sys.stderr)
+
+# =========================================================================
+# [Core 6] Process Group Control & Resource Governor
+# 功能：每个编码子进程独立成组，支持暂停/恢复/优雅停止；只操作本程序创建的进程
+# 资源调度器在内存或温度告急时挂起最低优先级的编码任务，而不是让系统进入交换
+# =========================================================================
+
+GRACEFUL_STOP_TIMEOUT_SEC = 5.0    # 发送 'q' 后等待 FFmpeg 封装收尾的时长
+GOVERNOR_INTERVAL_SEC = 2.0        # 资源采样周期
+
+
+def process_group_kwargs() -> Dict[str, Any]:
+    """子进程启动参数：在 get_subprocess_args 基础上让每个子进程成为独立进程组的组长"""
+    kwargs = get_subprocess_args()
+    if platform.system() == "Windows":
+        kwargs["creationflags"] = kwargs.get("creationflags", 0) | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    return kwargs
+
+
+def _win_process_call(pid: int, func_name: str) -> bool:
+    """调用 ntdll 的 NtSuspendProcess / NtResumeProcess (Windows 无 SIGSTOP)"""
+    PROCESS_SUSPEND_RESUME = 0x0800
+    handle = ctypes.windll.kernel32.OpenProcess(PROCESS_SUSPEND_RESUME, False, pid)
+    if not handle:
+        return False
+    try:
+        return getattr(ctypes.windll.ntdll, func_name)(handle) == 0
+    finally:
+        ctypes.windll.kernel32.CloseHandle(handle)
+
+
+def suspend_process(proc: Any) -> bool:
+    """挂起子进程所在的进程组 (POSIX: SIGSTOP；Windows: NtSuspendProcess)"""
+    if proc.poll() is not None:
+        return False
+    try:
+        if platform.system() == "Windows":
+            return _win_process_call(proc.pid, "NtSuspendProcess")
+        os.killpg(proc.pid, signal.SIGSTOP)
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+def resume_process(proc: Any) -> bool:
+    """恢复被挂起的进程组"""
+    if proc.poll() is not None:
+        return False
+    try:
+        if platform.system() == "Windows":
+            return _win_process_call(proc.pid, "NtResumeProcess")
+        os.killpg(proc.pid, signal.SIGCONT)
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+def kill_process_group(proc: Any) -> None:
+    """强制结束子进程及其进程组 (不会波及本程序以外的 FFmpeg)"""
+    if proc.poll() is not None:
+        return
+    try:
+        if platform.system() == "Windows":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, check=False, **get_subprocess_args())
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    try:
+        proc.kill()
+    except OSError:
+        pass
+
+
+def graceful_stop(proc: Any, timeout: float = GRACEFUL_STOP_TIMEOUT_SEC) -> None:
+    """
+    优雅停止：先恢复 (被挂起的进程无法读取 stdin)，再向 stdin 写入 'q' 让 FFmpeg 正常封装已编码部分，
+    超时未退出则强制结束进程组。会阻塞至多 timeout 秒，应在后台线程调用。
+    """
+    if proc.poll() is not None:
+        return
+    resume_process(proc)
+    try:
+        if hasattr(proc, "request_quit"):
+            proc.request_quit()  # 编排器托管的进程由事件循环写入 stdin
+        elif proc.stdin:
+            proc.stdin.write("q" if isinstance(proc.stdin, io.TextIOBase) else b"q")
+            proc.stdin.flush()
+    except (OSError, ValueError):
+        pass
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill_process_group(proc)
+        try:
+            proc.wait(timeout=1.0)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+def read_memory_status() -> Optional[Tuple[float, float]]:
+    """返回 (可用内存 GB, 物理内存总量 GB)；无法读取时返回 None"""
+    try:
+        if platform.system() == "Windows":
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+            stat = MEMORYSTATUSEX()
+            stat.dwLength = ctypes.sizeof(stat)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(stat))
+            return stat.ullAvailPhys / (1024 ** 3), stat.ullTotalPhys / (1024 ** 3)
+        info: Dict[str, int] = {}
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("MemTotal", "MemAvailable"):
+                    info[key] = int(rest.split()[0])
+        if len(info) == 2:
+            return info["MemAvailable"] / (1024 ** 2), info["MemTotal"] / (1024 ** 2)
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def read_cpu_temperature() -> Optional[float]:
+    """读取 CPU 封装温度 (°C，取各 thermal zone 最大值)；仅 Linux 可用，其余平台返回 None"""
+    temps = []
+    for zone in glob.glob("/sys/class/thermal/thermal_zone*"):
+        zone_type = HardwareProbe._read_first_line(os.path.join(zone, "type")) or ""
+        if not any(k in zone_type.lower() for k in ("cpu", "pkg", "x86", "soc", "core")):
+            continue
+        raw = HardwareProbe._read_first_line(os.path.join(zone, "temp"))
+        try:
+            temps.append(int(raw) / 1000.0)
+        except (TypeError, ValueError):
+            continue
+    return max(temps) if temps else None
+
+
+class ResourceGovernor:
+    """
+    内存/温度调度策略 (带滞回区间，避免频繁挂起与恢复)。
+    decide() 返回 "suspend" / "resume" / None，由调用方对具体任务执行动作。
+    """
+
+    def __init__(self, mem_low_ratio: float = 0.08, mem_resume_ratio: float = 0.15,
+                 temp_high: float = 92.0, temp_resume: float = 82.0, cooldown_sec: float = 6.0):
+        self.mem_low_ratio = mem_low_ratio
+        self.mem_resume_ratio = mem_resume_ratio
+        self.temp_high = temp_high
+        self.temp_resume = temp_resume
+        self.cooldown_sec = cooldown_sec
+        self._last_action = 0.0
+        self.reason = ""
+
+    def decide(self, memory: Optional[Tuple[float, float]], temperature: Optional[float],
+               running: int, suspended: int, now: float) -> Optional[str]:
+        if now - self._last_action < self.cooldown_sec:
+            return None
+        mem_ratio = memory[0] / memory[1] if memory and memory[1] > 0 else 1.0
+        if running > 1 and (mem_ratio < self.mem_low_ratio or (temperature or 0) >= self.temp_high):
+            self.reason = f"mem {mem_ratio:.0%}" if mem_ratio < self.mem_low_ratio else f"temp {temperature:.0f}°C"
+            self._last_action = now
+            return "suspend"
+        if suspended and mem_ratio >= self.mem_resume_ratio and (temperature or 0) < self.temp_resume:
+            self.reason = ""
+            self._last_action = now
+            return "resume"
+        return None
+
+# =========================================================================
+# [Core 7] Stall Supervision
+# 功能：按 out_time_us 是否推进判定 FFmpeg 卡死 (解码器挂起/HTTP 流断流等)，
+# 结束卡死进程组并给出逐级降级的重试方案
+# =========================================================================
+
+STALL_WINDOW_SEC = float(os.environ.get("CINETICO_STALL_SEC", "60"))  # 进度停滞判定窗口
+STALL_STARTUP_FACTOR = 2.0         # 首个进度出现前的宽限倍数 (探测大缓冲需要时间)
+STALL_MAX_RETRIES = 3              # 单任务因停滞重试的上限
+
+
+class StallSupervisor:
+    """
+    停滞监督线程。工作线程在启动子进程后 watch()，每读到一行 out_time_us 调用 progress()，
+    进程结束后 unwatch() 取回停滞原因 (未停滞返回 None)。暂停中的任务不计时。
+    """
+
+    def __init__(self, window_sec: float = STALL_WINDOW_SEC):
+        self.window_sec = window_sec
+        self._jobs: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, proc: Any, is_paused: Optional[Any] = None) -> None:
+        with self._lock:
+            self._jobs[proc] = {"last_us": -1, "last_t": time.time(), "started": False,
+                                "is_paused": is_paused, "reason": None}
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="StallSupervisor", daemon=True)
+                self._thread.start()
+
+    def progress(self, proc: Any, out_time_us: Any) -> None:
+        try:
+            value = int(out_time_us)
+        except (TypeError, ValueError):
+            return  # N/A 等无效值不视为推进
+        job = self._jobs.get(proc)
+        if job and value > job["last_us"]:
+            job["last_us"] = value
+            job["last_t"] = time.time()
+            job["started"] = True
+
+    def unwatch(self, proc: Any) -> Optional[str]:
+        with self._lock:
+            job = self._jobs.pop(proc, None)
+        return job["reason"] if job else None
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(1.0)
+            now = time.time()
+            with self._lock:
+                if not self._jobs:
+                    self._thread = None
+                    return
+                jobs = list(self._jobs.items())
+            for proc, job in jobs:
+                if job["reason"] or proc.poll() is not None:
+                    continue
+                if job["is_paused"] and job["is_paused"]():
+                    job["last_t"] = now  # 暂停/挂起期间不累计停滞时长
+                    continue
+                window = self.window_sec if job["started"] else self.window_sec * STALL_STARTUP_FACTOR
+                if now - job["last_t"] > window:
+                    at = max(job["last_us"], 0) / 1000000.0
+                    job["reason"] = (f"out_time stalled at {at:.1f}s for {window:.0f}s" if job["started"]
+                                     else f"no progress within {window:.0f}s of start")
+                    kill_process_group(proc)
+
+
+def next_stall_fallback(source_mode: str, hw_decode: bool, retries: int) -> Optional[str]:
+    """
+    停滞后的逐级降级方案：
+    内存 HTTP 流 → 直读源文件 ("direct")；GPU 解码 → CPU 解码 ("cpu_decode")；
+    均已降级时原样重试 ("retry")，超过 STALL_MAX_RETRIES 返回 None (判定失败)。
+    """
+    if retries >= STALL_MAX_RETRIES:
+        return None
+    if source_mode == "RAM":
+        return "direct"
+    if hw_decode:
+        return "cpu_decode"
+    return "retry"
+
+# =========================================================================
+# [Core 8] Failure Classification
+# 功能：从 FFmpeg 输出识别常见失败特征，映射为自动重试方案
+# 回归语料：corpus/ffmpeg_failures/<类别>__<描述>.log (类别 none 表示不应被识别为失败)
+# =========================================================================
+
+# 按优先级排列：靠前的类别优先命中 (如磁盘写满时解码报错只是连带症状)
+FAILURE_SIGNATURES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("no_space", ("no space left on device", "disk quota exceeded", "not enough space on the disk")),
+    # 编码器侧：NVENC 本身无法编码 (无设备 / 不支持 10-bit 或所需特性)，换 CPU 解码无济于事
+    ("nvenc_encode", ("10 bit encode not supported", "no nvenc capable devices found",
+                      "provided device doesn't support required nvenc features", "openencodesessionex failed")),
+    # 像素格式链路：硬件解码输出的格式无法送入编码器 / 滤镜，先尝试 CPU 解码，再退到 CPU 编码
+    ("nvenc_pix_fmt", ("pixel format not supported", "impossible to convert between the formats supported by the filter",
+                       "hwaccel does not support the input pixel format")),
+    ("decode_surfaces", ("no decoder surfaces left", "cuda_error_out_of_memory", "failed to allocate cuda frames",
+                         "hwaccel initialisation returned error", "failed setup for format cuda",
+                         "failed to get hw frames constraints", "failed to create a pool of frames")),
+    # 仅限 HTTP / 套接字特有的措辞 (AVERROR_HTTP_* 文案、http 重连、TCP 连接失败)；本地磁盘的 I/O 错误不属于此类
+    ("http_eof", ("stream ends prematurely", "will reconnect at", "connection reset by peer", "connection refused",
+                  "connection to tcp://", "server returned 400 bad request", "server returned 401 unauthorized",
+                  "server returned 403 forbidden", "server returned 404 not found", "server returned 4xx client error",
+                  "server returned 5xx server error")),
+    ("resources", ("cannot allocate memory", "resource temporarily unavailable", "pthread_create failed",
+                   "thread creation failed")),
+    ("corrupt_input", ("invalid data found when processing input", "moov atom not found", "invalid nal unit size",
+                       "error while decoding mb", "corrupt decoded frame", "header missing",
+                       "missing reference picture", "could not find codec parameters", "truncating packet")),
+]
+
+# 类别 → 候选方案 (依次尝试，已尝试或不适用的方案跳过，全部用尽为 skip)
+FAILURE_PLANS: Dict[str, Tuple[str, ...]] = {
+    "no_space": ("skip",),
+    "nvenc_encode": ("cpu_encode", "skip"),
+    "nvenc_pix_fmt": ("cpu_decode", "cpu_encode", "skip"),
+    "decode_surfaces": ("cpu_decode", "fewer_threads", "skip"),
+    "http_eof": ("direct", "skip"),
+    "resources": ("fewer_threads", "skip"),
+    "corrupt_input": ("skip",),
+}
+
+FALLBACK_THREADS = 4               # fewer_threads 方案下的编码线程上限
+
+
+def classify_ffmpeg_failure(log_lines: List[str]) -> Optional[str]:
+    """按 FAILURE_SIGNATURES 的优先级返回失败类别，无法识别时返回 None"""
+    text = "\n".join(log_lines).lower()
+    for name, needles in FAILURE_SIGNATURES:
+        if any(n in text for n in needles):
+            return name
+    return None
+
+
+def plan_failure_retry(failure_class: Optional[str], tried: Set[str], hw_decode: bool, network_source: bool,
+                       hw_encode: bool = False) -> str:
+    """
+    为失败类别选出下一个重试方案：cpu_decode / cpu_encode / direct / fewer_threads / skip。
+    cpu_decode 仅在使用了硬件解码时适用，cpu_encode 仅在使用了硬件编码时适用，direct 仅在读取内存 HTTP 流时适用。
+    """
+    if not failure_class:
+        return "skip"
+    for plan in FAILURE_PLANS.get(failure_class, ("skip",)):
+        if plan in tried:
+            continue
+        if plan == "cpu_decode" and not hw_decode:
+            continue
+        if plan == "cpu_encode" and not hw_encode:
+            continue
+        if plan == "direct" and not network_source:
+            continue
+        return plan
+    return "skip"
+
+
+def verify_failure_corpus(corpus_dir: Optional[str] = None) -> List[str]:
+    """
+    用回归语料校验分类器，返回不匹配项 (空列表表示全部通过)。
+    命令行入口见 verify_corpus_main (python Cinetico_Encoder.py --verify-corpus)。
+    """
+    corpus_dir = corpus_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "ffmpeg_failures")
+    mismatches = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.endswith(".log"):
+            continue
+        expected = name.split("__", 1)[0]
+        with open(os.path.join(corpus_dir, name), "r", encoding="utf-8", errors="replace") as f:
+            got = classify_ffmpeg_failure(f.read().splitlines())
+        if (got or "none") != expected:
+            mismatches.append(f"{name}: expected {expected}, got {got or 'none'}")
+    return mismatches
+
+
+def verify_corpus_main(argv: Optional[List[str]] = None) -> int:
+    """
+    语料校验入口：python Cinetico_Encoder.py --verify-corpus [--corpus 目录]
+    逐条打印不匹配项；全部通过时退出码为 0，否则为 1 (可直接用于 CI / 提交前检查)。
+    """
+    parser = argparse.ArgumentParser(prog="Cinetico_Encoder.py --verify-corpus",
+                                     description="Check the FFmpeg failure classifier against its regression corpus")
+    parser.add_argument("--verify-corpus", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", default=None, help="语料目录 (默认 corpus/ffmpeg_failures)")
+    args = parser.parse_args(argv)
+    try:
+        mismatches = verify_failure_corpus(args.corpus)
+    except OSError as e:
+        print(f"[Corpus] cannot read corpus: {e}", file=sys.stderr)
+        return 2
+    for line in mismatches:
+        print(f"[Corpus] {line}", file=sys.stderr)
+    print(f"[Corpus] {'FAIL' if mismatches else 'OK'}: {len(mismatches)} mismatch(es)")
+    return 1 if mismatches else 0
+
+# =========================================================================
+# [Core 9] Progress Ingestion
+# 功能：-progress 输出独占 stdout，以二进制块模式读取，每次读取只解析最新的完整块；
+# 日志走 stderr，由独立线程写入有界环形缓冲
+# =========================================================================
+
+PROGRESS_READ_SIZE = 64 * 1024
+
+
+class ProgressBlock:
+    """一个 progress= 块中调度与 UI 需要的字段"""
+    __slots__ = ("frame", "out_time_us", "fps", "total_size", "speed", "end")
+
+    def __init__(self) -> None:
+        self.frame = 0
+        self.out_time_us = 0
+        self.fps = 0.0
+        self.total_size = 0
+        self.speed = 0.0
+        self.end = False
+
+
+def _block_field(block: bytes, key: bytes) -> Optional[bytes]:
+    i = block.find(key)
+    if i < 0 or (i > 0 and block[i - 1] != 0x0A):
+        return None
+    i += len(key)
+    return block[i:block.find(b"\n", i)]
+
+
+def parse_progress_block(block: bytes) -> ProgressBlock:
+    """只定位所需的键 (每键一次 bytes.find)，不逐行切分；N/A 等无效值保持默认值"""
+    pb = ProgressBlock()
+    try:
+        pb.frame = int(_block_field(block, b"frame=") or 0)
+    except ValueError:
+        pass
+    try:
+        pb.out_time_us = int(_block_field(block, b"out_time_us=") or 0)
+    except ValueError:
+        pass
+    try:
+        pb.fps = float(_block_field(block, b"fps=") or 0)
+    except ValueError:
+        pass
+    try:
+        pb.total_size = int(_block_field(block, b"total_size=") or 0)
+    except ValueError:
+        pass
+    try:
+        pb.speed = float((_block_field(block, b"speed=") or b"0").rstrip(b"x"))
+    except ValueError:
+        pass
+    pb.end = _block_field(block, b"progress=") == b"end"
+    return pb
+
+
+class ProgressStream:
+    """
+    迭代二进制 progress 流 (stdout 管道)。每次 os.read 之后只产出最新的完整块，
+    同一次读取中积压的旧块直接丢弃 (进度是"最新值有效"的数据)。
+    """
+
+    def __init__(self, stream: Any = None):
+        self._stream = stream  # 持有引用，防止文件对象被回收而关闭 fd
+        self._fd = stream.fileno() if stream is not None else -1
+        self._buf = b""
+        self.blocks_skipped = 0
+
+    def feed(self, chunk: bytes) -> Optional[ProgressBlock]:
+        """喂入一段原始字节 (供异步读取方使用)，返回最新的完整块，不足一块时返回 None"""
+        self._buf += chunk
+        block = self._take_latest()
+        return parse_progress_block(block) if block is not None else None
+
+    def __iter__(self) -> Any:
+        while True:
+            try:
+                chunk = os.read(self._fd, PROGRESS_READ_SIZE)
+            except OSError:
+                return
+            if not chunk:
+                return
+            block = self.feed(chunk)
+            if block is not None:
+                yield block
+
+    def _take_latest(self) -> Optional[bytes]:
+        buf = self._buf
+        term = buf.rfind(b"progress=")
+        while term >= 0 and buf.find(b"\n", term) < 0:
+            term = buf.rfind(b"progress=", 0, term)  # 最后一个终止行尚未读完整，退回上一个
+        if term < 0:
+            return None
+        block_end = buf.find(b"\n", term) + 1
+        prev = buf.rfind(b"progress=", 0, term)
+        start = buf.find(b"\n", prev) + 1 if prev >= 0 else 0
+        self.blocks_skipped += buf.count(b"progress=", 0, start)
+        self._buf = buf[block_end:]
+        return buf[start:block_end]
+
+
+def pump_log_lines(stream: Any, sink: Any) -> None:
+    """日志线程：逐行读取 stderr (二进制) 并交给 sink，直到管道关闭"""
+    try:
+        for raw in iter(stream.readline, b""):
+            line = raw.decode("utf-8", errors="replace").strip()
+            if line:
+                sink(line)
+    except (OSError, ValueError):
+        pass
+
+
+def benchmark_progress_ingest(blocks: int = 20000) -> Dict[str, float]:
+    """
+    微基准：对比逐行文本解析 (旧实现) 与块模式解析的单块开销 (微秒)。
+    用法：python -c "import cinetico_core as c; print(c.benchmark_progress_ingest())"
+    """
+    sample = (b"frame=1200\nfps=48.00\nstream_0_0_q=27.0\nbitrate=3355.4kbits/s\ntotal_size=20971520\n"
+              b"out_time_us=50000000\nout_time_ms=50000000\nout_time=00:00:50.000000\ndup_frames=0\n"
+              b"drop_frames=0\nspeed=2.0x\nprogress=continue\n")
+    payload = sample * blocks
+
+    # 旧实现：文本模式逐行 split + dict 更新 + try/except
+    t0 = time.perf_counter()
+    stats: Dict[str, str] = {}
+    log: List[str] = []
+    for line in io.StringIO(payload.decode()):
+        line_str = line.strip()
+        if not line_str:
+            continue
+        log.append(line_str)
+        if "=" in line_str:
+            parts = line_str.split("=", 1)
+            if len(parts) == 2:
+                key, value = parts
+                stats[key.strip()] = value.strip()
+                if key.strip() == "out_time_us":
+                    try:
+                        int(value.strip())
+                    except ValueError:
+                        pass
+    legacy = (time.perf_counter() - t0) / blocks * 1e6
+
+    def run_blocks(step: int) -> Tuple[float, int]:
+        reader = ProgressStream()
+        parsed = 0
+        t0 = time.perf_counter()
+        for i in range(0, len(payload), step):
+            if reader.feed(payload[i:i + step]) is not None:
+                parsed += 1
+        return (time.perf_counter() - t0) / blocks * 1e6, parsed
+
+    # 块模式：每次读取恰好一个块 (最坏情况) / 按 4 KB 管道读取粒度 (积压时只解析最新块)
+    per_block, parsed_each = run_blocks(len(sample))
+    per_pipe, parsed_pipe = run_blocks(4096)
+    return {"legacy_us_per_block": round(legacy, 2), "block_us_per_block": round(per_block, 2),
+            "block_4k_us_per_block": round(per_pipe, 2), "blocks_parsed_4k": parsed_pipe,
+            "blocks_total": parsed_each}
+
+# =========================================================================
+# [Core 10] Subprocess Orchestrator
+# 功能：单个后台线程上的 asyncio 事件循环统一启动与监视全部 FFmpeg/ffprobe 子进程，
+# 提供超时、取消与线程安全的结果桥接 (concurrent.futures.Future / 回调)
+# =========================================================================
+
+class ChildProcess:
+    """
+    编排器托管的子进程句柄。提供与 Popen 兼容的 pid / poll / wait / kill，
+    因此进程组控制 (暂停/恢复/结束) 与停滞监督可直接复用。
+    """
+
+    def __init__(self, loop: Any, cmd: List[str]):
+        self.cmd = cmd
+        self.pid = -1
+        self.returncode: Optional[int] = None
+        self.timed_out = False
+        self.usage = ProcessUsage()  # 运行期间由编排器采样，退出时以 FFmpeg -benchmark 汇总校正
+        self.future: "concurrent.futures.Future[int]" = concurrent.futures.Future()
+        self._loop = loop
+        self._proc: Any = None
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        try:
+            return self.future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            raise subprocess.TimeoutExpired(self.cmd, timeout)
+
+    def kill(self) -> None:
+        if self.returncode is None:
+            self._loop.call_soon_threadsafe(self._kill_now)
+
+    def request_quit(self) -> None:
+        """向 stdin 写入 'q'，请求 FFmpeg 正常封装后退出"""
+        if self.returncode is None:
+            self._loop.call_soon_threadsafe(self._quit_now)
+
+    def _kill_now(self) -> None:
+        try:
+            self._proc.kill()
+        except (ProcessLookupError, OSError):
+            pass
+
+    def _quit_now(self) -> None:
+        try:
+            self._proc.stdin.write(b"q")
+        except (OSError, RuntimeError, AttributeError):
+            pass
+
+
+class ProcessOrchestrator:
+    """
+    子进程编排器。事件循环线程在首次使用时启动，之后常驻；线程数恒定，与任务数量无关。
+    - run(): 一次性命令 (ffprobe / 音频提取 / 拼接)，返回 Future[(returncode, stdout, stderr)]；
+             同时运行的数量受 max_runs 限制，批量探测不会瞬间拉起上百个 ffprobe
+    - spawn(): 长时编码进程，progress 块与日志行通过回调实时送出 (回调在事件循环线程执行，须轻量)
+    """
+
+    def __init__(self, max_runs: int = 4) -> None:
+        self.max_runs = max_runs
+        self._run_slots: Any = None
+        self._runs: set = set()  # 进行中的一次性命令 (仅在事件循环线程内访问)
+        self._loop: Any = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> Any:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()  # Windows 下默认即为支持子进程的 Proactor 循环
+                self._thread = threading.Thread(target=self._loop.run_forever, name="ProcessOrchestrator", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def run(self, cmd: List[str], timeout: Optional[float] = None, stdin_data: Optional[bytes] = None) -> Any:
+        """运行一次性命令；超时时结束子进程并以 TimeoutExpired 完成 Future"""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._run(cmd, timeout, stdin_data), loop)
+
+    async def _run(self, cmd: List[str], timeout: Optional[float], stdin_data: Optional[bytes]) -> Tuple[int, bytes, bytes]:
+        if self._run_slots is None:
+            self._run_slots = asyncio.Semaphore(self.max_runs)  # 须在事件循环线程内创建
+        async with self._run_slots:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdin=asyncio.subprocess.PIPE if stdin_data else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **get_subprocess_args())
+            self._runs.add(proc)
+            try:
+                out, err = await asyncio.wait_for(proc.communicate(stdin_data), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+                await proc.wait()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            finally:
+                self._runs.discard(proc)
+            return proc.returncode, out, err
+
+    def kill_runs(self) -> None:
+        """结束所有进行中的一次性命令 (停止队列时调用)；其 Future 以非零返回码完成"""
+        def kill_now() -> None:
+            for proc in list(self._runs):
+                try:
+                    proc.kill()
+                except (ProcessLookupError, OSError):
+                    pass
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(kill_now)
+
+    def spawn(self, cmd: List[str], on_progress: Optional[Any] = None, on_log: Optional[Any] = None,
+              timeout: Optional[float] = None, popen_kwargs: Optional[Dict[str, Any]] = None) -> ChildProcess:
+        """
+        启动长时进程并立即返回句柄 (启动失败时抛出与 Popen 相同的 OSError)。
+        stdout 按二进制块解析为 ProgressBlock 交给 on_progress；stderr 逐行交给 on_log。
+        句柄的 future 在两条输出流读尽、进程退出后才完成，调用方据此读取的日志是完整的。
+        """
+        loop = self._ensure_loop()
+        handle = ChildProcess(loop, cmd)
+        started = asyncio.run_coroutine_threadsafe(
+            self._start(handle, cmd, on_progress, on_log, timeout, popen_kwargs or {}), loop)
+        started.result()
+        return handle
+
+    async def _start(self, handle: ChildProcess, cmd: List[str], on_progress: Any, on_log: Any,
+                     timeout: Optional[float], popen_kwargs: Dict[str, Any]) -> None:
+        proc = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.PIPE, **popen_kwargs)
+        handle._proc = proc
+        handle.pid = proc.pid
+        asyncio.ensure_future(self._supervise(handle, proc, on_progress, on_log, timeout))
+
+    @staticmethod
+    async def _pump_progress(stream: Any, on_progress: Any, usage: "ProcessUsage") -> None:
+        assembler = ProgressStream()
+        while True:
+            chunk = await stream.read(PROGRESS_READ_SIZE)
+            if not chunk:
+                return
+            block = assembler.feed(chunk)
+            if block is not None and block.frame > usage.frames:
+                usage.frames = block.frame
+            if block is not None and on_progress:
+                try:
+                    on_progress(block)
+                except Exception as e:
+                    print(f"[Orchestrator] progress callback error: {e}", file=sys.stderr)
+
+    @staticmethod
+    async def _pump_log(stream: Any, on_log: Any, usage: "ProcessUsage") -> None:
+        while True:
+            try:
+                raw = await stream.readline()
+            except ValueError:  # 单行超过 StreamReader 上限，丢弃该段
+                continue
+            if not raw:
+                return
+            line = raw.decode("utf-8", errors="replace").strip()
+            if line.startswith("bench:"):
+                parse_benchmark_line(line, usage)
+            if line and on_log:
+                try:
+                    on_log(line)
+                except Exception as e:
+                    print(f"[Orchestrator] log callback error: {e}", file=sys.stderr)
+
+    async def _supervise(self, handle: ChildProcess, proc: Any, on_progress: Any, on_log: Any,
+                         timeout: Optional[float]) -> None:
+        readers = asyncio.gather(self._pump_progress(proc.stdout, on_progress, handle.usage),
+                                 self._pump_log(proc.stderr, on_log, handle.usage))
+        sampler = asyncio.ensure_future(self._sample_usage(proc, handle.usage))
+        try:
+            try:
+                await asyncio.wait_for(proc.wait(), timeout)
+            except asyncio.TimeoutError:
+                handle.timed_out = True
+                kill_process_group(handle)
+                await proc.wait()
+            sampler.cancel()
+            try:
+                await asyncio.wait_for(readers, 5.0)  # 进程组内残留子进程可能仍占用管道，限时等待
+            except asyncio.TimeoutError:
+                readers.cancel()
+            except Exception as e:  # 读取协程异常不能阻止句柄完成，否则等待方会永久阻塞
+                print(f"[Orchestrator] reader error: {e}", file=sys.stderr)
+        finally:
+            handle.returncode = proc.returncode
+            handle.future.set_result(proc.returncode)
+
+    @staticmethod
+    async def _sample_usage(proc: Any, usage: "ProcessUsage") -> None:
+        """进程存活期间周期采样 /proc 计数 (退出后 /proc 条目随回收消失，故最后不足一个周期的 I/O 可能未计入)"""
+        while proc.returncode is None:
+            if not read_proc_usage(proc.pid, usage):
+                return
+            await asyncio.sleep(USAGE_SAMPLE_SEC)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+                self._run_slots = None
+
+
+# =========================================================================
+# [Core 11] Resource Accounting
+# 功能：按子进程记录 CPU 时间、峰值内存与磁盘 I/O，结合帧数/时长/墙钟时间得出单任务效率指标，
+# 写入任务日志并可导出 (JSONL 持久化，CSV 导出)
+# =========================================================================
+
+USAGE_SAMPLE_SEC = 1.0
+CPU_BOUND_UTIL = 0.5   # CPU 时间 / 墙钟时间 低于该值视为 I/O 或等待受限
+
+_BENCH_FIELDS = {"utime": "cpu_user", "stime": "cpu_sys"}
+
+
+class ProcessUsage:
+    """单个子进程 (或合并后的单个任务) 的资源计数；CPU 单位秒，内存单位 KB，I/O 单位字节"""
+    __slots__ = ("cpu_user", "cpu_sys", "max_rss_kb", "read_bytes", "write_bytes", "read_chars", "frames", "exact")
+
+    def __init__(self) -> None:
+        self.cpu_user = 0.0
+        self.cpu_sys = 0.0
+        self.max_rss_kb = 0
+        self.read_bytes = 0     # 实际落到块设备的读取 (/proc/<pid>/io read_bytes)
+        self.write_bytes = 0
+        self.read_chars = 0     # 含管道/套接字在内的全部读取 (rchar)，RAM 模式的 HTTP 输入只体现在这里
+        self.frames = 0
+        self.exact = False      # CPU/RSS 已由 -benchmark 汇总校正
+
+    def merge(self, other: "ProcessUsage", share: float = 1.0) -> None:
+        """累加另一进程的计数；share < 1 用于合批进程按成员分摊。峰值内存取最大值"""
+        self.cpu_user += other.cpu_user * share
+        self.cpu_sys += other.cpu_sys * share
+        self.read_bytes += int(other.read_bytes * share)
+        self.write_bytes += int(other.write_bytes * share)
+        self.read_chars += int(other.read_chars * share)
+        self.frames += int(other.frames * share)
+        self.max_rss_kb = max(self.max_rss_kb, other.max_rss_kb)
+
+    @property
+    def cpu_sec(self) -> float:
+        return self.cpu_user + self.cpu_sys
+
+
+def read_proc_usage(pid: int, usage: ProcessUsage) -> bool:
+    """
+    从 /proc/<pid>/{stat,status,io} 采样 (仅 Linux)。计数单调递增，取最大值更新；
+    进程已退出或平台不支持时返回 False。/proc/<pid>/io 无权限时只跳过 I/O 部分。
+    """
+    base = f"/proc/{pid}"
+    try:
+        with open(f"{base}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        if not usage.exact:
+            usage.cpu_user = max(usage.cpu_user, int(fields[11]) / ticks)  # utime 为第 14 列
+            usage.cpu_sys = max(usage.cpu_sys, int(fields[12]) / ticks)
+        with open(f"{base}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    usage.max_rss_kb = max(usage.max_rss_kb, int(line.split()[1]))
+                    break
+    except (OSError, ValueError, IndexError, AttributeError):
+        return False
+    try:
+        with open(f"{base}/io", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == "read_bytes":
+                    usage.read_bytes = max(usage.read_bytes, int(value))
+                elif key == "write_bytes":
+                    usage.write_bytes = max(usage.write_bytes, int(value))
+                elif key == "rchar":
+                    usage.read_chars = max(usage.read_chars, int(value))
+    except (OSError, ValueError):
+        pass
+    return True
+
+
+def parse_benchmark_line(line: str, usage: ProcessUsage) -> bool:
+    """
+    解析 FFmpeg -benchmark 在退出时打印的汇总 (跨平台且精确到退出时刻)：
+    "bench: utime=12.345s stime=0.678s rtime=5.000s" / "bench: maxrss=123456KiB"
+    """
+    matched = False
+    for token in line[6:].split():
+        key, _, value = token.partition("=")
+        try:
+            if key in _BENCH_FIELDS:
+                setattr(usage, _BENCH_FIELDS[key], float(value.rstrip("s")))
+                usage.exact = matched = True
+            elif key == "maxrss":
+                digits = value.rstrip("KiBkB")
+                usage.max_rss_kb = max(usage.max_rss_kb, int(digits))
+                matched = True
+        except ValueError:
+            continue
+    return matched
+
+
+def job_efficiency(usage: ProcessUsage, duration_sec: float, wall_sec: float, output_bytes: int) -> Dict[str, Any]:
+    """由资源计数推导效率指标；分母为 0 的指标记为 None"""
+    cpu = usage.cpu_sec
+    out_min = duration_sec / 60.0 if duration_sec > 0 else 0.0
+    read_mb = usage.read_bytes / (1024 * 1024)
+    metrics: Dict[str, Any] = {
+        "wall_sec": round(wall_sec, 3),
+        "cpu_user_sec": round(usage.cpu_user, 3),
+        "cpu_sys_sec": round(usage.cpu_sys, 3),
+        "cpu_util": round(cpu / wall_sec, 3) if wall_sec > 0 else None,
+        "max_rss_mb": round(usage.max_rss_kb / 1024, 1),
+        "read_mb": round(read_mb, 2),
+        "write_mb": round(usage.write_bytes / (1024 * 1024), 2),
+        "read_chars_mb": round(usage.read_chars / (1024 * 1024), 2),
+        "frames": usage.frames,
+        "duration_sec": round(duration_sec, 3),
+        "output_mb": round(output_bytes / (1024 * 1024), 2),
+        "frames_per_cpu_sec": round(usage.frames / cpu, 2) if cpu > 0 else None,
+        "read_mb_per_out_min": round(read_mb / out_min, 2) if out_min > 0 else None,
+        "speed": round(duration_sec / wall_sec, 3) if wall_sec > 0 else None,
+    }
+    util = metrics["cpu_util"]
+    metrics["bound"] = None if util is None or cpu <= 0 else ("cpu" if util >= CPU_BOUND_UTIL else "io")
+    return metrics
+
+
+def format_efficiency(metrics: Dict[str, Any]) -> List[str]:
+    """任务日志中的效率摘要行"""
+    def fmt(value: Any, unit: str = "") -> str:
+        return "n/a" if value is None else f"{value}{unit}"
+    return [
+        f"[Usage] wall={fmt(metrics['wall_sec'], 's')} cpu={metrics['cpu_user_sec']}+{metrics['cpu_sys_sec']}s "
+        f"util={fmt(metrics['cpu_util'])} rss={metrics['max_rss_mb']}MB bound={fmt(metrics['bound'])}",
+        f"[Usage] io read={metrics['read_mb']}MB write={metrics['write_mb']}MB (all reads {metrics['read_chars_mb']}MB)",
+        f"[Usage] frames={metrics['frames']} frames/cpu-s={fmt(metrics['frames_per_cpu_sec'])} "
+        f"readMB/out-min={fmt(metrics['read_mb_per_out_min'])} speed={fmt(metrics['speed'], 'x')}",
+    ]
+
+
+def default_metrics_path() -> str:
+    """效率记录默认位置：~/.cinetico/job_metrics.jsonl (逐任务追加)"""
+    return os.path.join(os.path.expanduser("~"), ".cinetico", "job_metrics.jsonl")
+
+
+def append_job_metrics(record: Dict[str, Any], path: Optional[str] = None) -> None:
+    """追加一条任务效率记录 (写失败只打印，不影响编码结果)"""
+    path = path or default_metrics_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"[Metrics] write failed: {e}", file=sys.stderr)
+
+
+def export_job_metrics(records: List[Dict[str, Any]], path: str) -> str:
+    """按扩展名导出为 CSV 或 JSON，返回写入路径"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.lower().endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        return path
+    columns: List[str] = []
+    for record in records:
+        columns.extend(k for k in record if k not in columns)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(records)
+    return path
+
+
+# =========================================================================
+# [Core 11.5] Encode Engine
+# 功能：GUI 与 Headless 共用的调度引擎 —— 队列与任务记录、调度循环 (缓存层级 / 合批 / 分段 / 远程派发) 以及
+# I/O 预读与单任务、分段、合批、远程编码工作线程；界面差异只经 EngineListener 回调体现，本节不依赖任何 GUI 模块
+# =========================================================================
+
+# 任务状态 (status_code)，GUI 的任务卡片、任务日志与控制接口共用
+STATE_PENDING = 0
+STATE_QUEUED_IO = 1
+STATE_CACHING = 2
+STATE_READY = 3
+STATE_ENCODING = 4
+STATE_DONE = 5
+STATE_ERROR = -1
+TERMINAL_STATES = (STATE_DONE, STATE_ERROR)
+
+PROBE_TIMEOUT_SEC = 30.0  # ffprobe 时长 / 像素格式探测的超时 (网络共享上冷启动的大文件首次打开可能需要数秒)
+
+
+class EncodeJob:
+    """
+    引擎队列中的一个任务：参与调度的全部字段 (GUI 的 TaskCard 在此基础上增加显示状态)。
+    status_code 只经 EncodeEngine.set_state 修改，界面回调只读。
+    """
+
+    def __init__(self, filepath: str, size_bytes: int = 0, settings: Optional[Dict[str, Any]] = None,
+                 output_dir: Optional[str] = None) -> None:
+        self.filepath = filepath
+        self.file_size_gb = size_bytes / (1024 ** 3)  # 入队前统计一次，排序与缓存决策只读此缓存值
+        self.settings: Dict[str, Any] = dict(settings or {})  # 本任务生效的编码设置 (codec / gpu / crf / 10bit / keep_meta)
+        self.output_dir = output_dir          # 输出目录，None 表示写在源文件旁 (EncodeEngine.output_dir 兜底)
+        self.status_code = STATE_PENDING
+        self.source_mode = "PENDING"          # plan_io 选定的层级：DIRECT / RAM / SSD_CACHE
+        self.ram_token: Optional[str] = None  # 内存层级在 GLOBAL_RAM_STORAGE 中的键
+        self.ssd_cache_path: Optional[str] = None
+        self.lanes = 1                        # 占用的编码通道数 (分段并行时 > 1，合批的非首个成员与远程任务为 0)
+        self.duration_sec: Optional[float] = None  # 探测到的时长缓存 (0.0 表示探测失败)
+        self.probing = False                  # 时长探测已提交
+        self.no_batch = False                 # 降级或合批失败后强制单独编码
+        self.procs: List[Any] = []            # 当前持有的 FFmpeg 子进程 (合批时与其他成员共享)
+        self.paused = False                   # 用户手动暂停 (GUI)
+        self.throttled = False                # 被资源调度器临时挂起 (GUI)
+        self.cancelled = False
+        self.pinned = False                   # 指定了队列位置，不参与按大小自动排序
+        self.force_cpu_decode = False         # 降级：强制 CPU 解码
+        self.force_cpu_encode = False         # 降级：NVENC 不可用时改为 CPU 编码
+        self.thread_limit = 0                 # 降级：编码线程上限 (0 表示不限制)
+        self.stall_retries = 0
+        self.fallbacks_tried: Set[str] = set()
+        self.attempt = 0
+        self.usage = ProcessUsage()           # 本次尝试中全部子进程的资源计数
+        self.usage_t0 = time.time()
+        self.ready_t: Optional[float] = None  # 进入就绪状态的时刻，用于 trace 中的排队等待区间
+        self.log_data: Any = collections.deque(maxlen=2000)
+        self.final_output_path: Optional[str] = None
+
+    def reset_usage(self) -> None:
+        """开始新一次编码尝试：清零资源计数与计时"""
+        self.usage = ProcessUsage()
+        self.usage_t0 = time.time()
+
+
+class EngineListener:
+    """
+    引擎回调接口，默认均为空操作。除 job_state 外都只用于展示 (GUI 投递到主线程，Headless 输出 JSON Lines)。
+    回调在调度线程、工作线程或编排器线程上执行，不得阻塞，也不得修改任务的调度字段。
+    """
+
+    def job_state(self, job: EncodeJob, code: int) -> None:
+        """status_code 发生迁移 (调用方可能持有 queue_lock)"""
+
+    def caching(self, job: EncodeJob) -> None:
+        """开始预读到 job.source_mode 对应的层级"""
+
+    def cache_progress(self, job: EncodeJob, fraction: float) -> None:
+        pass
+
+    def ready(self, job: EncodeJob) -> None:
+        """直读就绪或预读完成"""
+
+    def dispatched(self, job: EncodeJob) -> None:
+        """任务 (或以其为首的批次) 已派发到编码线程"""
+
+    def encoding_started(self, jobs: List[EncodeJob], info: Dict[str, Any]) -> Any:
+        """
+        一次编码尝试开始。info 含 hw_encode / hw_decode / lanes，分段时另含 segments，合批时含 batch，远程时含 node。
+        返回值作为句柄原样传给 progress / encoding_ended。
+        """
+        return None
+
+    def progress(self, handle: Any, jobs: List[EncodeJob], fraction: Optional[float], fps: float,
+                 eta_sec: Optional[float], out_time_sec: float, speed: float = 0.0, size: int = 0,
+                 members: Optional[List[float]] = None) -> None:
+        """进度 (按 progress_interval 节流)；时长未知时 fraction 为 None，合批时 members 为各成员的进度"""
+
+    def encoding_ended(self, handle: Any) -> None:
+        """编码进程已结束 (结算之前调用)"""
+
+    def retry(self, job: EncodeJob, cause: str, plan: str, detail: Optional[str] = None) -> None:
+        """以降级方案 plan 退回就绪队列 (在任务重新就绪之前调用)"""
+
+    def done(self, job: EncodeJob, output: Optional[str], input_size: int, output_size: int,
+             record: Dict[str, Any]) -> None:
+        """编码完成；output 为 None 表示基准测试模式下产物已丢弃。record 为写入 job_metrics.jsonl 的效率记录"""
+
+    def failed(self, job: EncodeJob, reason: str, **detail: Any) -> None:
+        """任务失败 (reason 为失败类别或 stalled / cache_failed / concat_failed / remote_failed / move_failed / internal)"""
+
+    def cancelled(self, job: EncodeJob, partial: Optional[str]) -> None:
+        """编码中的任务被取消；partial 为保留下来的已编码部分"""
+
+    def interrupted(self, job: EncodeJob) -> None:
+        """因 stop() 中断，任务退回等待状态"""
+
+
+class EncodeEngine:
+    """
+    调度引擎。队列 (queue，路径列表) 与任务记录 (jobs，路径 -> EncodeJob) 由引擎持有，GUI 与 Headless 共用：
+    每 ENGINE_TICK_SEC 一轮，1. 统计内存驻留 / 预读数 / 通道占用 → 2. plan_io 选择缓存层级 → 2.5 异步探测小文件时长 →
+    3. 合批 / 分段 / 单任务派发 → 3.5 本地通道占满时派发到远程节点。持锁期间只做决策，从不启动子进程。
+    单任务流程：编码 → 停滞/失败分类后以降级方案退回就绪队列 → 迁移输出 → 记录成品清单与资源效率。
+    """
+
+    def __init__(self, listener: Optional[EngineListener] = None, ffmpeg_path: str = "ffmpeg", ffprobe_path: str = "ffprobe",
+                 work_dir: Optional[str] = None, workers: int = 2, hw_route: Optional[str] = None,
+                 orchestrator: Optional["ProcessOrchestrator"] = None, stall_supervisor: Optional[StallSupervisor] = None,
+                 metrics: Optional["EncoderMetrics"] = None, tracer: Optional["Tracer"] = None,
+                 manifest: Optional[OutputManifest] = None, remote_pool: Optional[RemoteNodePool] = None,
+                 is_ssd: Optional[Any] = None, ram_limit_gb: float = 0.0, free_ram_gb: Optional[Any] = None,
+                 output_dir: Optional[str] = None, progress_interval: float = 0.1, keep_finished: bool = True,
+                 metrics_extra: Optional[Dict[str, Any]] = None) -> None:
+        self.listener = listener or EngineListener()
+        self.ffmpeg_path = ffmpeg_path
+        self.ffprobe_path = ffprobe_path
+        self.work_dir = work_dir or tempfile.gettempdir()
+        self.workers = workers
+        self.hw_route = hw_route              # HardwareProbe 的 hw_encode；None 时 GPU 任务回退 CPU 编码
+        self._own_orchestrator = orchestrator is None
+        self.orchestrator = orchestrator or ProcessOrchestrator(max_runs=max(4, workers))
+        self.stall_supervisor = stall_supervisor or StallSupervisor()
+        self.metrics = metrics or EncoderMetrics()
+        self.tracer = tracer or Tracer(enabled=False)
+        self.manifest = manifest
+        self.remote_pool = remote_pool
+        self.is_ssd = is_ssd or (lambda path: True)
+        self.ram_limit_gb = ram_limit_gb
+        self.free_ram_gb = free_ram_gb        # 可用于内存层级的物理内存 (GB)，不足时改写存储缓存；None 表示不检查
+        self.output_dir = output_dir
+        self.progress_interval = progress_interval
+        self.keep_finished = keep_finished    # False 时进入终态的任务移出队列 (常驻服务)
+        self.metrics_extra = dict(metrics_extra or {})
+        self.benchmark = False                # 基准测试：产物只统计体积，不保留
+        self.profiler: Any = None
+        self.queue: List[str] = []            # queue[queue_floor:] 为未锁定位置的等待任务，按体积有序
+        self.jobs: Dict[str, EncodeJob] = {}
+        self.queue_floor = 0
+        self.queue_lock = threading.Lock()
+        self.stopping = False
+        self.stats = {"ticks": 0, "busy_sec": 0.0, "cpu_sec": 0.0, "max_tick_sec": 0.0}  # 调度自身开销 (每轮 run 重置)
+        self.startup_overhead_sec = 1.0       # 单任务固定开销 (探测+进程启动) 的滑动平均，合批阈值的依据
+        self.encode_speed = 2.0               # 编码速度 (素材秒/墙钟秒) 的滑动平均
+        self.executor = ThreadPoolExecutor(max_workers=max(16, workers), thread_name_prefix="compute")
+        self.io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="io")  # 并发由 plan_io 限制
+        self._ram_server: Any = None
+        self._ram_port = 0
+        self._active: Set[Any] = set()
+        self._lock = threading.Lock()
+
+    # --- 队列 ---
+    def add(self, jobs: List[EncodeJob], order: str = "size") -> List[EncodeJob]:
+        """入队：按 order 二分插入未锁定的等待段 (O(k log n))，已在队列中的路径跳过；返回实际入队的任务"""
+        with self.queue_lock:
+            added = [job for job in jobs if job.filepath not in self.jobs]
+            for job in added:
+                self.jobs[job.filepath] = job
+            insert_pending(self.queue, [job.filepath for job in added], lambda f: self.jobs[f].file_size_gb,
+                           lo=self.sorted_floor(), order=order)
+        return added
+
+    def _is_settled(self, job: EncodeJob) -> bool:
+        """已开始/已完成/已缓存或被指定位置的任务不参与按体积排序"""
+        return job.status_code != STATE_PENDING or job.source_mode != "PENDING" or job.pinned
+
+    def sorted_floor(self) -> int:
+        """
+        新任务的最前插入位置：queue[queue_floor:] 始终有序，新任务只插入这一段，且不越过其队首已锁定的任务。
+        游标只前进 (调用方须持有 queue_lock)，摊还 O(1)。
+        """
+        q, i = self.queue, self.queue_floor
+        while i < len(q) and self._is_settled(self.jobs[q[i]]):
+            i += 1
+        self.queue_floor = i
+        return i
+
+    def set_state(self, job: EncodeJob, code: int) -> None:
+        """状态迁移的唯一入口 (调度字段须在 queue_lock 内修改)"""
+        if job.status_code == code:
+            return
+        job.status_code = code
+        self.listener.job_state(job, code)
+
+    def busy_lanes(self) -> int:
+        with self.queue_lock:
+            return sum(self.jobs[f].lanes for f in self.queue if self.jobs[f].status_code == STATE_ENCODING)
+
+    def reset_job(self, job: EncodeJob) -> None:
+        """重新开始未完成的任务：释放缓存，清除层级、降级标记与重试计数 (调用方须持有 queue_lock)"""
+        self._release_cache(job)
+        job.source_mode = "PENDING"
+        job.lanes = 1
+        job.no_batch = False
+        job.paused = job.throttled = job.cancelled = False
+        job.force_cpu_decode = job.force_cpu_encode = False
+        job.stall_retries = 0
+        job.fallbacks_tried = set()
+        job.thread_limit = 0
+        self.set_state(job, STATE_PENDING)
+
+    def cancel(self, job: EncodeJob) -> bool:
+        """
+        取消任务。未开始编码的任务同步置为终态并释放缓存 (预读中的由 I/O 线程收尾)；
+        编码中的任务由工作线程在进程结束后结算。返回是否已开始编码。
+        """
+        with self.queue_lock:
+            job.cancelled = True
+            started = job.status_code == STATE_ENCODING
+            caching = job.status_code in (STATE_QUEUED_IO, STATE_CACHING)
+            if not started:
+                self.set_state(job, STATE_ERROR)  # 同步置为终态，阻止引擎继续调度
+        if not started and not caching:
+            self._settle(job, STATE_ERROR)
+        return started
+
+    # --- 生命周期 ---
+    def run(self, until_idle: bool = True) -> None:
+        """
+        调度循环，在调用线程上运行。until_idle 为 True 时队列中全部任务进入终态即返回 (批处理)，
+        否则运行到 stop() (常驻服务)。
+        """
+        self.stats = {"ticks": 0, "busy_sec": 0.0, "cpu_sec": 0.0, "max_tick_sec": 0.0}
+        while not self.stopping:
+            tick_t0, tick_cpu0 = time.perf_counter(), time.thread_time()
+            with self.queue_lock:
+                idle = self._tick()
+            if idle and until_idle:
+                break
+            tick = time.perf_counter() - tick_t0
+            stats = self.stats  # 调度自身开销 (不含休眠)，供压测工具评估扩展性
+            stats["ticks"] += 1
+            stats["busy_sec"] += tick
+            stats["cpu_sec"] += time.thread_time() - tick_cpu0
+            if tick > stats["max_tick_sec"]:
+                stats["max_tick_sec"] = tick
+            time.sleep(ENGINE_TICK_SEC)
+
+    def stop(self) -> None:
+        """停止全部任务：不再派发，结束运行中的进程组与一次性命令 (工作线程随之把任务结算为中断)"""
+        self.stopping = True
+        self.kill_all()
+
+    def kill_all(self) -> None:
+        """只结束本引擎创建的进程组 (不按进程名全局查杀，共享主机上会误伤其他 FFmpeg)，以及探测/拼接等一次性命令"""
+        with self._lock:
+            procs = list(self._active)
+            self._active.clear()
+        for proc in procs:
+            try:
+                kill_process_group(proc)
+            except subprocess.SubprocessError:
+                pass
+        self.orchestrator.kill_runs()
+
+    def release_unfinished(self) -> List[EncodeJob]:
+        """停止后：把队列中未进入终态的任务结算为失败并释放缓存，返回这些任务"""
+        with self.queue_lock:
+            leftover = [self.jobs[f] for f in self.queue if self.jobs[f].status_code not in TERMINAL_STATES]
+        for job in leftover:
+            self._settle(job, STATE_ERROR)
+        return leftover
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭线程池、自建的编排器与内存文件服务器 (wait 时等待工作线程收尾)"""
+        self.io_executor.shutdown(wait=wait)
+        self.executor.shutdown(wait=wait)
+        if self._own_orchestrator:
+            self.orchestrator.shutdown()
+        if self._ram_server is not None:
+            self._ram_server.shutdown()
+            self._ram_server.server_close()
+            self._ram_server = None
+
+    # --- 调度 ---
+    def _tick(self) -> bool:
+        """一轮调度 (调用方持有 queue_lock)；队列中全部任务都已进入终态时返回 True"""
+        jobs = self.jobs
+        # 1. 统计资源
+        ram_in_use, active_io, busy, idle = 0.0, 0, 0, True
+        for f in self.queue:
+            job = jobs[f]
+            code = job.status_code
+            if code in TERMINAL_STATES:
+                continue
+            idle = False
+            if job.source_mode == "RAM": ram_in_use += job.file_size_gb
+            if code in (STATE_QUEUED_IO, STATE_CACHING): active_io += 1
+            elif code == STATE_ENCODING: busy += job.lanes
+        if idle:
+            return True
+
+        # 2. 调度 I/O (决策函数与离线模拟器共用)
+        pending = ((f, jobs[f].file_size_gb) for f in self.queue if jobs[f].status_code == STATE_PENDING)
+        for f, tier in plan_io(pending, ram_in_use, active_io, self.is_ssd, self.ram_limit_gb, IO_MAX_ACTIVE):
+            job = jobs[f]
+            job.source_mode = tier
+            if tier == "DIRECT":
+                job.ready_t = time.time()
+                self.set_state(job, STATE_READY)
+                self.tracer.instant("schedule.direct", f, size_gb=round(job.file_size_gb, 4))
+                self.listener.ready(job)
+                continue
+            if tier == "RAM": ram_in_use += job.file_size_gb
+            active_io += 1
+            self.set_state(job, STATE_QUEUED_IO)
+            self.tracer.instant("schedule.io", f, tier=tier, ram_in_use_gb=round(ram_in_use, 2), size_gb=round(job.file_size_gb, 4))
+            self.io_executor.submit(self._cache_task, job)
+
+        # 2.5 探测小文件时长 (异步)，为合批决策提供依据
+        for f in self.queue:
+            job = jobs[f]
+            if (job.status_code in (STATE_PENDING, STATE_QUEUED_IO, STATE_CACHING, STATE_READY)
+                    and job.duration_sec is None and not job.probing and job.file_size_gb <= BATCH_PROBE_MAX_GB):
+                job.probing = True
+                self._probe_duration_async(job)
+
+        # 3. 调度计算
+        if busy < self.workers:
+            threshold = batch_clip_threshold(self.startup_overhead_sec, self.encode_speed)
+            for index, f in enumerate(self.queue):
+                job = jobs[f]
+                if job.status_code != STATE_READY or job.cancelled:
+                    continue
+                # 小文件的时长探测尚未返回时稍候，避免错过合批机会 (探测失败记为 0.0，不会无限等待)
+                if job.duration_sec is None and job.probing and not job.no_batch:
+                    continue
+                batch = self._plan_batch(index, threshold)
+                if batch:
+                    self._trace_queue_wait(batch)
+                    self.tracer.instant("schedule.batch", f, members=len(batch), threshold_sec=round(threshold, 2))
+                    for member in batch:
+                        member.lanes = 0
+                        self.set_state(member, STATE_ENCODING)
+                    job.lanes = 1  # 批次由首个成员占用一条通道
+                    busy += 1
+                    self.executor.submit(self._batch_task, batch)
+                else:
+                    lanes = self._plan_lanes(job, self.workers - busy)
+                    if lanes is None:
+                        continue  # 分段候选的时长探测已异步发起，保持就绪，下一轮再决策
+                    self._trace_queue_wait([job])
+                    job.lanes = lanes
+                    busy += lanes
+                    self.set_state(job, STATE_ENCODING)
+                    self.tracer.instant("schedule.encode", f, lanes=lanes, busy=busy, workers=self.workers,
+                                        media_sec=job.duration_sec)
+                    self.executor.submit(self._segmented_task if lanes > 1 else self._encode_task, job)
+                self.listener.dispatched(job)
+                if busy >= self.workers:
+                    break
+
+        # 3.5 调度远程节点：本地通道已占满时，剩余就绪任务按节点吞吐量权重分发
+        pool = self.remote_pool
+        if pool is not None and pool.nodes and busy >= self.workers and pool.free_slots() > 0:
+            for f in self.queue:
+                job = jobs[f]
+                if job.status_code != STATE_READY or job.cancelled:
+                    continue
+                if job.duration_sec is None and job.probing:
+                    continue  # 与步骤 3 一致：时长探测未返回的任务暂不派发 (合批/分段决策尚未做出)
+                node = pool.acquire()
+                if node is None:
+                    break
+                job.lanes = 0  # 不占用本地通道
+                self.set_state(job, STATE_ENCODING)
+                self._trace_queue_wait([job])
+                self.tracer.instant("schedule.remote", f, node=node.name)
+                self.executor.submit(self._remote_task, job, node)
+                self.listener.dispatched(job)
+        return False
+
+    def _trace_queue_wait(self, jobs: List[EncodeJob]) -> None:
+        """记录从就绪到被派发之间的排队区间 (调用方需持有 queue_lock)"""
+        now = time.time()
+        for job in jobs:
+            if job.ready_t and self.tracer.enabled:
+                self.tracer.complete("queue_wait", job.ready_t, now, job.filepath)
+            job.ready_t = None
+
+    def _plan_lanes(self, job: EncodeJob, free_lanes: int) -> Optional[int]:
+        """
+        决定任务占用的编码通道数 (调用方需持有 queue_lock)。预计时长压过队列中其余未完成任务之和时 (should_segment)
+        拆分为分段并行，占满全部空闲通道。时长未知时发起异步探测并返回 None，由下一轮重新决策。
+        """
+        if free_lanes < 2:
+            return 1
+        if job.duration_sec is None:
+            if not job.probing:
+                job.probing = True
+                self._probe_duration_async(job)
+            return None
+        if job.duration_sec < SEGMENT_MIN_DURATION_SEC:
+            return 1
+        # 未探测时长的任务按候选任务的码率 (秒/GB) 折算，避免对整条队列逐个 ffprobe
+        sec_per_gb = job.duration_sec / job.file_size_gb if job.file_size_gb > 0 else 0.0
+        remaining = []
+        for f in self.queue:
+            other = self.jobs[f]
+            if other is job or other.status_code in TERMINAL_STATES:
+                continue
+            remaining.append(other.duration_sec if other.duration_sec else other.file_size_gb * sec_per_gb)
+        return free_lanes if should_segment(job.duration_sec, remaining, free_lanes) else 1
+
+    def _plan_batch(self, index: int, threshold: float) -> List[EncodeJob]:
+        """
+        以 queue[index] 为首，从其后的就绪任务中挑选设置与输出目录相同的短片段组成批次 (调用方需持有 queue_lock)。
+        不满足合批条件时返回空列表，按单任务调度。
+        """
+        head = self.jobs[self.queue[index]]
+        if head.no_batch or not head.duration_sec or head.duration_sec > threshold:
+            return []
+        candidates: List[Tuple[Any, float]] = [(head, head.duration_sec)]
+        for f in itertools.islice(self.queue, index + 1, None):
+            other = self.jobs[f]
+            if (other.status_code == STATE_READY and not other.no_batch and not other.cancelled
+                    and other.duration_sec and other.duration_sec <= threshold
+                    and other.settings == head.settings and other.output_dir == head.output_dir):
+                candidates.append((other, other.duration_sec))
+                if len(candidates) >= BATCH_MAX_FILES:
+                    break  # plan_batch 最多取 BATCH_MAX_FILES 个，够数即停
+        return plan_batch(candidates, threshold)
+
+    def _record_encode_costs(self, startup_sec: float, speed: float) -> None:
+        """以滑动平均记录单任务固定开销与编码速度，作为合批阈值的依据"""
+        alpha = SIM_EWMA_ALPHA
+        self.startup_overhead_sec = (1 - alpha) * self.startup_overhead_sec + alpha * max(0.0, startup_sec)
+        self.encode_speed = (1 - alpha) * self.encode_speed + alpha * max(0.1, speed)
+
+    def _record_stage(self, stage: str, path: str, t0: float, **args: Any) -> None:
+        """阶段结束：计入 /metrics 直方图 (仅 METRIC_STAGES) 并写入 trace span"""
+        now = time.time()
+        if stage in METRIC_STAGES:
+            self.metrics.observe_stage(stage, now - t0)
+        self.tracer.complete(stage, t0, now, path, **args)
+
+    # --- 探测 ---
+    def _dur_cmd(self, path: str) -> List[str]:
+        return [self.ffprobe_path, "-v", "error", "-show_entries", "format=duration",
+                "-of", "default=noprint_wrappers=1:nokey=1", path]
+
+    def _probe_duration_async(self, job: EncodeJob) -> None:
+        """在编排器事件循环上异步探测时长 (失败记为 0.0，该任务不参与合批与分段)，不占用工作线程"""
+        t0 = time.time()
+
+        def on_done(fut: Any) -> None:
+            self._record_stage("probe", job.filepath, t0, kind="duration")
+            try:
+                rc, out, _ = fut.result()
+                job.duration_sec = float(out.strip()) if rc == 0 else 0.0
+            except Exception:
+                job.duration_sec = 0.0
+        self.orchestrator.run(self._dur_cmd(job.filepath), timeout=PROBE_TIMEOUT_SEC).add_done_callback(on_done)
+
+    def _duration(self, job: EncodeJob) -> float:
+        """任务时长：优先使用异步探测的缓存值，未探测过的 (大文件) 在工作线程内同步探测；失败返回 0"""
+        if job.duration_sec is None:
+            t0 = time.time()
+            try:
+                rc, out, _ = self.orchestrator.run(self._dur_cmd(job.filepath), timeout=PROBE_TIMEOUT_SEC).result()
+                job.duration_sec = float(out.strip()) if rc == 0 else 0.0
+            except (subprocess.SubprocessError, OSError, ValueError):
+                job.duration_sec = 0.0
+            self._record_stage("probe", job.filepath, t0, kind="duration")
+        return job.duration_sec
+
+    def _probe_cpu_decode(self, path: str) -> bool:
+        """像素格式预检：硬件解码器不支持的格式 (4:2:2 / 4:4:4 / 10-bit H.264) 返回 True"""
+        t0 = time.time()
+        info = ""
+        try:
+            rc, out, _ = self.orchestrator.run([self.ffprobe_path, "-v", "error", "-select_streams", "v:0",
+                                                "-show_entries", "stream=codec_name,pix_fmt", "-of", "csv=p=0", path],
+                                               timeout=PROBE_TIMEOUT_SEC).result()
+            info = out.decode(errors="replace").strip().lower() if rc == 0 else ""
+        except (subprocess.SubprocessError, OSError):
+            pass
+        force = "422" in info or "444" in info or ("h264" in info and "10" in info)
+        self._record_stage("probe", path, t0, kind="pix_fmt", force_cpu_decode=force)
+        return force
+
+    def _hw_encode(self, job: EncodeJob) -> bool:
+        """本次尝试是否使用硬件编码：任务要求 GPU、本机具备硬件编码器且未降级为 cpu_encode"""
+        return bool(job.settings.get("gpu")) and self.hw_route is not None and not job.force_cpu_encode
+
+    def _needs_cpu_decode(self, job: EncodeJob) -> bool:
+        """硬件编码的任务是否须改用 CPU 解码 (降级标记或像素格式预检)"""
+        if job.force_cpu_decode:
+            return True
+        return self._hw_encode(job) and self._probe_cpu_decode(job.filepath)
+
+    @staticmethod
+    def _encode_settings(job: EncodeJob, hw_decode: bool, hw_encode: bool) -> Dict[str, Any]:
+        """任务设置叠加本次尝试的解码/编码路线 (settings_encode_args 的输入)"""
+        return dict(job.settings, force_cpu_decode=not hw_decode, force_cpu_encode=not hw_encode)
+
+    # --- I/O 层级 ---
+    def _cache_task(self, job: EncodeJob) -> None:
+        """I/O 线程：按 plan_io 选定的层级把源文件读入内存 (经回环 HTTP 供 FFmpeg 读取) 或复制到工作目录"""
+        path = job.filepath
+        with self.queue_lock:
+            if job.cancelled or job.status_code != STATE_QUEUED_IO:
+                proceed = False
+            else:
+                proceed = True
+                self.set_state(job, STATE_CACHING)
+        if not proceed:
+            if job.cancelled:
+                self._settle(job, STATE_ERROR)
+            return
+        t0 = time.time()
+        profiler = self.profiler
+        if profiler: profiler.mark("cache", path)
+        try:
+            if job.source_mode == "RAM" and self.free_ram_gb is not None and self.free_ram_gb() <= job.file_size_gb:
+                job.source_mode = "SSD_CACHE"  # 可用物理内存 (扣除系统保留) 不足：改写存储缓存
+            self.listener.caching(job)
+            if job.source_mode == "RAM":
+                try:
+                    self._read_into_ram(job)
+                except MemoryError:
+                    print(f"[RAM Allocation Error] {path}")
+                    job.source_mode = "SSD_CACHE"  # 内存分配失败时退回存储缓存
+                    self.listener.caching(job)
+            if job.source_mode == "SSD_CACHE":
+                self._copy_to_cache(job)
+        except OSError as e:
+            self.listener.failed(job, "cache_failed", detail=str(e))
+            self._settle(job, STATE_ERROR)
+            return
+        finally:
+            if profiler: profiler.mark("cache", path, end=True)
+        if job.cancelled:
+            self._settle(job, STATE_ERROR)  # 预读期间被取消，状态已由 cancel() 置为终态
+            return
+        if self.stopping:
+            self._interrupt(job)
+            return
+        self._record_stage("cache", path, t0, tier=job.source_mode)
+        with self.queue_lock:
+            job.ready_t = time.time()
+            self.set_state(job, STATE_READY)
+        self.listener.ready(job)
+
+    def _read_into_ram(self, job: EncodeJob) -> None:
+        """以 64MB 切片读入内存 (独立的内存页追加，避免申请连续大块内存引发 MemoryError)，登记到内存文件服务器"""
+        total = max(1, int(job.file_size_gb * 1024 ** 3))
+        t0 = time.time()
+        chunks: List[bytes] = []
+        read_len = 0
+        with open(job.filepath, "rb") as f:
+            while not self.stopping and not job.cancelled:
+                chunk = f.read(64 * 1024 * 1024)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                read_len += len(chunk)
+                self.listener.cache_progress(job, min(1.0, read_len / total))
+        if self.stopping or job.cancelled:
+            return
+        with self._lock:
+            if self._ram_server is None:
+                self._ram_server, self._ram_port = start_global_server()
+        token = uuid.uuid4().hex
+        GLOBAL_RAM_STORAGE[token] = chunks
+        job.ram_token = token
+        self.metrics.cache_fill_bytes.inc(read_len, "ram")
+        self.tracer.complete("cache.ram_read", t0, time.time(), job.filepath, bytes=read_len)
+
+    def _copy_to_cache(self, job: EncodeJob) -> None:
+        """复制到工作目录中的存储缓存 (句柄全部关闭后才删除中止的副本)"""
+        total = max(1, int(job.file_size_gb * 1024 ** 3))
+        t0 = time.time()
+        cache_path = os.path.join(self.work_dir, f"CACHE_{uuid.uuid4().hex}_{os.path.basename(job.filepath)}")
+        job.ssd_cache_path = cache_path
+        copied = 0
+        with open(job.filepath, "rb") as fsrc, open(cache_path, "wb") as fdst:
+            while not self.stopping and not job.cancelled:
+                chunk = fsrc.read(32 * 1024 * 1024)
+                if not chunk:
+                    break
+                fdst.write(chunk)
+                copied += len(chunk)
+                self.listener.cache_progress(job, min(1.0, copied / total))
+        if self.stopping or job.cancelled:
+            return
+        self.metrics.cache_fill_bytes.inc(copied, "ssd_cache")
+        self.tracer.complete("cache.ssd_copy", t0, time.time(), job.filepath, bytes=copied)
+
+    def _release_ram(self, job: EncodeJob) -> None:
+        """释放内存缓存，之后从源文件直读"""
+        if job.ram_token:
+            chunks = GLOBAL_RAM_STORAGE.pop(job.ram_token, None)
+            if chunks:
+                chunks.clear()
+            job.ram_token = None
+        if job.source_mode == "RAM":
+            job.source_mode = "DIRECT"
+
+    def _release_cache(self, job: EncodeJob) -> None:
+        """释放内存缓存并删除存储缓存副本"""
+        self._release_ram(job)
+        if job.ssd_cache_path:
+            self._discard(job.ssd_cache_path)
+            job.ssd_cache_path = None
+
+    def _source(self, job: EncodeJob) -> str:
+        """文件形式的输入：存储缓存副本，否则为源文件"""
+        if job.source_mode == "SSD_CACHE" and job.ssd_cache_path:
+            return os.path.abspath(job.ssd_cache_path)
+        return job.filepath
+
+    # --- 结算与重排 ---
+    def _settle(self, job: EncodeJob, code: int) -> None:
+        """任务进入终态：释放缓存；keep_finished 为 False 时移出队列"""
+        self._release_cache(job)
+        with self.queue_lock:
+            self.set_state(job, code)
+            if not self.keep_finished and self.jobs.get(job.filepath) is job:
+                index = self.queue.index(job.filepath)
+                if index < self.queue_floor:
+                    self.queue_floor -= 1
+                self.queue.pop(index)
+                del self.jobs[job.filepath]
+
+    def _interrupt(self, job: EncodeJob) -> None:
+        """因 stop() 中断：释放缓存并退回等待状态 (GUI 再次启动时重新调度，Headless 收尾时记为中断)"""
+        self._release_cache(job)
+        with self.queue_lock:
+            job.source_mode = "PENDING"
+            job.lanes = 1
+            self.set_state(job, STATE_PENDING)
+        self.listener.interrupted(job)
+
+    def _requeue(self, job: EncodeJob, plan: str) -> None:
+        """应用降级方案并退回就绪队列：内存流重试一律改为直读，降级 (含合批失败的 solo) 后一律单独重试"""
+        if self.stopping:
+            self._interrupt(job)
+            return
+        with self.queue_lock:
+            self._release_ram(job)
+            if plan == "cpu_decode": job.force_cpu_decode = True
+            if plan == "cpu_encode": job.force_cpu_encode = job.force_cpu_decode = True
+            if plan == "fewer_threads": job.thread_limit = FALLBACK_THREADS
+            job.no_batch = True
+            job.lanes = 1
+            job.ready_t = time.time()
+            self.set_state(job, STATE_READY)
+
+    def _handle_stall(self, job: EncodeJob, reason: str, hw_decode: bool, log_tail: List[str]) -> None:
+        """停滞处理：按降级方案重新排队 (内存流 → 直读，GPU 解码 → CPU 解码，再原样重试)，用尽后判定失败"""
+        fallback = next_stall_fallback(job.source_mode, hw_decode, job.stall_retries)
+        job.log_data.append(f"[Stall] {reason} -> {fallback or 'give up'}")
+        if not fallback:
+            self.listener.failed(job, "stalled", detail=reason, log_tail=log_tail[-10:])
+            self._settle(job, STATE_ERROR)
+            return
+        job.stall_retries += 1
+        self.listener.retry(job, "stall", fallback, reason)
+        self._requeue(job, fallback)
+
+    def _handle_failure(self, job: EncodeJob, rc: int, log_tail: List[str], hw_decode: bool, network: bool,
+                        hw_encode: bool) -> None:
+        """编码失败处理：按日志特征分类并按对应方案重新排队；无法识别或方案用尽时判定失败"""
+        failure_class = classify_ffmpeg_failure(log_tail)
+        plan = plan_failure_retry(failure_class, job.fallbacks_tried, hw_decode, network, hw_encode)
+        job.log_data.append(f"[Failure] {failure_class or 'unknown'} -> {plan}")
+        if plan == "skip":
+            self.listener.failed(job, failure_class or "unknown", returncode=rc, log_tail=log_tail[-10:])
+            self._settle(job, STATE_ERROR)
+            return
+        job.fallbacks_tried.add(plan)
+        self.listener.retry(job, failure_class or "unknown", plan)
+        self._requeue(job, plan)
+
+    # --- 子进程 ---
+    def _spawn(self, jobs: List[EncodeJob], cmd: List[str], supervise: bool = True,
+               on_log: Optional[Any] = None, on_progress: Optional[Any] = None) -> Any:
+        """
+        经编排器以独立进程组启动编码子进程并登记到所属任务 (stdin 保持管道，用于发送 'q' 优雅收尾)。
+        supervise 时纳入停滞监督 (命令须带 -progress)；暂停/挂起期间启动的新进程 (如下一分段) 同样挂起。
+        """
+        sink = on_log or (lambda line: [job.log_data.append(line) for job in jobs])
+        proc = self.orchestrator.spawn(cmd, on_progress=on_progress, on_log=sink, popen_kwargs=process_group_kwargs())
+        with self._lock:
+            self._active.add(proc)
+        for job in jobs:
+            job.procs.append(proc)
+            if job.paused or job.throttled:
+                suspend_process(proc)
+        if supervise:
+            self.stall_supervisor.watch(proc, is_paused=lambda: any(job.paused or job.throttled for job in jobs))
+        return proc
+
+    def _reap(self, jobs: List[EncodeJob], proc: Any) -> Optional[str]:
+        """注销已结束的子进程并把其资源计数并入所属任务 (合批进程按成员均摊)，返回停滞原因 (因停滞被结束时)"""
+        with self._lock:
+            self._active.discard(proc)
+        for job in jobs:
+            if proc in job.procs:
+                job.procs.remove(proc)
+                job.usage.merge(proc.usage, 1.0 / len(jobs))
+        return self.stall_supervisor.unwatch(proc)
+
+    # --- 编码 ---
+    def _encode_task(self, job: EncodeJob) -> None:
+        """工作线程：单任务编码一次，按结果结算或以降级方案退回就绪队列"""
+        path = job.filepath
+        working = os.path.join(self.work_dir, f"TEMP_ENC_{uuid.uuid4().hex}.mp4")
+        handle, started, proc = None, False, None
+        job_t0 = time.time()
+        try:
+            job.attempt += 1
+            duration = self._duration(job)
+            hw_encode = self._hw_encode(job)
+            hw_decode = hw_encode and not self._needs_cpu_decode(job)
+            # 内存 HTTP 流仅用于 CPU 编码 (硬件编码时直读)；音轨改由源文件作为第二输入提供
+            network = job.source_mode == "RAM" and job.ram_token is not None and not hw_encode
+            source = f"http://127.0.0.1:{self._ram_port}/{job.ram_token}" if network else self._source(job)
+            output_args = ["-benchmark"] + (["-threads", str(job.thread_limit)] if job.thread_limit else [])
+            cmd = build_agent_cmd(self.ffmpeg_path, source, working, self._encode_settings(job, hw_decode, hw_encode),
+                                  self.hw_route, output_args, audio_path=path if network else None)
+
+            job.log_data.clear()
+            job.reset_usage()
+            handle = self.listener.encoding_started([job], {"hw_encode": hw_encode, "hw_decode": hw_decode, "lanes": 1})
+            started = True
+            log_tail: Any = collections.deque(maxlen=200)  # 仅保留非进度行，供失败分类使用
+            ps: Dict[str, Any] = {"last": 0.0, "max": 0.0, "first_frame_t": None, "finished": False}
+            start = time.time()
+            proc_ref: List[Any] = [None]
+
+            def on_progress(block: ProgressBlock) -> None:
+                if ps["finished"]:
+                    return  # 进程已结束，禁止后续的进度回滚
+                self.stall_supervisor.progress(proc_ref[0], block.out_time_us)
+                now = time.time()
+                if ps["first_frame_t"] is None and block.out_time_us > 0:
+                    ps["first_frame_t"] = now  # 首次出现有效 out_time：拆分固定开销与编码耗时
+                if now - ps["last"] < self.progress_interval and not block.end:
+                    return
+                ps["last"] = now
+                out_sec = block.out_time_us / 1000000.0
+                fraction = eta = None
+                if duration > 0:
+                    ps["max"] = max(ps["max"], out_sec / duration)
+                    fraction = min(1.0, ps["max"])
+                    if fraction > 0.005:
+                        eta = max(0.0, (now - start) / fraction - (now - start))
+                self.listener.progress(handle, [job], fraction, block.fps, eta, out_sec, block.speed, block.total_size)
+
+            def on_log(line: str) -> None:
+                job.log_data.append(line)
+                log_tail.append(line)
+
+            proc = proc_ref[0] = self._spawn([job], cmd, on_log=on_log, on_progress=on_progress)
+            proc.wait()
+            ps["finished"] = True
+            stall_reason = self._reap([job], proc)
+            self.tracer.complete("encode", start, time.time(), path, rc=proc.returncode, mode=job.source_mode,
+                                 hw_encode=hw_encode, hw_decode=hw_decode)
+            started = False
+            self.listener.encoding_ended(handle)
+
+            if job.cancelled:
+                # 优雅停止后 FFmpeg 已封装已编码部分，保留为 _Partial 文件
+                partial = None
+                if proc.returncode == 0 and os.path.exists(working) and os.path.getsize(working) > 0:
+                    partial = headless_output_path(path, job.output_dir or self.output_dir).replace("_Compressed_", "_Partial_")
+                    shutil.move(working, partial)
+                self.listener.cancelled(job, partial)
+                self._settle(job, STATE_ERROR)
+            elif self.stopping:
+                self._interrupt(job)
+            elif stall_reason:
+                self._handle_stall(job, stall_reason, hw_decode, list(log_tail))
+            elif proc.returncode == 0 and os.path.exists(working) and os.path.getsize(working) > 0:
+                first = ps["first_frame_t"]
+                if first is not None and duration > 0:
+                    self._record_encode_costs(first - job_t0, duration / max(0.001, time.time() - first))
+                self._finish(job, working, duration)
+            else:
+                self._handle_failure(job, proc.returncode, list(log_tail), hw_decode, network, hw_encode)
+        except Exception as e:
+            self.listener.failed(job, "internal", detail=str(e))
+            self._settle(job, STATE_ERROR)
+        finally:
+            cleanup_t0 = time.time()
+            if proc is not None:
+                self._reap([job], proc)
+            if started:
+                self.listener.encoding_ended(handle)
+            self._discard(working)
+            self.tracer.complete("cleanup", cleanup_t0, time.time(), path)
+
+    def _segmented_task(self, job: EncodeJob) -> None:
+        """
+        工作线程：长视频分段并行编码。关键帧处切分 → 最多 lanes 个分段同时编码 (仅视频) →
+        音频单独编码一次 → concat 流复制无损拼接。切分失败 (关键帧不足等) 时回退为单路编码。
+        """
+        path = job.filepath
+        token = uuid.uuid4().hex
+        seg_dir = os.path.join(self.work_dir, f"TEMP_SEG_{token}")
+        working = os.path.join(self.work_dir, f"TEMP_ENC_{token}.mp4")
+        procs: List[Any] = []
+        handle, started = None, False
+        try:
+            duration = self._duration(job)
+            keyframes = KeyframeIndex.get(self.ffprobe_path, path, self.work_dir, runner=self.orchestrator)
+            segments = plan_segments(keyframes, duration, job.lanes)
+            if len(segments) < 2 or self.stopping:
+                with self.queue_lock:
+                    job.lanes = 1
+                return self._encode_task(job)
+
+            job.attempt += 1
+            os.makedirs(seg_dir, exist_ok=True)
+            with self.queue_lock:
+                self._release_ram(job)  # 分段需要随机 Seek：内存 HTTP 流不支持 Range，改为直读
+            source = self._source(job)
+            hw_encode = self._hw_encode(job)
+            hw_decode = hw_encode and not self._needs_cpu_decode(job)
+            hwaccel_args, codec_args = settings_encode_args(self._encode_settings(job, hw_decode, hw_encode), self.hw_route)
+            lanes = job.lanes
+
+            seg_files = [os.path.join(seg_dir, f"seg_{i:04d}.mp4") for i in range(len(segments))]
+            seg_done = [0.0] * len(segments)
+            seg_fps = [0.0] * len(segments)
+            log_tail: Any = collections.deque(maxlen=200)
+            stall_reasons: List[str] = []
+            last = [0.0]
+            ui_lock = threading.Lock()
+            job.log_data.clear()
+            job.reset_usage()
+            handle = self.listener.encoding_started([job], {"hw_encode": hw_encode, "hw_decode": hw_decode,
+                                                            "lanes": lanes, "segments": len(segments)})
+            started = True
+            start = time.time()
+
+            def report_progress() -> None:
+                now = time.time()
+                with ui_lock:
+                    if now - last[0] < self.progress_interval:
+                        return
+                    last[0] = now
+                fraction = min(1.0, sum(seg_done) / duration) if duration > 0 else None
+                eta = max(0.0, (now - start) / fraction - (now - start)) if fraction and fraction > 0.005 else None
+                self.listener.progress(handle, [job], fraction, sum(seg_fps), eta, sum(seg_done))
+
+            def start_child(cmd: List[str], i: int = -1) -> Any:
+                """经编排器启动子进程后立即返回 (不占用线程)；已停止/取消时返回 None"""
+                if self.stopping or job.cancelled:
+                    return None
+                tag = f"[{'seg %02d' % i if i >= 0 else 'audio'}]"
+                proc_ref: List[Any] = [None]
+
+                def on_progress(block: ProgressBlock) -> None:
+                    self.stall_supervisor.progress(proc_ref[0], block.out_time_us)
+                    seg_done[i] = block.out_time_us / 1000000.0
+                    seg_fps[i] = block.fps
+                    report_progress()
+
+                def on_log(line: str) -> None:
+                    job.log_data.append(f"{tag} {line}")
+                    log_tail.append(line)
+
+                proc = proc_ref[0] = self._spawn([job], cmd, supervise=i >= 0,  # 音频命令无 -progress 输出，不做停滞监督
+                                                 on_log=on_log, on_progress=on_progress if i >= 0 else None)
+                procs.append(proc)
+                return proc
+
+            def finish_child(proc: Any, i: int = -1) -> int:
+                """子进程已结束：注销并记录停滞原因，返回退出码"""
+                if proc is None:
+                    return -1
+                reason = self._reap([job], proc)
+                if reason: stall_reasons.append(f"seg {i:02d}: {reason}")
+                if i >= 0:
+                    seg_fps[i] = 0.0
+                    if proc.returncode == 0: seg_done[i] = segments[i][1] - segments[i][0]
+                return proc.returncode
+
+            audio_file = os.path.join(seg_dir, "audio.m4a")
+            audio_cmd = [self.ffmpeg_path, "-y", "-i", path, "-vn", "-map", "0:a:0", "-c:a", "aac", "-b:a", "320k", audio_file]
+            pending_segs = []
+            for i, (seg_start, seg_end) in enumerate(segments):
+                cmd = [self.ffmpeg_path, "-y"] + hwaccel_args + ["-ss", f"{seg_start:.6f}", "-i", source]
+                if i < len(segments) - 1: cmd.extend(["-t", f"{seg_end - seg_start:.6f}"])
+                cmd.extend(["-map", "0:v:0", "-an", "-sn", "-dn", "-map_chapters", "-1"])
+                cmd.extend(codec_args)
+                if job.thread_limit: cmd.extend(["-threads", str(job.thread_limit)])
+                cmd.extend(["-benchmark", "-progress", "pipe:1", "-nostats", seg_files[i]])
+                pending_segs.append((i, cmd))
+
+            # 本线程只做车道调度：最多 lanes 个分段同时运行，任一结束即补位
+            seg_codes = [-1] * len(segments)
+            running: Dict[Any, Tuple[Any, int]] = {}
+            audio_proc = start_child(audio_cmd) if job.settings.get("audio", True) else None
+            while pending_segs or running:
+                while pending_segs and len(running) < lanes:
+                    i, cmd = pending_segs.pop(0)
+                    proc = start_child(cmd, i)
+                    if proc is None:
+                        pending_segs.clear()
+                        break
+                    running[proc.future] = (proc, i)
+                if not running:
+                    break
+                done, _ = futures_wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    proc, i = running.pop(fut)
+                    seg_codes[i] = finish_child(proc, i)
+            if audio_proc is not None:
+                audio_proc.wait()
+            audio_code = finish_child(audio_proc)
+
+            if job.cancelled:
+                started = False
+                self.listener.encoding_ended(handle)
+                self.listener.cancelled(job, None)
+                self._settle(job, STATE_ERROR)
+                return
+            if self.stopping:
+                self._interrupt(job)
+                return
+            if stall_reasons:
+                self._handle_stall(job, stall_reasons[0], hw_decode, list(log_tail))
+                return
+            failed = [code for code in seg_codes if code != 0]
+            if failed:
+                self._handle_failure(job, failed[0], list(log_tail), hw_decode, False, hw_encode)
+                return
+
+            # 无损拼接：视频段流复制 + 单次编码的音轨
+            self.listener.progress(handle, [job], 0.99, 0.0, None, duration)
+            has_audio = audio_code == 0 and os.path.exists(audio_file) and os.path.getsize(audio_file) > 1024
+            list_file = os.path.join(seg_dir, "concat.txt")
+            write_concat_list(list_file, seg_files)
+            concat_cmd = build_concat_cmd(self.ffmpeg_path, list_file, working, audio_file if has_audio else None,
+                                          path if job.settings.get("keep_meta") else None)
+            concat_rc, _, concat_err = self.orchestrator.run(concat_cmd).result()
+            started = False
+            self.listener.encoding_ended(handle)
+            if concat_rc != 0 or not os.path.exists(working):
+                concat_log = concat_err.decode("utf-8", errors="replace").splitlines()[-30:]
+                job.log_data.extend(concat_log)
+                self.listener.failed(job, "concat_failed", returncode=concat_rc, log_tail=concat_log[-10:])
+                self._settle(job, STATE_ERROR)
+                return
+            self._finish(job, working, duration)
+        except Exception as e:
+            self.listener.failed(job, "internal", detail=str(e))
+            self._settle(job, STATE_ERROR)
+        finally:
+            for proc in procs:
+                self._reap([job], proc)
+            if started:
+                self.listener.encoding_ended(handle)
+            shutil.rmtree(seg_dir, ignore_errors=True)
+            self._discard(working)
+
+    def _batch_task(self, batch: List[EncodeJob]) -> None:
+        """
+        工作线程：将多个短片段合并进同一个 FFmpeg 进程编码 (多输入/多输出)，摊薄进程启动开销。
+        失败时按日志归因到具体成员；无法归因或未出错的成员退回就绪队列，逐个单独重试。
+        """
+        outputs = [os.path.join(self.work_dir, f"TEMP_ENC_{uuid.uuid4().hex}.mp4") for _ in batch]
+        finished: Set[int] = set()
+        handle, started, proc = None, False, None
+        try:
+            with self.queue_lock:
+                for job in batch:
+                    self._release_ram(job)  # 多路 HTTP 内存流并发解复用易死锁，短片段直读即可
+            inputs = [self._source(job) for job in batch]
+            durations = [max(job.duration_sec or 0.0, 0.001) for job in batch]
+            # _plan_batch 保证成员的设置一致；任一成员的降级标记作用于整批
+            hw_encode = all(self._hw_encode(job) for job in batch)
+            hw_decode = hw_encode and not any(self._needs_cpu_decode(job) for job in batch)
+            hwaccel_args, codec_args = settings_encode_args(self._encode_settings(batch[0], hw_decode, hw_encode), self.hw_route)
+            thread_limits = [job.thread_limit for job in batch if job.thread_limit]
+            if thread_limits: codec_args = codec_args + ["-threads", str(min(thread_limits))]
+            cmd = build_batch_cmd(self.ffmpeg_path, inputs, outputs, hwaccel_args, codec_args,
+                                  bool(batch[0].settings.get("keep_meta")))
+            for job in batch:
+                job.attempt += 1
+                job.log_data.clear()
+                job.reset_usage()
+                job.log_data.append(f"[Batch] {len(batch)} clips in one process")
+            handle = self.listener.encoding_started(batch, {"hw_encode": hw_encode, "hw_decode": hw_decode, "lanes": 1,
+                                                            "batch": len(batch)})
+            started = True
+
+            log_tail: Any = collections.deque(maxlen=200)
+            last = [0.0]
+            start = time.time()
+            total_duration = sum(durations)
+            proc_ref: List[Any] = [None]
+
+            def on_progress(block: ProgressBlock) -> None:
+                self.stall_supervisor.progress(proc_ref[0], block.out_time_us)
+                now = time.time()
+                if now - last[0] < self.progress_interval and not block.end:
+                    return
+                last[0] = now
+                out_sec = block.out_time_us / 1000000.0  # 各输出并行推进，超过成员时长即视为该成员编码完毕
+                members = [min(1.0, out_sec / d) for d in durations]
+                fraction = min(1.0, sum(min(out_sec, d) for d in durations) / total_duration)
+                eta = max(0.0, (now - start) / fraction - (now - start)) if fraction > 0.005 else None
+                self.listener.progress(handle, batch, fraction, block.fps, eta, out_sec, block.speed, block.total_size, members)
+
+            # 合批成员共享同一进程，暂停任一成员即暂停整批；日志先收集，结束后统一写入各成员
+            proc = proc_ref[0] = self._spawn(batch, cmd, on_log=log_tail.append, on_progress=on_progress)
+            proc.wait()
+            stall_reason = self._reap(batch, proc)
+            for job in batch: job.log_data.extend(log_tail)
+            started = False
+            self.listener.encoding_ended(handle)
+
+            # 任一成员取消会停止整批：被取消者结算为取消，其余成员 (输出不完整) 在 finally 中单独重试
+            if any(job.cancelled for job in batch):
+                for i, job in enumerate(batch):
+                    if job.cancelled:
+                        self.listener.cancelled(job, None)
+                        self._settle(job, STATE_ERROR)
+                        finished.add(i)
+                return
+            if self.stopping:
+                return  # 全部成员在 finally 中结算为中断
+            if proc.returncode == 0:
+                for i, job in enumerate(batch):
+                    if os.path.exists(outputs[i]) and os.path.getsize(outputs[i]) > 0:
+                        self._finish(job, outputs[i], durations[i])
+                        finished.add(i)
+                return
+            if stall_reason:
+                # 停滞无法归因到单个成员：全部成员单独重试 (各自再受停滞监督)
+                for job in batch: job.log_data.append(f"[Stall] batch {stall_reason}")
+                return
+            # 失败归因：被日志点名的成员直接判错，其余成员单独重试 (无法归因时全部单独重试)
+            lines = list(log_tail)
+            for i in attribute_batch_errors(lines, inputs, outputs):
+                self.listener.failed(batch[i], classify_ffmpeg_failure(lines) or "unknown", returncode=proc.returncode,
+                                     log_tail=lines[-10:])
+                self._settle(batch[i], STATE_ERROR)
+                finished.add(i)
+        except Exception as e:
+            for i, job in enumerate(batch):
+                if i not in finished:
+                    self.listener.failed(job, "internal", detail=str(e))
+                    self._settle(job, STATE_ERROR)
+                    finished.add(i)
+        finally:
+            if proc is not None:
+                self._reap(batch, proc)
+            if started:
+                self.listener.encoding_ended(handle)
+            for i, job in enumerate(batch):
+                if i in finished:
+                    continue
+                if self.stopping:
+                    self._interrupt(job)
+                else:
+                    self.listener.retry(job, "batch", "solo")
+                    self._requeue(job, "solo")
+            for out in outputs:
+                self._discard(out)
+
+    def _remote_task(self, job: EncodeJob, node: Any) -> None:
+        """
+        工作线程：在远程节点上编码。
+        节点失联 (心跳超时/断连) 时任务退回就绪状态，由调度循环重新分配到本地或其他节点。
+        """
+        working = os.path.join(self.work_dir, f"TEMP_ENC_{uuid.uuid4().hex}.mp4")
+        handle, started, lost = None, False, False
+        try:
+            job.attempt += 1
+            duration = self._duration(job) or 1.0
+            with self.queue_lock:
+                self._release_ram(job)  # 远程节点不读取本机内存流
+            source = self._source(job)
+            settings = dict(job.settings, force_cpu_decode=job.force_cpu_decode or self._probe_cpu_decode(job.filepath))
+            job.log_data.clear()
+            job.reset_usage()
+            job.log_data.append(f"[Remote] dispatched to {node.name}")
+            handle = self.listener.encoding_started([job], {"hw_encode": bool(settings.get("gpu")),
+                                                            "hw_decode": not settings["force_cpu_decode"],
+                                                            "lanes": 0, "node": node.name})
+            started = True
+            last = [0.0]
+
+            def on_progress(out_sec: float, fps: float, total_size: int) -> None:
+                now = time.time()
+                if now - last[0] < self.progress_interval:
+                    return
+                last[0] = now
+                self.listener.progress(handle, [job], min(1.0, out_sec / duration), fps, None, out_sec, size=total_size)
+
+            result = run_remote_job(node, source, working, settings, duration,
+                                    on_progress=on_progress, should_stop=lambda: self.stopping or job.cancelled)
+            job.log_data.extend(result.get("log_tail", []))
+            started = False
+            self.listener.encoding_ended(handle)
+
+            if job.cancelled:
+                self.listener.cancelled(job, None)
+                self._settle(job, STATE_ERROR)
+            elif self.stopping:
+                self._interrupt(job)
+            elif result["returncode"] == 0:
+                self._finish(job, working, duration)
+            else:
+                self.listener.failed(job, "remote_failed", returncode=result["returncode"],
+                                     log_tail=list(result.get("log_tail", []))[-10:])
+                self._settle(job, STATE_ERROR)
+        except RemoteNodeLost as e:
+            lost = True
+            job.log_data.append(f"[Remote] node lost: {e}")
+            self.listener.retry(job, "node_lost", "requeue", str(e))
+            with self.queue_lock:
+                job.lanes = 1
+                job.ready_t = time.time()
+                self.set_state(job, STATE_READY)
+        except Exception as e:
+            self.listener.failed(job, "internal", detail=str(e))
+            self._settle(job, STATE_ERROR)
+        finally:
+            self.remote_pool.release(node, lost=lost)
+            if started:
+                self.listener.encoding_ended(handle)
+            self._discard(working)
+
+    def _finish(self, job: EncodeJob, working: str, duration: float) -> None:
+        """编码成功：记录资源效率，将临时输出迁移到最终位置 (基准测试模式下只统计体积后删除)，写入成品清单并结算"""
+        path = job.filepath
+        input_size = os.path.getsize(path)
+        output_size = os.path.getsize(working)
+        record = self._record_job_metrics(job, duration, output_size)
+        output = None
+        if self.benchmark:
+            self._discard(working)
+        else:
+            output = headless_output_path(path, job.output_dir or self.output_dir)
+            t0 = time.time()
+            try:
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+                shutil.move(working, output)
+            except OSError as e:
+                self._discard(working)
+                self.listener.failed(job, "move_failed", detail=str(e))
+                self._settle(job, STATE_ERROR)
+                return
+            if job.settings.get("keep_meta"):
+                try: shutil.copystat(path, output)
+                except OSError: pass
+            self._record_stage("relocate", path, t0)
+            if self.manifest is not None:
+                self.manifest.record(path, job.settings, output)
+            job.final_output_path = output
+        self.listener.done(job, output, input_size, output_size, record)
+        self._settle(job, STATE_DONE)
+
+    def _record_job_metrics(self, job: EncodeJob, duration: float, output_bytes: int) -> Dict[str, Any]:
+        """把本次尝试的资源计数换算为效率指标：写入任务日志并追加到 job_metrics.jsonl，返回该记录"""
+        metrics = job_efficiency(job.usage, duration, time.time() - job.usage_t0, output_bytes)
+        job.log_data.extend(format_efficiency(metrics))
+        self.metrics.observe_stage("encode", metrics["wall_sec"])
+        self.metrics.observe_job(job.usage, job.source_mode, output_bytes)
+        record = {"file": job.filepath, "time": time.strftime("%Y-%m-%d %H:%M:%S"), "mode": job.source_mode,
+                  "lanes": max(1, job.lanes), "benchmark": self.benchmark, **self.metrics_extra, **metrics}
+        append_job_metrics(record)
+        return record
+
+    @staticmethod
+    def _discard(path: str) -> None:
+        if os.path.exists(path):
+            try: os.remove(path)
+            except OSError: pass
+
+
+# =========================================================================
+# [Core 12] Headless Batch Runner
+# 功能：无 GUI 的命令行批处理模式 (显示器缺失的编码服务器 / systemd 服务)，与 GUI 驱动同一个 EncodeEngine
+# (调度、工作线程、停滞监督、失败降级、成品清单与资源统计)；进度以 JSON Lines 输出到 stdout
+# =========================================================================
+
+HEADLESS_VIDEO_EXTS = (".mp4", ".mkv", ".mov", ".avi", ".ts", ".flv", ".wmv")  # 与导入对话框一致
+
+EXIT_OK = 0            # 全部成功或已跳过
+EXIT_JOB_FAILED = 1    # 至少一个任务失败
+EXIT_USAGE = 2         # 参数错误或没有可处理的输入
+EXIT_NO_FFMPEG = 3     # ffmpeg / ffprobe 不可用
+EXIT_INTERRUPTED = 130 # 收到 SIGINT / SIGTERM
+
+
+def collect_inputs(paths: List[str], manifest: Optional[str] = None) -> List[str]:
+    """
+    展开输入：文件原样保留，文件夹递归收集视频文件 (跳过本工具的产物)，
+    清单文件可为 JSON 数组 / {"files": [...]} 或每行一个路径的文本。结果去重并保持顺序。
+    """
+    items = list(paths)
+    if manifest:
+        with open(manifest, "r", encoding="utf-8") as f:
+            text = f.read()
+        try:
+            data = json.loads(text)
+            items.extend(data.get("files", []) if isinstance(data, dict) else data)
+        except ValueError:
+            items.extend(line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#"))
+
+    found: List[str] = []
+    for item in items:
+        item = os.path.abspath(os.path.expanduser(str(item)))
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(HEADLESS_VIDEO_EXTS) and "_Compressed_" not in name:
+                        found.append(os.path.join(root, name))
+        else:
+            found.append(item)
+    return list(dict.fromkeys(found))
+
+
+def headless_output_path(src: str, output_dir: Optional[str] = None) -> str:
+    """与 GUI 相同的命名规则：<源文件名>_Compressed_<日期>.mp4，默认写在源文件旁"""
+    stem = os.path.splitext(os.path.basename(src))[0]
+    return os.path.join(output_dir or os.path.dirname(src), f"{stem}_Compressed_{time.strftime('%Y%m%d')}.mp4")
+
+
+HEADLESS_RAM_LIMIT_GB = 48.0   # 内存层级的驻留上限，与 GUI 的 MAX_RAM_LOAD_GB 一致
+HEADLESS_RAM_RESERVE_GB = 6.0  # 保留给系统的内存，与 GUI 的 SAFE_RAM_RESERVE 一致
+
+_ROTATIONAL_CACHE: Dict[int, bool] = {}
+
+
+def source_is_ssd(path: str) -> bool:
+    """
+    源文件所在块设备是否为非旋转介质 (Linux 读取 /sys/dev/block/<主:次>/queue/rotational，按设备号缓存)。
+    其他平台或无法判断 (tmpfs、网络文件系统等) 时视为 SSD，与 GUI 在非 Windows 平台的默认一致。
+    """
+    if not sys.platform.startswith("linux"):
+        return True
+    try:
+        dev = os.stat(path).st_dev
+    except OSError:
+        return True
+    if dev not in _ROTATIONAL_CACHE:
+        is_ssd = True
+        node = os.path.realpath(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}")
+        for base in (node, os.path.dirname(node)):  # 分区节点没有 queue/，取其所属磁盘
+            try:
+                with open(os.path.join(base, "queue", "rotational"), "r", encoding="ascii") as f:
+                    is_ssd = f.read().strip() == "0"
+                break
+            except OSError:
+                continue
+        _ROTATIONAL_CACHE[dev] = is_ssd
+    return _ROTATIONAL_CACHE[dev]
+
+
+def headless_ram_limit_gb() -> float:
+    """内存层级的默认上限：HEADLESS_RAM_LIMIT_GB 与 (物理内存 - 系统保留) 取小；无法获取物理内存时不使用内存层级"""
+    try:
+        total_gb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024 ** 3)
+    except (AttributeError, ValueError, OSError):
+        return 0.0
+    return max(0.0, min(HEADLESS_RAM_LIMIT_GB, total_gb - HEADLESS_RAM_RESERVE_GB))
+
+
+class HeadlessJob(EncodeJob):
+    """Headless 队列中的一个任务：EncodeJob 加上所属监视配置 (profile，决定输出目录与完成后的处理)"""
+
+    def __init__(self, src: str, profile: Dict[str, Any], settings: Dict[str, Any], size_bytes: int) -> None:
+        super().__init__(src, size_bytes, settings, profile.get("output_dir"))
+        self.profile = profile
+
+
+class HeadlessRunner(EngineListener):
+    """
+    命令行批处理：驱动与 GUI 相同的 EncodeEngine (调度策略、工作线程、降级重试均在引擎中)，
+    本类只负责入队前的清单/缺失检查，并把引擎回调输出为 JSON Lines 事件。
+    """
+
+    def __init__(self, settings: Dict[str, Any], workers: Optional[int] = None, output_dir: Optional[str] = None,
+                 work_dir: Optional[str] = None, ffmpeg_path: Optional[str] = None, ffprobe_path: Optional[str] = None,
+                 use_manifest: bool = True, progress_interval: float = 1.0, emit: Optional[Any] = None,
+                 ram_limit_gb: Optional[float] = None, queue_order: str = "size") -> None:
+        if queue_order not in QUEUE_ORDERS:
+            raise ValueError(f"unknown queue order: {queue_order}")
+        default_ffmpeg, default_ffprobe = resolve_ffmpeg_binaries()
+        self.ffmpeg_path = ffmpeg_path or default_ffmpeg
+        self.settings = settings
+        work_dir = work_dir or output_dir or tempfile.gettempdir()
+        os.makedirs(work_dir, exist_ok=True)
+        facts = HardwareProbe.snapshot(self.ffmpeg_path)
+        self.hw_route = facts["hw_encode"]
+        self.workers = workers or facts["rec_slots"]
+        self.queue_order = queue_order
+        self.manifest = OutputManifest() if use_manifest else None
+        self.metrics = EncoderMetrics()
+        self.metrics.collectors.append(self._collect_metrics)
+        self.engine = EncodeEngine(self, self.ffmpeg_path, ffprobe_path or default_ffprobe, work_dir=work_dir,
+                                   workers=self.workers, hw_route=self.hw_route, metrics=self.metrics,
+                                   manifest=self.manifest, is_ssd=source_is_ssd,
+                                   ram_limit_gb=headless_ram_limit_gb() if ram_limit_gb is None else ram_limit_gb,
+                                   output_dir=output_dir, progress_interval=progress_interval, keep_finished=False,
+                                   metrics_extra={"headless": True})
+        self._emit_lock = threading.Lock()
+        self._emit_fn = emit
+        self.results: Dict[str, str] = {}  # path -> done / skipped / failed / interrupted
+
+    @property
+    def stopping(self) -> bool:
+        return self.engine.stopping
+
+    def _collect_metrics(self) -> List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]:
+        busy = self.engine.busy_lanes()
+        return [("cinetico_slots", "gauge", "Encode slots by use.", [({"use": "total"}, self.workers), ({"use": "busy"}, busy)]),
+                ("cinetico_slot_utilisation", "gauge", "Busy encode slots divided by total slots.",
+                 [({}, busy / self.workers if self.workers else 0.0)])]
+
+    def emit(self, event: str, **fields: Any) -> None:
+        """输出一条 JSON Lines 事件 (单行、立即刷新，便于 journald 或上层脚本逐行解析)"""
+        record = {"event": event, "ts": round(time.time(), 3), **fields}
+        with self._emit_lock:
+            if self._emit_fn:
+                self._emit_fn(record)
+                return
+            try:
+                print(json.dumps(record, ensure_ascii=False), flush=True)
+            except (OSError, ValueError):  # 读取端已关闭 (如管道下游退出)：丢弃事件，编码照常进行
+                pass
+
+    def stop(self) -> None:
+        """停止全部任务：不再派发，结束运行中的进程组与一次性命令"""
+        self.engine.stop()
+
+    def run(self, files: List[str]) -> int:
+        t0 = time.time()
+        self.emit("start", files=len(files), workers=self.workers, hw_encode=self.hw_route, settings=self.settings)
+        self.submit(files)
+        self.engine.run(until_idle=True)
+        self._drain()
+        values = list(self.results.values())
+        counts = {state: values.count(state) for state in ("done", "skipped", "failed", "interrupted")}
+        self.emit("summary", wall_sec=round(time.time() - t0, 3), **counts)
+        if self.stopping:
+            return EXIT_INTERRUPTED
+        return EXIT_JOB_FAILED if counts["failed"] else EXIT_OK
+
+    def serve(self, watcher: "FolderWatcher") -> int:
+        """
+        常驻模式：监视目录报告的稳定文件按所属配置 (profile) 入队，由调度循环处理，直到 stop()。
+        以信号停止属于正常退出 (systemd 服务)，返回 EXIT_OK。
+        """
+        self.emit("watching", folders=[p["path"] for p in watcher.profiles], workers=self.workers,
+                  hw_encode=self.hw_route, backend=watcher.backend)
+
+        def on_ready(path: str, profile: Dict[str, Any]) -> None:
+            self.emit("queued", file=path, profile=profile.get("name"))
+            self.submit([path], profile)
+
+        watcher.on_ready = on_ready
+        watcher.start()
+        self.engine.run(until_idle=False)
+        watcher.stop()
+        self._drain()
+        return EXIT_OK
+
+    def submit(self, paths: List[str], profile: Optional[Dict[str, Any]] = None) -> None:
+        """入队：源文件缺失或成品清单命中的任务直接结算，其余交给引擎按 queue_order 二分插入等待段"""
+        profile = profile or {}
+        settings = dict(self.settings, **profile.get("settings", {}))
+        jobs: List[EncodeJob] = []
+        for src in paths:
+            if not os.path.isfile(src):
+                self.emit("failed", file=src, reason="not_found")
+                self._record(src, "failed")
+                continue
+            if self.manifest is not None:
+                existing = self.manifest.lookup(src, settings)
+                if existing:
+                    self.metrics.manifest_skips.inc()
+                    self.emit("skipped", file=src, output=existing)
+                    self._record(src, "skipped")
+                    continue
+            try:
+                size = os.path.getsize(src)
+            except OSError:
+                self.emit("failed", file=src, reason="not_found")
+                self._record(src, "failed")
+                continue
+            jobs.append(HeadlessJob(src, profile, settings, size))
+        if jobs:
+            self.engine.add(jobs, order=self.queue_order)
+
+    def _record(self, src: str, result: str) -> None:
+        self.results[src] = result
+        self.metrics.jobs_finished.inc(1, result)
+
+    def _drain(self) -> None:
+        """调度循环结束后：等待工作线程收尾，未完成的任务记为中断，关闭线程池与内存文件服务器"""
+        self.engine.shutdown(wait=True)
+        for job in self.engine.release_unfinished():
+            if self.results.get(job.filepath) != "interrupted":
+                self.interrupted(job)
+
+    # --- EngineListener：引擎回调 -> JSON Lines 事件 ---
+    def caching(self, job: EncodeJob) -> None:
+        self.emit("caching", file=job.filepath, tier=job.source_mode)
+
+    def encoding_started(self, jobs: List[EncodeJob], info: Dict[str, Any]) -> Any:
+        extra = {key: info[key] for key in ("segments", "batch", "node") if key in info}
+        for job in jobs:
+            self.emit("encoding", file=job.filepath, attempt=job.attempt, duration_sec=round(job.duration_sec or 0.0, 3),
+                      hw_decode=info["hw_decode"], tier=job.source_mode, lanes=max(1, info["lanes"]), **extra)
+        return None
+
+    def progress(self, handle: Any, jobs: List[EncodeJob], fraction: Optional[float], fps: float,
+                 eta_sec: Optional[float], out_time_sec: float, speed: float = 0.0, size: int = 0,
+                 members: Optional[List[float]] = None) -> None:
+        if members is not None:  # 合批：各成员按自身时长报告
+            for job, value in zip(jobs, members):
+                self.emit("progress", file=job.filepath, progress=round(value, 4),
+                          out_time_sec=round(min(out_time_sec, job.duration_sec or out_time_sec), 3), fps=fps, speed=speed)
+            return
+        self.emit("progress", file=jobs[0].filepath, progress=None if fraction is None else round(fraction, 4),
+                  out_time_sec=round(out_time_sec, 3), fps=round(fps, 2), speed=speed, size=size,
+                  eta_sec=None if eta_sec is None else round(eta_sec, 1))
+
+    def retry(self, job: EncodeJob, cause: str, plan: str, detail: Optional[str] = None) -> None:
+        fields = {"detail": detail} if detail else {}
+        self.emit("retry", file=job.filepath, cause=cause, plan=plan, **fields)
+
+    def done(self, job: EncodeJob, output: Optional[str], input_size: int, output_size: int,
+             record: Dict[str, Any]) -> None:
+        profile = getattr(job, "profile", {})
+        if output and profile.get("on_done"):
+            apply_done_action(job.filepath, output, profile)
+        self.emit("done", file=job.filepath, output=output, input_size=input_size, output_size=output_size,
+                  ratio=round(output_size / input_size, 4) if input_size else None, metrics=record)
+        self._record(job.filepath, "done")
+
+    def failed(self, job: EncodeJob, reason: str, **detail: Any) -> None:
+        self.emit("failed", file=job.filepath, reason=reason, **detail)
+        self._record(job.filepath, "failed")
+
+    def cancelled(self, job: EncodeJob, partial: Optional[str]) -> None:
+        self.failed(job, "cancelled", partial=partial)
+
+    def interrupted(self, job: EncodeJob) -> None:
+        self.emit("interrupted", file=job.filepath)
+        self._record(job.filepath, "interrupted")
+
+
+def headless_main(argv: Optional[List[str]] = None) -> int:
+    """
+    Headless 模式入口：python Cinetico_Encoder.py --headless [选项] 路径...
+    加 --watch 配置文件 时作为常驻服务监视热文件夹。不导入任何 GUI 模块；退出码见 EXIT_* 常量。
+    """
+    parser = argparse.ArgumentParser(prog="Cinetico_Encoder.py --headless", description="Cinético headless batch encoder")
+    parser.add_argument("--headless", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help="视频文件或文件夹 (文件夹递归扫描)")
+    parser.add_argument("--manifest", default=None, help="输入清单：JSON 数组 / {\"files\": [...]} / 每行一个路径")
+    parser.add_argument("--codec", choices=["H.264", "H.265", "AV1"], default="H.264")
+    parser.add_argument("--crf", type=int, default=28)
+    parser.add_argument("--gpu", action="store_true", help="使用硬件编码 (不可用时回退 CPU)")
+    parser.add_argument("--10bit", dest="ten_bit", action="store_true")
+    parser.add_argument("--keep-meta", action="store_true")
+    parser.add_argument("--workers", type=int, default=None, help="并发任务数 (默认按硬件推导)")
+    parser.add_argument("--output-dir", default=None, help="输出目录 (默认写在源文件旁)")
+    parser.add_argument("--work-dir", default=None, help="临时输出目录")
+    parser.add_argument("--no-skip", action="store_true", help="忽略成品清单，已编码过的源文件也重新编码")
+    parser.add_argument("--progress-interval", type=float, default=1.0, help="单任务进度事件的最小间隔 (秒)")
+    parser.add_argument("--ram-limit", type=float, default=None,
+                        help="机械盘源读入内存的驻留上限 GB (默认按物理内存推导，0 表示只用 SSD 缓存)")
+    parser.add_argument("--order", choices=QUEUE_ORDERS, default="size", help="等待队列排序 (默认小文件优先)")
+    parser.add_argument("--ffmpeg", default=None)
+    parser.add_argument("--ffprobe", default=None)
+    parser.add_argument("--watch", default=None, metavar="CONFIG", help="监视配置 (JSON)，常驻运行直到收到 SIGINT/SIGTERM")
+    parser.add_argument("--stable-sec", type=float, default=WATCH_STABLE_SEC, help="文件保持不变多久后入队 (秒)")
+    parser.add_argument("--poll", action="store_true", help="强制使用 scandir 轮询 (如网络文件系统上 inotify 收不到事件)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="在 127.0.0.1:端口/metrics 提供 Prometheus 指标")
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+
+    files: List[str] = []
+    profiles: List[Dict[str, Any]] = []
+    try:
+        if args.watch:
+            profiles = load_watch_config(args.watch)
+        else:
+            files = collect_inputs(args.paths, args.manifest)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[Headless] cannot read {'watch config' if args.watch else 'manifest'}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not files and not profiles:
+        print("[Headless] no input files", file=sys.stderr)
+        return EXIT_USAGE
+
+    ffmpeg_path, ffprobe_path = resolve_ffmpeg_binaries()
+    ffmpeg_path, ffprobe_path = args.ffmpeg or ffmpeg_path, args.ffprobe or ffprobe_path
+    for binary in (ffmpeg_path, ffprobe_path):
+        try:
+            subprocess.run([binary, "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+                           **get_subprocess_args())
+        except (OSError, subprocess.SubprocessError):
+            print(f"[Headless] {binary} is not available", file=sys.stderr)
+            return EXIT_NO_FFMPEG
+
+    settings = {"codec": args.codec, "gpu": args.gpu, "crf": args.crf, "10bit": args.ten_bit, "keep_meta": args.keep_meta}
+    runner = HeadlessRunner(settings, workers=args.workers, output_dir=args.output_dir, work_dir=args.work_dir,
+                            ffmpeg_path=ffmpeg_path, ffprobe_path=ffprobe_path, use_manifest=not args.no_skip,
+                            progress_interval=args.progress_interval, ram_limit_gb=args.ram_limit, queue_order=args.order)
+
+    def on_signal(signum: int, frame: Any) -> None:
+        runner.emit("stopping", signal=signum)
+        runner.stop()
+    signal.signal(signal.SIGINT, on_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, on_signal)
+    if args.metrics_port is not None:
+        ControlAPIServer(None, EventHub(), args.metrics_port, extra_routes={"/metrics": runner.metrics.route}).start()
+    if profiles:
+        return runner.serve(FolderWatcher(profiles, stable_sec=args.stable_sec, use_inotify=False if args.poll else None))
+    return runner.run(files)
+
+
+# =========================================================================
+# [Core 13] Watch-Folder Ingestion
+# 功能：监视热文件夹 (Linux 使用 inotify，其他平台以 scandir 轮询兜底)，文件大小与 mtime 在窗口期内
+# 保持不变且无进程以写方式打开时才入队；每个文件夹可配置独立的编码设置与完成后的处理方式
+# =========================================================================
+
+WATCH_STABLE_SEC = 10.0   # 大小与 mtime 保持不变的时长
+WATCH_POLL_SEC = 2.0      # 轮询 / 稳定性检查周期
+WATCH_IGNORED_DIRS = ("_done",)
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_IN_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+
+
+def is_watch_candidate(name: str) -> bool:
+    """只接收视频文件，排除隐藏文件、临时文件与本工具的产物"""
+    return (name.lower().endswith(HEADLESS_VIDEO_EXTS) and not name.startswith((".", "TEMP_ENC_", "CACHE_"))
+            and "_Compressed_" not in name)
+
+
+def load_watch_config(path: str) -> List[Dict[str, Any]]:
+    """
+    读取监视配置 (JSON)：{"folders": [{"path": ..., "name": ..., "recursive": true,
+    "settings": {"codec": "H.265", "crf": 26, ...}, "output_dir": ..., "on_done": "move_source" | "tag",
+    "done_dir": ...}]}。settings 中缺省的键沿用命令行设置。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    profiles = []
+    for item in data.get("folders", []) if isinstance(data, dict) else data:
+        if isinstance(item, str):
+            item = {"path": item}
+        folder = os.path.abspath(os.path.expanduser(item["path"]))
+        profile = dict(item, path=folder)
+        profile.setdefault("name", os.path.basename(folder.rstrip(os.sep)) or folder)
+        profile.setdefault("recursive", True)
+        profile.setdefault("settings", {})
+        if profile.get("on_done") not in (None, "none", "move_source", "tag"):
+            raise ValueError(f"unknown on_done action: {profile['on_done']}")
+        profiles.append(profile)
+    return profiles
+
+
+def apply_done_action(src: str, output: str, profile: Dict[str, Any]) -> None:
+    """
+    完成后的处理：move_source 把源文件移入 done_dir (默认 <监视目录>/_done，不再被监视)；
+    tag 在源文件与产物上写扩展属性 (user.cinetico.*)，文件系统不支持时改写旁路文件 <源文件>.cinetico.json。
+    """
+    action = profile.get("on_done")
+    try:
+        if action == "move_source":
+            done_dir = profile.get("done_dir") or os.path.join(profile["path"], "_done")
+            rel = os.path.relpath(os.path.dirname(src), profile["path"])
+            target_dir = os.path.normpath(os.path.join(done_dir, rel)) if not rel.startswith("..") else done_dir
+            os.makedirs(target_dir, exist_ok=True)
+            shutil.move(src, os.path.join(target_dir, os.path.basename(src)))
+        elif action == "tag":
+            tags = {"user.cinetico.output": output, "user.cinetico.profile": str(profile.get("name", ""))}
+            try:
+                for key, value in tags.items():
+                    os.setxattr(src, key, value.encode("utf-8"))
+                os.setxattr(output, "user.cinetico.source", src.encode("utf-8"))
+            except (AttributeError, OSError):
+                with open(src + ".cinetico.json", "w", encoding="utf-8") as f:
+                    json.dump({"output": output, "profile": profile.get("name")}, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"[Watch] on_done {action} failed for {src}: {e}", file=sys.stderr)
+
+
+def open_writer_paths(paths: Set[str]) -> Set[str]:
+    """
+    返回 paths 中仍被某个进程以写方式打开的文件 (Linux 扫描 /proc/*/fd，只检查写模式的描述符)。
+    其他平台无法低成本判断，返回空集合，仅依赖稳定窗口。
+    """
+    if not paths or not os.path.isdir("/proc/self/fd"):
+        return set()
+    real = {os.path.realpath(p): p for p in paths}  # /proc/*/fd 链接指向解析后的真实路径
+    busy: Set[str] = set()
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        fd_dir = f"/proc/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for fd in fds:
+            try:
+                target = os.readlink(f"{fd_dir}/{fd}")
+            except OSError:
+                continue
+            if target not in real:
+                continue
+            flags = None
+            try:
+                with open(f"/proc/{pid}/fdinfo/{fd}", "r") as f:
+                    for line in f:
+                        if line.startswith("flags:"):
+                            flags = int(line.split()[1], 8)
+                            break
+            except (OSError, ValueError, IndexError):
+                pass
+            if flags is None or flags & (os.O_WRONLY | os.O_RDWR):
+                busy.add(real[target])
+    return busy
+
+
+class StabilityTracker:
+    """
+    候选文件的稳定性判断。每个周期只 stat 尚未稳定的候选文件 (而非整个目录)，
+    (size, mtime_ns) 变化即重新计时；窗口期满后再确认没有写入者才放行。
+    """
+
+    def __init__(self, window_sec: float = WATCH_STABLE_SEC) -> None:
+        self.window_sec = window_sec
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, path: str, now: float) -> None:
+        """登记候选或重置其计时 (收到写入事件时)"""
+        with self._lock:
+            self._pending[path] = (-1, -1, now)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def due(self, now: float) -> List[str]:
+        """返回本周期判定稳定的文件并将其移出候选；已删除的候选直接丢弃"""
+        with self._lock:
+            items = list(self._pending.items())
+        ready: Set[str] = set()
+        for path, (size, mtime_ns, since) in items:
+            try:
+                st = os.stat(path)
+            except OSError:
+                with self._lock:
+                    self._pending.pop(path, None)
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                with self._lock:
+                    if path in self._pending:
+                        self._pending[path] = (st.st_size, st.st_mtime_ns, now)
+            elif now - since >= self.window_sec and st.st_size > 0:
+                ready.add(path)
+        if not ready:
+            return []
+        busy = open_writer_paths(ready)
+        with self._lock:
+            for path in busy:
+                if path in self._pending:
+                    size, mtime_ns, _ = self._pending[path]
+                    self._pending[path] = (size, mtime_ns, now)  # 仍在写入：重新计时
+            stable = sorted(ready - busy)
+            for path in stable:
+                self._pending.pop(path, None)
+        return stable
+
+
+class _InotifyBackend:
+    """Linux inotify (ctypes 调用 libc，无第三方依赖)；子目录在创建时自动加入监视"""
+
+    def __init__(self) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | getattr(os, "O_CLOEXEC", 0))
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+
+    def add_dir(self, path: str) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _IN_WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {path}")  # 多为 max_user_watches 耗尽
+        self._dirs[wd] = path
+
+    def read(self, timeout: float) -> Tuple[List[Tuple[str, bool]], bool]:
+        """返回 ([(路径, 是否目录)], 是否发生队列溢出)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], False
+        events: List[Tuple[str, bool]] = []
+        overflow = False
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _, length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+            offset += 16 + length
+            if mask & _IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            base = self._dirs.get(wd)
+            if base and name:
+                events.append((os.path.join(base, os.fsdecode(name)), bool(mask & _IN_ISDIR)))
+        return events, overflow
+
+    def close(self) -> None:
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class FolderWatcher:
+    """
+    热文件夹监视。新文件先进入 StabilityTracker，稳定后调用 on_ready(path, profile)。
+    - inotify：事件驱动，只对事件涉及的文件做 stat；事件队列溢出时对全部目录补扫一次
+    - 轮询：记录每个目录的 mtime，只有新增/删除过条目 (目录 mtime 变化) 的目录才重新 scandir，
+      已知条目集合做差集得到新文件，数万条目的目录在空闲周期内只需一次 stat
+    启动时已存在的文件同样作为候选 (已编码过的由成品清单跳过)。
+    """
+
+    def __init__(self, profiles: List[Dict[str, Any]], on_ready: Optional[Any] = None,
+                 stable_sec: float = WATCH_STABLE_SEC, poll_sec: float = WATCH_POLL_SEC,
+                 use_inotify: Optional[bool] = None) -> None:
+        self.profiles = profiles
+        self.on_ready = on_ready
+        self.poll_sec = poll_sec
+        self.tracker = StabilityTracker(stable_sec)
+        self._dir_mtime: Dict[str, int] = {}
+        self._dir_entries: Dict[str, Set[str]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify: Optional[_InotifyBackend] = None
+        if use_inotify is None:
+            use_inotify = platform.system() == "Linux"
+        if use_inotify:
+            try:
+                self._inotify = _InotifyBackend()
+            except (OSError, AttributeError) as e:
+                print(f"[Watch] inotify unavailable, polling instead: {e}", file=sys.stderr)
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._inotify else "poll"
+
+    def profile_for(self, path: str) -> Optional[Dict[str, Any]]:
+        """最长前缀匹配所属配置 (嵌套的监视目录以更具体者为准)"""
+        best = None
+        for profile in self.profiles:
+            root = profile["path"]
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                if not profile.get("recursive", True) and os.path.dirname(path) != root:
+                    continue
+                if best is None or len(root) > len(best["path"]):
+                    best = profile
+        return best
+
+    def _ignored_dir(self, path: str) -> bool:
+        return os.path.basename(path) in WATCH_IGNORED_DIRS or os.path.basename(path).startswith(".")
+
+    def _scan_dir(self, path: str, now: float, recursive: bool) -> None:
+        """scandir 单个目录：与已知条目做差集，新文件登记为候选，新子目录递归登记 (inotify 模式下同时加入监视)"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self._dir_mtime.pop(path, None)
+            self._dir_entries.pop(path, None)
+            return
+        if self._inotify and path not in self._dir_mtime:
+            try:
+                self._inotify.add_dir(path)
+            except OSError as e:
+                print(f"[Watch] {e}; falling back to polling", file=sys.stderr)
+                self._inotify.close()
+                self._inotify = None
+        self._dir_mtime[path] = mtime
+        known = self._dir_entries.setdefault(path, set())
+        current: Set[str] = set()
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    current.add(entry.name)
+                    if entry.name in known:
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and not self._ignored_dir(entry.path):
+                                subdirs.append(entry.path)
+                        elif is_watch_candidate(entry.name):
+                            self.tracker.touch(entry.path, now)
+                    except OSError:
+                        continue
+        except OSError:
+            return
+        self._dir_entries[path] = current
+        for sub in subdirs:
+            self._scan_dir(sub, now, recursive)
+
+    def rescan(self, now: float) -> None:
+        """轮询：只重新读取 mtime 发生变化 (条目增删) 的目录"""
+        for path in list(self._dir_mtime):
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                self._dir_mtime.pop(path, None)
+                self._dir_entries.pop(path, None)
+                continue
+            if mtime != self._dir_mtime[path]:
+                profile = self.profile_for(path)
+                self._scan_dir(path, now, bool(profile and profile.get("recursive", True)))
+
+    def _handle_events(self, events: List[Tuple[str, bool]], now: float) -> None:
+        for path, is_dir in events:
+            if is_dir:
+                profile = self.profile_for(path)
+                if profile and profile.get("recursive", True) and not self._ignored_dir(path):
+                    self._scan_dir(path, now, True)  # 目录被整体移入时其中的文件不会各自产生事件
+            elif is_watch_candidate(os.path.basename(path)) and self.profile_for(path):
+                self.tracker.touch(path, now)
+
+    def _collect(self, timeout: float, now_fn: Any) -> float:
+        """收集一轮变化：inotify 等待至多 timeout 秒的事件，轮询模式重新读取变化过的目录"""
+        if not self._inotify:
+            self.rescan(now_fn())
+            return now_fn()
+        events, overflow = self._inotify.read(timeout)
+        now = now_fn()
+        if overflow:
+            self._dir_mtime = {p: -1 for p in self._dir_mtime}  # 事件丢失：对全部目录补扫
+            self.rescan(now)
+        self._handle_events(events, now)
+        return now
+
+    def _dispatch_ready(self, now: float) -> List[str]:
+        ready = self.tracker.due(now)
+        for path in ready:
+            profile = self.profile_for(path)
+            if profile and self.on_ready:
+                self.on_ready(path, profile)
+        return ready
+
+    def poll_once(self, now: Optional[float] = None) -> List[str]:
+        """执行一个周期 (供脚本验证与单线程调用)：收集变化并返回本周期放行的文件"""
+        self._collect(0, time.time)
+        return self._dispatch_ready(time.time() if now is None else now)
+
+    def start(self) -> None:
+        now = time.time()
+        for profile in self.profiles:
+            os.makedirs(profile["path"], exist_ok=True)
+            self._scan_dir(profile["path"], now, profile.get("recursive", True))
+        self._thread = threading.Thread(target=self._loop, name="FolderWatcher", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        next_check = time.time() + self.poll_sec
+        while not self._stop.is_set():
+            if not self._inotify:
+                self._stop.wait(self.poll_sec)
+            now = self._collect(max(0.0, next_check - time.time()), time.time)
+            if self._inotify and now < next_check:
+                continue  # inotify 事件在两次稳定性检查之间只登记候选
+            next_check = now + self.poll_sec
+            try:
+                self._dispatch_ready(now)
+            except Exception as e:
+                print(f"[Watch] dispatch error: {e}", file=sys.stderr)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_sec + 1.0)
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+
+# =========================================================================
+# [Core 14] Local Control API
+# 功能：仅监听回环地址的 JSON 控制接口 (提交/列出/暂停/取消/调整优先级)，
+# 进度事件经 SSE 或分块 JSON Lines 推送；请求处理只做快照与投递，不阻塞编码路径
+# =========================================================================
+
+API_DEFAULT_PORT = 53334            # 53333 为单实例锁占用
+API_EVENT_BUFFER = 1000             # 每个订阅者的事件缓冲，消费过慢时丢弃最新事件并计数
+API_KEEPALIVE_SEC = 15.0
+API_ALLOWED_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+
+
+def job_id_for(path: str) -> str:
+    """任务 ID：规范化路径的短哈希 (稳定，可在重启后复用)"""
+    return hashlib.blake2b(os.path.normcase(os.path.abspath(path)).encode("utf-8"), digest_size=6).hexdigest()
+
+
+def api_port_from_env(value: Optional[str] = None) -> Optional[int]:
+    """CINETICO_API_PORT：端口号；0 / off 表示禁用"""
+    value = os.environ.get("CINETICO_API_PORT", "") if value is None else value
+    if value.strip().lower() in ("0", "off", "false", "no"):
+        return None
+    try:
+        return int(value) if value.strip() else API_DEFAULT_PORT
+    except ValueError:
+        return API_DEFAULT_PORT
+
+
+def validate_job_settings(settings: Any) -> Dict[str, Any]:
+    """只接受影响产物的设置键 (与成品清单一致)，类型不符时抛出 ValueError"""
+    if settings is None:
+        return {}
+    if not isinstance(settings, dict):
+        raise ValueError("settings must be an object")
+    clean: Dict[str, Any] = {}
+    for key, value in settings.items():
+        if key not in MANIFEST_SETTING_KEYS:
+            raise ValueError(f"unknown setting: {key}")
+        if key == "codec":
+            if value not in ("H.264", "H.265", "AV1"):
+                raise ValueError("codec must be H.264, H.265 or AV1")
+        elif key == "crf":
+            if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= 51:
+                raise ValueError("crf must be an integer between 0 and 51")
+        elif not isinstance(value, bool):
+            raise ValueError(f"{key} must be a boolean")
+        clean[key] = value
+    return clean
+
+
+class EventHub:
+    """
+    事件分发：publish() 只向各订阅者的有界队列 put_nowait，满则丢弃并计数，
+    因此发布方 (UI / 工作线程) 永远不会被慢速客户端阻塞。无订阅者时开销为一次判空。
+    """
+
+    def __init__(self, buffer: int = API_EVENT_BUFFER) -> None:
+        self._queue_cls = queue.Queue
+        self.buffer = buffer
+        self._subscribers: List[Any] = []
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def active(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self) -> Any:
+        q = self._queue_cls(maxsize=self.buffer)
+        with self._lock:
+            self._subscribers = self._subscribers + [q]
+        return q
+
+    def unsubscribe(self, q: Any) -> None:
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not q]
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        for q in self._subscribers:  # 读取不可变快照，无需加锁
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                self.dropped += 1
+
+
+class ControlAPIServer:
+    """
+    回环 HTTP 控制接口。后端 (GUI 或 Headless) 需提供：
+      list_jobs() -> [dict]；submit(files, settings, position, start) -> [job_id]；
+      control(job_id, action) -> bool (pause / resume / cancel)；
+      reprioritise(job_id, position) -> bool；state() -> dict；profile(action, memory) -> dict
+    路由：
+      GET  /api/jobs                      任务列表
+      POST /api/jobs                      {"files": [...], "settings": {...}, "position": 0?, "start": true?}
+      POST /api/jobs/<id>/<action>        pause / resume / cancel
+      POST /api/jobs/<id>/priority        {"position": N}
+      GET  /api/state                     缓存、槽位与吞吐状态
+      GET  /api/events[?format=jsonl]     SSE (默认) 或分块 JSON Lines
+      GET|POST /api/profile               {"action": "start" | "stop" | "status", "memory": false}
+    所有 POST 须带 Content-Type: application/json；携带非回环 Origin 的请求一律拒绝 (防跨站请求)。
+    设置了 CINETICO_API_TOKEN 时需携带 Authorization: Bearer <token>。
+    """
+
+    def __init__(self, backend: Any, hub: EventHub, port: int = API_DEFAULT_PORT,
+                 token: Optional[str] = None, extra_routes: Optional[Dict[str, Any]] = None) -> None:
+        self.backend = backend
+        self.hub = hub
+        self.port = port
+        self.token = token if token is not None else os.environ.get("CINETICO_API_TOKEN") or None
+        self.extra_routes = extra_routes or {}  # GET 路径 -> () -> (content_type, bytes)
+        self.server: Any = None
+        self._stopping = threading.Event()
+
+    def start(self) -> bool:
+        """绑定失败 (端口占用等) 时返回 False，主程序照常运行"""
+        api = self
+
+        class _Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                api._dispatch(self, "GET")
+
+            def do_POST(self) -> None:
+                api._dispatch(self, "POST")
+
+        try:
+            self.server = http.server.ThreadingHTTPServer(("127.0.0.1", self.port), _Handler)
+        except OSError as e:
+            print(f"[API] disabled: {e}", file=sys.stderr)
+            return False
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="ControlAPI", daemon=True).start()
+        return True
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    # --- 请求处理 ---
+    @staticmethod
+    def _send(handler: Any, status: int, body: Any, content_type: str = "application/json") -> None:
+        data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(data)))
+        handler.send_header("Cache-Control", "no-store")
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    @staticmethod
+    def _hostname(value: str) -> str:
+        return value.split("]")[0] + "]" if value.startswith("[") else value.split(":")[0]
+
+    def _authorised(self, handler: Any) -> bool:
+        host = self._hostname(handler.headers.get("Host") or "")
+        if host not in API_ALLOWED_HOSTS:  # 拒绝 DNS 重绑定：浏览器页面无法冒充回环主机名
+            return False
+        origin = handler.headers.get("Origin")
+        if origin is not None:  # 浏览器发起的跨站请求必带 Origin (含 "null")；只放行回环来源的页面
+            parts = urlsplit(origin)
+            if parts.scheme not in ("http", "https") or parts.hostname not in LOOPBACK_HOSTS:
+                return False
+        if self.token:
+            return hmac.compare_digest(handler.headers.get("Authorization", ""), f"Bearer {self.token}")
+        return True
+
+    def _read_json(self, handler: Any) -> Any:
+        length = int(handler.headers.get("Content-Length") or 0)
+        if length > 1024 * 1024:
+            raise ValueError("request body too large")
+        raw = handler.rfile.read(length) if length else b""
+        return json.loads(raw.decode("utf-8")) if raw else {}
+
+    def _dispatch(self, handler: Any, method: str) -> None:
+        url = urlsplit(handler.path)
+        parts = [p for p in url.path.split("/") if p]
+        try:
+            if not self._authorised(handler):
+                return self._send(handler, 403, {"error": "forbidden"})
+            # 所有 POST 必须声明 JSON：text/plain 等"简单请求"可被任意网页免预检地跨站发出
+            content_type = (handler.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+            if method == "POST" and content_type != "application/json":
+                return self._send(handler, 415, {"error": "Content-Type must be application/json"})
+            if method == "GET" and url.path in self.extra_routes:
+                content_type, data = self.extra_routes[url.path]()
+                return self._send(handler, 200, data, content_type)
+            if parts[:1] != ["api"] or self.backend is None:  # 无后端时仅提供 extra_routes (如 Headless 的 /metrics)
+                return self._send(handler, 404, {"error": "not found"})
+            route = parts[1:]
+            if method == "GET" and route == ["jobs"]:
+                return self._send(handler, 200, {"jobs": self.backend.list_jobs()})
+            if method == "GET" and route == ["state"]:
+                return self._send(handler, 200, dict(self.backend.state(), events_dropped=self.hub.dropped))
+            if method == "GET" and route == ["events"]:
+                return self._stream_events(handler, parse_qs(url.query).get("format", ["sse"])[0])
+            if route == ["profile"] and method in ("GET", "POST"):
+                body = self._read_json(handler) if method == "POST" else {"action": "status"}
+                if body.get("action") not in ("status", "start", "stop"):
+                    raise ValueError("action must be status, start or stop")
+                return self._send(handler, 200, self.backend.profile(body["action"], bool(body.get("memory", False))))
+            if method == "POST" and route == ["jobs"]:
+                body = self._read_json(handler)
+                files = body.get("files")
+                if not isinstance(files, list) or not files or not all(isinstance(f, str) for f in files):
+                    raise ValueError("files must be a non-empty list of paths")
+                missing = [f for f in files if not os.path.isfile(f)]
+                if missing:
+                    return self._send(handler, 400, {"error": "file not found", "files": missing})
+                position = body.get("position")
+                if position is not None and (isinstance(position, bool) or not isinstance(position, int)):
+                    raise ValueError("position must be an integer")
+                ids = self.backend.submit(files, validate_job_settings(body.get("settings")), position,
+                                          bool(body.get("start", False)))
+                return self._send(handler, 202, {"jobs": ids})
+            if method == "POST" and len(route) == 3 and route[0] == "jobs":
+                job_id, action = route[1], route[2]
+                if action == "priority":
+                    position = self._read_json(handler).get("position")
+                    if isinstance(position, bool) or not isinstance(position, int):
+                        raise ValueError("position must be an integer")
+                    ok = self.backend.reprioritise(job_id, position)
+                elif action in ("pause", "resume", "cancel"):
+                    ok = self.backend.control(job_id, action)
+                else:
+                    return self._send(handler, 404, {"error": f"unknown action: {action}"})
+                return self._send(handler, 202 if ok else 404, {"ok": ok})
+            return self._send(handler, 404, {"error": "not found"})
+        except (ValueError, KeyError, AttributeError) as e:
+            return self._send(handler, 400, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _stream_events(self, handler: Any, fmt: str) -> None:
+        """长连接推送：SSE 为 data 帧，jsonl 为分块传输的逐行 JSON；空闲时发送保活"""
+        jsonl = fmt == "jsonl"
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson" if jsonl else "text/event-stream")
+        handler.send_header("Cache-Control", "no-store")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def write_chunk(data: bytes) -> None:
+            handler.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            handler.wfile.flush()
+
+        q = self.hub.subscribe()
+        try:
+            write_chunk(b"\n" if jsonl else b": connected\n\n")
+            while not self._stopping.is_set():
+                try:
+                    event = q.get(timeout=API_KEEPALIVE_SEC)
+                except queue.Empty:
+                    write_chunk(b"\n" if jsonl else b": keepalive\n\n")
+                    continue
+                line = json.dumps(event, ensure_ascii=False)
+                write_chunk((line + "\n").encode("utf-8") if jsonl else f"event: {event.get('event', 'message')}\ndata: {line}\n\n".encode("utf-8"))
+            write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            self.hub.unsubscribe(q)
+            handler.close_connection = True
+
+
+# =========================================================================
+# [Core 15] Metrics Export
+# 功能：Prometheus 文本格式指标。计数器与直方图只在阶段结束时累加一次 (不进入逐帧/逐块循环)，
+# 队列状态、内存缓存与槽位等仪表在抓取时由回调现场计算，平时零开销
+# =========================================================================
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_STAGES = ("probe", "cache", "encode", "relocate")
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+JOB_STATE_NAMES = {STATE_PENDING: "pending", STATE_QUEUED_IO: "queued_io", STATE_CACHING: "caching", STATE_READY: "ready",
+                   STATE_ENCODING: "encoding", STATE_DONE: "done", STATE_ERROR: "error"}
+
+
+def _metric_labels(labelnames: Tuple[str, ...], values: Tuple[Any, ...]) -> str:
+    if not labelnames:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labelnames, escaped)) + "}"
+
+
+def _metric_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """单调计数器；inc() 为一次无竞争加锁的字典累加"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> None:
+        self.name, self.help, self.labelnames = name, help_text, labelnames
+        self._values: Dict[Tuple[Any, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, *labels: Any) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def value(self, *labels: Any) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items(), key=lambda kv: tuple(map(str, kv[0])))
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_metric_labels(self.labelnames, k)} {_metric_value(v)}" for k, v in items)
+        return lines
+
+
+class Histogram:
+    """累积桶直方图 (Prometheus 语义)；observe() 为一次二分查找加一次计数"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = STAGE_BUCKETS) -> None:
+        self.name, self.help, self.labelnames = name, help_text, labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[Any, ...], List[float]] = {}  # labels -> [桶计数..., +Inf 计数, 总和]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: Any) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels: Any) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(((k, list(v)) for k, v in self._series.items()), key=lambda kv: tuple(map(str, kv[0])))
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for labels, series in items:
+            cumulative = 0.0
+            for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_metric_labels(names, labels + (le,))} {_metric_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_metric_labels(self.labelnames, labels)} {_metric_value(series[-1])}")
+            lines.append(f"{self.name}_count{_metric_labels(self.labelnames, labels)} {_metric_value(cumulative)}")
+        return lines
+
+
+class EncoderMetrics:
+    """
+    编码器指标集合 (GUI 与 Headless 共用)。
+    collectors 为抓取时调用的回调，返回 [(name, type, help, [(labels dict, value), ...]), ...]，
+    用于队列状态、内存缓存与槽位等瞬时量。
+    """
+
+    def __init__(self) -> None:
+        self.jobs_finished = Counter("cinetico_jobs_finished_total", "Jobs that reached a terminal state.", ("result",))
+        self.frames = Counter("cinetico_encoded_frames_total", "Video frames written by encoder processes.")
+        self.read_bytes = Counter("cinetico_source_read_bytes_total",
+                                  "Bytes read by encoder processes, by source tier.", ("tier",))
+        self.cache_fill_bytes = Counter("cinetico_cache_fill_bytes_total",
+                                        "Bytes copied from source storage into a cache tier.", ("tier",))
+        self.output_bytes = Counter("cinetico_output_bytes_total", "Bytes of finished encoder output.")
+        self.manifest_skips = Counter("cinetico_manifest_skips_total", "Inputs skipped because the output manifest already had them.")
+        self.stage_seconds = Histogram("cinetico_stage_duration_seconds", "Wall time spent per job stage.", ("stage",))
+        self.collectors: List[Any] = []
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        self.stage_seconds.observe(max(0.0, seconds), stage)
+
+    def observe_job(self, usage: "ProcessUsage", tier: str, output_bytes: int) -> None:
+        """一次成功编码结束时调用：帧数、按层级统计的读取字节与输出字节"""
+        self.frames.inc(usage.frames)
+        self.read_bytes.inc(usage.read_chars or usage.read_bytes, tier.lower())
+        self.output_bytes.inc(output_bytes)
+
+    def render(self) -> bytes:
+        lines: List[str] = []
+        for metric in (self.jobs_finished, self.frames, self.read_bytes, self.cache_fill_bytes,
+                       self.output_bytes, self.manifest_skips, self.stage_seconds):
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:  # 单个回调失败不影响其余指标
+                print(f"[Metrics] collector failed: {e}", file=sys.stderr)
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    keys = tuple(labels)
+                    lines.append(f"{name}{_metric_labels(keys, tuple(labels[k] for k in keys))} {_metric_value(value)}")
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def route(self) -> Tuple[str, bytes]:
+        """ControlAPIServer.extra_routes 的 /metrics 处理函数"""
+        return METRICS_CONTENT_TYPE, self.render()
+
+
+# =========================================================================
+# [Core 16] Stage Tracing
+# 功能：按任务记录各阶段的 span (探测/音频解复用/等待槽位/缓存/编码/迁移/清理) 与调度决策，
+# 由后台线程写入滚动 JSONL；可导出为 Chrome trace_event 格式在 chrome://tracing / Perfetto 中查看。
+# 关闭时 span() 返回共享的空上下文管理器，开销仅为一次属性判断
+# =========================================================================
+
+TRACE_MAX_BYTES = 32 * 1024 * 1024
+TRACE_BACKUPS = 3
+
+
+def default_trace_path() -> str:
+    return os.path.join(os.path.expanduser("~"), ".cinetico", "traces", "trace.jsonl")
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "job", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, job: Optional[str], args: Dict[str, Any]) -> None:
+        self.tracer, self.name, self.job, self.args = tracer, name, job, args
+        self.start = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.complete(self.name, self.start, time.time(), self.job, **self.args)
+
+    def set(self, **args: Any) -> None:
+        """在 span 结束前补充结果字段 (如退出码、选中的缓存层级)"""
+        self.args.update(args)
+
+
+class Tracer:
+    """
+    span 记录器。启用方式：环境变量 CINETICO_TRACE=1 (或直接给出 JSONL 路径)。
+    记录只在调用线程里组装为字典并入队，序列化与写盘由后台线程批量完成；
+    文件超过 max_bytes 时滚动为 .1 … .N。
+    """
+
+    def __init__(self, path: Optional[str] = None, enabled: Optional[bool] = None,
+                 max_bytes: int = TRACE_MAX_BYTES, backups: int = TRACE_BACKUPS) -> None:
+        env = os.environ.get("CINETICO_TRACE", "").strip()
+        if enabled is None:
+            enabled = bool(env) and env.lower() not in ("0", "off", "false", "no")
+        if path is None:
+            path = env if env and env.lower() not in ("1", "on", "true", "yes") and enabled else default_trace_path()
+        self.path = path
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: Any = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def span(self, name: str, job: Optional[str] = None, **args: Any) -> Any:
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, job, args)
+
+    def complete(self, name: str, start: float, end: float, job: Optional[str] = None, **args: Any) -> None:
+        """记录一段已结束的区间 (墙钟秒)，用于跨线程测得的等待时间"""
+        if not self.enabled:
+            return
+        self._put({"ph": "X", "name": name, "job": job, "ts": round(start, 6), "dur": round(max(0.0, end - start), 6),
+                   "thread": threading.current_thread().name, "args": args})
+
+    def instant(self, name: str, job: Optional[str] = None, **args: Any) -> None:
+        """记录瞬时事件 (调度决策)"""
+        if not self.enabled:
+            return
+        self._put({"ph": "i", "name": name, "job": job, "ts": round(time.time(), 6),
+                   "thread": threading.current_thread().name, "args": args})
+
+    def _put(self, record: Dict[str, Any]) -> None:
+        self._queue.put(record)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._writer_loop, name="TraceWriter", daemon=True)
+                    self._thread.start()
+
+    def _writer_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < 1000:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            stop = None in batch
+            lines = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch if r is not None)
+            try:
+                if lines:
+                    self._write(lines)
+            except OSError as e:
+                print(f"[Trace] write failed: {e}", file=sys.stderr)
+            if stop:
+                return
+
+    def _write(self, data: str) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size and size + len(data) > self.max_bytes:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+    def close(self) -> None:
+        """写出队列中剩余的记录"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+
+def trace_files(path: Optional[str] = None) -> List[str]:
+    """当前 trace 文件及其滚动备份，按时间从旧到新"""
+    path = path or default_trace_path()
+    rotated = [f"{path}.{i}" for i in range(TRACE_BACKUPS, 0, -1) if os.path.exists(f"{path}.{i}")]
+    return rotated + ([path] if os.path.exists(path) else [])
+
+
+def export_chrome_trace(paths: List[str], out_path: str) -> int:
+    """
+    将 JSONL span 合并为 Chrome trace_event JSON：每个任务一行 (tid)，调度决策位于 "engine" 行。
+    返回写出的事件数。
+    """
+    events: List[Dict[str, Any]] = []
+    lanes: Dict[str, int] = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 进程被强杀时可能留下半行
+                job = record.get("job")
+                lane_name = os.path.basename(job) if job else record.get("thread") or "engine"
+                tid = lanes.setdefault(lane_name, len(lanes) + 1)
+                event = {"name": record["name"], "ph": record["ph"], "pid": 1, "tid": tid,
+                         "ts": int(record["ts"] * 1000000), "args": dict(record.get("args") or {}, thread=record.get("thread"))}
+                if record["ph"] == "X":
+                    event["dur"] = int(record["dur"] * 1000000)
+                else:
+                    event["s"] = "t"
+                events.append(event)
+    events.sort(key=lambda e: e["ts"])
+    meta = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}} for name, tid in lanes.items()]
+    meta.append({"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "Cinetico Encoder"}})
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return len(events)
+
+
+def trace_export_main(argv: Optional[List[str]] = None) -> int:
+    """python Cinetico_Encoder.py --export-trace OUT.json [trace.jsonl ...] (默认读取当前 trace 及其滚动备份)"""
+    parser = argparse.ArgumentParser(prog="Cinetico_Encoder.py --export-trace", description="Convert stage traces to Chrome trace format")
+    parser.add_argument("--export-trace", dest="out", required=True, metavar="OUT.json")
+    parser.add_argument("inputs", nargs="*", help="JSONL trace 文件 (默认 ~/.cinetico/traces/trace.jsonl*)")
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+    inputs = args.inputs or trace_files()
+    if not inputs:
+        print("[Trace] no trace files found", file=sys.stderr)
+        return EXIT_USAGE
+    try:
+        count = export_chrome_trace(inputs, args.out)
+    except (OSError, KeyError) as e:
+        print(f"[Trace] export failed: {e}", file=sys.stderr)
+        return EXIT_JOB_FAILED
+    print(f"[Trace] {count} events -> {args.out}", file=sys.stderr)
+    return EXIT_OK
+
+
+# =========================================================================
+# [Core 17] In-Memory Source Server
+# 功能：将内存中的视频数据 (分块 bytes 列表) 通过回环 HTTP 喂给 FFmpeg，避免写盘 (RAM 缓存层级)
+# =========================================================================
+
+GLOBAL_RAM_STORAGE: Dict[str, List[bytes]] = {}
+
+
+class GlobalRamHandler(http.server.SimpleHTTPRequestHandler):
+    """自定义 HTTP 处理器，支持高并发分块链表传输，彻底解决超大内存对象的分配崩溃"""
+    def log_message(self, format: str, *args: Any) -> None: pass
+
+    def do_GET(self) -> None:
+        try:
+            token = self.path.lstrip('/')
+            video_data_chunks = GLOBAL_RAM_STORAGE.get(token)  # 现在获取到的是一个 list[bytes]
+            if not video_data_chunks:
+                self.send_error(404)
+                return
+
+            # 计算总长度
+            total_length = sum(len(chunk) for chunk in video_data_chunks)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(total_length))
+            self.end_headers()
+
+            # [PyArchitect Fix] 流式向 Socket 吐出数据块，内存零拷贝
+            try:
+                for chunk in video_data_chunks:
+                    self.wfile.write(chunk)
+            except (ConnectionResetError, BrokenPipeError):
+                pass
+        except Exception:
+            pass
+
+
+def start_global_server() -> Tuple[Any, int]:
+    """启动本地回环 HTTP 服务器（安全加固版）"""
+    # 强制绑定 loopback，拒绝局域网访问
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), GlobalRamHandler)
+    server.daemon_threads = True
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, port
+
+
+# =========================================================================
+# [Core 18] Throughput Benchmark Suite
+# 功能：用 lavfi 生成确定性的测试素材 (分辨率/位深/时长矩阵)，在各源层级 (直读 / 内存 HTTP / SSD 缓存)
+# 与 CPU 编码配置、给定并发下测量 fps、墙钟、CPU 时间与峰值内存，结果写为 JSON 并可与基线比对
+# =========================================================================
+
+BENCH_SOURCES = {
+    "testsrc2": "testsrc2=size={size}:rate={rate}",
+    "mandelbrot": "mandelbrot=size={size}:rate={rate}",
+    "noise": "color=c=gray:size={size}:rate={rate},noise=alls=80:allf=t+u:all_seed=1",  # 固定种子，逐帧可复现
+}
+BENCH_MODES = ("direct", "ram", "ssd_cache")
+BENCH_RATE = 30
+BENCH_CRF = 28
+BENCH_TOLERANCE = 0.10  # 与基线相比 fps 下降 / CPU 时间或峰值内存上升超过 10% 视为回退
+
+
+def bench_clip_path(work_dir: str, source: str, size: str, depth: int, seconds: int) -> str:
+    return os.path.join(work_dir, "clips", f"{source}_{size}_{depth}bit_{seconds}s.mp4")
+
+
+def generate_bench_clip(orchestrator: "ProcessOrchestrator", ffmpeg_path: str, path: str, source: str,
+                        size: str, depth: int, seconds: int) -> bool:
+    """生成测试素材 (已存在则复用)。单线程 x264 + bitexact，同一 FFmpeg 版本下逐字节可复现"""
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        return True
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".part.mp4"
+    cmd = [ffmpeg_path, "-y", "-f", "lavfi", "-i", BENCH_SOURCES[source].format(size=size, rate=BENCH_RATE),
+           "-t", str(seconds), "-c:v", "libx264", "-preset", "veryfast", "-crf", "12", "-threads", "1",
+           "-pix_fmt", "yuv420p10le" if depth == 10 else "yuv420p", "-g", str(BENCH_RATE * 2),
+           "-fflags", "+bitexact", "-flags:v", "+bitexact", "-an", tmp]
+    rc, _, err = orchestrator.run(cmd, timeout=600.0).result()
+    if rc != 0 or not os.path.exists(tmp):
+        print(f"[Bench] clip generation failed: {os.path.basename(path)}: "
+              f"{err.decode(errors='replace').strip().splitlines()[-1:] if err else rc}", file=sys.stderr)
+        return False
+    os.replace(tmp, path)
+    return True
+
+
+def bench_profiles(codecs: List[str], depth: int) -> List[Tuple[str, List[str]]]:
+    """
+    CPU 编码配置：经 build_video_codec_args 生成 (与应用实际使用的参数一致)，按参数去重。
+    CPU 路径下各编码选项目前都映射到 libx264，去重后不会重复测量同一组参数。
+    """
+    profiles: List[Tuple[str, List[str]]] = []
+    seen: Set[Tuple[str, ...]] = set()
+    for codec in codecs:
+        args, _ = build_video_codec_args(codec, False, False, depth == 10, BENCH_CRF)
+        if tuple(args) in seen:
+            continue
+        seen.add(tuple(args))
+        profiles.append((f"{codec}-cpu-{depth}bit", args))
+    return profiles
+
+
+def _bench_encode(orchestrator: "ProcessOrchestrator", ffmpeg_path: str, inputs: List[str], outputs: List[str],
+                  codec_args: List[str], network: bool) -> Tuple[List[int], List["ProcessUsage"], float]:
+    """同时启动 len(inputs) 个编码进程，返回 (退出码, 各进程资源计数, 墙钟秒)"""
+    start = time.time()
+    procs = []
+    for src, out in zip(inputs, outputs):
+        cmd = [ffmpeg_path, "-y", "-benchmark"]
+        if network:
+            cmd.extend(["-probesize", "100M", "-analyzeduration", "100M"])  # 与 GUI 的内存流输入一致
+        cmd.extend(["-i", src, "-map", "0:v:0", *codec_args, "-progress", "pipe:1", "-nostats", out])
+        procs.append(orchestrator.spawn(cmd, popen_kwargs=process_group_kwargs()))
+    for proc in procs:
+        proc.wait()
+    return [p.returncode for p in procs], [p.usage for p in procs], time.time() - start
+
+
+def run_bench_case(orchestrator: "ProcessOrchestrator", ffmpeg_path: str, clip: str, mode: str,
+                   profile: Tuple[str, List[str]], concurrency: int, work_dir: str, ram_port: int) -> Dict[str, Any]:
+    """单个用例：按源层级准备输入 (准备耗时单独记录)，并发编码，汇总吞吐与资源"""
+    prep_start = time.time()
+    cleanup: List[str] = []
+    tokens: List[str] = []
+    if mode == "ssd_cache":
+        inputs = []
+        for _ in range(concurrency):
+            cached = os.path.join(work_dir, f"CACHE_{uuid.uuid4().hex}.mp4")
+            shutil.copyfile(clip, cached)
+            cleanup.append(cached)
+            inputs.append(cached)
+    elif mode == "ram":
+        with open(clip, "rb") as f:
+            chunks = list(iter(lambda: f.read(64 * 1024 * 1024), b""))
+        inputs = []
+        for _ in range(concurrency):
+            token = uuid.uuid4().hex
+            GLOBAL_RAM_STORAGE[token] = chunks
+            tokens.append(token)
+            inputs.append(f"http://127.0.0.1:{ram_port}/{token}")
+    else:
+        inputs = [clip] * concurrency
+    prep_sec = time.time() - prep_start
+
+    outputs = [os.path.join(work_dir, f"TEMP_ENC_{uuid.uuid4().hex}.mp4") for _ in range(concurrency)]
+    cleanup.extend(outputs)
+    try:
+        codes, usages, wall = _bench_encode(orchestrator, ffmpeg_path, inputs, outputs, profile[1], mode == "ram")
+        output_bytes = os.path.getsize(outputs[0]) if os.path.exists(outputs[0]) else 0
+    finally:
+        for token in tokens:
+            GLOBAL_RAM_STORAGE.pop(token, None)
+        for path in cleanup:
+            try: os.remove(path)
+            except OSError: pass
+    frames = sum(u.frames for u in usages)
+    cpu_sec = sum(u.cpu_sec for u in usages)
+    return {"mode": mode, "profile": profile[0], "concurrency": concurrency,
+            "rc": next((c for c in codes if c != 0), 0), "frames": frames,
+            "fps": round(frames / wall, 2) if wall > 0 else 0.0, "wall_sec": round(wall, 3),
+            "prep_sec": round(prep_sec, 3), "cpu_sec": round(cpu_sec, 3),
+            "cpu_util": round(cpu_sec / wall, 3) if wall > 0 else 0.0,
+            "max_rss_mb": round(max((u.max_rss_kb for u in usages), default=0) / 1024.0, 1),
+            "output_mb": round(output_bytes / (1024 * 1024), 3)}
+
+
+def bench_case_key(result: Dict[str, Any]) -> str:
+    return "/".join(str(result[k]) for k in ("source", "size", "depth", "seconds", "mode", "profile", "concurrency"))
+
+
+def compare_benchmarks(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+                       tolerance: float = BENCH_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    与基线逐用例比对，返回回退列表 [{"case", "metric", "baseline", "current", "change"}]。
+    fps 下降、CPU 时间或峰值内存上升超过 tolerance，或基线成功而本次失败，均计为回退。
+    """
+    base = {bench_case_key(r): r for r in baseline}
+    regressions: List[Dict[str, Any]] = []
+    for result in results:
+        key = bench_case_key(result)
+        old = base.get(key)
+        if old is None:
+            continue
+        if result["rc"] != 0 and old["rc"] == 0:
+            regressions.append({"case": key, "metric": "rc", "baseline": 0, "current": result["rc"], "change": None})
+            continue
+        for metric, worse_if_higher in (("fps", False), ("cpu_sec", True), ("max_rss_mb", True)):
+            before, after = old.get(metric) or 0, result.get(metric) or 0
+            if not before:
+                continue
+            change = (after - before) / before
+            if (change > tolerance) if worse_if_higher else (change < -tolerance):
+                regressions.append({"case": key, "metric": metric, "baseline": before, "current": after,
+                                    "change": round(change, 4)})
+    return regressions
+
+
+def bench_main(argv: Optional[List[str]] = None) -> int:
+    """
+    基准测试入口：python Cinetico_Encoder.py --benchmark [选项]
+    结果写入 --out (默认 ~/.cinetico/bench/bench_<时间>.json)；给出 --baseline 时比对，存在回退则退出码为 1。
+    """
+
+    def csv_list(value: str) -> List[str]:
+        return [v.strip() for v in value.split(",") if v.strip()]
+
+    parser = argparse.ArgumentParser(prog="Cinetico_Encoder.py --benchmark", description="Cinético throughput benchmark")
+    parser.add_argument("--benchmark", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--sources", type=csv_list, default=list(BENCH_SOURCES), help="testsrc2,mandelbrot,noise")
+    parser.add_argument("--sizes", type=csv_list, default=["1280x720", "1920x1080"])
+    parser.add_argument("--depths", type=csv_list, default=["8", "10"])
+    parser.add_argument("--lengths", type=csv_list, default=["10"], help="素材时长 (秒)")
+    parser.add_argument("--modes", type=csv_list, default=list(BENCH_MODES))
+    parser.add_argument("--codecs", type=csv_list, default=["H.264", "H.265", "AV1"])
+    parser.add_argument("--concurrency", type=csv_list, default=["1", "2"])
+    parser.add_argument("--work-dir", default=None, help="素材缓存与临时输出目录 (默认 ~/.cinetico/bench)")
+    parser.add_argument("--out", default=None, help="结果 JSON 路径")
+    parser.add_argument("--baseline", default=None, help="用于比对的基线结果 JSON")
+    parser.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE)
+    parser.add_argument("--ffmpeg", default=None)
+    try:
+        args = parser.parse_args(argv)
+        depths = [int(d) for d in args.depths]
+        lengths = [int(s) for s in args.lengths]
+        levels = [int(c) for c in args.concurrency]
+        unknown = [s for s in args.sources if s not in BENCH_SOURCES] + [m for m in args.modes if m not in BENCH_MODES]
+        if unknown or any(d not in (8, 10) for d in depths):
+            parser.error(f"unsupported value: {unknown or args.depths}")
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+    except ValueError as e:
+        print(f"[Bench] {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    ffmpeg_path = args.ffmpeg or resolve_ffmpeg_binaries()[0]
+    try:
+        version = subprocess.run([ffmpeg_path, "-version"], capture_output=True, check=True,
+                                 **get_subprocess_args()).stdout.decode(errors="replace").splitlines()[:1]
+    except (OSError, subprocess.SubprocessError):
+        print(f"[Bench] {ffmpeg_path} is not available", file=sys.stderr)
+        return EXIT_NO_FFMPEG
+
+    work_dir = args.work_dir or os.path.join(os.path.expanduser("~"), ".cinetico", "bench")
+    os.makedirs(work_dir, exist_ok=True)
+    orchestrator = ProcessOrchestrator()
+    ram_server, ram_port = start_global_server()
+    results: List[Dict[str, Any]] = []
+    try:
+        for source in args.sources:
+            for size in args.sizes:
+                for depth in depths:
+                    for seconds in lengths:
+                        clip = bench_clip_path(work_dir, source, size, depth, seconds)
+                        if not generate_bench_clip(orchestrator, ffmpeg_path, clip, source, size, depth, seconds):
+                            continue
+                        for profile in bench_profiles(args.codecs, depth):
+                            for mode in args.modes:
+                                for level in levels:
+                                    result = {"source": source, "size": size, "depth": depth, "seconds": seconds,
+                                              **run_bench_case(orchestrator, ffmpeg_path, clip, mode, profile,
+                                                               level, work_dir, ram_port)}
+                                    results.append(result)
+                                    print(f"[Bench] {bench_case_key(result)}: {result['fps']} fps, "
+                                          f"{result['wall_sec']} s, cpu {result['cpu_sec']} s, "
+                                          f"rss {result['max_rss_mb']} MB, rc={result['rc']}", file=sys.stderr)
+    except KeyboardInterrupt:
+        orchestrator.kill_runs()
+        print("[Bench] interrupted, writing partial results", file=sys.stderr)
+    finally:
+        orchestrator.shutdown()
+        ram_server.shutdown()
+
+    report = {"meta": {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "host": platform.node(), "platform": platform.platform(),
+                       "cpus": HardwareProbe.effective_cpu_count(),
+                       "ffmpeg": version[0] if version else "", "rate": BENCH_RATE, "crf": BENCH_CRF},
+              "results": results}
+    out = args.out or os.path.join(work_dir, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"[Bench] {len(results)} cases -> {out}", file=sys.stderr)
+
+    if args.baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)["results"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[Bench] cannot read baseline: {e}", file=sys.stderr)
+            return EXIT_USAGE
+        regressions = compare_benchmarks(results, baseline, args.tolerance)
+        for r in regressions:
+            print(f"[Bench] REGRESSION {r['case']} {r['metric']}: {r['baseline']} -> {r['current']}"
+                  + (f" ({r['change']:+.1%})" if r["change"] is not None else ""), file=sys.stderr)
+        if regressions:
+            return EXIT_JOB_FAILED
+    return EXIT_OK
+
+
+# =========================================================================
+# [Core 19] Scheduling Policy & Offline Simulator
+# 功能：把调度引擎的排序、I/O 名额与缓存层级决策抽为纯函数；离散事件模拟器以同一套决策 (含合批/分段)
+# 回放录制或合成的队列，在设备带宽/延迟、内存预算与编码通道模型下评估候选参数的完工时间、利用率与内存峰值
+# =========================================================================
+
+IO_MAX_ACTIVE = 1                  # 同时进行的预读数 (机械盘并发读会退化为随机寻道)
+QUEUE_ORDERS = ("size", "size_desc", "fifo")
+ENGINE_TICK_SEC = 0.1              # 调度引擎的轮询周期，模拟器按同一节拍决策
+SIM_SEGMENT_OVERHEAD = 0.05        # 分段并行的额外开销 (关键帧对齐、拼接)
+SIM_EWMA_ALPHA = 0.3               # 与 EncodeEngine 记录启动开销/编码速度时相同的平滑系数
+SIM_DEFAULT_BOX: Dict[str, Any] = {
+    "hdd": {"bandwidth_mb_s": 180.0, "latency_ms": 12.0, "seek_penalty": 0.6},   # 机械盘源：并发流按寻道惩罚折损总带宽
+    "ssd": {"bandwidth_mb_s": 1800.0, "latency_ms": 0.1, "seek_penalty": 0.0},   # SSD 源与 SSD 缓存盘
+    "ram": {"bandwidth_mb_s": 10000.0, "latency_ms": 0.0, "seek_penalty": 0.0},
+    "ram_gb": 64.0,                # 物理内存，用于判断内存层级是否超配
+    "lane_scaling": 0.85,          # n 条通道同时编码时总吞吐 ∝ n^lane_scaling (共享 CPU/缓存)
+    "startup_sec": 1.0,            # 单个编码进程的固定开销
+    "probe_sec": 0.05,             # 小文件时长探测的延迟
+}
+
+
+def order_pending(items: List[Any], size_of: Any, order: str = "size") -> List[Any]:
+    """
+    等待中任务的排序策略：size 为小文件优先 (默认，短任务先完成)，size_desc 为大文件优先，fifo 保持提交顺序。
+    """
+    if order not in QUEUE_ORDERS:
+        raise ValueError(f"unknown queue order: {order}")
+    if order == "fifo":
+        return list(items)
+    return sorted(items, key=size_of, reverse=order == "size_desc")
+
+
+def insert_pending(queue: List[Any], items: List[Any], size_of: Any, lo: int = 0, order: str = "size") -> List[int]:
+    """
+    order_pending 的增量版本：将 items 按同一策略插入 queue[lo:] (该段须已按策略有序，原地修改)，返回各项的插入位置。
+    每项只做 O(log n) 次键值比较；size_of 应读取缓存值，不在比较中访问文件系统。
+    体积相同时新任务排在已有任务之后，与对整段稳定排序的结果一致。
+    """
+    if order not in QUEUE_ORDERS:
+        raise ValueError(f"unknown queue order: {order}")
+    if order == "fifo":
+        queue.extend(items)
+        return list(range(len(queue) - len(items), len(queue)))
+    sign = -1 if order == "size_desc" else 1
+    key = lambda item: sign * size_of(item)
+    positions = []
+    for item in sorted(items, key=key):
+        pos = bisect.bisect_right(queue, key(item), lo=lo, key=key)
+        queue.insert(pos, item)
+        positions.append(pos)
+    return positions
+
+
+def choose_cache_tier(ram_in_use_gb: float, size_gb: float, ram_limit_gb: float) -> str:
+    """非 SSD 源的缓存层级：预计驻留量低于上限时读入内存，否则复制到 SSD 缓存"""
+    return "RAM" if ram_in_use_gb + size_gb < ram_limit_gb else "SSD_CACHE"
+
+
+def plan_io(pending: Any, ram_in_use_gb: float, active_io: int, is_ssd: Any,
+            ram_limit_gb: float, io_limit: int = IO_MAX_ACTIVE) -> List[Tuple[Any, str]]:
+    """
+    一轮 I/O 调度。pending 为按队列顺序的 (key, 体积 GB) 可迭代对象，惰性消费 —— 名额用尽即停止扫描，
+    其后的 SSD 源留待下一轮。SSD 源直接就绪 (DIRECT)，其余任务按内存余量选择 RAM / SSD_CACHE。
+    返回 [(key, 层级)]，总是 pending 的一个前缀。
+    """
+    decisions: List[Tuple[Any, str]] = []
+    for key, size_gb in pending:
+        if is_ssd(key):
+            decisions.append((key, "DIRECT"))
+            continue
+        if active_io >= io_limit:
+            break
+        tier = choose_cache_tier(ram_in_use_gb, size_gb, ram_limit_gb)
+        if tier == "RAM":
+            ram_in_use_gb += size_gb
+        active_io += 1
+        decisions.append((key, tier))
+        if active_io >= io_limit:
+            break
+    return decisions
+
+
+class SimJob:
+    """模拟队列中的一个任务：encode_sec 为单通道独占时的编码墙钟耗时 (含进程启动开销)"""
+    __slots__ = ("key", "arrival", "size_gb", "duration_sec", "encode_sec", "ssd",
+                 "state", "tier", "known_at", "ready_at", "seq")
+
+    def __init__(self, key: str, arrival: float, size_gb: float, duration_sec: float, encode_sec: float, ssd: bool):
+        self.key = key
+        self.arrival = arrival
+        self.size_gb = size_gb
+        self.duration_sec = duration_sec
+        self.encode_sec = encode_sec
+        self.ssd = ssd
+        self.state = "pending"
+        self.tier: Optional[str] = None
+        self.known_at = arrival
+        self.ready_at = 0.0
+        self.seq = 0  # 调度决策序号，即该任务在 file_queue 中的相对位置
+
+
+class _SimDevice:
+    """带宽按并发流数折损 (寻道惩罚) 后在各流之间平分"""
+
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        self.name = name
+        self.bandwidth = float(spec["bandwidth_mb_s"]) * 1024 * 1024
+        self.latency = float(spec.get("latency_ms", 0.0)) / 1000.0
+        self.seek_penalty = float(spec.get("seek_penalty", 0.0))
+        self.flows = 0
+        self.busy_sec = 0.0
+        self.bytes = 0.0
+
+    def share(self) -> float:
+        if self.flows <= 1:
+            return self.bandwidth
+        return self.bandwidth / (1.0 + self.seek_penalty * (self.flows - 1)) / self.flows
+
+
+class _SimFlow:
+    """一段持续占用资源的活动：预读 (单位为字节) 或编码 (单位为单通道工作秒)"""
+    __slots__ = ("kind", "jobs", "remaining", "lanes", "demands", "rate", "started_at")
+
+    def __init__(self, kind: str, jobs: List[SimJob], amount: float, lanes: int,
+                 demands: List[Tuple[_SimDevice, float]], now: float):
+        self.kind = kind
+        self.jobs = jobs
+        self.remaining = amount
+        self.lanes = lanes
+        self.demands = demands  # [(设备, 每单位工作量读取的字节数)]
+        self.rate = 0.0
+        self.started_at = now
+
+
+class _Simulation:
+    def __init__(self, specs: List[Dict[str, Any]], policy: Dict[str, Any], box: Dict[str, Any]):
+        self.policy = policy
+        self.box = box
+        self.devices = {name: _SimDevice(name, box[name]) for name in ("hdd", "ssd", "ram")}
+        self.jobs = [SimJob(s["job"], float(s.get("arrival_sec", 0.0)), float(s["size_gb"]), float(s["duration_sec"]),
+                            float(s["encode_sec"]), bool(s.get("ssd", False))) for s in specs]
+        self.pending: List[SimJob] = []
+        self.ready: List[SimJob] = []
+        self.flows: List[_SimFlow] = []
+        self.events: List[Tuple[float, int, str, Any]] = []
+        self.seq = 0
+        self.now = 0.0
+        self.ram_in_use = 0.0
+        self.peak_ram = 0.0
+        self.active_io = 0
+        self.busy_lanes = 0
+        self.lane_sec = 0.0
+        self.remaining_duration = sum(j.duration_sec for j in self.jobs)
+        self.startup_ewma = 1.0  # EncodeEngine 的初始估计
+        self.speed_ewma = 2.0
+        self.wait_sec = 0.0
+        self.counts = {"DIRECT": 0, "RAM": 0, "SSD_CACHE": 0, "batches": 0, "batched_jobs": 0, "segmented": 0, "ticks": 0}
+        self.done = 0
+        arrivals: Dict[float, List[SimJob]] = {}
+        for job in self.jobs:
+            arrivals.setdefault(job.arrival, []).append(job)
+        for t, batch in arrivals.items():
+            self._push(t, "arrive", batch)
+
+    def _push(self, t: float, kind: str, payload: Any) -> None:
+        self.seq += 1
+        heapq.heappush(self.events, (t, self.seq, kind, payload))
+
+    # --- 事件处理 ---
+    def _on_event(self, kind: str, payload: Any) -> None:
+        if kind == "arrive":
+            # 与 add_list 相同：已调度的任务位置不变，新任务按策略插入有序的等待队列
+            insert_pending(self.pending, payload, lambda j: j.size_gb, order=self.policy["order"])
+            for job in payload:
+                if job.size_gb <= BATCH_PROBE_MAX_GB:
+                    job.known_at = job.arrival + float(self.box["probe_sec"])
+                    self._push(job.known_at, "known", job)
+        elif kind == "io_start":
+            job = payload
+            source = self.devices["hdd"]
+            sink = self.devices["ram"] if job.tier == "RAM" else self.devices["ssd"]
+            self._start_flow(_SimFlow("io", [job], job.size_gb * 1024 ** 3, 0, [(source, 1.0), (sink, 1.0)], self.now))
+
+    def _start_flow(self, flow: _SimFlow) -> None:
+        for device, _ in flow.demands:
+            device.flows += 1
+        self.busy_lanes += flow.lanes
+        self.flows.append(flow)
+
+    def _finish_flow(self, flow: _SimFlow) -> None:
+        for device, _ in flow.demands:
+            device.flows -= 1
+        self.busy_lanes -= flow.lanes
+        self.flows.remove(flow)
+        if flow.kind == "io":
+            job = flow.jobs[0]
+            self.active_io -= 1
+            self._make_ready(job)
+            return
+        for job in flow.jobs:
+            job.state = "done"
+            self.done += 1
+            self.remaining_duration -= job.duration_sec
+            if job.tier == "RAM":
+                self.ram_in_use -= job.size_gb
+        if len(flow.jobs) == 1 and flow.lanes == 1:
+            job = flow.jobs[0]
+            startup = float(self.box["startup_sec"])
+            speed = job.duration_sec / max(0.001, self.now - flow.started_at - startup)
+            a = SIM_EWMA_ALPHA
+            self.startup_ewma = (1 - a) * self.startup_ewma + a * startup
+            self.speed_ewma = (1 - a) * self.speed_ewma + a * max(0.1, speed)
+
+    def _make_ready(self, job: SimJob) -> None:
+        job.state = "ready"
+        job.ready_at = self.now
+        bisect.insort(self.ready, job, key=lambda j: j.seq)  # 就绪列表保持队列顺序
+
+    # --- 调度 (与 EncodeEngine 相同的决策顺序) ---
+    def _tick(self) -> bool:
+        self.counts["ticks"] += 1
+        changed = False
+        policy = self.policy
+        decisions = plan_io(((j, j.size_gb) for j in self.pending), self.ram_in_use, self.active_io,
+                            lambda j: j.ssd, policy["ram_limit_gb"], policy["io_limit"])
+        if decisions:
+            changed = True
+            del self.pending[:len(decisions)]
+        for job, tier in decisions:
+            job.tier = tier
+            self.counts[tier] += 1
+            self.seq += 1
+            job.seq = self.seq
+            if tier == "DIRECT":
+                self._make_ready(job)
+                continue
+            if tier == "RAM":
+                self.ram_in_use += job.size_gb
+                self.peak_ram = max(self.peak_ram, self.ram_in_use)
+            job.state = "io"
+            self.active_io += 1
+            self._push(self.now + self.devices["hdd"].latency, "io_start", job)
+
+        workers = policy["workers"]
+        if self.busy_lanes < workers and self.ready:
+            threshold = batch_clip_threshold(self.startup_ewma, self.speed_ewma)
+            taken: Set[int] = set()
+            for idx, job in enumerate(self.ready):
+                if idx in taken:
+                    continue
+                if job.known_at > self.now:
+                    continue  # 小文件时长探测尚未返回，稍候以免错过合批
+                batch = self._plan_batch(idx, threshold, taken)
+                if batch:
+                    members = [self.ready[i] for i in batch]
+                    taken.update(batch)
+                    self._start_encode(members, 1)
+                    self.counts["batches"] += 1
+                    self.counts["batched_jobs"] += len(members)
+                else:
+                    taken.add(idx)
+                    free = workers - self.busy_lanes
+                    lanes = free if free >= 2 and should_segment(
+                        job.duration_sec, [self.remaining_duration - job.duration_sec], free) else 1
+                    if lanes > 1:
+                        self.counts["segmented"] += 1
+                    self._start_encode([job], lanes)
+                if self.busy_lanes >= workers:
+                    break
+            if taken:
+                changed = True
+                for i in sorted(taken, reverse=True):  # 被派发的任务集中在队首，逐个删除的搬移量很小
+                    del self.ready[i]
+        return changed
+
+    def _plan_batch(self, idx: int, threshold: float, taken: Set[int]) -> List[int]:
+        head = self.ready[idx]
+        if head.duration_sec > threshold:
+            return []
+        candidates = [(idx, head.duration_sec)]
+        for i in range(idx + 1, len(self.ready)):
+            other = self.ready[i]
+            if i not in taken and other.known_at <= self.now and 0 < other.duration_sec <= threshold:
+                candidates.append((i, other.duration_sec))
+                if len(candidates) >= BATCH_MAX_FILES:
+                    break  # plan_batch 最多取 BATCH_MAX_FILES 个，够数即停，避免长队列全量扫描
+        return plan_batch(candidates, threshold)
+
+    def _start_encode(self, members: List[SimJob], lanes: int) -> None:
+        startup = float(self.box["startup_sec"])
+        if len(members) > 1:
+            work = startup + sum(max(0.001, j.encode_sec - startup) for j in members)
+        else:
+            work = members[0].encode_sec * (1.0 + SIM_SEGMENT_OVERHEAD if lanes > 1 else 1.0)
+        demands = []
+        for tier in {j.tier for j in members}:
+            device = self.devices["ram"] if tier == "RAM" else self.devices["ssd"]
+            tier_bytes = sum(j.size_gb for j in members if j.tier == tier) * 1024 ** 3
+            demands.append((device, tier_bytes / work))
+        for job in members:
+            job.state = "encoding"
+            self.wait_sec += self.now - job.ready_at
+        self._start_flow(_SimFlow("encode", members, work, lanes, demands, self.now))
+
+    # --- 主循环 ---
+    def _rates(self) -> None:
+        scaling = float(self.box["lane_scaling"])
+        per_lane = self.busy_lanes ** (scaling - 1.0) if self.busy_lanes > 0 else 1.0
+        for flow in self.flows:
+            rate = flow.lanes * per_lane if flow.kind == "encode" else float("inf")
+            for device, per_unit in flow.demands:
+                if per_unit > 0:
+                    rate = min(rate, device.share() / per_unit)
+            flow.rate = rate
+
+    def run(self) -> Dict[str, Any]:
+        inf = float("inf")
+        tick_due: Optional[float] = None
+        while True:
+            self._rates()
+            t_flow = min((self.now + f.remaining / f.rate for f in self.flows if f.rate > 0), default=inf)
+            t_event = self.events[0][0] if self.events else inf
+            t_next = min(t_flow, t_event, tick_due if tick_due is not None else inf)
+            if t_next == inf:
+                break
+            dt = max(0.0, t_next - self.now)
+            for flow in self.flows:
+                flow.remaining -= flow.rate * dt
+                for device, per_unit in flow.demands:
+                    device.bytes += flow.rate * dt * per_unit
+            for device in self.devices.values():
+                if device.flows:
+                    device.busy_sec += dt
+            self.lane_sec += self.busy_lanes * dt
+            self.now = t_next
+
+            dirty = False
+            for flow in [f for f in self.flows if f.rate > 0 and f.remaining / f.rate <= 1e-9]:
+                self._finish_flow(flow)
+                dirty = True
+            while self.events and self.events[0][0] <= self.now:
+                _, _, kind, payload = heapq.heappop(self.events)
+                self._on_event(kind, payload)
+                dirty = True
+            if tick_due is not None and self.now >= tick_due - 1e-9:
+                tick_due = None
+                if self._tick():
+                    tick_due = self.now + ENGINE_TICK_SEC
+            if dirty and tick_due is None:
+                tick_due = math.ceil(self.now / ENGINE_TICK_SEC - 1e-9) * ENGINE_TICK_SEC
+                if tick_due < self.now:
+                    tick_due = self.now
+        return self._report()
+
+    def _report(self) -> Dict[str, Any]:
+        makespan = self.now
+        workers = self.policy["workers"]
+        return {
+            "policy": dict(self.policy),
+            "jobs": len(self.jobs),
+            "done": self.done,
+            "makespan_sec": round(makespan, 2),
+            "lane_util": round(self.lane_sec / (workers * makespan), 4) if makespan > 0 else 0.0,
+            # device_util 为实际吞吐占标称带宽的比例，device_busy 为至少有一个流在读写的时间占比
+            "device_util": {name: round(d.bytes / (d.bandwidth * makespan), 4) if makespan > 0 else 0.0
+                            for name, d in self.devices.items()},
+            "device_busy": {name: round(d.busy_sec / makespan, 4) if makespan > 0 else 0.0
+                            for name, d in self.devices.items()},
+            "peak_ram_gb": round(self.peak_ram, 2),
+            "ram_overcommit": self.peak_ram > float(self.box["ram_gb"]),
+            "mean_queue_wait_sec": round(self.wait_sec / len(self.jobs), 2) if self.jobs else 0.0,
+            "decisions": dict(self.counts),
+        }
+
+
+def simulate_policy(specs: List[Dict[str, Any]], policy: Dict[str, Any], box: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    用离散事件模型回放一条队列。specs 为 load_queue_trace / synthetic_queue 的输出；
+    policy 含 ram_limit_gb、io_limit、workers、order。返回完工时间、通道/设备利用率与内存峰值。
+    """
+    return _Simulation(specs, policy, dict(SIM_DEFAULT_BOX, **(box or {}))).run()
+
+
+def synthetic_queue(count: int, seed: int = 1, size_gb_mean: float = 2.0, duration_mean: float = 600.0,
+                    speed_mean: float = 3.0, ssd_share: float = 0.0, arrival_rate: float = 0.0,
+                    startup_sec: float = SIM_DEFAULT_BOX["startup_sec"]) -> List[Dict[str, Any]]:
+    """
+    合成队列：体积服从对数正态分布，时长与体积正相关 (码率抖动)，编码速度独立抖动。
+    arrival_rate > 0 时按泊松过程陆续到达 (任务/秒)，否则全部在 0 时刻入队。
+    """
+    rng = random.Random(seed)
+
+    def lognormal(mean: float, sigma: float) -> float:
+        return rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+
+    specs = []
+    t = 0.0
+    for i in range(count):
+        size_gb = max(0.001, lognormal(size_gb_mean, 1.0))
+        duration = max(1.0, size_gb * lognormal(duration_mean / size_gb_mean, 0.3))
+        speed = lognormal(speed_mean, 0.3)
+        if arrival_rate > 0:
+            t += rng.expovariate(arrival_rate)
+        specs.append({"job": f"job_{i:05d}", "arrival_sec": round(t, 3), "size_gb": round(size_gb, 4),
+                      "duration_sec": round(duration, 2), "encode_sec": round(startup_sec + duration / speed, 2),
+                      "ssd": rng.random() < ssd_share})
+    return specs
+
+
+def _queue_from_trace_events(records: List[Dict[str, Any]], speed_guess: float) -> List[Dict[str, Any]]:
+    """由阶段追踪记录 (Core 16) 还原队列：queue.add 给出入队时刻与体积，encode 区间给出实际编码耗时"""
+    jobs: Dict[str, Dict[str, Any]] = {}
+    for rec in records:
+        key = rec.get("job")
+        if not key:
+            continue
+        job = jobs.setdefault(key, {"encode_sec": 0.0})
+        args = rec.get("args") or {}
+        name = rec.get("name")
+        if args.get("size_gb") is not None:
+            job["size_gb"] = float(args["size_gb"])
+        if name == "queue.add":
+            job["added"] = float(rec["ts"])
+        elif name == "schedule.direct":
+            job["ssd"] = True
+        elif name == "schedule.encode" and args.get("media_sec"):
+            job["duration_sec"] = float(args["media_sec"])
+        elif name == "encode" and rec.get("ph") == "X":
+            job["encode_sec"] += float(rec.get("dur", 0.0))  # 重试的尝试一并计入实际成本
+    t0 = min((j["added"] for j in jobs.values() if "added" in j), default=0.0)
+    specs = []
+    for key, job in jobs.items():
+        if "size_gb" not in job or job["encode_sec"] <= 0:
+            continue  # 未完成编码或缺少体积 (合批/远程任务) 的记录无法还原成本
+        duration = job.get("duration_sec") or job["encode_sec"] * speed_guess
+        specs.append({"job": key, "arrival_sec": round(job["added"] - t0, 3) if "added" in job else 0.0,
+                      "size_gb": job["size_gb"], "duration_sec": duration, "encode_sec": job["encode_sec"],
+                      "ssd": job.get("ssd", False)})
+    specs.sort(key=lambda s: (s["arrival_sec"], s["job"]))
+    return specs
+
+
+def load_queue_trace(paths: List[str], speed_guess: float = 2.0) -> List[Dict[str, Any]]:
+    """
+    读取队列轨迹：既可以是阶段追踪的 JSONL (含 ph 字段)，也可以是每行一个任务的队列 JSONL
+    ({"job", "arrival_sec", "size_gb", "duration_sec", "encode_sec" | "speed", "ssd"})。
+    """
+    records = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    if any("ph" in r for r in records):
+        return _queue_from_trace_events(records, speed_guess)
+    specs = []
+    startup = float(SIM_DEFAULT_BOX["startup_sec"])
+    for i, r in enumerate(records):
+        spec = {"job": str(r.get("job", f"job_{i:05d}")), "arrival_sec": float(r.get("arrival_sec", 0.0)),
+                "size_gb": float(r["size_gb"]), "duration_sec": float(r["duration_sec"]), "ssd": bool(r.get("ssd", False))}
+        spec["encode_sec"] = float(r["encode_sec"]) if "encode_sec" in r else startup + spec["duration_sec"] / float(r.get("speed", speed_guess))
+        specs.append(spec)
+    return specs
+
+
+def simulate_main(argv: Optional[List[str]] = None) -> int:
+    """
+    模拟器入口：python Cinetico_Encoder.py --simulate [--trace 轨迹.jsonl | --synthetic N] [候选参数]
+    对候选参数的笛卡尔积逐一回放，按完工时间排序输出表格，--out 写出完整 JSON。
+    """
+
+    def csv_list(value: str) -> List[str]:
+        return [v.strip() for v in value.split(",") if v.strip()]
+
+    parser = argparse.ArgumentParser(prog="Cinetico_Encoder.py --simulate", description="Cinético scheduling policy simulator")
+    parser.add_argument("--simulate", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--trace", nargs="+", default=None, help="阶段追踪 JSONL 或队列 JSONL")
+    parser.add_argument("--synthetic", type=int, default=0, help="合成任务数")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--size-gb", type=float, default=2.0, help="合成队列的平均体积")
+    parser.add_argument("--duration", type=float, default=600.0, help="合成队列的平均时长 (秒)")
+    parser.add_argument("--speed", type=float, default=3.0, help="单通道平均编码速度 (素材秒/墙钟秒)")
+    parser.add_argument("--ssd-share", type=float, default=0.0, help="位于 SSD 上的源文件比例")
+    parser.add_argument("--arrival-rate", type=float, default=0.0, help="到达速率 (任务/秒)，0 为一次性入队")
+    parser.add_argument("--box", default=None, help="机型描述 JSON (覆盖默认设备/内存/通道模型)")
+    parser.add_argument("--ram-limits", type=csv_list, default=["48"], help="候选 MAX_RAM_LOAD_GB")
+    parser.add_argument("--io-limits", type=csv_list, default=[str(IO_MAX_ACTIVE)], help="候选预读并发数")
+    parser.add_argument("--workers", type=csv_list, default=["2"], help="候选编码通道数")
+    parser.add_argument("--orders", type=csv_list, default=["size"], help=",".join(QUEUE_ORDERS))
+    parser.add_argument("--dump-queue", default=None, help="把使用的队列写为 JSONL 以便复用")
+    parser.add_argument("--out", default=None, help="结果 JSON 路径")
+    try:
+        args = parser.parse_args(argv)
+        grid = list(itertools.product([float(v) for v in args.ram_limits], [int(v) for v in args.io_limits],
+                                      [int(v) for v in args.workers], args.orders))
+        bad = [o for o in args.orders if o not in QUEUE_ORDERS]
+        if bad or (not args.trace and args.synthetic <= 0):
+            parser.error(f"unknown order: {bad}" if bad else "one of --trace or --synthetic is required")
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+    except ValueError as e:
+        print(f"[Sim] {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    box = dict(SIM_DEFAULT_BOX)
+    try:
+        if args.box:
+            with open(args.box, "r", encoding="utf-8") as f:
+                for key, value in json.load(f).items():
+                    box[key] = dict(box[key], **value) if isinstance(box.get(key), dict) else value
+        if args.trace:
+            specs = load_queue_trace(args.trace, speed_guess=args.speed)
+        else:
+            specs = synthetic_queue(args.synthetic, args.seed, args.size_gb, args.duration, args.speed,
+                                    args.ssd_share, args.arrival_rate, float(box["startup_sec"]))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[Sim] {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not specs:
+        print("[Sim] queue is empty", file=sys.stderr)
+        return EXIT_USAGE
+    if args.dump_queue:
+        with open(args.dump_queue, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(s) + "\n" for s in specs)
+
+    results = []
+    for ram_limit, io_limit, workers, order in grid:
+        t0 = time.perf_counter()
+        result = simulate_policy(specs, {"ram_limit_gb": ram_limit, "io_limit": io_limit,
+                                         "workers": workers, "order": order}, box)
+        result["sim_sec"] = round(time.perf_counter() - t0, 3)
+        results.append(result)
+    results.sort(key=lambda r: r["makespan_sec"])
+
+    print(f"{'ram_gb':>7} {'io':>3} {'lanes':>5} {'order':>9} {'makespan':>10} {'lane%':>6} {'hdd%':>6} {'peak_ram':>9}  note")
+    for r in results:
+        p = r["policy"]
+        note = "RAM overcommit" if r["ram_overcommit"] else ""
+        print(f"{p['ram_limit_gb']:>7g} {p['io_limit']:>3} {p['workers']:>5} {p['order']:>9} {r['makespan_sec']:>10.1f}"
+              f" {r['lane_util'] * 100:>6.1f} {r['device_util']['hdd'] * 100:>6.1f} {r['peak_ram_gb']:>9.2f}  {note}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"jobs": len(specs), "box": box, "results": results}, f, indent=2, ensure_ascii=False)
+    return EXIT_OK
+
+
+# =========================================================================
+# [Core 20] Runtime Profiling
+# 功能：运行时可开关的全线程采样剖析 (折叠栈，可直接生成火焰图)、每线程 CPU 时间、
+# 预读前后的 tracemalloc 分配差异，以及调用方提供的仪表 (如 UI 事件队列深度/丢弃数) 的会话报告
+# =========================================================================
+
+PROFILE_INTERVAL_SEC = 0.005       # 采样周期 (200 Hz)；单次采样只遍历各线程栈帧，不做格式化
+PROFILE_MAX_DEPTH = 96             # 单个调用栈保留的最大帧数
+PROFILE_MEM_FRAMES = 16            # tracemalloc 记录的调用栈深度
+PROFILE_MEM_TOP = 15               # 每次分配差异报告的条目数
+
+
+def default_profile_dir() -> str:
+    return os.path.join(os.path.expanduser("~"), ".cinetico", "profiles")
+
+
+def profile_mode_from_env(value: Optional[str] = None) -> Optional[str]:
+    """CINETICO_PROFILE：1 / cpu 开启采样剖析，mem 额外开启分配追踪；未设置或 0 / off 时返回 None"""
+    raw = (os.environ.get("CINETICO_PROFILE", "") if value is None else value).strip().lower()
+    if raw in ("", "0", "off", "false", "no"):
+        return None
+    return "mem" if raw in ("mem", "memory", "all") else "cpu"
+
+
+def _thread_group(name: str) -> str:
+    """线程池的工作线程 (compute_3、io_0) 合并为同一组，火焰图按职责而不是按线程编号展开"""
+    head, sep, tail = name.rpartition("_")
+    return head if sep and tail.isdigit() else name
+
+
+def _read_thread_cpu(native_id: Optional[int]) -> Optional[float]:
+    """Linux 下读取单个线程的累计 CPU 秒数 (utime + stime)，其他平台返回 None"""
+    if native_id is None:
+        return None
+    try:
+        with open(f"/proc/self/task/{native_id}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class SamplingProfiler:
+    """
+    全线程采样剖析器：后台线程按固定周期读取 sys._current_frames()，以「线程组;外层帧;...;内层帧」折叠计数。
+    被剖析线程无需任何插桩，开销只在采样线程自身 (持有 GIL 的时间与线程数 × 栈深成正比)。
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_SEC, gauges: Optional[Dict[str, Any]] = None):
+        self.interval = interval
+        self.gauges = gauges or {}  # 名称 -> () -> 数值，每次采样读取，报告最大值与均值
+        self.stacks: Dict[Tuple[str, ...], int] = {}
+        self.thread_samples: Dict[str, int] = {}
+        self.gauge_stats: Dict[str, List[float]] = {}  # 名称 -> [最大值, 累计值, 次数]
+        self.samples = 0
+        self.started = 0.0
+        self.stopped = 0.0
+        self._frame_names: Dict[Any, str] = {}
+        self._cpu_start: Dict[int, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started = time.time()
+        self._cpu_start = {}
+        for t in threading.enumerate():
+            cpu = _read_thread_cpu(t.native_id)
+            if cpu is not None:
+                self._cpu_start[t.ident] = cpu
+        self._thread = threading.Thread(target=self._loop, name="Profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        self.stopped = time.time()
+
+    def _frame_name(self, code: Any) -> str:
+        name = self._frame_names.get(code)
+        if name is None:
+            name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._frame_names[code] = name
+        return name
+
+    def _loop(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                thread = names.get(ident, f"thread-{ident}")
+                codes = []
+                while frame is not None and len(codes) < PROFILE_MAX_DEPTH:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                key = (_thread_group(thread),) + tuple(self._frame_name(c) for c in reversed(codes))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.thread_samples[thread] = self.thread_samples.get(thread, 0) + 1
+            for name, probe in self.gauges.items():
+                try:
+                    value = float(probe())
+                except Exception:
+                    continue
+                stat = self.gauge_stats.setdefault(name, [value, 0.0, 0])
+                stat[0] = max(stat[0], value)
+                stat[1] += value
+                stat[2] += 1
+            self.samples += 1
+
+    def thread_cpu(self) -> Dict[str, float]:
+        """会话期间各线程消耗的 CPU 秒数 (仅 Linux；会话中途结束的线程不计入)"""
+        usage: Dict[str, float] = {}
+        for t in threading.enumerate():
+            cpu = _read_thread_cpu(t.native_id)
+            if cpu is None:
+                continue
+            usage[t.name] = round(cpu - self._cpu_start.get(t.ident, 0.0), 3)
+        return usage
+
+    def write_collapsed(self, path: str) -> int:
+        """写出 Brendan Gregg 折叠栈格式 (flamegraph.pl / speedscope / inferno 可直接读取)，返回行数"""
+        lines = [";".join(stack) + f" {count}\n"  # 折叠格式以最后一个空格分隔计数，帧名内的空格无碍
+                 for stack, count in sorted(self.stacks.items(), key=lambda kv: -kv[1])]
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        return len(lines)
+
+
+class AllocationTracker:
+    """tracemalloc 包装：在预读等内存敏感阶段前后取快照，记录按调用位置聚合的分配差异"""
+
+    def __init__(self, frames: int = PROFILE_MEM_FRAMES):
+        self.frames = frames
+        self.diffs: List[Dict[str, Any]] = []
+        self._open: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._lock = threading.Lock()
+        self._owns_tracing = False
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._owns_tracing = True
+
+    def begin(self, label: str, job: Optional[str] = None) -> None:
+        if tracemalloc.is_tracing():
+            snap = tracemalloc.take_snapshot()
+            with self._lock:
+                self._open[(label, job)] = snap
+
+    def end(self, label: str, job: Optional[str] = None) -> None:
+        with self._lock:
+            before = self._open.pop((label, job), None)
+        if before is None or not tracemalloc.is_tracing():
+            return
+        stats = tracemalloc.take_snapshot().compare_to(before, "lineno")
+        current, peak = tracemalloc.get_traced_memory()
+        self.diffs.append({
+            "label": label, "job": job, "traced_mb": round(current / 1048576, 2), "peak_mb": round(peak / 1048576, 2),
+            "net_kb": round(sum(s.size_diff for s in stats) / 1024, 1),
+            "top": [{"where": str(s.traceback[0]), "size_kb": round(s.size_diff / 1024, 1), "count": s.count_diff}
+                    for s in stats[:PROFILE_MEM_TOP] if s.size_diff],
+        })
+
+    def stop(self, dump_path: Optional[str] = None) -> None:
+        if not tracemalloc.is_tracing():
+            return
+        if dump_path:
+            tracemalloc.take_snapshot().dump(dump_path)  # 可用 tracemalloc.Snapshot.load 离线分析
+        if self._owns_tracing:
+            tracemalloc.stop()
+
+
+class ProfileSession:
+    """
+    一次剖析会话：stop() 时写出会话目录 (默认 ~/.cinetico/profiles/<时间>/)：
+    stacks.collapsed (折叠栈)、report.json (线程采样/CPU、仪表、附加计数与分配差异)、memory_end.tracemalloc (mem 模式)。
+    """
+
+    def __init__(self, memory: bool = False, out_dir: Optional[str] = None, gauges: Optional[Dict[str, Any]] = None,
+                 interval: float = PROFILE_INTERVAL_SEC):
+        self.memory = memory
+        self.out_dir = out_dir or os.path.join(default_profile_dir(), time.strftime("%Y%m%d_%H%M%S"))
+        self.sampler = SamplingProfiler(interval, gauges)
+        self.allocations = AllocationTracker() if memory else None
+
+    def start(self) -> "ProfileSession":
+        if self.allocations:
+            self.allocations.start()
+        self.sampler.start()
+        return self
+
+    def mark(self, label: str, job: Optional[str] = None, end: bool = False) -> None:
+        """分配追踪的阶段边界 (未开启 mem 模式时为空操作)"""
+        if self.allocations:
+            (self.allocations.end if end else self.allocations.begin)(label, job)
+
+    def status(self) -> Dict[str, Any]:
+        return {"active": True, "memory": self.memory, "dir": self.out_dir, "samples": self.sampler.samples}
+
+    def stop(self, extra: Optional[Dict[str, Any]] = None) -> str:
+        self.sampler.stop()
+        os.makedirs(self.out_dir, exist_ok=True)
+        lines = self.sampler.write_collapsed(os.path.join(self.out_dir, "stacks.collapsed"))
+        if self.allocations:
+            self.allocations.stop(os.path.join(self.out_dir, "memory_end.tracemalloc"))
+        s = self.sampler
+        report = {
+            "started": s.started, "duration_sec": round(s.stopped - s.started, 3), "interval_sec": s.interval,
+            "samples": s.samples, "distinct_stacks": lines,
+            "thread_samples": dict(sorted(s.thread_samples.items(), key=lambda kv: -kv[1])),
+            "thread_cpu_sec": dict(sorted(s.thread_cpu().items(), key=lambda kv: -kv[1])),
+            "gauges": {name: {"max": st[0], "mean": round(st[1] / st[2], 2) if st[2] else 0.0}
+                       for name, st in s.gauge_stats.items()},
+            "allocations": self.allocations.diffs if self.allocations else None,
+            **(extra or {}),
+        }
+        with open(os.path.join(self.out_dir, "report.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return self.out_dir
+
+
+# =========================================================================
+# [Core 21] Coalescing UI Update Bus
+# 功能：工作线程到界面主线程的更新总线。进度类更新按 (控件, 属性) 合并，只保留最新值；
+# 状态迁移与生命周期事件按序全部送达，从不丢弃。主线程每帧在时间预算内做一次批量应用，并统计延迟与合并次数
+# =========================================================================
+
+UI_FRAME_MS = 33                   # 界面刷新周期 (约 30 FPS)
+UI_FRAME_BUDGET_SEC = 0.012        # 单帧应用更新的时间预算，超出部分顺延到下一帧
+
+
+class UIUpdateBus:
+    """
+    线程安全的界面更新总线。post(key=None) 的事件按提交顺序全部送达；带 key 的事件在被应用前
+    若再次提交同一 key，旧值被替换 (合并)，其在顺序中的位置移到最新一次提交处 —— 因此与其他事件的
+    相对先后保持不变，只是中间值被跳过。
+    """
+
+    def __init__(self, budget_sec: float = UI_FRAME_BUDGET_SEC):
+        self.budget_sec = budget_sec
+        self._lock = threading.Lock()
+        self._fifo: Any = collections.deque()   # (seq, 提交时刻, func, args, kwargs)
+        self._latest: Dict[Any, Tuple] = {}      # key -> 同上；dict 保持插入顺序，即按 seq 有序
+        self._carry: List[Tuple] = []            # 上一帧超出预算未应用的部分
+        self._seq = 0
+        self.posted = 0
+        self.coalesced = 0
+        self.applied = 0
+        self.errors = 0
+        self.frames = 0
+        self.overruns = 0
+        self.max_pending = 0
+        self.lag_sec = 0.0       # 最近一帧中最陈旧更新的等待时长
+        self.max_lag_sec = 0.0
+        self.frame_sec = 0.0     # 最近一帧的应用耗时
+
+    @property
+    def pending(self) -> int:
+        return len(self._fifo) + len(self._latest) + len(self._carry)
+
+    def post(self, func: Any, args: Tuple = (), kwargs: Optional[Dict[str, Any]] = None, key: Any = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._seq += 1
+            self.posted += 1
+            if key is None:
+                self._fifo.append((self._seq, now, func, args, kwargs or {}))
+            else:
+                old = self._latest.pop(key, None)
+                if old is not None:
+                    self.coalesced += 1
+                    now = old[1]  # 延迟从该 key 首个未应用的值算起，反映界面显示的陈旧程度
+                self._latest[key] = (self._seq, now, func, args, kwargs or {})
+            pending = len(self._fifo) + len(self._latest) + len(self._carry)
+            if pending > self.max_pending:
+                self.max_pending = pending
+
+    def drain(self, apply: Any) -> int:
+        """
+        主线程调用：取走当前全部待处理事件，按提交顺序逐个交给 apply(func, args, kwargs)；
+        超出时间预算时剩余部分留到下一帧最先应用。返回本帧应用的事件数。
+        """
+        with self._lock:
+            fifo, latest = self._fifo, self._latest
+            if not fifo and not latest and not self._carry:
+                return 0
+            self._fifo = type(fifo)()
+            self._latest = {}
+        batch = self._carry + list(heapq.merge(fifo, latest.values(), key=lambda item: item[0]))
+        self._carry = []
+        start = time.perf_counter()
+        now = time.monotonic()
+        lag = 0.0
+        count = 0
+        for i, (_, posted_at, func, args, kwargs) in enumerate(batch):
+            if count and time.perf_counter() - start > self.budget_sec:
+                self._carry = batch[i:]
+                self.overruns += 1
+                break
+            lag = max(lag, now - posted_at)
+            try:
+                apply(func, args, kwargs)
+            except Exception:
+                self.errors += 1
+            count += 1
+        self.applied += count
+        self.frames += 1
+        self.lag_sec = lag
+        self.max_lag_sec = max(self.max_lag_sec, lag)
+        self.frame_sec = time.perf_counter() - start
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        return {"posted": self.posted, "coalesced": self.coalesced, "applied": self.applied, "pending": self.pending,
+                "max_pending": self.max_pending, "frames": self.frames, "overruns": self.overruns, "errors": self.errors,
+                "lag_ms": round(self.lag_sec * 1000, 1), "max_lag_ms": round(self.max_lag_sec * 1000, 1),
+                "frame_ms": round(self.frame_sec * 1000, 2)}
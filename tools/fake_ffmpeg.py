@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Project: Cinético Encoder
+Description: Fake ffmpeg / ffprobe stand-in for scheduler tests without media.
+             调度器压测用的 FFmpeg 替身：按可配置的速度输出逼真的 -progress 块，响应信号与 stdin 'q'，
+             写出小体积的输出文件，并可按比例注入失败 (复用 corpus/ffmpeg_failures 中的真实日志) 与停滞。
+
+以 ffprobe 身份运行：可执行文件名含 "ffprobe" (如 tools/fake_ffprobe.py)，或首个参数为 --as-ffprobe。
+只导入标准库中的轻量模块 —— 万级任务时每次子进程的启动开销直接决定压测耗时。
+
+配置 (环境变量 CINETICO_FAKE_FFMPEG，JSON)：
+    speed              编码速度，素材秒 / 墙钟秒 (默认 50)
+    bytes_per_sec      输入文件每秒素材对应的字节数，用于由文件大小推导时长 (默认 20000)
+    fps                帧率 (默认 30)
+    startup_sec        首个进度块之前的启动延迟 (默认 0.05)
+    progress_interval  进度块间隔，墙钟秒 (默认 0.5，与 FFmpeg 一致)
+    output_ratio       输出大小 / 输入大小 (默认 0.4)
+    fail_rate          编码失败概率 (默认 0)
+    stall_rate         编码停滞概率 (默认 0)
+    seed               随机种子 (默认 1)；同一输入 + 同一命令行的结果固定，换参数重试可能成功
+文件名标记 (优先于随机注入)：__fail-<失败分类>、__stall、__dur<秒>、__pix-<像素格式>
+
+Headless 冒烟测试 (无需真实 FFmpeg 与素材)：
+    mkdir -p /tmp/smoke/in && truncate -s 200K /tmp/smoke/in/a.mp4 /tmp/smoke/in/b__fail-resources.mp4
+    python Cinetico_Encoder.py --headless /tmp/smoke/in --output-dir /tmp/smoke/out \
+        --ffmpeg tools/fake_ffmpeg.py --ffprobe tools/fake_ffprobe.py
+    预期：a 编码完成；b 以 fewer_threads 重试一次后判定失败 (reason=resources)，退出码为 1。
+"""
+
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+
+MEDIA_EXTS = (".mp4", ".mkv", ".mov", ".avi", ".ts", ".flv", ".wmv", ".wav", ".m4a", ".aac")
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "corpus", "ffmpeg_failures")
+FAIL_CLASSES = ("corrupt_input", "decode_surfaces", "http_eof", "no_space", "resources")
+
+DEFAULTS = {"speed": 50.0, "bytes_per_sec": 20000, "fps": 30.0, "startup_sec": 0.05, "progress_interval": 0.5,
+            "output_ratio": 0.4, "fail_rate": 0.0, "stall_rate": 0.0, "seed": 1}
+
+
+def load_config():
+    config = dict(DEFAULTS)
+    try:
+        config.update(json.loads(os.environ.get("CINETICO_FAKE_FFMPEG") or "{}"))
+    except ValueError:
+        pass
+    return config
+
+
+def marker(path, name):
+    """读取文件名中的 __<name><value> 标记，不存在时返回 None"""
+    base = os.path.basename(path)
+    token = f"__{name}"
+    if token not in base:
+        return None
+    value = base.split(token, 1)[1]
+    for stop in ("__", "."):
+        value = value.split(stop, 1)[0]
+    return value.lstrip("-")
+
+
+def input_size(path):
+    """本地文件取大小；内存 HTTP 流按 FFmpeg 的方式完整读取一遍"""
+    if path.startswith("http://"):
+        import urllib.request
+        total = 0
+        with urllib.request.urlopen(path, timeout=30) as resp:
+            while True:
+                chunk = resp.read(1 << 20)
+                if not chunk:
+                    return total
+                total += len(chunk)
+    return os.path.getsize(path)
+
+
+def media_duration(path, config):
+    dur = marker(path, "dur")
+    if dur:
+        return float(dur)
+    return max(0.04, input_size(path) / float(config["bytes_per_sec"]))
+
+
+def corpus_log(failure_class):
+    """取该分类的首个真实日志作为 stderr 输出"""
+    try:
+        for name in sorted(os.listdir(CORPUS_DIR)):
+            if name.startswith(failure_class + "__"):
+                with open(os.path.join(CORPUS_DIR, name), "r", encoding="utf-8") as f:
+                    return f.read()
+    except OSError:
+        pass
+    return f"Error: simulated {failure_class} failure\n"
+
+
+def run_ffprobe(args, config):
+    if args[:1] == ["-hide_banner"]:
+        args = args[1:]
+    if args[:1] == ["-version"]:  # 调用方启动前的可用性检查 (如 headless_main)
+        print("ffprobe version fake-cinetico Copyright (c) the Cinetico test suite")
+        return 0
+    if not args:
+        sys.stderr.write("No input specified\n")
+        return 1
+    src = args[-1]
+    if not os.path.exists(src) and not src.startswith("http://"):
+        sys.stderr.write(f"{src}: No such file or directory\n")
+        return 1
+    joined = " ".join(args)
+    if "format=duration" in joined:
+        print(f"{media_duration(src, config):.6f}")
+    elif "stream=codec_name,pix_fmt" in joined:
+        print(f"h264,{marker(src, 'pix') or 'yuv420p'}")
+    elif "packet=pts_time,flags" in joined:
+        duration = media_duration(src, config)
+        t = 0.0
+        lines = []
+        while t < duration:  # 每 2 秒一个关键帧
+            lines.append(f"{t:.6f},K_")
+            t += 2.0
+        sys.stdout.write("\n".join(lines) + "\n")
+    return 0
+
+
+def split_io(args):
+    """返回 (输入列表, 输出列表, -t 时长)：-i 之后为输入，其余带媒体扩展名的位置参数为输出"""
+    inputs, outputs, limit = [], [], None
+    for i, arg in enumerate(args):
+        prev = args[i - 1] if i else ""
+        if prev == "-i":
+            inputs.append(arg)
+        elif prev == "-t":
+            try: limit = float(arg)
+            except ValueError: pass
+        elif not arg.startswith("-") and arg.lower().endswith(MEDIA_EXTS):
+            outputs.append(arg)
+    return inputs, outputs, limit
+
+
+def capabilities(flag):
+    if flag == "-encoders":
+        return ("Encoders:\n V..... = Video\n ------\n"
+                " V....D libx264              libx264 H.264 / AVC (codec h264)\n"
+                " V....D libx265              libx265 H.265 / HEVC (codec hevc)\n"
+                " V....D libsvtav1            SVT-AV1 (codec av1)\n"
+                " A....D aac                  AAC (Advanced Audio Coding)\n")
+    return "Hardware acceleration methods:\n\n"
+
+
+def run_ffmpeg(args, config):
+    if args[:1] == ["-version"]:
+        print("ffmpeg version fake-cinetico Copyright (c) the Cinetico test suite")
+        return 0
+    if args[:1] == ["-hide_banner"] and len(args) == 2:
+        sys.stdout.write(capabilities(args[1]))
+        return 0
+
+    start = time.time()
+    inputs, outputs, limit = split_io(args)
+    if not outputs:
+        sys.stderr.write("At least one output file must be specified\n")
+        return 1
+    total_in = 0
+    durations = []
+    for src in inputs:
+        if src.endswith(".txt"):  # concat 列表：流复制，立即完成
+            continue
+        try:
+            total_in += input_size(src)
+            durations.append(media_duration(src, config))
+        except OSError as e:
+            sys.stderr.write(f"{src}: {e.strerror or e}\n")
+            return 1
+    duration = limit if limit is not None else max(durations or [0.04])
+
+    # 失败与停滞注入：文件名标记优先，其次按种子化的概率 (与命令行绑定，换参数重试可能成功)
+    rng = random.Random(f"{config['seed']}|{' '.join(args)}")
+    fail = next((marker(src, "fail") for src in inputs if marker(src, "fail")), None)
+    stall = any("__stall" in os.path.basename(src) for src in inputs)
+    is_encode = "-progress" in args
+    if fail is None and is_encode and rng.random() < float(config["fail_rate"]):
+        fail = rng.choice(FAIL_CLASSES)
+    if not stall and is_encode and rng.random() < float(config["stall_rate"]):
+        stall = True
+    stall_at = duration * rng.uniform(0.1, 0.8) if stall else None
+
+    state = {"quit": False, "signal": None}
+
+    def on_signal(signum, frame):
+        state["signal"] = signum
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    def watch_stdin():
+        try:
+            while True:
+                data = os.read(0, 1)  # 直接读 fd：缓冲读取器的锁会让守护线程在解释器退出时崩溃
+                if not data:
+                    return
+                if data in (b"q", b"Q"):
+                    state["quit"] = True
+                    return
+        except (OSError, ValueError):
+            return
+    threading.Thread(target=watch_stdin, daemon=True).start()
+
+    fps = float(config["fps"])
+    speed = float(config["speed"])
+    interval = float(config["progress_interval"])
+    out_time = 0.0
+    progress = "-progress" in args
+    time.sleep(float(config["startup_sec"]))
+    if not progress and not fail:
+        out_time = duration  # 音频提取 / 拼接等辅助命令不汇报进度，视为瞬时完成
+    last = time.time()
+    while out_time < duration and not state["quit"] and state["signal"] is None:
+        time.sleep(min(interval, max(0.001, (duration - out_time) / speed)))
+        now = time.time()
+        step = min(now - last, interval) * speed  # 挂起 (SIGSTOP) 期间不计入进度
+        last = now
+        if stall_at is not None and out_time + step >= stall_at:
+            out_time = stall_at  # out_time 不再前进，但进度块照常输出 (与真实停滞一致)
+        else:
+            out_time = min(duration, out_time + step)
+        if fail and out_time >= duration * 0.3:
+            break
+        if progress:
+            emit_progress(out_time, fps, speed, total_in, config, "continue")
+
+    if fail:
+        sys.stderr.write(corpus_log(fail))
+        return 1
+    size = max(1024, int(total_in * float(config["output_ratio"]) / max(1, len(outputs))))
+    for dst in outputs:
+        if dst.lower().endswith(".wav"):
+            size_out = max(2048, int(duration * 1000))
+        else:
+            size_out = size if out_time >= duration else max(1024, int(size * out_time / max(duration, 0.001)))
+        try:
+            with open(dst, "wb") as f:
+                f.truncate(size_out)
+        except OSError as e:
+            sys.stderr.write(f"{dst}: {e.strerror or e}\n")
+            return 1
+    if progress:
+        emit_progress(out_time, fps, speed, total_in, config, "end")
+    if "-benchmark" in args:
+        cpu = os.times()
+        elapsed = time.time() - start
+        sys.stderr.write(f"bench: utime={cpu.user:.3f}s stime={cpu.system:.3f}s rtime={elapsed:.3f}s\n")
+        sys.stderr.write("bench: maxrss=16384KiB\n")
+    if state["signal"] is not None:
+        sys.stderr.write(f"Exiting normally, received signal {state['signal']}.\n")
+        return 255
+    return 0
+
+
+def emit_progress(out_time, fps, speed, total_in, config, status):
+    frame = int(out_time * fps)
+    out_us = int(out_time * 1000000)
+    size = int(total_in * float(config["output_ratio"]) * min(1.0, out_time / 3600.0 + 0.001))
+    sys.stdout.write(f"frame={frame}\nfps={fps * speed:.2f}\nstream_0_0_q=28.0\nbitrate=1000.0kbits/s\n"
+                     f"total_size={size}\nout_time_us={out_us}\nout_time_ms={out_us}\n"
+                     f"out_time={time.strftime('%H:%M:%S', time.gmtime(out_time))}.{out_us % 1000000:06d}\n"
+                     f"dup_frames=0\ndrop_frames=0\nspeed={speed:.2f}x\nprogress={status}\n")
+    sys.stdout.flush()
+
+
+def main(argv):
+    config = load_config()
+    args = list(argv[1:])
+    as_probe = "ffprobe" in os.path.basename(argv[0]).lower()
+    if args[:1] == ["--as-ffprobe"]:
+        as_probe, args = True, args[1:]
+    elif args[:1] == ["--as-ffmpeg"]:
+        args = args[1:]
+    try:
+        return run_ffprobe(args, config) if as_probe else run_ffmpeg(args, config)
+    except BrokenPipeError:
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Project: Cinético Encoder
+Description: ffprobe entry point of tools/fake_ffmpeg.py.
+             文件名含 "ffprobe"，fake_ffmpeg 据此以 ffprobe 身份运行；可直接传给 --ffprobe，无需 shell 包装或符号链接。
+"""
+
+import sys
+
+from fake_ffmpeg import main
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Project: Cinético Encoder
+Description: Scheduler scale harness — drives the real GUI engine over thousands of fake jobs.
+             调度器规模压测：在隔离的沙盒 HOME 中启动真实的 UltraEncoderApp，以 tools/fake_ffmpeg.py 代替 FFmpeg，
+             一次排入上万个任务，测量调度循环开销、编码通道空闲间隙、UI 事件队列深度、主线程定时器延迟与内存增长。
+
+需要图形环境 (CI 中可用 xvfb-run)：
+    xvfb-run python tools/scale_harness.py --jobs 10000 --workers 4 --out scale.json
+超出 --max-idle-ratio / --max-ui-queue / --max-rss-growth-mb 任一阈值时退出码为 1，便于接入回归检查。
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+FAKE_FFMPEG = os.path.join(TOOLS_DIR, "fake_ffmpeg.py")
+SAMPLE_SEC = 0.05
+TIMER_PROBE_SEC = 0.1
+
+
+def parse_args(argv):
+    p = argparse.ArgumentParser(prog="scale_harness", description="Cinético scheduler scale harness")
+    p.add_argument("--jobs", type=int, default=10000, help="number of fake input files")
+    p.add_argument("--workers", type=int, default=4, help="concurrent encode lanes")
+    p.add_argument("--speed", type=float, default=400.0, help="fake encode speed (media sec / wall sec)")
+    p.add_argument("--mean-size-kb", type=float, default=64.0, help="mean input size (lognormal)")
+    p.add_argument("--fail-rate", type=float, default=0.0)
+    p.add_argument("--stall-rate", type=float, default=0.0)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--work-dir", default=None, help="sandbox directory (default: a fresh temp dir)")
+    p.add_argument("--timeout", type=float, default=3600.0, help="abort the run after this many seconds")
+    p.add_argument("--out", default=None, help="write the JSON report here as well as stdout")
+    p.add_argument("--max-idle-ratio", type=float, default=None,
+                   help="fail if idle lane-seconds with runnable work exceed this share of lane capacity")
+    p.add_argument("--max-ui-queue", type=int, default=None, help="fail if the UI event queue ever exceeds this depth")
+    p.add_argument("--max-rss-growth-mb", type=float, default=None, help="fail if RSS grows more than this per 1k jobs")
+    return p.parse_args(argv)
+
+
+def prepare_sandbox(args):
+    """沙盒：独立 HOME (任务日志/清单/追踪都写在 ~/.cinetico)、伪 ffmpeg 包装脚本与种子化的输入文件"""
+    root = args.work_dir or tempfile.mkdtemp(prefix="cinetico_scale_")
+    home, bin_dir, src_dir = (os.path.join(root, d) for d in ("home", "bin", "src"))
+    for d in (home, bin_dir, src_dir):
+        os.makedirs(d, exist_ok=True)
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+    os.environ["CINETICO_API_PORT"] = "off"
+    os.environ.pop("CINETICO_AGENTS", None)
+    os.environ["CINETICO_FAKE_FFMPEG"] = json.dumps({
+        "speed": args.speed, "fail_rate": args.fail_rate, "stall_rate": args.stall_rate, "seed": args.seed,
+        "startup_sec": 0.01, "progress_interval": 0.25,
+    })
+
+    wrappers = {}
+    for name, extra in (("ffmpeg", ""), ("ffprobe", " --as-ffprobe")):
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_FFMPEG}"{extra} "$@"\n')
+        os.chmod(path, 0o755)
+        wrappers[name] = path
+
+    rng = random.Random(args.seed)
+    sigma = 0.8
+    mu = math.log(args.mean_size_kb * 1024) - sigma * sigma / 2
+    files = []
+    for i in range(args.jobs):
+        path = os.path.join(src_dir, f"clip_{i:05d}.mp4")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.truncate(max(4096, int(rng.lognormvariate(mu, sigma))))
+        files.append(path)
+    return root, wrappers, files
+
+
+def read_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576.0
+    except (OSError, ValueError, IndexError):
+        import resource  # 非 Linux：退化为峰值 RSS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1048576.0 if sys.platform == "darwin" else 1024.0)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))]
+
+
+class Sampler(threading.Thread):
+    """后台采样：状态分布、通道占用、UI 队列深度与 RSS (只读共享状态，持锁时间极短)"""
+
+    def __init__(self, app, enc):
+        super().__init__(daemon=True)
+        self.app, self.enc = app, enc
+        self.stop_event = threading.Event()
+        self.ui_depths, self.rss = [], []
+        self.idle_lane_sec = 0.0
+        self.capacity_lane_sec = 0.0
+        self.gap_sec = 0.0
+        self.longest_gap_sec = 0.0
+
+    def run(self):
+        enc, app = self.enc, self.app
+        last = time.perf_counter()
+        while not self.stop_event.wait(SAMPLE_SEC):
+            now = time.perf_counter()
+            dt, last = now - last, now
+            with app.queue_lock:
+                cards = [app.task_widgets[f] for f in app.file_queue]
+            runnable = busy = 0
+            for card in cards:
+                code = card.status_code
+                if code in (enc.STATE_PENDING, enc.STATE_QUEUED_IO, enc.STATE_READY): runnable += 1
+                elif code == enc.STATE_ENCODING: busy += card.lanes
+            workers = app.current_workers
+            self.capacity_lane_sec += workers * dt
+            if runnable and busy < workers:
+                self.idle_lane_sec += (workers - busy) * dt
+                self.gap_sec += dt
+                self.longest_gap_sec = max(self.longest_gap_sec, self.gap_sec)
+            else:
+                self.gap_sec = 0.0
+            self.ui_depths.append(app.ui_bus.pending)
+            self.rss.append(read_rss_mb())
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    root, wrappers, files = prepare_sandbox(args)
+
+    sys.path.insert(0, REPO_DIR)
+    import Cinetico_Encoder as enc  # 沙盒环境变量就绪后再导入 (模块级读取 HOME)
+    enc.FFMPEG_PATH, enc.FFPROBE_PATH = wrappers["ffmpeg"], wrappers["ffprobe"]
+
+    gc.collect()
+    objects_start = len(gc.get_objects())
+    rss_start = read_rss_mb()
+    app = enc.UltraEncoderApp()
+    app.withdraw()
+    app.manual_cache_path = os.path.join(root, "cache")
+    os.makedirs(app.manual_cache_path, exist_ok=True)
+    app.current_workers = max(1, args.workers)
+    app.update()
+
+    # add_list 立即返回，文件大小在后台统计后才入队：分别记录调用耗时与全部入队的耗时
+    report = {}
+    t0 = time.perf_counter()
+    app.add_list(files, on_added=lambda paths: report.setdefault("enqueued_sec", time.perf_counter() - t0))
+    add_sec = time.perf_counter() - t0
+
+    timer_lag = []
+    sampler = Sampler(app, enc)
+
+    def probe_timer(expected):
+        timer_lag.append(max(0.0, time.perf_counter() - expected))
+        schedule_probe()
+
+    def schedule_probe():
+        app.after(int(TIMER_PROBE_SEC * 1000), probe_timer, time.perf_counter() + TIMER_PROBE_SEC)
+
+    def start():
+        if "enqueued_sec" not in report:
+            app.after(50, start)
+            return
+        app.scan_disk()
+        sampler.start()
+        report["run_start"] = time.perf_counter()
+        app.run()
+        schedule_probe()
+        app.after(500, watch)
+
+    def watch():
+        elapsed = time.perf_counter() - report["run_start"]
+        if app.running and elapsed < args.timeout:
+            app.after(200, watch)
+            return
+        report["timed_out"] = app.running
+        if app.running:
+            app.stop_flag = True
+        report["run_end"] = time.perf_counter()
+        sampler.stop_event.set()
+        app.after(1000, app.quit)  # 留出时间让收尾的 UI 事件排空
+
+    app.after(300, start)
+    app.mainloop()
+    sampler.join(timeout=2)
+
+    wall = report["run_end"] - report["run_start"]
+    codes = [app.task_widgets[f].status_code for f in app.file_queue]
+    done = sum(1 for c in codes if c == enc.STATE_DONE)
+    errors = sum(1 for c in codes if c == enc.STATE_ERROR)
+    stats = dict(app.engine_stats)
+    rss_end = read_rss_mb()
+    gc.collect()
+    per_k = max(1.0, args.jobs / 1000.0)
+    result = {
+        "jobs": args.jobs, "workers": app.current_workers, "done": done, "errors": errors,
+        "timed_out": report["timed_out"],
+        "add_list_sec": round(add_sec, 3),
+        "enqueue_sec": round(report["enqueued_sec"], 3),
+        "wall_sec": round(wall, 3),
+        "jobs_per_sec": round(done / wall, 2) if wall > 0 else 0.0,
+        "engine": {
+            "ticks": stats["ticks"],
+            "busy_sec": round(stats["busy_sec"], 3),
+            "cpu_sec": round(stats["cpu_sec"], 3),
+            "overhead_ratio": round(stats["busy_sec"] / wall, 4) if wall > 0 else 0.0,
+            "mean_tick_ms": round(stats["busy_sec"] / stats["ticks"] * 1000, 3) if stats["ticks"] else 0.0,
+            "max_tick_ms": round(stats["max_tick_sec"] * 1000, 3),
+        },
+        "lanes": {
+            "idle_lane_sec": round(sampler.idle_lane_sec, 3),
+            "idle_ratio": round(sampler.idle_lane_sec / sampler.capacity_lane_sec, 4) if sampler.capacity_lane_sec else 0.0,
+            "longest_gap_sec": round(sampler.longest_gap_sec, 3),
+        },
+        "ui_queue": {
+            "max": max(sampler.ui_depths, default=0),
+            "p95": percentile(sampler.ui_depths, 0.95),
+            "mean": round(statistics.fmean(sampler.ui_depths), 2) if sampler.ui_depths else 0.0,
+            "bus": app.ui_bus.stats(),
+        },
+        "timer_lag_ms": {
+            "p95": round(percentile(timer_lag, 0.95) * 1000, 2),
+            "max": round(max(timer_lag, default=0.0) * 1000, 2),
+        },
+        "rss_mb": {
+            "start": round(rss_start, 1), "peak": round(max(sampler.rss + [rss_end]), 1), "end": round(rss_end, 1),
+            "growth_per_1k_jobs": round((rss_end - rss_start) / per_k, 2),
+        },
+        "gc_objects_delta": len(gc.get_objects()) - objects_start,
+        "sandbox": root,
+    }
+
+    violations = []
+    if args.max_idle_ratio is not None and result["lanes"]["idle_ratio"] > args.max_idle_ratio:
+        violations.append(f"idle_ratio {result['lanes']['idle_ratio']} > {args.max_idle_ratio}")
+    if args.max_ui_queue is not None and result["ui_queue"]["max"] > args.max_ui_queue:
+        violations.append(f"ui_queue max {result['ui_queue']['max']} > {args.max_ui_queue}")
+    if args.max_rss_growth_mb is not None and result["rss_mb"]["growth_per_1k_jobs"] > args.max_rss_growth_mb:
+        violations.append(f"rss growth {result['rss_mb']['growth_per_1k_jobs']} MB/1k > {args.max_rss_growth_mb}")
+    if report["timed_out"]:
+        violations.append(f"run did not finish within {args.timeout}s")
+    result["violations"] = violations
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    # 不走 on_closing：它以 os._exit(0) 结束进程，会吞掉阈值检查的退出码
+    app.kill_all_procs()
+    app.orchestrator.shutdown()
+    app.tracer.close()
+    app.journal.close()
+    app.destroy()
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())